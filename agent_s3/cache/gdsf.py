@@ -1,23 +1,35 @@
 """
 Prefix-aware Greedy-Dual-Size-Frequency (GDSF) eviction policy for GPTCache.
 """
-import time
-
 from gptcache.manager.eviction import registry
 from gptcache.manager.eviction.base import BaseEvictionPolicy
 
+from .kv_store import DEFAULT_LAMBDA_DECAY, gdsf_score, kv_store
+from .prefix import prefix_trie
+
+
 class PrefixGDSF(BaseEvictionPolicy):
     def __init__(self):
-        self.lambda_decay = 0.001
+        self.lambda_decay = DEFAULT_LAMBDA_DECAY
 
     def _score(self, m):
-        freq = m.get("hits", 1)
-        size = m.get("kv_size", 1)
-        age = time.time() - m.get("last", time.time())
-        return (freq / size) - self.lambda_decay * age
+        # Hit counts and access times recorded in GPTCache metadata are only
+        # set on write; the KV store tracks them on every read.
+        live = kv_store.meta(m["prefix"]) if m.get("prefix") else None
+        if live:
+            m = {**m, **live}
+        return gdsf_score(m.get("hits", 1), m.get("kv_size", 1), m.get("last", 0.0), self.lambda_decay)
+
+    @staticmethod
+    def _is_leaf(m):
+        if m.get("prefix") and m["prefix"] in prefix_trie:
+            return prefix_trie.is_leaf(m["prefix"])
+        return m.get("is_leaf", True)
 
     def evict(self, all_meta):
-        leaves = [m for m in all_meta if m.get("is_leaf", True)]
+        # Prefixes of other cached prompts are kept while those prompts are;
+        # the trie knows whether a longer prompt was cached after this write.
+        leaves = [m for m in all_meta if self._is_leaf(m)]
         victim = min(leaves, key=self._score)
         return victim["uuid"]
 
@@ -1,7 +1,10 @@
 """
 Helpers for semantic cache read/write and vLLM KV reuse.
 """
+import inspect
+import threading
 import time
+from typing import Any, Dict
 try:
     import torch
     Tensor = torch.Tensor
@@ -15,28 +18,93 @@ except Exception:  # pragma: no cover - torch optional for tests
             self.nbytes = 0
 
 from gptcache import cache
-from .prefix import prefix_hash
+from .prefix import prefix_trie, tokenize
 from .kv_store import kv_store
+from agent_s3.tools.semantic_cache_metrics import CacheMetrics, hit_rates
+
+# Trie keys beyond this multiple of live KV tensors trigger a prune on write
+_TRIE_PRUNE_RATIO = 2
+
+# read_cache outcomes and latencies, reported by get_cache_stats
+metrics = CacheMetrics()
+_counters = {"hits": 0, "misses": 0, "kv_reuses": 0, "kv_reused_tokens": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(**increments: int) -> None:
+    with _counters_lock:
+        for name, value in increments.items():
+            _counters[name] += value
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Return prompt-cache hit rates, KV reuse, lookup latency and KV store state."""
+    with _counters_lock:
+        stats: Dict[str, Any] = dict(_counters)
+    rates = hit_rates(stats["hits"], 0, stats["misses"])
+    stats["hit_rate"] = rates["hit_rate"]
+    stats["miss_rate"] = rates["miss_rate"]
+    stats["latency"] = metrics.snapshot()
+    stats["kv_store"] = kv_store.get_stats()
+    return stats
+
+
+def reset_cache_stats() -> None:
+    with _counters_lock:
+        for name in _counters:
+            _counters[name] = 0
+    metrics.reset()
+
+
+def _accepts_prefix_tokens(llm) -> bool:
+    """Return True if ``llm.attach_kv`` can be told how many tokens match."""
+    try:
+        return "prefix_tokens" in inspect.signature(llm.attach_kv).parameters
+    except (TypeError, ValueError):
+        return False
 
 
 def read_cache(prompt: str, llm):
+    start = time.perf_counter()
     res = cache.get(prompt)
+    looked_up = time.perf_counter()
+    metrics.record("lookup", looked_up - start)
+    # A cached tensor may belong to a longer prompt. The plain vLLM
+    # attach_kv(kv) would use all of it, including that prompt's suffix, so
+    # without prefix_tokens only prompts ending at the match are attached.
+    sliced = _accepts_prefix_tokens(llm)
+    match = prefix_trie.longest_prefix(tokenize(prompt), kv_store.__contains__, whole=not sliced)
+    metrics.record("prefix_match", time.perf_counter() - looked_up)
     if res:
+        _count(hits=1)
+        if match:
+            kv_store.touch(match.key)  # keep the prefix's GDSF score current
         return res  # semantic hit
-    pfx = prefix_hash(prompt)
-    if pfx in kv_store:
-        llm.attach_kv(kv_store[pfx])  # vLLM API for prefix reuse
-        return None  # must still call LLM
-    return None
+    _count(misses=1)
+    if match is None:
+        kv_store.record_miss()
+        return None
+    kv_tensor = kv_store.get(match.key)  # counts the hit, or a miss if just evicted
+    if kv_tensor is None:
+        return None
+    if sliced:
+        llm.attach_kv(kv_tensor, prefix_tokens=match.tokens)
+    else:
+        llm.attach_kv(kv_tensor)  # vLLM API for whole-prompt reuse
+    _count(kv_reuses=1, kv_reused_tokens=match.tokens)
+    return None  # must still call LLM
 
 
 def write_cache(prompt: str, answer: str, kv_tensor: Tensor):
+    key = prefix_trie.insert(tokenize(prompt))
     meta = {
-        "prefix": prefix_hash(prompt),
+        "prefix": key,
         "hits": 1,
         "kv_size": kv_tensor.nbytes,
-        "is_leaf": True,
+        "is_leaf": prefix_trie.is_leaf(key),
         "last": time.time(),
     }
-    kv_store[meta["prefix"]] = kv_tensor
+    kv_store[key] = kv_tensor
+    if len(prefix_trie) > _TRIE_PRUNE_RATIO * len(kv_store):
+        prefix_trie.prune(kv_store.__contains__)
     cache.set(prompt, answer, meta)
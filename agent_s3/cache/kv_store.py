@@ -1,4 +1,298 @@
 """
-In-memory KV-tensor store for vLLM prefix reuse.
+Byte-budgeted KV-tensor store for vLLM prefix reuse.
+
+Tensors are kept in CPU RAM up to ``max_bytes``. When a new tensor does not
+fit, the entries with the lowest GDSF score are moved to ``.npy`` files under
+``spill_dir`` and read back through ``numpy`` memory maps on their next hit.
+Spilled bytes have their own budget; beyond it, the lowest-scoring spilled
+entries are dropped. Tensors that cannot be converted to numpy, such as the
+fallback ``Tensor`` used when torch is not installed, are dropped instead of
+spilled.
+
+Every ``get`` and ``touch`` updates the entry's hit count and last access
+time, and :class:`agent_s3.cache.gdsf.PrefixGDSF` reads those live counters
+through :meth:`KVStore.meta`.
 """
-kv_store = {}  # key = prefix_hash, value = torch.Tensor (GPU or CPU)
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from agent_s3.config import KV_STORE_MAX_BYTES, KV_STORE_MAX_SPILL_BYTES, KV_STORE_SPILL_DIR
+
+try:
+    import torch
+except Exception:  # pragma: no cover - torch optional for tests
+    torch = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LAMBDA_DECAY = 0.001
+
+_UNSAFE_KEY_RE = re.compile(r"[^A-Za-z0-9_-]+")
+
+
+def gdsf_score(hits: float, size: float, last: float, lambda_decay: float = DEFAULT_LAMBDA_DECAY,
+               now: Optional[float] = None) -> float:
+    """Greedy-Dual-Size-Frequency score; the lowest score is evicted first.
+
+    Frequency per byte, minus a penalty for time since the last access.
+    """
+    now = time.time() if now is None else now
+    return hits / max(size, 1) - lambda_decay * (now - last)
+
+
+def tensor_nbytes(tensor: Any) -> int:
+    nbytes = getattr(tensor, "nbytes", None)
+    if nbytes is None and hasattr(tensor, "element_size"):
+        nbytes = tensor.element_size() * tensor.nelement()
+    return int(nbytes or 0)
+
+
+def _to_numpy(tensor: Any) -> Optional[np.ndarray]:
+    if isinstance(tensor, np.ndarray):
+        return tensor
+    if torch is not None and isinstance(tensor, torch.Tensor):
+        return tensor.detach().cpu().numpy()
+    return None
+
+
+class _Entry:
+    __slots__ = ("tensor", "nbytes", "hits", "last", "path", "is_torch")
+
+    def __init__(self, tensor: Any, nbytes: int) -> None:
+        self.tensor = tensor
+        self.nbytes = nbytes
+        self.hits = 1
+        self.last = time.time()
+        self.path: Optional[Path] = None
+        self.is_torch = torch is not None and isinstance(tensor, torch.Tensor)
+
+
+class KVStore:
+    """Prefix-hash to KV-tensor map with a RAM byte budget and disk spill."""
+
+    def __init__(
+        self,
+        max_bytes: int = KV_STORE_MAX_BYTES,
+        spill_dir: Optional[str] = KV_STORE_SPILL_DIR,
+        max_spill_bytes: int = KV_STORE_MAX_SPILL_BYTES,
+        lambda_decay: float = DEFAULT_LAMBDA_DECAY,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self.max_spill_bytes = max_spill_bytes
+        self.lambda_decay = lambda_decay
+        self._entries: Dict[str, _Entry] = {}
+        self._lock = threading.RLock()
+        self.ram_bytes = 0
+        self.spilled_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.spills = 0
+        self.evictions = 0
+
+    # ------------------------------------------------------------------
+    # Mapping interface used by cache.helpers
+    # ------------------------------------------------------------------
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, key: str) -> Any:
+        tensor = self.get(key)
+        if tensor is None:
+            raise KeyError(key)
+        return tensor
+
+    def __setitem__(self, key: str, tensor: Any) -> None:
+        self.put(key, tensor)
+
+    # ------------------------------------------------------------------
+    # Store operations
+    # ------------------------------------------------------------------
+
+    def put(self, key: str, tensor: Any) -> None:
+        """Store ``tensor`` under ``key``, evicting or spilling to stay in budget."""
+        nbytes = tensor_nbytes(tensor)
+        with self._lock:
+            self._remove(key)
+            entry = _Entry(tensor, nbytes)
+            self._entries[key] = entry
+            self.ram_bytes += nbytes
+            self._enforce_budget(keep=key)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the tensor for ``key``, recording a hit or a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.hits += 1
+            entry.last = time.time()
+            if entry.tensor is None:
+                return self._promote(key, entry)
+            return entry.tensor
+
+    def touch(self, key: str) -> bool:
+        """Count a hit for ``key`` without loading it; return False if absent."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            entry.hits += 1
+            entry.last = time.time()
+            return True
+
+    def record_miss(self) -> None:
+        """Count a lookup that found no candidate key at all."""
+        with self._lock:
+            self.misses += 1
+
+    def meta(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return live GDSF inputs (``hits``, ``last``, ``kv_size``) for ``key``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            return {"hits": entry.hits, "last": entry.last, "kv_size": entry.nbytes}
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            tensor = entry.tensor
+            if tensor is None:
+                tensor = self._load(entry)
+                if not entry.is_torch:
+                    tensor = np.array(tensor)
+            self._remove(key)
+            return tensor
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "spilled_entries": sum(1 for e in self._entries.values() if e.tensor is None),
+                "ram_bytes": self.ram_bytes,
+                "spilled_bytes": self.spilled_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "spills": self.spills,
+                "evictions": self.evictions,
+            }
+
+    # ------------------------------------------------------------------
+    # Budget enforcement; callers hold the lock
+    # ------------------------------------------------------------------
+
+    def _score(self, entry: _Entry, now: float) -> float:
+        return gdsf_score(entry.hits, entry.nbytes, entry.last, self.lambda_decay, now)
+
+    def _victim(self, in_ram: bool, keep: Optional[str]) -> Optional[str]:
+        now = time.time()
+        candidates = [
+            (self._score(entry, now), key)
+            for key, entry in self._entries.items()
+            if key != keep and (entry.tensor is not None) == in_ram
+        ]
+        return min(candidates)[1] if candidates else None
+
+    def _enforce_budget(self, keep: Optional[str] = None) -> None:
+        while self.ram_bytes > self.max_bytes:
+            victim = self._victim(in_ram=True, keep=keep)
+            if victim is None:
+                # Only the new entry is left; it must leave RAM itself
+                victim = keep if keep in self._entries and self._entries[keep].tensor is not None else None
+                if victim is None:
+                    break
+            if not self._spill(victim):
+                self._remove(victim)
+                self.evictions += 1
+        while self.spilled_bytes > self.max_spill_bytes:
+            victim = self._victim(in_ram=False, keep=None)
+            if victim is None:
+                break
+            self._remove(victim)
+            self.evictions += 1
+
+    def _spill(self, key: str) -> bool:
+        """Move an entry's tensor to a memory-mapped ``.npy`` file."""
+        entry = self._entries[key]
+        array = _to_numpy(entry.tensor)
+        if self.spill_dir is None or array is None or self.max_spill_bytes <= 0:
+            return False
+        try:
+            self.spill_dir.mkdir(parents=True, exist_ok=True)
+            path = self.spill_dir / f"{_UNSAFE_KEY_RE.sub('_', key)}.npy"
+            mapped = np.lib.format.open_memmap(path, mode="w+", dtype=array.dtype, shape=array.shape)
+            mapped[...] = array
+            mapped.flush()
+            del mapped
+        except OSError as e:
+            logger.warning("Failed to spill KV tensor %s: %s", key[:8], e)
+            return False
+        entry.path = path
+        entry.tensor = None
+        self.ram_bytes -= entry.nbytes
+        self.spilled_bytes += entry.nbytes
+        self.spills += 1
+        return True
+
+    def _load(self, entry: _Entry) -> Any:
+        array = np.load(entry.path, mmap_mode="r")
+        if entry.is_torch and torch is not None:
+            return torch.from_numpy(np.array(array))
+        return array
+
+    def _promote(self, key: str, entry: _Entry) -> Any:
+        """Bring a spilled tensor back into RAM after a hit and return it."""
+        tensor = self._load(entry)
+        if not entry.is_torch:
+            # Copy out of the memory map so the spill file can be removed
+            tensor = np.array(tensor)
+        self._unlink(entry)
+        self.spilled_bytes -= entry.nbytes
+        entry.tensor = tensor
+        self.ram_bytes += entry.nbytes
+        self._enforce_budget(keep=key)
+        return tensor
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        if entry.tensor is None:
+            self.spilled_bytes -= entry.nbytes
+            self._unlink(entry)
+        else:
+            self.ram_bytes -= entry.nbytes
+
+    @staticmethod
+    def _unlink(entry: _Entry) -> None:
+        if entry.path is not None:
+            try:
+                os.unlink(entry.path)
+            except OSError:
+                pass
+            entry.path = None
+
+
+kv_store = KVStore()  # key = full-prompt prefix hash, value = KV tensor (torch, numpy or fallback)
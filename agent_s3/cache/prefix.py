@@ -1,8 +1,188 @@
 """
-Prefix hash utility for semantic cache prefix matching.
+Token-level prefix index for vLLM KV reuse.
+
+Prompts are tokenized with the shared encoding from
+``agent_s3.tools.context_management.token_budget`` and cut into chunks of
+``PREFIX_CHUNK_TOKENS`` tokens. Each chunk boundary gets a chained hash of the
+previous boundary's hash and the chunk's tokens, so one boundary hash stands
+for the whole prefix up to that boundary. The last, possibly partial, chunk
+also gets a boundary, and its hash identifies the full prompt.
+
+:class:`PrefixTrie` links the boundary hashes of cached prompts into a trie.
+Each node records the KV keys of the cached prompts that pass through it.
+:meth:`PrefixTrie.longest_prefix` walks a new prompt's boundaries and returns
+the deepest one still backed by a live KV tensor. A prompt that shares a long
+system prompt with a cached one therefore reuses everything up to the last
+common chunk boundary.
 """
 import hashlib
+import re
+import threading
+from array import array
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from agent_s3.tools.context_management.token_budget import get_token_estimator
+
+PREFIX_CHUNK_TOKENS = 64
+
+EMPTY_PREFIX_HASH = hashlib.sha256(b"").hexdigest()
+
+# Used when only the whitespace fallback encoding is available. That encoding
+# drops whitespace, and prompts that differ only in whitespace would collide.
+_FALLBACK_TOKEN_RE = re.compile(r"\S+|\s+")
+
+
+def tokenize(prompt: str, model_name: str = "gpt-4") -> Sequence:
+    """Return the token sequence prefix hashes are computed over."""
+    encoding = get_token_estimator(model_name).encoding
+    if getattr(encoding, "name", None) == "whitespace":
+        return _FALLBACK_TOKEN_RE.findall(prompt)
+    return encoding.encode(prompt, disallowed_special=())
+
+
+def _chunk_bytes(chunk: Sequence) -> bytes:
+    if chunk and isinstance(chunk[0], str):
+        return "".join(chunk).encode()
+    return array("I", chunk).tobytes()
+
+
+def boundary_hashes(tokens: Sequence, chunk_tokens: int = PREFIX_CHUNK_TOKENS) -> List[Tuple[int, str]]:
+    """Return ``(token_count, hash)`` for every chunk boundary of ``tokens``."""
+    boundaries = []
+    digest = b""
+    for start in range(0, len(tokens), chunk_tokens):
+        chunk = tokens[start:start + chunk_tokens]
+        digest = hashlib.sha256(digest + _chunk_bytes(chunk)).digest()
+        boundaries.append((start + len(chunk), digest.hex()))
+    return boundaries
+
+
+def prefix_hash(prompt: str, n_tokens: Optional[int] = None) -> str:
+    """Hash the first ``n_tokens`` tokens of a prompt, or all of them by default."""
+    tokens = tokenize(prompt)
+    if n_tokens is not None:
+        tokens = tokens[:n_tokens]
+    boundaries = boundary_hashes(tokens)
+    return boundaries[-1][1] if boundaries else EMPTY_PREFIX_HASH
+
+
+class PrefixMatch(NamedTuple):
+    """A cached KV tensor whose first ``tokens`` tokens match the prompt."""
+
+    key: str
+    tokens: int
+
+
+class _Node:
+    __slots__ = ("parent", "children", "keys")
+
+    def __init__(self, parent: Optional[str]) -> None:
+        self.parent = parent
+        self.children = 0
+        self.keys: Set[str] = set()
+
+
+class PrefixTrie:
+    """Trie of chunk-boundary hashes over the prompts with cached KV tensors."""
+
+    def __init__(self, chunk_tokens: int = PREFIX_CHUNK_TOKENS) -> None:
+        self.chunk_tokens = chunk_tokens
+        self._nodes: Dict[str, _Node] = {}
+        # KV key -> boundary hashes of its prompt, root first
+        self._paths: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._paths
+
+    def insert(self, tokens: Sequence) -> str:
+        """Register a cached prompt and return its KV key, the full-prompt hash."""
+        boundaries = boundary_hashes(tokens, self.chunk_tokens)
+        if not boundaries:
+            return EMPTY_PREFIX_HASH
+        key = boundaries[-1][1]
+        with self._lock:
+            parent = None
+            for _, digest in boundaries:
+                node = self._nodes.get(digest)
+                if node is None:
+                    node = self._nodes[digest] = _Node(parent)
+                    if parent is not None:
+                        self._nodes[parent].children += 1
+                node.keys.add(key)
+                parent = digest
+            self._paths[key] = [digest for _, digest in boundaries]
+        return key
+
+    def longest_prefix(
+        self,
+        tokens: Sequence,
+        is_live: Optional[Callable[[str], bool]] = None,
+        whole: bool = False,
+    ) -> Optional[PrefixMatch]:
+        """Return the cached KV covering the longest prefix of ``tokens``.
+
+        ``is_live`` reports whether a KV key still has a tensor and defaults to
+        every key in the trie. Keys whose tensors were evicted are pruned as
+        they are found. With ``whole``, only cached prompts that end at the
+        matched boundary are returned, so the tensor holds no tokens beyond
+        the match.
+        """
+        boundaries = boundary_hashes(tokens, self.chunk_tokens)
+        with self._lock:
+            if is_live is None:
+                is_live = self._paths.__contains__
+            for depth, digest in reversed(boundaries):
+                if is_live(digest):
+                    return PrefixMatch(digest, depth)
+                node = self._nodes.get(digest)
+                if node is None or whole:
+                    continue
+                for key in list(node.keys):
+                    if is_live(key):
+                        return PrefixMatch(key, depth)
+                    self._remove(key)
+        return None
+
+    def is_leaf(self, key: str) -> bool:
+        """Return True if no longer cached prompt extends the one under ``key``."""
+        with self._lock:
+            node = self._nodes.get(key)
+            return node is None or node.children == 0
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def prune(self, is_live: Callable[[str], bool]) -> int:
+        """Drop every key whose KV tensor is gone and return how many were dropped."""
+        with self._lock:
+            stale = [key for key in self._paths if not is_live(key)]
+            for key in stale:
+                self._remove(key)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._nodes.clear()
+            self._paths.clear()
+
+    def _remove(self, key: str) -> None:
+        path = self._paths.pop(key, None)
+        if path is None:
+            return
+        # Every key passes through all of its ancestors, so a node left
+        # without keys has no children either.
+        for digest in reversed(path):
+            node = self._nodes[digest]
+            node.keys.discard(key)
+            if not node.keys:
+                del self._nodes[digest]
+                if node.parent is not None:
+                    self._nodes[node.parent].children -= 1
+
 
-def prefix_hash(prompt: str, n_tokens: int = 50) -> str:
-    """Hash the first n_tokens of a prompt for prefix-based cache lookup."""
-    return hashlib.sha256(" ".join(prompt.split()[:n_tokens]).encode()).hexdigest()
+prefix_trie = PrefixTrie()  # chunk-boundary hashes of prompts stored in kv_store
@@ -0,0 +1,81 @@
+"""
+Single-flight coalescing for identical in-flight LLM requests.
+
+Concurrent callers that issue the same request share one network call: the
+first caller runs it and the rest wait on its future. Keys use the same hash as
+:meth:`agent_s3.tools.semantic_cache.SemanticCache.get_cache_key`
+(:func:`agent_s3.tools.semantic_cache_key.cache_key`), so a coalesced request
+is exactly one that would later hit the semantic cache.
+"""
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from agent_s3.tools.semantic_cache_key import cache_key
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; duplicates share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Run ``fn`` unless an identical call is already in flight.
+
+        Args:
+            key: Identity of the call
+            fn: Zero-argument callable performing the call
+
+        Returns:
+            ``(result, shared)`` where ``shared`` is True when the result came
+            from another caller's in-flight call. Exceptions raised by the
+            leading call are re-raised in every waiting caller.
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._inflight),
+            }
+
+
+def request_key(prompt_data: Dict[str, Any]) -> Optional[str]:
+    """Return the semantic cache key for ``prompt_data``.
+
+    Returns ``None`` when the data cannot be serialized, in which case the
+    request should simply not be coalesced.
+    """
+    try:
+        return cache_key(prompt_data)
+    except (TypeError, ValueError):
+        return None
@@ -28,6 +28,8 @@ _COMMAND_MAP: Dict[str, str] = {
     "tasks": "execute_tasks_command",
     "clear": "execute_clear_command",
     "db": "execute_db_command",
+    "cache": "execute_cache_command",
+    "cache-stats": "execute_cache_stats_command",
 }
 
 
@@ -59,7 +61,9 @@ def _handle_simple_help_command(args: str) -> Tuple[str, bool]:
             "request": "Process a full change request (plan + execution)",
             "tasks": "List active tasks that can be resumed",
             "clear": "Clear a specific task state",
-            "db": "Database operations (schema, query, test, etc.)"
+            "db": "Database operations (schema, query, test, etc.)",
+            "cache": "Export or import semantic cache bundles",
+            "cache-stats": "Show cache hit rates, lookup latency and estimated savings (--json for raw data)"
         }
 
         if command in help_msgs:
@@ -92,6 +96,8 @@ Available Commands:
   /tasks                     - List active tasks that can be resumed
   /clear <id>                - Clear a specific task state
   /db <command>              - Database operations (see /db help for details)
+  /cache export|import <file> - Export or import a semantic cache bundle
+  /cache-stats [--json]      - Show cache hit rates, latency and savings
   /test                      - Run tests
   /debug                     - Start debugging utilities
 
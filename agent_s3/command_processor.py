@@ -1012,6 +1012,65 @@ class CommandProcessor:
             self._log(error_msg, level="error")
             return error_msg, False
 
+    def execute_cache_command(self, args: str) -> tuple[str, bool]:
+        """Execute the cache command to export or import semantic cache bundles.
+
+        Args:
+            args: ``export <bundle> [namespace ...]`` or
+                ``import <bundle> [dedupe_threshold]``
+
+        Returns:
+            Tuple of command result message and success flag
+        """
+        usage = (
+            "Usage:\n"
+            "  /cache export <bundle> [namespace ...] - Write semantic cache entries to a bundle\n"
+            "  /cache import <bundle> [threshold]     - Merge a bundle, skipping near-duplicates"
+        )
+        parts = args.split()
+        if len(parts) < 2 or parts[0] not in ("export", "import"):
+            return usage, False
+
+        from agent_s3.tools.semantic_cache import SemanticCache
+        from agent_s3.tools.semantic_cache_bundle import DEFAULT_DEDUPE_THRESHOLD
+
+        subcommand, bundle_path = parts[0], parts[1]
+        self._log(f"Semantic cache {subcommand}: {bundle_path}")
+        try:
+            cache = SemanticCache.get_instance()
+            if subcommand == "export":
+                count = cache.export_bundle(bundle_path, parts[2:] or None)
+                return f"Exported {count} semantic cache entries to {bundle_path}", True
+            threshold = float(parts[2]) if len(parts) > 2 else DEFAULT_DEDUPE_THRESHOLD
+            counts = cache.import_bundle(bundle_path, threshold)
+            summary = ", ".join(f"{name}: {count}" for name, count in counts.items())
+            return f"Imported semantic cache bundle {bundle_path} ({summary})", True
+        except (OSError, ValueError) as e:
+            error_msg = f"Semantic cache {subcommand} failed: {e}"
+            self._log(error_msg, level="error")
+            return error_msg, False
+
+    def execute_cache_stats_command(self, args: str) -> tuple[str, bool]:
+        """Execute the cache-stats command to report cache effectiveness.
+
+        Args:
+            args: ``--json`` for the raw report instead of a summary
+
+        Returns:
+            Tuple of command result message and success flag
+        """
+        from agent_s3.tools.semantic_cache_metrics import collect_cache_stats, format_cache_stats
+
+        try:
+            report = collect_cache_stats()
+        except Exception as e:
+            error_msg = f"Error collecting cache statistics: {e}"
+            self._log(error_msg, level="error")
+            return error_msg, False
+        if args.strip() == "--json":
+            return json.dumps(report, indent=2, default=str), True
+        return format_cache_stats(report), True
+
     def execute_db_command(self, args: str) -> tuple[str, bool]:
         """Execute the db command for database operations.
 
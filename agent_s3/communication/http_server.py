@@ -75,9 +75,21 @@ class Agent3HTTPHandler(BaseHTTPRequestHandler):
         elif parsed.path == "/help":
             result = self.execute_command("/help")
             self.send_json(result)
+        elif parsed.path == "/cache-stats":
+            self.send_cache_stats()
         else:
             self.send_error(404)
 
+    def send_cache_stats(self) -> None:
+        """Send semantic cache and prompt cache statistics as JSON."""
+        from agent_s3.tools.semantic_cache_metrics import collect_cache_stats
+
+        try:
+            self.send_json(collect_cache_stats())
+        except Exception as e:
+            logger.error(f"Error collecting cache statistics: {e}", exc_info=True)
+            self.send_json({"error": str(e)}, status=500)
+
     def do_POST(self) -> None:
         """Handle POST requests."""
         if not self._authorized():
@@ -290,7 +302,7 @@ class EnhancedHTTPServer:
 
             logger.info(f"HTTP server started on http://{self.host}:{self.port}")
             logger.info(
-                "Available endpoints: GET /health, GET /help, POST /command"
+                "Available endpoints: GET /health, GET /help, GET /cache-stats, POST /command"
             )
 
             self.server.serve_forever()
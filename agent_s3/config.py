@@ -79,6 +79,26 @@ LLM_INITIAL_BACKOFF = float(os.getenv('LLM_INITIAL_BACKOFF', '1.0'))
 LLM_BACKOFF_FACTOR = float(os.getenv('LLM_BACKOFF_FACTOR', '2.0'))
 LLM_FALLBACK_STRATEGY = os.getenv('LLM_FALLBACK_STRATEGY', 'retry_simplified')
 LLM_DEFAULT_TIMEOUT = float(os.getenv('LLM_DEFAULT_TIMEOUT', '60.0'))
+# Seconds a call may spend retrying; unset = every attempt may run to its timeout
+LLM_RETRY_DEADLINE = float(os.environ['LLM_RETRY_DEADLINE']) if os.getenv('LLM_RETRY_DEADLINE') else None
+LLM_RETRY_BUDGET_RATIO = float(os.getenv('LLM_RETRY_BUDGET_RATIO', '0.2'))  # retries per request, per endpoint
+LLM_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('LLM_CIRCUIT_FAILURE_THRESHOLD', '5'))
+LLM_CIRCUIT_COOLDOWN = float(os.getenv('LLM_CIRCUIT_COOLDOWN', '30.0'))  # seconds before a half-open probe
+LLM_TIMEOUT_P95_MULTIPLIER = float(os.getenv('LLM_TIMEOUT_P95_MULTIPLIER', '3.0'))  # 0 = static read timeout
+LLM_RESPONSE_CAPTURE = os.getenv('LLM_RESPONSE_CAPTURE', 'all')  # off, errors, sampled or all
+LLM_RESPONSE_CAPTURE_SAMPLE_RATE = float(os.getenv('LLM_RESPONSE_CAPTURE_SAMPLE_RATE', '0.1'))
+LLM_RESPONSE_CAPTURE_MAX_CHARS = int(os.getenv('LLM_RESPONSE_CAPTURE_MAX_CHARS', '4000'))
+LLM_RESPONSE_CAPTURE_COMPRESS = os.getenv('LLM_RESPONSE_CAPTURE_COMPRESS', 'false').lower() == 'true'
+LLM_RESPONSE_CAPTURE_DIR = os.getenv('LLM_RESPONSE_CAPTURE_DIR', 'logs/llm_responses')
+KV_STORE_MAX_BYTES = int(os.getenv('KV_STORE_MAX_BYTES', str(2 * 1024 ** 3)))  # RAM budget for KV tensors
+KV_STORE_SPILL_DIR = os.getenv('KV_STORE_SPILL_DIR', '.cache/kv_store')  # empty = drop instead of spilling
+KV_STORE_MAX_SPILL_BYTES = int(os.getenv('KV_STORE_MAX_SPILL_BYTES', str(8 * 1024 ** 3)))
+LLM_MAX_CONCURRENCY_PER_ENDPOINT = int(os.getenv('LLM_MAX_CONCURRENCY_PER_ENDPOINT', '8'))
+LLM_REQUESTS_PER_SECOND = float(os.getenv('LLM_REQUESTS_PER_SECOND', '0'))  # 0 = adapt from provider headers only
+LLM_LATENCY_SLO = float(os.getenv('LLM_LATENCY_SLO', '0'))  # p95 seconds for routed roles; 0 = no SLO
+LLM_COST_BUDGET = float(os.getenv('LLM_COST_BUDGET', '0'))  # USD per routed call; 0 = no budget
+LLM_PROMPT_CACHING = os.getenv('LLM_PROMPT_CACHING', 'true').lower() == 'true'
+LLM_PROMPT_CACHE_MIN_TOKENS = int(os.getenv('LLM_PROMPT_CACHE_MIN_TOKENS', '1024'))
 LLM_EXPLAIN_PROMPT_MAX_LEN = int(os.getenv('LLM_EXPLAIN_PROMPT_MAX_LEN', '1000'))
 LLM_EXPLAIN_RESPONSE_MAX_LEN = int(os.getenv('LLM_EXPLAIN_RESPONSE_MAX_LEN', '1000'))
 
@@ -97,8 +117,28 @@ EMBEDDING_RETRY_COUNT    = int(os.getenv('EMBEDDING_RETRY_COUNT',    '3'))
 EMBEDDING_BACKOFF_INITIAL = float(os.getenv('EMBEDDING_BACKOFF_INITIAL', '1.0'))
 EMBEDDING_BACKOFF_FACTOR = float(os.getenv('EMBEDDING_BACKOFF_FACTOR', '2.0'))
 EMBEDDING_TIMEOUT        = float(os.getenv('EMBEDDING_TIMEOUT',      '30.0'))
+# Embedding backend: "local" (offline hashing), "onnx" (local model) or "llm" (embedder role).
+# SemanticCache embeds with "llm" while this is "local", since hashing vectors are lexical.
+EMBEDDING_BACKEND        = os.getenv('EMBEDDING_BACKEND',        'local')
+EMBEDDING_ONNX_MODEL     = os.getenv('EMBEDDING_ONNX_MODEL',     '')
+EMBEDDING_ONNX_TOKENIZER = os.getenv('EMBEDDING_ONNX_TOKENIZER', '')
+# Texts and estimated tokens per embedding batch (local inference or one API request)
+EMBEDDING_BATCH_SIZE     = int(os.getenv('EMBEDDING_BATCH_SIZE',     '64'))
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv('EMBEDDING_BATCH_MAX_TOKENS', '100000'))
+# Persistent embedding cache; an empty path uses <workspace>/.cache, 0 bytes disables it
+EMBEDDING_CACHE_PATH     = os.getenv('EMBEDDING_CACHE_PATH',     '')
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv('EMBEDDING_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+# Stored vector precision: "float32", "float16", "int8" or "pq" (product quantization)
+EMBEDDING_PRECISION      = os.getenv('EMBEDDING_PRECISION',      'float32')
+EMBEDDING_PQ_M           = int(os.getenv('EMBEDDING_PQ_M',       '16'))
+# Candidates re-ranked exactly per result when precision is below float32
+EMBEDDING_RERANK_FACTOR  = int(os.getenv('EMBEDDING_RERANK_FACTOR', '4'))
 # Default timeout for external HTTP requests
 HTTP_DEFAULT_TIMEOUT     = float(os.getenv('HTTP_DEFAULT_TIMEOUT', '30.0'))
+# Pooled HTTP transport settings shared by LLM, embedding and GitHub calls
+HTTP_POOL_CONNECTIONS    = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+HTTP_POOL_MAXSIZE        = int(os.getenv('HTTP_POOL_MAXSIZE',     '32'))
+HTTP_KEEPALIVE           = os.getenv('HTTP_KEEPALIVE', 'true').lower() == 'true'
 # Specialized LLM roles configuration
 EMBEDDER_ROLE_NAME       = os.getenv('EMBEDDER_ROLE_NAME',     'embedder')
 SUMMARIZER_ROLE_NAME     = os.getenv('SUMMARIZER_ROLE_NAME',   'summarizer')
@@ -208,6 +248,25 @@ class ConfigModel(BaseModel):
     llm_backoff_factor: float = LLM_BACKOFF_FACTOR
     llm_fallback_strategy: str = LLM_FALLBACK_STRATEGY
     llm_default_timeout: float = LLM_DEFAULT_TIMEOUT
+    llm_retry_deadline: Optional[float] = LLM_RETRY_DEADLINE
+    llm_retry_budget_ratio: float = LLM_RETRY_BUDGET_RATIO
+    llm_circuit_failure_threshold: int = LLM_CIRCUIT_FAILURE_THRESHOLD
+    llm_circuit_cooldown: float = LLM_CIRCUIT_COOLDOWN
+    llm_timeout_p95_multiplier: float = LLM_TIMEOUT_P95_MULTIPLIER
+    llm_response_capture: str = LLM_RESPONSE_CAPTURE
+    llm_response_capture_sample_rate: float = LLM_RESPONSE_CAPTURE_SAMPLE_RATE
+    llm_response_capture_max_chars: int = LLM_RESPONSE_CAPTURE_MAX_CHARS
+    llm_response_capture_compress: bool = LLM_RESPONSE_CAPTURE_COMPRESS
+    llm_response_capture_dir: str = LLM_RESPONSE_CAPTURE_DIR
+    kv_store_max_bytes: int = KV_STORE_MAX_BYTES
+    kv_store_spill_dir: str = KV_STORE_SPILL_DIR
+    kv_store_max_spill_bytes: int = KV_STORE_MAX_SPILL_BYTES
+    llm_max_concurrency_per_endpoint: int = LLM_MAX_CONCURRENCY_PER_ENDPOINT
+    llm_requests_per_second: float = LLM_REQUESTS_PER_SECOND
+    llm_latency_slo: float = LLM_LATENCY_SLO
+    llm_cost_budget: float = LLM_COST_BUDGET
+    llm_prompt_caching: bool = LLM_PROMPT_CACHING
+    llm_prompt_cache_min_tokens: int = LLM_PROMPT_CACHE_MIN_TOKENS
     llm_explain_prompt_max_len: int = LLM_EXPLAIN_PROMPT_MAX_LEN
     llm_explain_response_max_len: int = LLM_EXPLAIN_RESPONSE_MAX_LEN
     # CLI command warnings always enabled for safety
@@ -222,7 +281,20 @@ class ConfigModel(BaseModel):
     embedding_backoff_initial: float = EMBEDDING_BACKOFF_INITIAL
     embedding_backoff_factor: float = EMBEDDING_BACKOFF_FACTOR
     embedding_timeout: float = EMBEDDING_TIMEOUT
+    embedding_backend: str = EMBEDDING_BACKEND
+    embedding_onnx_model: str = EMBEDDING_ONNX_MODEL
+    embedding_onnx_tokenizer: str = EMBEDDING_ONNX_TOKENIZER
+    embedding_batch_size: int = EMBEDDING_BATCH_SIZE
+    embedding_batch_max_tokens: int = EMBEDDING_BATCH_MAX_TOKENS
+    embedding_cache_path: str = EMBEDDING_CACHE_PATH
+    embedding_cache_max_bytes: int = EMBEDDING_CACHE_MAX_BYTES
+    embedding_precision: str = EMBEDDING_PRECISION
+    embedding_pq_m: int = EMBEDDING_PQ_M
+    embedding_rerank_factor: int = EMBEDDING_RERANK_FACTOR
     http_default_timeout: float = HTTP_DEFAULT_TIMEOUT
+    http_pool_connections: int = HTTP_POOL_CONNECTIONS
+    http_pool_maxsize: int = HTTP_POOL_MAXSIZE
+    http_keepalive: bool = HTTP_KEEPALIVE
     embedder_role_name: str = EMBEDDER_ROLE_NAME
     summarizer_role_name: str = SUMMARIZER_ROLE_NAME
     summarizer_max_chunk_size: int = SUMMARIZER_MAX_CHUNK_SIZE
@@ -103,7 +103,7 @@ def execute_full_debugging(
 
     # Call LLM for debugging
     try:
-        result = cached_call_llm(prompt, llm, **coordinator.config.config)
+        result = cached_call_llm(prompt, llm, cache_role="debugger", **coordinator.config.config)
 
         if not result.get('success'):
             error_msg = result.get('error', 'Unknown error')
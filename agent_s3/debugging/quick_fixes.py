@@ -88,7 +88,7 @@ def execute_generator_quick_fix(
 
     # Call LLM for quick fix
     try:
-        result = cached_call_llm(prompt, llm, **coordinator.config.config)
+        result = cached_call_llm(prompt, llm, cache_role="generator", **coordinator.config.config)
 
         if not result.get('success'):
             error_msg = result.get('error', 'Unknown error')
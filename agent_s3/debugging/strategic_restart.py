@@ -410,7 +410,7 @@ def _execute_request_modification(
         """
 
         # Call LLM for request modification
-        result = cached_call_llm(prompt, llm, **coordinator.config.config)
+        result = cached_call_llm(prompt, llm, cache_role="debugger", **coordinator.config.config)
 
         if not result.get('success'):
             error_msg = result.get('error', 'Unknown error')
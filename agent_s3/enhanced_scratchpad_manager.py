@@ -10,6 +10,7 @@ import re
 import json
 import glob
 import logging
+import threading
 from enum import Enum, auto
 from dataclasses import dataclass, field, asdict
 from datetime import datetime
@@ -152,6 +153,9 @@ class EnhancedScratchpadManager:
         self.current_log_file = self._get_session_log_file()
         self.current_part = 1
 
+        # Serializes writes from the caller and background capture threads
+        self._write_lock = threading.RLock()
+
         # Initialize statistics
         self.entry_count = 0
         self.section_stack = []
@@ -278,22 +282,23 @@ class EnhancedScratchpadManager:
     def _check_and_rotate_log(self) -> None:
         """Check if log file size limit is reached and rotate if needed."""
         try:
-            if self.current_log_file.exists():
-                size_mb = self.current_log_file.stat().st_size / (1024 * 1024)
-                if size_mb >= self.max_file_size_mb:
-                    self.current_part += 1
-                    self.current_log_file = self._get_session_log_file(self.current_part)
-
-                    # Log rotation event to new file
-                    new_entry = LogEntry(
-                        timestamp=datetime.now().isoformat(),
-                        role="SessionManager",
-                        level=LogLevel.INFO,
-                        section=Section.METADATA,
-                        message=f"Log rotation - continuing in part {self.current_part}",
-                        metadata={"previous_part": self.current_part - 1, "part": self.current_part}
-                    )
-                    self._write_entry(new_entry)
+            with self._write_lock:
+                if self.current_log_file.exists():
+                    size_mb = self.current_log_file.stat().st_size / (1024 * 1024)
+                    if size_mb >= self.max_file_size_mb:
+                        self.current_part += 1
+                        self.current_log_file = self._get_session_log_file(self.current_part)
+
+                        # Log rotation event to new file
+                        new_entry = LogEntry(
+                            timestamp=datetime.now().isoformat(),
+                            role="SessionManager",
+                            level=LogLevel.INFO,
+                            section=Section.METADATA,
+                            message=f"Log rotation - continuing in part {self.current_part}",
+                            metadata={"previous_part": self.current_part - 1, "part": self.current_part}
+                        )
+                        self._write_entry(new_entry)
 
         except Exception as e:
             # Don't fail if rotation has issues
@@ -356,7 +361,12 @@ class EnhancedScratchpadManager:
             return "[Error decrypting content]"
 
     def _write_entry(self, entry: LogEntry) -> None:
-        """Write a log entry to the current log file."""
+        """Write a log entry to the current log file.
+
+        Formatting and encryption happen outside the write lock so concurrent
+        writers (such as the raw response capture thread) only serialize on
+        the file append itself.
+        """
         try:
             # Format the entry
             formatted_entry = self._format_entry(entry)
@@ -369,17 +379,18 @@ class EnhancedScratchpadManager:
             if not formatted_entry.endswith("\n"):
                 formatted_entry += "\n"
 
-            # Write to file
-            with open(self.current_log_file, 'a', encoding='utf-8') as f:
-                f.write(formatted_entry)
+            with self._write_lock:
+                # Write to file
+                with open(self.current_log_file, 'a', encoding='utf-8') as f:
+                    f.write(formatted_entry)
 
-            # Update statistics
-            self.entry_count += 1
+                # Update statistics
+                self.entry_count += 1
 
-            # Add to recent entries cache
-            self._recent_entries.append(entry)
-            if len(self._recent_entries) > self._max_recent_entries:
-                self._recent_entries.pop(0)
+                # Add to recent entries cache
+                self._recent_entries.append(entry)
+                if len(self._recent_entries) > self._max_recent_entries:
+                    self._recent_entries.pop(0)
 
         except Exception as e:
             # Log to standard error if file writing fails
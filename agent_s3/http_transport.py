@@ -0,0 +1,878 @@
+"""Shared, pooled HTTP transports for outbound API calls.
+
+Every provider call used to build a fresh ``requests.Session`` and throw it
+away, paying a TCP and TLS handshake per request. The :class:`TransportRegistry`
+keeps one long-lived session per endpoint origin (scheme, host and port) so
+that calls from any thread reuse warm, keep-alive connections.
+"""
+
+import logging
+import re
+import socket
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# Default pool sizing. ``pool_connections`` is the number of host pools kept per
+# session and ``pool_maxsize`` the number of sockets kept open per host.
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 32
+
+# TCP keep-alive probe settings (seconds / probe count)
+KEEPALIVE_IDLE = 60
+KEEPALIVE_INTERVAL = 15
+KEEPALIVE_COUNT = 4
+
+# Per-endpoint request limiting defaults
+DEFAULT_MAX_CONCURRENCY_PER_ENDPOINT = 8
+DEFAULT_429_PAUSE = 1.0
+
+# Circuit breaker defaults: consecutive endpoint failures before opening, and
+# seconds an open circuit waits before letting a half-open probe through
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_COOLDOWN = 30.0
+# Retry budget defaults: retries allowed per request, the reserve available to
+# an idle endpoint, and how fast that reserve refills
+DEFAULT_RETRY_RATIO = 0.2
+DEFAULT_MIN_RETRY_TOKENS = 3.0
+DEFAULT_RETRY_REFILL_PER_SECOND = 0.1
+DEFAULT_MAX_RETRY_TOKENS = 10.0
+
+# HTTP statuses that indicate an unhealthy endpoint rather than a bad request
+TRANSIENT_STATUSES = frozenset({408, 429, 500, 502, 503, 504})
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+RetrySpec = Union[int, Retry, None]
+
+
+def _keepalive_socket_options() -> list:
+    """Return socket options enabling TCP keep-alive where the OS supports it."""
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    for name, value in (
+        ("TCP_KEEPIDLE", KEEPALIVE_IDLE),
+        ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL),
+        ("TCP_KEEPCNT", KEEPALIVE_COUNT),
+    ):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+def _origin(url: str) -> str:
+    """Normalise a URL to its ``scheme://host:port`` origin."""
+    parts = urlsplit(url)
+    scheme = (parts.scheme or "https").lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port or (443 if scheme == "https" else 80)
+    return f"{scheme}://{host}:{port}"
+
+
+def _retry_key(max_retries: RetrySpec) -> Tuple[Any, ...]:
+    """Build a hashable key describing a retry policy."""
+    if max_retries is None:
+        return (0,)
+    if isinstance(max_retries, int):
+        return (max_retries,)
+    return (
+        max_retries.total,
+        max_retries.backoff_factor,
+        tuple(sorted(max_retries.status_forcelist or ())),
+        tuple(sorted(max_retries.allowed_methods or ())),
+    )
+
+
+class KeepAliveHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that enables TCP keep-alive on its pooled sockets."""
+
+    def __init__(self, *args: Any, keepalive: bool = True, **kwargs: Any) -> None:
+        # Must be set before HTTPAdapter.__init__ builds the pool manager
+        self._keepalive = keepalive
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args: Any, **kwargs: Any) -> None:
+        if self._keepalive:
+            kwargs.setdefault("socket_options", _keepalive_socket_options())
+        super().init_poolmanager(*args, **kwargs)
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse a ``Retry-After`` header (delta seconds or HTTP date)."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse an ``x-ratelimit-reset*`` header into seconds from now.
+
+    Accepts OpenAI-style durations (``"1s"``, ``"6m0s"``, ``"20ms"``), plain
+    seconds, and epoch timestamps in seconds or milliseconds (OpenRouter).
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        parts = _DURATION_RE.findall(value)
+        if not parts:
+            return None
+        return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+    if number > 1e12:
+        return max(0.0, number / 1000.0 - time.time())
+    if number > 1e9:
+        return max(0.0, number - time.time())
+    return max(0.0, number)
+
+
+def _header_int(headers: Dict[str, str], *names: str) -> Optional[int]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return int(float(value))
+            except ValueError:
+                continue
+    return None
+
+
+class EndpointLimiter:
+    """Concurrency cap plus token-bucket rate limiter for one endpoint.
+
+    The bucket starts at ``requests_per_second`` (``None`` means unlimited) and
+    adapts to what the provider reports: ``Retry-After`` and 429 responses
+    pause every caller, and ``x-ratelimit-remaining``/``x-ratelimit-reset``
+    headers spread the remaining quota evenly until the window resets.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY_PER_ENDPOINT,
+        requests_per_second: Optional[float] = None,
+        burst: Optional[float] = None,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.configured_rate = requests_per_second
+        self.rate = requests_per_second
+        self.capacity = burst or max(1.0, float(requests_per_second or 1.0))
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.wait_time = 0.0
+
+    def __enter__(self) -> "EndpointLimiter":
+        self.acquire()
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.release()
+
+    def acquire(self) -> float:
+        """Wait for a concurrency slot and a rate token.
+
+        Returns:
+            Seconds spent waiting
+        """
+        started = time.monotonic()
+        self._semaphore.acquire()
+        try:
+            while True:
+                delay = self._try_take()
+                if delay <= 0:
+                    break
+                time.sleep(delay)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            with self._lock:
+                self.throttled += 1
+                self.wait_time += waited
+        return waited
+
+    def release(self) -> None:
+        """Return the concurrency slot taken by :meth:`acquire`."""
+        self._semaphore.release()
+
+    def _try_take(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.rate is None:
+                return 0.0
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._last_refill) * self.rate
+            )
+            self._last_refill = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def pause(self, seconds: float) -> None:
+        """Block new requests on this endpoint for ``seconds``."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def observe(self, status_code: int, headers: Optional[Dict[str, str]]) -> None:
+        """Adapt the bucket to rate-limit information in a provider response."""
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        retry_after = _parse_retry_after(headers.get("retry-after"))
+        if status_code == 429 and retry_after is None:
+            retry_after = DEFAULT_429_PAUSE
+        if retry_after:
+            logger.warning("Rate limited by endpoint; pausing for %.1fs", retry_after)
+            self.pause(retry_after)
+
+        remaining = _header_int(headers, "x-ratelimit-remaining-requests", "x-ratelimit-remaining")
+        reset = _parse_reset(
+            headers.get("x-ratelimit-reset-requests") or headers.get("x-ratelimit-reset")
+        )
+        if remaining is None or reset is None:
+            return
+        if remaining <= 0:
+            self.pause(reset)
+            return
+        adaptive = remaining / max(reset, 1.0)
+        with self._lock:
+            if self.configured_rate is not None:
+                adaptive = min(adaptive, self.configured_rate)
+            # Only throttle once the remaining quota is actually scarce
+            if remaining <= self.max_concurrency * 2:
+                self.rate = adaptive
+                self.capacity = max(1.0, min(self.capacity, float(remaining)))
+            else:
+                self.rate = self.configured_rate
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "rate": self.rate,
+                "throttled": self.throttled,
+                "wait_time": round(self.wait_time, 3),
+                "paused_for": max(0.0, self._paused_until - time.monotonic()),
+            }
+
+
+def retry_deadline(
+    attempt_timeout: float, max_retries: int, initial_backoff: float, backoff_factor: float
+) -> float:
+    """Return the seconds ``max_retries`` attempts may take, backoff included.
+
+    Used when no retry deadline is configured, so an attempt that runs into
+    its own timeout still leaves room for the retries after it.
+    """
+    backoff = sum(initial_backoff * backoff_factor ** i for i in range(max(0, max_retries - 1)))
+    return max_retries * attempt_timeout + backoff
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """Return True if ``error`` means the endpoint itself is failing.
+
+    Timeouts, connection errors and HTTP 408/429/5xx responses are transient
+    and count against the endpoint's circuit breaker. Other 4xx responses
+    are caller errors that a retry would not fix.
+    """
+    if isinstance(
+        error,
+        (
+            requests.exceptions.Timeout,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.ChunkedEncodingError,
+        ),
+    ):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError):
+        response = error.response
+        return response is None or response.status_code in TRANSIENT_STATUSES
+    return False
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit is open."""
+
+    def __init__(self, name: str, retry_after: float) -> None:
+        super().__init__(f"Circuit open for {name}; retry in {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Closed/open/half-open circuit breaker for one endpoint.
+
+    The circuit opens after ``failure_threshold`` consecutive failures, and
+    callers then fail immediately instead of waiting on a degraded endpoint.
+    Once ``cooldown`` seconds pass, one probe call is let through (half-open).
+    If the probe succeeds the circuit closes; if it fails the circuit opens
+    again for another cooldown.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        cooldown: float = DEFAULT_COOLDOWN,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.rejected = 0
+
+    def configure(self, failure_threshold: int, cooldown: float) -> None:
+        """Apply new thresholds without touching the current state."""
+        with self._lock:
+            self.failure_threshold = max(1, failure_threshold)
+            self.cooldown = cooldown
+
+    def reset(self) -> None:
+        """Close the circuit and forget recorded failures."""
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == self.OPEN and now - self._opened_at >= self.cooldown:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed.
+
+        A True result in the half-open state reserves the single probe; the
+        caller must report its outcome with :meth:`record_success`,
+        :meth:`record_failure` or :meth:`release`.
+        """
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a probe through."""
+        with self._lock:
+            if self._current_state(time.monotonic()) != self.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._failures += 1
+            state = self._current_state(now)
+            if state == self.HALF_OPEN or (state == self.CLOSED and self._failures >= self.failure_threshold):
+                self._state = self.OPEN
+                self._opened_at = now
+                self.opened += 1
+                logger.warning("Circuit opened after %d consecutive failures", self._failures)
+            self._probe_in_flight = False
+
+    def release(self) -> None:
+        """Give back a half-open probe whose outcome says nothing about the endpoint."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "retry_after": max(0.0, self._opened_at + self.cooldown - now) if state == self.OPEN else 0.0,
+            }
+
+
+class RetryBudget:
+    """Retry allowance shared by every caller of one endpoint.
+
+    Each request deposits ``ratio`` tokens and each retry spends one, so
+    retries can add at most ``ratio`` extra load to a struggling endpoint no
+    matter how many callers loop over it. Idle endpoints keep a small reserve
+    of ``min_tokens`` that refills at ``refill_per_second``.
+    """
+
+    def __init__(
+        self,
+        ratio: float = DEFAULT_RETRY_RATIO,
+        min_tokens: float = DEFAULT_MIN_RETRY_TOKENS,
+        refill_per_second: float = DEFAULT_RETRY_REFILL_PER_SECOND,
+    ) -> None:
+        self.ratio = ratio
+        self.min_tokens = min_tokens
+        self.refill_per_second = refill_per_second
+        self.max_tokens = max(min_tokens, DEFAULT_MAX_RETRY_TOKENS)
+        self._tokens = min_tokens
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.denied = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self._tokens < self.min_tokens:
+            self._tokens = min(
+                self.min_tokens, self._tokens + (now - self._last_refill) * self.refill_per_second
+            )
+        self._last_refill = now
+
+    def record_request(self) -> None:
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_retry(self) -> bool:
+        """Spend one retry token; return False when the budget is exhausted."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.retries += 1
+                return True
+            self.denied += 1
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tokens": round(self._tokens, 3),
+                "retries": self.retries,
+                "denied": self.denied,
+            }
+
+
+class TransportRegistry:
+    """Thread-safe registry of pooled ``requests`` sessions keyed by endpoint.
+
+    A session is created lazily the first time an origin is used and then
+    shared by every caller. ``requests`` connection pools are thread-safe, so
+    concurrent calls to the same provider draw from one bounded pool instead
+    of each opening new connections.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = DEFAULT_POOL_CONNECTIONS,
+        pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+        keepalive: bool = True,
+        pool_block: bool = False,
+        max_concurrency_per_endpoint: int = DEFAULT_MAX_CONCURRENCY_PER_ENDPOINT,
+        requests_per_second: Optional[float] = None,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        cooldown: float = DEFAULT_COOLDOWN,
+        retry_ratio: float = DEFAULT_RETRY_RATIO,
+    ) -> None:
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keepalive = keepalive
+        self.pool_block = pool_block
+        self.max_concurrency_per_endpoint = max_concurrency_per_endpoint
+        self.requests_per_second = requests_per_second or None
+        self._sessions: Dict[Tuple[str, Tuple[Any, ...]], requests.Session] = {}
+        # Requests still using each session, replaced sessions left to drain,
+        # and sessions handed to callers whose use the registry cannot see
+        self._in_flight: Dict[requests.Session, int] = {}
+        self._retired: Set[requests.Session] = set()
+        self._handed_out: Set[requests.Session] = set()
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.retry_ratio = retry_ratio
+        self._limiters: Dict[str, EndpointLimiter] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._retry_budgets: Dict[str, RetryBudget] = {}
+        self._request_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def configure(
+        self,
+        pool_connections: Optional[int] = None,
+        pool_maxsize: Optional[int] = None,
+        keepalive: Optional[bool] = None,
+        max_concurrency_per_endpoint: Optional[int] = None,
+        requests_per_second: Optional[float] = None,
+        failure_threshold: Optional[int] = None,
+        cooldown: Optional[float] = None,
+        retry_ratio: Optional[float] = None,
+    ) -> None:
+        """Update registry settings. Arguments left out keep their value.
+
+        A ``requests_per_second`` of 0 removes the rate limit.
+
+        Changed pool settings replace the pooled sessions, which are built
+        again lazily. Existing sessions are replaced, not closed, because
+        other threads may be in the middle of a request on them. A replaced
+        session is closed once its last :meth:`request` finishes; one that is
+        idle is closed now. Sessions taken from :meth:`get_session` directly
+        are left to the garbage collector, since the registry cannot tell
+        when they are done.
+
+        Changed limiter settings drop the per-endpoint limiters so callers
+        holding a slot release it on the limiter they took it from. Breakers
+        and retry budgets are updated in place and keep their state.
+        """
+        idle = []
+        with self._lock:
+            pool = (self.pool_connections, self.pool_maxsize, self.keepalive)
+            if pool_connections is not None:
+                self.pool_connections = pool_connections
+            if pool_maxsize is not None:
+                self.pool_maxsize = pool_maxsize
+            if keepalive is not None:
+                self.keepalive = keepalive
+            if pool != (self.pool_connections, self.pool_maxsize, self.keepalive):
+                for session in self._sessions.values():
+                    if self._in_flight.get(session):
+                        self._retired.add(session)
+                    elif session not in self._handed_out:
+                        idle.append(session)
+                self._sessions.clear()
+                self._handed_out.clear()
+
+            limits = (self.max_concurrency_per_endpoint, self.requests_per_second)
+            if max_concurrency_per_endpoint is not None:
+                self.max_concurrency_per_endpoint = max_concurrency_per_endpoint
+            if requests_per_second is not None:
+                self.requests_per_second = requests_per_second or None
+            if limits != (self.max_concurrency_per_endpoint, self.requests_per_second):
+                self._limiters.clear()
+
+            if failure_threshold is not None:
+                self.failure_threshold = failure_threshold
+            if cooldown is not None:
+                self.cooldown = cooldown
+            for breaker in self._breakers.values():
+                breaker.configure(self.failure_threshold, self.cooldown)
+            if retry_ratio is not None:
+                self.retry_ratio = retry_ratio
+                for budget in self._retry_budgets.values():
+                    budget.ratio = retry_ratio
+        for session in idle:
+            _close_session(session)
+
+    def get_session(self, url: str, max_retries: RetrySpec = 0) -> requests.Session:
+        """Return the shared session for the origin of ``url``.
+
+        Args:
+            url: Any URL on the target endpoint
+            max_retries: Retry policy mounted on the session's adapter. Callers
+                with different retry needs get separate pools.
+
+        Returns:
+            A pooled ``requests.Session``
+        """
+        key = (_origin(url), _retry_key(max_retries))
+        with self._lock:
+            session = self._session_locked(key, max_retries)
+            self._handed_out.add(session)
+            return session
+
+    def _session_locked(self, key: Tuple[str, Tuple[Any, ...]], max_retries: RetrySpec) -> requests.Session:
+        session = self._sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = KeepAliveHTTPAdapter(
+                pool_connections=self.pool_connections,
+                pool_maxsize=self.pool_maxsize,
+                pool_block=self.pool_block,
+                max_retries=max_retries or 0,
+                keepalive=self.keepalive,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._sessions[key] = session
+            logger.debug("Created pooled HTTP session for %s", key[0])
+        return session
+
+    def get_limiter(self, url: str) -> EndpointLimiter:
+        """Return the shared concurrency/rate limiter for the origin of ``url``."""
+        origin = _origin(url)
+        limiter = self._limiters.get(origin)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(origin)
+                if limiter is None:
+                    limiter = EndpointLimiter(
+                        max_concurrency=self.max_concurrency_per_endpoint,
+                        requests_per_second=self.requests_per_second,
+                    )
+                    self._limiters[origin] = limiter
+        return limiter
+
+    def get_breaker(self, url: str, scope: Optional[str] = None) -> CircuitBreaker:
+        """Return the shared circuit breaker for ``url``.
+
+        Args:
+            url: Any URL on the target endpoint
+            scope: Optional qualifier, such as a model name, for endpoints
+                that serve several independently failing backends
+        """
+        key = _origin(url) if scope is None else f"{_origin(url)}#{scope}"
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(key)
+                if breaker is None:
+                    breaker = CircuitBreaker(self.failure_threshold, self.cooldown)
+                    self._breakers[key] = breaker
+        return breaker
+
+    def reset_breakers(self) -> None:
+        """Close every circuit, e.g. after the model configuration changes."""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        for breaker in breakers:
+            breaker.reset()
+
+    def get_retry_budget(self, url: str) -> RetryBudget:
+        """Return the retry budget shared by all callers of the origin of ``url``."""
+        origin = _origin(url)
+        budget = self._retry_budgets.get(origin)
+        if budget is None:
+            with self._lock:
+                budget = self._retry_budgets.get(origin)
+                if budget is None:
+                    budget = RetryBudget(ratio=self.retry_ratio)
+                    self._retry_budgets[origin] = budget
+        return budget
+
+    def request(
+        self, method: str, url: str, max_retries: RetrySpec = 0, **kwargs: Any
+    ) -> requests.Response:
+        """Issue a request through the pooled session for ``url``.
+
+        The session counts as in use until the response is read, or for
+        ``stream=True`` until the response is closed, so :meth:`configure`
+        never closes it under the caller.
+        """
+        origin = _origin(url)
+        with self._lock:
+            session = self._session_locked((origin, _retry_key(max_retries)), max_retries)
+            self._in_flight[session] = self._in_flight.get(session, 0) + 1
+            self._request_counts[origin] = self._request_counts.get(origin, 0) + 1
+        try:
+            response = session.request(method, url, **kwargs)
+        except BaseException:
+            self._release(session)
+            raise
+        if kwargs.get("stream"):
+            _call_on_close(response, lambda: self._release(session))
+        else:
+            self._release(session)
+        return response
+
+    def _release(self, session: requests.Session) -> None:
+        """End one request on ``session`` and close it if it was replaced and is now idle."""
+        with self._lock:
+            remaining = self._in_flight.get(session, 1) - 1
+            if remaining > 0:
+                self._in_flight[session] = remaining
+                return
+            self._in_flight.pop(session, None)
+            if session not in self._retired:
+                return
+            self._retired.discard(session)
+        _close_session(session)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the number of live sessions and requests issued per origin."""
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "draining_sessions": len(self._retired),
+                "requests": dict(self._request_counts),
+                "pool_connections": self.pool_connections,
+                "pool_maxsize": self.pool_maxsize,
+                "keepalive": self.keepalive,
+                "limiters": {
+                    origin: limiter.get_stats()
+                    for origin, limiter in self._limiters.items()
+                },
+                "breakers": {key: breaker.get_stats() for key, breaker in self._breakers.items()},
+                "retry_budgets": {
+                    origin: budget.get_stats() for origin, budget in self._retry_budgets.items()
+                },
+            }
+
+    def close(self) -> None:
+        """Close every pooled session, including ones still draining."""
+        with self._lock:
+            sessions = list(self._sessions.values()) + list(self._retired)
+            self._sessions.clear()
+            self._retired.clear()
+            self._handed_out.clear()
+            self._in_flight.clear()
+            self._request_counts.clear()
+        for session in sessions:
+            _close_session(session)
+
+
+def _close_session(session: requests.Session) -> None:
+    try:
+        session.close()
+    except Exception as e:  # pragma: no cover - best effort cleanup
+        logger.debug("Error closing HTTP session: %s", e)
+
+
+def _call_on_close(response: requests.Response, callback: Callable[[], None]) -> None:
+    """Run ``callback`` once, the first time ``response`` is closed."""
+    close = response.close
+    once = threading.Lock()
+
+    def close_and_notify() -> None:
+        try:
+            close()
+        finally:
+            if once.acquire(blocking=False):
+                callback()
+
+    response.close = close_and_notify  # type: ignore[method-assign]
+
+
+_registry: Optional[TransportRegistry] = None
+_registry_lock = threading.Lock()
+
+
+# Config fields read by get_transport_registry and the arguments they set
+_REGISTRY_SETTINGS = (
+    ("http_pool_connections", "pool_connections"),
+    ("http_pool_maxsize", "pool_maxsize"),
+    ("http_keepalive", "keepalive"),
+    ("llm_max_concurrency_per_endpoint", "max_concurrency_per_endpoint"),
+    ("llm_requests_per_second", "requests_per_second"),
+    ("llm_circuit_failure_threshold", "failure_threshold"),
+    ("llm_circuit_cooldown", "cooldown"),
+    ("llm_retry_budget_ratio", "retry_ratio"),
+)
+
+
+def _setting(config: Any, name: str, default: Any) -> Any:
+    if config is None:
+        return default
+    if isinstance(config, dict):
+        return config.get(name, default)
+    return getattr(config, name, default)
+
+
+def _registry_settings(config: Any) -> Dict[str, Any]:
+    """Return the :class:`TransportRegistry` arguments ``config`` sets."""
+    missing = object()
+    settings = {}
+    for name, argument in _REGISTRY_SETTINGS:
+        value = _setting(config, name, missing)
+        if value is not missing:
+            settings[argument] = value
+    return settings
+
+
+def get_transport_registry(config: Optional[Any] = None) -> TransportRegistry:
+    """Return the process-wide transport registry.
+
+    Pool, limiter, breaker and retry-budget settings found in ``config`` (a
+    dict or ``ConfigModel``) are applied on every call, so a registry first
+    created without a config still picks them up. Settings ``config`` does
+    not mention keep their current value.
+    """
+    global _registry
+    settings = _registry_settings(config)
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = TransportRegistry(**settings)
+                return _registry
+    if settings:
+        _registry.configure(**settings)
+    return _registry
+
+
+def iter_sse_data(lines: Iterable[Union[str, bytes]]) -> Iterator[str]:
+    """Yield the ``data`` payload of each server-sent event in ``lines``.
+
+    Multi-line ``data`` fields are joined with newlines, comment lines (such as
+    OpenRouter's ``: OPENROUTER PROCESSING`` keep-alives) are skipped and
+    iteration stops at the ``[DONE]`` sentinel.
+
+    Args:
+        lines: Lines of an SSE body, e.g. ``response.iter_lines()``
+
+    Yields:
+        The data payload of each complete event
+    """
+    data_lines: List[str] = []
+    for raw in lines:
+        if raw is None:
+            continue
+        line = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        line = line.rstrip("\r")
+        if not line:
+            if data_lines:
+                data = "\n".join(data_lines)
+                data_lines = []
+                if data == "[DONE]":
+                    return
+                yield data
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "data":
+            data_lines.append(value)
+
+    if data_lines:
+        data = "\n".join(data_lines)
+        if data != "[DONE]":
+            yield data
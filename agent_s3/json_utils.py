@@ -421,6 +421,223 @@ def get_openrouter_json_params() -> Dict[str, Any]:
     }
 
 
+
+class JSONStreamError(JSONValidationError):
+    """Exception raised when streamed JSON is structurally invalid."""
+
+    pass
+
+
+_JSON_WHITESPACE = " \t\r\n"
+_SCALAR_START = "-0123456789tfn"
+
+
+class IncrementalJSONParser:
+    """Scan JSON text as it streams in and emit completed array items early.
+
+    Text is fed in arbitrary chunks via :meth:`feed`. The parser tracks
+    container nesting, string/escape state and object key positions without
+    re-parsing the buffer, so structural errors (mismatched brackets, a stray
+    character where a key or separator is expected) raise
+    :class:`JSONStreamError` as soon as they arrive rather than after the
+    whole response has been generated.
+
+    When ``item_key`` is given, each element of the array stored under that
+    key in the top-level object (for example ``"feature_groups"``) is decoded
+    and passed to ``on_item(item, index)`` the moment it closes. With
+    ``item_key=None`` the elements of a top-level array are emitted instead.
+    ``on_item`` may raise :class:`JSONStreamError` to abort the stream.
+
+    Any text before the first ``{`` or ``[`` (and after the root value closes)
+    is ignored, matching :func:`extract_json_from_text`.
+    """
+
+    def __init__(
+        self,
+        item_key: Optional[str] = None,
+        on_item: Optional[Callable[[Any, int], None]] = None,
+    ) -> None:
+        self.item_key = item_key
+        self.on_item = on_item
+        self.items: List[Any] = []
+        self._text = ""
+        self._stack: List[Dict[str, Any]] = []
+        self._root_start: Optional[int] = None
+        self._root_end: Optional[int] = None
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._key_start = 0
+        self._in_scalar = False
+        self._item_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """All text fed so far."""
+        return self._text
+
+    @property
+    def complete(self) -> bool:
+        """Whether the root JSON value has been closed."""
+        return self._root_end is not None
+
+    def feed(self, chunk: str) -> None:
+        """Consume the next chunk of streamed text.
+
+        Raises:
+            JSONStreamError: If the chunk makes the document structurally invalid
+        """
+        offset = len(self._text)
+        self._text += chunk
+        if self._root_end is not None:
+            return
+        for i in range(offset, len(self._text)):
+            self._consume(self._text[i], i)
+            if self._root_end is not None:
+                return
+
+    def close(self) -> Any:
+        """Finish the stream and return the decoded root value.
+
+        Raises:
+            JSONStreamError: If no complete JSON value was received
+        """
+        if self._root_start is None:
+            raise JSONStreamError("No JSON object found in streamed response")
+        if self._root_end is None:
+            raise JSONStreamError(
+                f"Streamed JSON ended with {len(self._stack)} unclosed container(s)"
+            )
+        try:
+            return json.loads(self._text[self._root_start:self._root_end])
+        except json.JSONDecodeError as e:
+            raise JSONStreamError(f"Streamed JSON is invalid: {e}") from e
+
+    def _error(self, message: str, index: int) -> None:
+        snippet = self._text[max(0, index - 20):index + 1]
+        raise JSONStreamError(f"{message} at offset {index} (near {snippet!r})")
+
+    def _consume(self, c: str, i: int) -> None:
+        if self._root_start is None:
+            if c in "{[":
+                self._root_start = i
+                self._push(c)
+            return
+
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == "\\":
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._string_is_key:
+                    frame = self._stack[-1]
+                    frame["key"] = json.loads(self._text[self._key_start:i + 1])
+                    frame["state"] = "colon"
+                else:
+                    self._value_done(i + 1)
+            return
+
+        if self._in_scalar:
+            if c not in _JSON_WHITESPACE and c not in ",]}":
+                return
+            self._in_scalar = False
+            self._value_done(i)
+
+        if c in _JSON_WHITESPACE:
+            return
+
+        frame = self._stack[-1]
+        state = frame["state"]
+        if frame["type"] == "{":
+            if state in ("key_or_end", "key"):
+                if c == '"':
+                    self._in_string = True
+                    self._string_is_key = True
+                    self._key_start = i
+                elif c == "}" and state == "key_or_end":
+                    self._close_container(c, i)
+                else:
+                    self._error("Expected object key", i)
+            elif state == "colon":
+                if c != ":":
+                    self._error("Expected ':' after object key", i)
+                frame["state"] = "value"
+            elif state == "value":
+                self._start_value(c, i)
+            elif c == ",":
+                frame["state"] = "key"
+            elif c == "}":
+                self._close_container(c, i)
+            else:
+                self._error("Expected ',' or '}' in object", i)
+        else:
+            if state in ("value_or_end", "value"):
+                if c == "]" and state == "value_or_end":
+                    self._close_container(c, i)
+                else:
+                    self._start_value(c, i)
+            elif c == ",":
+                frame["state"] = "value"
+            elif c == "]":
+                self._close_container(c, i)
+            else:
+                self._error("Expected ',' or ']' in array", i)
+
+    def _push(self, c: str) -> None:
+        self._stack.append({
+            "type": c,
+            "state": "key_or_end" if c == "{" else "value_or_end",
+            "key": None,
+        })
+
+    def _at_item_level(self) -> bool:
+        if self.item_key is None:
+            return len(self._stack) == 1 and self._stack[0]["type"] == "["
+        return (
+            len(self._stack) == 2
+            and self._stack[0]["type"] == "{"
+            and self._stack[0]["key"] == self.item_key
+            and self._stack[1]["type"] == "["
+        )
+
+    def _start_value(self, c: str, i: int) -> None:
+        if self._at_item_level():
+            self._item_start = i
+        self._stack[-1]["state"] = "after_value"
+        if c in "{[":
+            self._push(c)
+        elif c == '"':
+            self._in_string = True
+            self._string_is_key = False
+        elif c in _SCALAR_START:
+            self._in_scalar = True
+        else:
+            self._error("Unexpected character where a value was expected", i)
+
+    def _close_container(self, c: str, i: int) -> None:
+        self._stack.pop()
+        if not self._stack:
+            self._root_end = i + 1
+            return
+        self._value_done(i + 1)
+
+    def _value_done(self, end: int) -> None:
+        if self._item_start is None or not self._at_item_level():
+            return
+        text = self._text[self._item_start:end]
+        self._item_start = None
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise JSONStreamError(f"Invalid array item in streamed JSON: {e}") from e
+        index = len(self.items)
+        self.items.append(item)
+        if self.on_item is not None:
+            self.on_item(item, index)
+
+
 try:
     from agent_s3.planning import validate_json_schema
 except ImportError:
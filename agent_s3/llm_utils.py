@@ -4,6 +4,7 @@ This module provides robust error handling for LLM API calls, including retries,
 backoff, and fallback strategies with advanced semantic caching.
 """
 
+import json
 import time
 from typing import Any, Dict, Optional, List, Tuple
 import requests
@@ -16,6 +17,9 @@ except ImportError:
     cache = None
 
 from agent_s3.cache.helpers import read_cache, write_cache
+from agent_s3.cache.single_flight import SingleFlight, request_key
+from agent_s3.http_transport import get_transport_registry, is_transient_error, retry_deadline
+from agent_s3.tools.semantic_cache_validation import check_response
 
 # Type hint for ScratchpadManager to avoid circular imports
 ScratchpadManagerType = Any
@@ -36,6 +40,9 @@ FALLBACK_PROMPT_TEMPLATE = "Previous attempt failed. Please re-evaluate the requ
 if cache:
     cache.init()
 
+# Identical concurrent call_llm invocations share one in-flight request
+_inflight_calls = SingleFlight()
+
 def call_llm(
     prompt: str,
     llm: Any,
@@ -44,6 +51,7 @@ def call_llm(
     config: Optional[Dict[str, Any]] = None,
     scratchpad_manager: ScratchpadManagerType = None,
     prompt_summary: Optional[str] = None,
+    metrics: Any = None,
     **kwargs: Any,
 ) -> Tuple[Dict[str, Any], Any]:
     """Invoke an LLM with retry and semantic caching.
@@ -51,7 +59,9 @@ def call_llm(
     The helper wraps :func:`call_llm_with_retry` and handles semantic cache
     lookup and storage for the provided ``llm`` instance.
 
-    Cache hits are returned without contacting the LLM service.
+    Cache hits are returned without contacting the LLM service. Concurrent
+    calls with the same prompt, client and parameters are coalesced into a
+    single request; waiting callers receive the result marked ``coalesced``.
 
     Args:
         prompt: The prompt text to send to the LLM.
@@ -60,6 +70,7 @@ def call_llm(
         config: Optional configuration dictionary.
         scratchpad_manager: Optional scratchpad for logging messages.
         prompt_summary: Short summary used when generating fallback prompts.
+        metrics: Optional ``MetricsTracker`` that counts coalesced calls.
         **kwargs: Additional parameters for the LLM call.
 
     Returns:
@@ -89,15 +100,29 @@ def call_llm(
         # progress_tracker.increment("semantic_hits")  # Disabled for HTTP migration
         return {"success": True, "response": hit, "cached": True}, llm
 
-    return _call(llm), llm
+    model = getattr(llm, "model", None) or f"{type(llm).__qualname__}@{id(llm):x}"
+    # Fold the method and call options into the key so differing calls never share
+    options = json.dumps({"method": method_name, **kwargs}, sort_keys=True, default=str)
+    key = request_key({"prompt": prompt, "model": str(model), "messages": options})
+    if key is None:
+        return _call(llm), llm
+
+    result, shared = _inflight_calls.do(key, lambda: _call(llm))
+    if shared:
+        if metrics is not None:
+            metrics.record_coalesced(method_name, str(model))
+        return {**result, "coalesced": True}, llm
+    return result, llm
 def cached_call_llm(prompt, llm, return_kv=False, **kwargs):
     """Use the semantic cache when invoking an LLM.
 
     Cached results are returned immediately. New responses are stored so
     subsequent calls with semantically similar prompts can bypass the LLM
-    service.
+    service, unless they fail the validator registered for ``cache_role`` or,
+    for ``json_object`` requests, do not parse as JSON.
     """
     method_name = kwargs.pop("method_name", "generate")
+    cache_role = kwargs.pop("cache_role", None)
     config = kwargs.pop("config", {})
     scratchpad_manager = kwargs.pop("scratchpad_manager", None)
     prompt_summary = kwargs.pop(
@@ -125,7 +150,11 @@ def cached_call_llm(prompt, llm, return_kv=False, **kwargs):
 
         if not result.get("cached"):
             kv_tensor = getattr(used_llm, "get_kv_tensor", lambda: None)()
-            if kv_tensor is not None:
+            cacheable, _version, error = check_response(cache_role, response, kwargs.get("response_format"))
+            if not cacheable:
+                # Cached, it would be replayed and repaired on every hit
+                logging.info(f"Not caching LLM response: {error}")
+            elif kv_tensor is not None:
                 write_cache(prompt, response, kv_tensor)
             elif cache:
                 try:
@@ -203,6 +232,11 @@ def call_llm_with_retry(
     max_retries = config.get('llm_max_retries', 3)
     initial_backoff = config.get('llm_initial_backoff', 1.0)
     backoff_factor = config.get('llm_backoff_factor', 2.0)
+    # Backoff never extends the retries past this deadline
+    deadline_seconds = config.get('llm_retry_deadline')
+    if deadline_seconds is None:
+        deadline_seconds = retry_deadline(timeout, max_retries, initial_backoff, backoff_factor)
+    deadline = time.monotonic() + deadline_seconds
 
     # Main retry loop
     last_error = None
@@ -237,10 +271,19 @@ def call_llm_with_retry(
             last_error = str(e)
             last_error_details = type(e).__name__
 
-            # Check if this is the last attempt
-            if attempt < max_retries - 1:
-                # Calculate backoff time
-                backoff_time = initial_backoff * (backoff_factor ** attempt)
+            # 4xx responses other than 408/429 will fail the same way again
+            if not is_transient_error(e):
+                scratchpad_manager.log(
+                    "LLM Utils",
+                    f"Non-retryable error: {type(e).__name__}: {str(e)}"
+                )
+                break
+
+            # Calculate backoff time
+            backoff_time = initial_backoff * (backoff_factor ** attempt)
+
+            # Check if this is the last attempt or the retry deadline would pass
+            if attempt < max_retries - 1 and time.monotonic() + backoff_time < deadline:
 
                 # Log the retry
                 scratchpad_manager.log(
@@ -360,8 +403,55 @@ def get_embedding(
     Returns:
         A list of floats representing the embedding vector, or None on failure
     """
-    if not text or not text.strip():
-        return None
+    return get_embeddings([text], model, config, dimensions, retry_count)[0]
+
+
+def _fit_dimensions(embedding: List[float], dimensions: int) -> List[float]:
+    """Pad or truncate an embedding to ``dimensions`` values."""
+    if len(embedding) > dimensions:
+        return embedding[:dimensions]
+    return embedding + [0.0] * (dimensions - len(embedding))
+
+
+def get_embeddings(
+    texts: List[str],
+    model: str = "text-embedding-ada-002",
+    config: Optional[Dict[str, Any]] = None,
+    dimensions: int = 1536,
+    retry_count: int = 3,
+    batch_size: Optional[int] = None,
+    max_batch_tokens: Optional[int] = None,
+) -> List[Optional[List[float]]]:
+    """Generate embeddings for many texts with multi-input API requests.
+
+    Texts are sent in batches of at most ``batch_size`` texts and
+    ``max_batch_tokens`` estimated tokens (``embedding_batch_size`` and
+    ``embedding_batch_max_tokens`` by default), one request per batch. A
+    batch the API rejects as invalid (HTTP 4xx) is split in half and retried,
+    so one bad input only loses its own embedding. Embeddings already in the
+    persistent embedding cache are not requested again.
+
+    Args:
+        texts: The texts to embed
+        model: The embedding model to use (default: text-embedding-ada-002)
+        config: Optional configuration containing API keys
+        dimensions: Target embedding dimensions (default: 1536)
+        retry_count: Number of attempts per request
+        batch_size: Maximum texts per request
+        max_batch_tokens: Maximum estimated tokens per request
+
+    Returns:
+        One embedding per text, in order, with None for empty texts and
+        texts whose embedding could not be generated
+    """
+    from agent_s3.config import EMBEDDING_BATCH_MAX_TOKENS, EMBEDDING_BATCH_SIZE
+    from agent_s3.tools.embedding_cache import get_embedding_cache
+    from agent_s3.tools.local_embeddings import iter_batches
+
+    results: List[Optional[List[float]]] = [None] * len(texts)
+    pending = [i for i, text in enumerate(texts) if text and text.strip()]
+    if not pending:
+        return results
 
     # Load configuration if not provided
     if config is None:
@@ -376,7 +466,7 @@ def get_embedding(
 
     if not api_key:
         # No API keys available, return None
-        return None
+        return results
 
     # Prepare API endpoint based on the model
     if model.startswith("openai/"):
@@ -400,53 +490,77 @@ def get_embedding(
     else:
         headers["Authorization"] = f"Bearer {api_key}"
 
-    # Prepare the request payload
-    payload = {
-        "model": model_name,
-        "input": text[:8192],  # Limit input to 8K characters
-    }
-
-    # Retry logic
-    for attempt in range(retry_count):
-        try:
-            response = requests.post(
-                endpoint,
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            response.raise_for_status()
-
-            data = response.json()
-
-            # Extract embedding based on API response format
-            if "data" in data and len(data["data"]) > 0:
-                # OpenAI/OpenRouter format
-                embedding = data["data"][0].get("embedding")
-                if embedding:
-                    # Ensure we return the requested dimensions
-                    if len(embedding) != dimensions:
-                        # Pad or truncate to match requested dimensions
-                        if len(embedding) > dimensions:
-                            return embedding[:dimensions]
-                        else:
-                            padded = embedding + [0.0] * (dimensions - len(embedding))
-                            return padded
-                    return embedding
-
-            # If we couldn't extract the embedding, log and retry
-            logging.warning("Failed to extract embedding from response: %s", data)
-
-        except Exception as e:
-            logging.warning("Embedding generation attempt %d failed: %s", attempt + 1, e)
-            if attempt == retry_count - 1:
-                # Final attempt failed
-                logging.error("All embedding generation attempts failed: %s", e)
-                return None
-
-            # Wait before retrying (simple exponential backoff)
-            time.sleep(2 ** attempt)
-
-    # If all attempts failed or we couldn't extract the embedding
-    logging.error("Failed to generate embedding after %d attempts", retry_count)
-    return None
+    inputs = [text[:8192] for text in texts]  # Limit each input to 8K characters
+
+    embedding_cache = get_embedding_cache(config)
+    cache_model = f"{model_name}-{dimensions}"
+    if embedding_cache is not None:
+        cached = embedding_cache.get_many(cache_model, [inputs[i] for i in pending])
+        for i, embedding in zip(pending, cached):
+            if embedding is not None:
+                results[i] = embedding.tolist()
+        pending = [i for i in pending if results[i] is None]
+
+    def request_batch(indices: List[int]) -> None:
+        payload = {
+            "model": model_name,
+            "input": [inputs[i] for i in indices],
+        }
+        # Retry logic
+        for attempt in range(retry_count):
+            try:
+                response = get_transport_registry(config).request(
+                    "POST",
+                    endpoint,
+                    headers=headers,
+                    json=payload,
+                    timeout=30
+                )
+                response.raise_for_status()
+                data = response.json()
+
+                # OpenAI/OpenRouter format; items carry the index of their input
+                items = data.get("data") or []
+                for position, item in enumerate(items):
+                    embedding = item.get("embedding")
+                    slot = item.get("index", position)
+                    if embedding and 0 <= slot < len(indices):
+                        results[indices[slot]] = _fit_dimensions(embedding, dimensions)
+                if items:
+                    return
+
+                # If we couldn't extract the embeddings, log and retry
+                logging.warning("Failed to extract embeddings from response: %s", data)
+
+            except requests.HTTPError as e:
+                status = getattr(e.response, "status_code", None)
+                if status is not None and 400 <= status < 500 and status not in (408, 429):
+                    if len(indices) > 1:
+                        # Isolate the input the API rejected
+                        middle = len(indices) // 2
+                        request_batch(indices[:middle])
+                        request_batch(indices[middle:])
+                    else:
+                        logging.error("Embedding input %d rejected: %s", indices[0], e)
+                    return
+                logging.warning("Embedding batch attempt %d failed: %s", attempt + 1, e)
+            except Exception as e:
+                logging.warning("Embedding batch attempt %d failed: %s", attempt + 1, e)
+
+            if attempt < retry_count - 1:
+                # Wait before retrying (simple exponential backoff)
+                time.sleep(2 ** attempt)
+
+        # If all attempts failed or we couldn't extract the embeddings
+        logging.error("Failed to embed a batch of %d texts after %d attempts", len(indices), retry_count)
+
+    batches = iter_batches(
+        [inputs[i] for i in pending],
+        batch_size or getattr(config, "embedding_batch_size", EMBEDDING_BATCH_SIZE),
+        max_batch_tokens or getattr(config, "embedding_batch_max_tokens", EMBEDDING_BATCH_MAX_TOKENS),
+    )
+    for batch in batches:
+        request_batch([pending[i] for i in batch])
+    if embedding_cache is not None:
+        embedding_cache.put_many(cache_model, [inputs[i] for i in pending], [results[i] for i in pending])
+    return results
@@ -325,6 +325,8 @@ Focus on creating a comprehensive and detailed plan that a developer can follow
                     config=params,
                     tech_stack=context.get("tech_stack") if context else None,
                     code_context=context.get("code_context") if context else None,
+                    # Malformed JSON aborts the stream instead of the full plan
+                    stream=True,
                 )
 
                 if not response_text:
@@ -62,6 +62,7 @@ def call_llm_with_retry(
             user_prompt=user_prompt,
             config=config,
             scratchpad=_NoOpScratchpad(),  # Add the missing scratchpad parameter
+            stream=True,
         )
         if not response:
             raise ValueError("LLM returned an empty response.")
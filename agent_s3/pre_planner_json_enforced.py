@@ -15,10 +15,12 @@ Key responsibilities:
 import json
 import logging
 import os
+from functools import lru_cache
 from typing import Dict, Any, Optional, Tuple, List, Union, Callable
 
 from agent_s3.errors import PrePlanningError
 from agent_s3.json_utils import (
+    JSONStreamError,
     extract_json_from_text,
     get_openrouter_json_params,
     validate_json_schema,
@@ -244,6 +246,58 @@ def validate_pre_planning_output(data: Dict[str, Any]) -> Tuple[bool, str]:
 
     return True, "Pre-planning output is valid"
 
+def validate_feature_group(group: Any, index: int) -> Tuple[bool, str]:
+    """
+    Validate a single feature group as soon as it has been produced.
+
+    Used while a pre-planning response is still streaming so that malformed
+    groups are rejected before the remaining output is generated.
+
+    Args:
+        group: Decoded feature group
+        index: Position of the group in ``feature_groups``
+
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    if not isinstance(group, dict):
+        return False, f"Feature group at index {index} is not a dictionary"
+
+    if "group_name" not in group:
+        return False, f"Feature group at index {index} is missing 'group_name'"
+
+    features = group.get("features")
+    if not isinstance(features, list) or not features:
+        return False, f"Feature group at index {index} has no 'features'"
+
+    for i, feature in enumerate(features):
+        if not isinstance(feature, dict):
+            return False, f"Feature {i} in group {index} is not a dictionary"
+        for field in ("name", "description"):
+            if field not in feature:
+                return False, f"Feature {i} in group {index} is missing '{field}'"
+
+    return True, "Feature group is valid"
+
+
+def _validate_streamed_feature_group(group: Any, index: int) -> None:
+    """Stream callback that aborts the LLM response on a malformed group.
+
+    Only groups the validate/repair pass cannot fix abort the stream. Missing
+    fields are logged and left to that pass once the response is complete.
+    """
+    if not isinstance(group, dict):
+        raise JSONStreamError(f"Feature group at index {index} is not a dictionary")
+    features = group.get("features") or []
+    if not isinstance(features, list) or not all(isinstance(f, dict) for f in features):
+        raise JSONStreamError(f"Feature group at index {index} has malformed 'features'")
+
+    is_valid, message = validate_feature_group(group, index)
+    if not is_valid:
+        logger.info("%s; deferring to plan repair", message)
+        return
+    logger.debug("Streamed feature group %d validated", index)
+
 # JSON schema for validation
 
 # Use the base PrePlanningError as JSONValidationError for backward compatibility
@@ -594,6 +648,9 @@ def pre_planning_workflow(
             scratchpad=scratchpad,  # Add the missing scratchpad parameter
             tech_stack=context.get("tech_stack") if context else None,
             code_context=context.get("code_context") if context else None,
+            stream=True,
+            on_stream_item=_validate_streamed_feature_group,
+            stream_item_key="feature_groups",
         )
         status, data = process_response(response, task_description)
         if status is True:
@@ -712,12 +769,14 @@ def process_response(
             return False, data
 
 
+@lru_cache(maxsize=1)
 def get_json_system_prompt() -> str:
     """
     Get the system prompt that enforces JSON output format.
 
     This extends the base pre-planner system prompt with specific JSON formatting
-    requirements and schema details.
+    requirements and schema details. The prompt contains no per-task content and
+    is built once, so every call sends a byte-identical, cacheable prefix.
 
     Returns:
         Properly formatted system prompt string
@@ -1025,7 +1084,14 @@ def _attempt_pre_planning_call(
         openrouter_params = get_openrouter_params()
         full_config = {**config, **openrouter_params}
         
-        response = router_agent.run(prompt, **full_config)
+        # Stream so that an invalid feature group aborts the response early
+        response = router_agent.run(
+            prompt,
+            **full_config,
+            stream=True,
+            on_stream_item=_validate_streamed_feature_group,
+            stream_item_key="feature_groups",
+        )
         if not response:
             raise ProcessingError("Empty response from LLM")
         return response
@@ -1227,30 +1293,27 @@ class PrePlanner:
         return data, False
 
     def _call_llm_with_retry(
-        self, system_prompt: str, user_prompt: str, max_retries: int = 2
+        self, system_prompt: str, user_prompt: str
     ) -> Dict[str, Any]:
-        """Call the router agent with retry logic."""
-        last_error: Optional[str] = None
-        
+        """Call the router agent.
+
+        Retries, circuit breaking and fallback happen inside
+        ``RouterAgent.call_llm_by_role`` under one retry budget, so this
+        method makes a single call rather than nesting another retry loop.
+        """
         # Create a no-op scratchpad for this method
         class _NoOpScratchpad:
             def log(self, *_args, **_kwargs):
                 pass
-        
-        scratchpad = _NoOpScratchpad()
-        
-        for _ in range(max_retries + 1):
-            try:
-                response = self.router_agent.call_llm_by_role(
-                    role="pre_planner",
-                    system_prompt=system_prompt,
-                    user_prompt=user_prompt,
-                    config=self.config.get("llm_params", {}),
-                    scratchpad=scratchpad,  # Add the missing scratchpad parameter
-                )
-                return {"success": True, "response": response}
-            except Exception as e:  # pragma: no cover - error path
-                import time
-                last_error = str(e)
-                time.sleep(0.5)
-        return {"success": False, "error": last_error or "LLM call failed"}
+
+        try:
+            response = self.router_agent.call_llm_by_role(
+                role="pre_planner",
+                system_prompt=system_prompt,
+                user_prompt=user_prompt,
+                config=self.config.get("llm_params", {}),
+                scratchpad=_NoOpScratchpad(),
+            )
+            return {"success": True, "response": response}
+        except Exception as e:  # pragma: no cover - error path
+            return {"success": False, "error": str(e) or "LLM call failed"}
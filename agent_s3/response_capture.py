@@ -0,0 +1,214 @@
+"""Raw LLM response capture, written off the request path.
+
+``RouterAgent`` used to pretty-print every provider response with
+``json.dumps(indent=2)`` and push it synchronously through the scratchpad.
+:class:`ResponseCapture` decides on the calling thread whether a response is
+captured at all, which is a cheap mode check and random draw. Serialization,
+truncation, optional gzip side files and the scratchpad write all happen on a
+background writer thread.
+
+Capture modes:
+
+- ``off``: never capture
+- ``errors``: capture responses whose content could not be extracted
+- ``sampled``: errors plus ``sample_rate`` of successful responses
+- ``all``: every response (the default)
+"""
+
+import atexit
+import gzip
+import json
+import logging
+import queue
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_MODES = ("off", "errors", "sampled", "all")
+# Sampling drops successful responses, so it is opt-in
+DEFAULT_CAPTURE_MODE = "all"
+DEFAULT_SAMPLE_RATE = 0.1
+# Inline captures are cut to this many characters
+DEFAULT_MAX_CHARS = 4000
+DEFAULT_CAPTURE_DIR = "logs/llm_responses"
+# Pending captures beyond this are dropped rather than slowing callers down
+DEFAULT_QUEUE_SIZE = 256
+
+_UNSAFE_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+class ResponseCapture:
+    """Queue raw responses for a background writer according to a capture mode."""
+
+    def __init__(
+        self,
+        mode: str = DEFAULT_CAPTURE_MODE,
+        sample_rate: float = DEFAULT_SAMPLE_RATE,
+        max_chars: int = DEFAULT_MAX_CHARS,
+        compress: bool = False,
+        capture_dir: str = DEFAULT_CAPTURE_DIR,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ) -> None:
+        if mode not in CAPTURE_MODES:
+            logger.warning("Unknown response capture mode %r; using %r", mode, DEFAULT_CAPTURE_MODE)
+            mode = DEFAULT_CAPTURE_MODE
+        self.mode = mode
+        self.sample_rate = sample_rate
+        self.max_chars = max_chars
+        self.compress = compress
+        self.capture_dir = Path(capture_dir)
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._sequence = 0
+        self.captured = 0
+        self.written = 0
+        self.dropped = 0
+        self.skipped = 0
+
+    def should_capture(self, error: bool = False) -> bool:
+        """Return True if a response with this outcome should be captured."""
+        if self.mode == "all":
+            return True
+        if self.mode == "off":
+            return False
+        if error:
+            return True
+        return self.mode == "sampled" and random.random() < self.sample_rate
+
+    def submit(self, scratchpad: Any, role: str, model: str, payload: Any, error: bool = False) -> bool:
+        """Queue ``payload`` for capture without serializing it.
+
+        Args:
+            scratchpad: Object with a ``log(role, message, level=...)`` method
+            role: Role the call served
+            model: Model that produced the response
+            payload: Parsed response body; serialized later on the writer thread
+            error: True when the response could not be used
+
+        Returns:
+            True if the response was queued
+        """
+        if not self.should_capture(error):
+            with self._lock:
+                self.skipped += 1
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((scratchpad, role, model, payload, error))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.captured += 1
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until queued captures are written; return False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "captured": self.captured,
+                "written": self.written,
+                "dropped": self.dropped,
+                "skipped": self.skipped,
+                "pending": self._queue.qsize(),
+            }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="llm-response-capture", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self._write(*item)
+            except Exception as e:  # pragma: no cover - capture must never break callers
+                logger.debug("Failed to capture raw LLM response: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, scratchpad: Any, role: str, model: str, payload: Any, error: bool) -> None:
+        text = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+        level = "warning" if error else "debug"
+        if self.compress:
+            path = self._side_file(model)
+            with gzip.open(path, "wt", encoding="utf-8") as f:
+                f.write(text)
+            message = f"Raw response from {model} (Role: {role}): {len(text)} chars saved to {path}"
+        elif len(text) > self.max_chars:
+            omitted = len(text) - self.max_chars
+            message = (
+                f"Raw response from {model} (Role: {role}): {text[:self.max_chars]}"
+                f"... [truncated, {omitted} chars omitted]"
+            )
+        else:
+            message = f"Raw response from {model} (Role: {role}): {text}"
+        scratchpad.log("RouterAgent", message, level=level)
+        with self._lock:
+            self.written += 1
+
+    def _side_file(self, model: str) -> Path:
+        with self._lock:
+            self._sequence += 1
+            sequence = self._sequence
+        self.capture_dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        name = _UNSAFE_NAME_RE.sub("_", model)
+        return self.capture_dir / f"{stamp}_{sequence:06d}_{name}.json.gz"
+
+
+_capture: Optional[ResponseCapture] = None
+_capture_lock = threading.Lock()
+
+
+def _setting(config: Any, name: str, default: Any) -> Any:
+    if config is None:
+        return default
+    if isinstance(config, dict):
+        return config.get(name, default)
+    return getattr(config, name, default)
+
+
+def get_response_capture(config: Optional[Any] = None) -> ResponseCapture:
+    """Return the process-wide response capture.
+
+    Settings are read from ``config`` (a dict or ``ConfigModel``) the first
+    time the capture is created.
+    """
+    global _capture
+    if _capture is None:
+        with _capture_lock:
+            if _capture is None:
+                _capture = ResponseCapture(
+                    mode=_setting(config, "llm_response_capture", DEFAULT_CAPTURE_MODE),
+                    sample_rate=_setting(config, "llm_response_capture_sample_rate", DEFAULT_SAMPLE_RATE),
+                    max_chars=_setting(config, "llm_response_capture_max_chars", DEFAULT_MAX_CHARS),
+                    compress=_setting(config, "llm_response_capture_compress", False),
+                    capture_dir=_setting(config, "llm_response_capture_dir", DEFAULT_CAPTURE_DIR),
+                )
+                atexit.register(_capture.flush)
+    return _capture
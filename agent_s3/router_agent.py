@@ -3,16 +3,33 @@
 import os
 import json
 import logging
+import math
 import time
 import re  # Add import for regex pattern matching
 from .pattern_constants import ERROR_PATTERN, EXCEPTION_PATTERN
 from time import sleep
 import requests
+import threading
+from collections import deque
 import traceback  # Added import
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import Dict, Any, Optional, Tuple, List
+from urllib.parse import urlsplit
 
 import jsonschema
 
+from .cache.single_flight import SingleFlight, request_key
+from .http_transport import (
+    CircuitOpenError,
+    get_transport_registry,
+    is_transient_error,
+    iter_sse_data,
+    retry_deadline,
+)
+from .json_utils import IncrementalJSONParser, JSONStreamError, extract_json_from_text
+from .response_capture import get_response_capture
+from .routing_policy import RoutingPolicy, estimate_cache_savings, estimate_cost, estimate_tokens
+
 # Export public functions for testing
 __all__ = [
     '_load_llm_config',  # Export for testing
@@ -24,8 +41,36 @@ logger = logging.getLogger(__name__)
 # Maximum number of characters from LLM responses to include in log messages
 MAX_LOG_LEN = 500
 
+# Static reminder sent with every system prompt
+TEST_INTEGRITY_REMINDER = (
+    "\n\n⚠️ IMPORTANT: You must NEVER modify tests to make failing code pass. Always fix the "
+    "implementation code itself, not the tests. Modifying tests to accommodate broken code is "
+    "strictly prohibited. ⚠️"
+)
+# System prompts shorter than this are not marked for provider prompt caching
+DEFAULT_PROMPT_CACHE_MIN_TOKENS = 1024
+# Hosts that accept cache_control content parts; others may reject list content
+PROMPT_CACHE_CONTROL_HOSTS = ("openrouter.ai", "anthropic.com")
+
+# Read timeout as a multiple of the model's p95 latency once enough calls succeeded
+DEFAULT_TIMEOUT_P95_MULTIPLIER = 3.0
+ADAPTIVE_TIMEOUT_MIN_SAMPLES = 10
+MIN_READ_TIMEOUT = 15.0
+
+# RouterAgent.run keyword arguments that are request parameters, not config
+_RUN_CALL_ARGS = ("stream", "on_stream_item", "stream_item_key")
+
+
+def _supports_cache_control(endpoint: Optional[str]) -> bool:
+    """Return True if ``endpoint`` is on a host known to accept ``cache_control`` parts."""
+    host = (urlsplit(endpoint or "").hostname or "").lower()
+    return any(host == known or host.endswith("." + known) for known in PROMPT_CACHE_CONTROL_HOSTS)
+
+
 # Initialize models_by_role at module level to avoid undefined global variable
 _models_by_role = {}
+# Every llm.json entry per role, default first; roles with several entries are routed
+_candidates_by_role: Dict[str, List[Dict[str, Any]]] = {}
 
 # Command patterns for special routing
 COMMAND_PATTERNS = {
@@ -41,21 +86,205 @@ SCHEMA_PATH = os.path.join(os.path.dirname(__file__), "llm_entry_schema.json")
 with open(SCHEMA_PATH, "r", encoding="utf-8") as schema_file:
     LLM_ENTRY_SCHEMA = json.load(schema_file)
 
+def _cached_input_tokens(usage: Dict[str, Any]) -> int:
+    """Return cache-read input tokens from an OpenAI- or Anthropic-style usage block."""
+    details = usage.get("prompt_tokens_details") or {}
+    return int(details.get("cached_tokens") or usage.get("cache_read_input_tokens") or 0)
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
 class MetricsTracker:
-    """Collects metrics for LLM calls."""
-    def __init__(self):
+    """Collects metrics for LLM calls.
+
+    Besides the raw record list, a rolling window of recent calls is kept per
+    ``(role, model)`` for routing decisions (see :meth:`get_model_stats`).
+    """
+    def __init__(self, window: int = 200):
         self._records = []
-    def record(self, role: str, model: str, duration: float, success: bool, tokens: int):
-        self._records.append({
+        self._window = window
+        self._recent: Dict[Tuple[str, str], deque] = {}
+        self._coalesced: Dict[Tuple[str, str], int] = {}
+        self._hedges: Dict[str, Dict[str, int]] = {}
+        self._usage: Dict[Tuple[str, str], Dict[str, int]] = {}
+        self._prompt_cache: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    def record(
+        self,
+        role: str,
+        model: str,
+        duration: float,
+        success: bool,
+        tokens: int,
+        input_tokens: Optional[int] = None,
+        output_tokens: Optional[int] = None,
+        cost: Optional[float] = None,
+    ):
+        entry = {
             'role': role,
             'model': model,
             'duration': duration,
             'success': success,
             'tokens': tokens
-        })
+        }
+        if input_tokens is not None:
+            entry['input_tokens'] = input_tokens
+        if output_tokens is not None:
+            entry['output_tokens'] = output_tokens
+        if cost is not None:
+            entry['cost'] = cost
+        self._records.append(entry)
+        with self._lock:
+            recent = self._recent.get((role, model))
+            if recent is None:
+                recent = self._recent[(role, model)] = deque(maxlen=self._window)
+            recent.append(entry)
+    def get_recent(self, role: str, model: str) -> List[Dict[str, Any]]:
+        """Return the rolling window of records for ``(role, model)``."""
+        with self._lock:
+            return list(self._recent.get((role, model), ()))
+    def get_model_stats(self, role: str, model: str) -> Dict[str, Any]:
+        """Return rolling latency, error rate and cost for ``(role, model)``.
+
+        Latency percentiles only use successful calls. ``cost_per_token`` is
+        ``None`` until a call with a recorded cost has been seen.
+        """
+        recent = self.get_recent(role, model)
+        latencies = sorted(r['duration'] for r in recent if r['success'])
+        failures = sum(1 for r in recent if not r['success'])
+        costed = [r for r in recent if r.get('cost') is not None and r['tokens']]
+        outputs = [r['output_tokens'] for r in recent if r['success'] and r.get('output_tokens')]
+        return {
+            'samples': len(recent),
+            'p50': _percentile(latencies, 50),
+            'p90': _percentile(latencies, 90),
+            'p95': _percentile(latencies, 95),
+            'error_rate': failures / len(recent) if recent else 0.0,
+            'cost_per_token': (
+                sum(r['cost'] for r in costed) / sum(r['tokens'] for r in costed) if costed else None
+            ),
+            'avg_output_tokens': sum(outputs) / len(outputs) if outputs else 0.0,
+        }
+    def record_coalesced(self, role: str, model: str):
+        """Count a call served by an identical in-flight request."""
+        with self._lock:
+            key = (role, model)
+            self._coalesced[key] = self._coalesced.get(key, 0) + 1
     def get_metrics(self):
         """Return recorded metrics."""
         return list(self._records)
+    def record_usage(
+        self,
+        role: str,
+        model: str,
+        estimated_input: int,
+        actual_input: int,
+        estimated_output: int,
+        actual_output: int,
+    ):
+        """Reconcile local token estimates with provider-reported usage."""
+        with self._lock:
+            totals = self._usage.setdefault(
+                (role, model),
+                {'calls': 0, 'estimated_input': 0, 'actual_input': 0, 'estimated_output': 0, 'actual_output': 0},
+            )
+            totals['calls'] += 1
+            totals['estimated_input'] += estimated_input
+            totals['actual_input'] += actual_input
+            totals['estimated_output'] += estimated_output
+            totals['actual_output'] += actual_output
+    def get_token_accuracy(self) -> Dict[str, Dict[str, Any]]:
+        """Return estimated vs. provider-reported tokens per ``role/model``.
+
+        ``input_ratio`` and ``output_ratio`` are actual/estimated; 1.0 means
+        the local estimate was exact.
+        """
+        with self._lock:
+            snapshot = {f"{role}/{model}": dict(totals) for (role, model), totals in self._usage.items()}
+        for totals in snapshot.values():
+            totals['input_ratio'] = (
+                totals['actual_input'] / totals['estimated_input'] if totals['estimated_input'] else None
+            )
+            totals['output_ratio'] = (
+                totals['actual_output'] / totals['estimated_output'] if totals['estimated_output'] else None
+            )
+        return snapshot
+    def record_prompt_cache(self, role: str, input_tokens: int, cached_tokens: int, savings: float):
+        """Count provider-reported cache-read input tokens and the USD they saved."""
+        with self._lock:
+            totals = self._prompt_cache.setdefault(
+                role, {'calls': 0, 'input_tokens': 0, 'cached_tokens': 0, 'savings_usd': 0.0}
+            )
+            totals['calls'] += 1
+            totals['input_tokens'] += input_tokens
+            totals['cached_tokens'] += cached_tokens
+            totals['savings_usd'] += savings
+    def get_prompt_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return cached-input tokens, cached share of input and USD saved per role."""
+        with self._lock:
+            snapshot = {role: dict(totals) for role, totals in self._prompt_cache.items()}
+        for totals in snapshot.values():
+            totals['cached_ratio'] = (
+                totals['cached_tokens'] / totals['input_tokens'] if totals['input_tokens'] else 0.0
+            )
+        return snapshot
+    def record_hedge(self, role: str, hedged: bool, hedge_won: bool):
+        """Count a hedging-eligible call, whether a hedge fired and whether it won."""
+        with self._lock:
+            counts = self._hedges.setdefault(role, {'calls': 0, 'hedged': 0, 'hedge_wins': 0})
+            counts['calls'] += 1
+            counts['hedged'] += int(hedged)
+            counts['hedge_wins'] += int(hedged and hedge_won)
+    def get_hedging_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return per-role hedge rate (hedged/calls) and win rate (wins/hedged)."""
+        with self._lock:
+            snapshot = {role: dict(counts) for role, counts in self._hedges.items()}
+        for counts in snapshot.values():
+            counts['hedge_rate'] = counts['hedged'] / counts['calls'] if counts['calls'] else 0.0
+            counts['win_rate'] = counts['hedge_wins'] / counts['hedged'] if counts['hedged'] else 0.0
+        return snapshot
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """Return coalesced call counts, in total and per ``role/model``."""
+        with self._lock:
+            by_key = {f"{role}/{model}": count for (role, model), count in self._coalesced.items()}
+        return {'coalesced': sum(by_key.values()), 'by_role_model': by_key}
+
+
+# Identical concurrent calls across all RouterAgent instances share one request
+_inflight_calls = SingleFlight()
+
+# Hedge delay used until a model has enough latency samples for its percentile
+DEFAULT_HEDGE_DELAY = 10.0
+DEFAULT_HEDGE_PERCENTILE = 90
+MIN_HEDGE_DELAY = 0.1
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_executor_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="llm-hedge")
+    return _hedge_executor
+
+
+class _CallCancelled(Exception):
+    """Raised inside a hedged call that lost the race."""
+
+class _NullScratchpad:
+    """Scratchpad stand-in for calls made without a logger."""
+
+    def log(self, *_args, **_kwargs) -> None:
+        return None
+
 
 def _validate_entry(entry: Dict[str, Any], index: int) -> None:
     """Validate a single llm.json entry against the schema."""
@@ -135,7 +364,9 @@ def _load_llm_config(config_obj: Optional[Any] = None): # Add config_obj paramet
         # Validate entries with schema
         for idx, model_info in enumerate(llm_config):
             _validate_entry(model_info, idx)
+        global _candidates_by_role
         models_by_role = {}
+        candidates_by_role: Dict[str, List[Dict[str, Any]]] = {}
         for model_info in llm_config:
             roles = model_info.get("role")
             if isinstance(roles, str):
@@ -143,11 +374,13 @@ def _load_llm_config(config_obj: Optional[Any] = None): # Add config_obj paramet
             if isinstance(roles, list):
                 for role in roles:
                     if role in models_by_role:
-                        logger.warning(
-                            "Duplicate role definition found for %s. Using the last definition found in llm.json.",
+                        logger.info(
+                            "Multiple models configured for %s. The last definition in llm.json is the "
+                            "default; the others are routing alternatives.",
                             role,
                         )
                     models_by_role[role] = model_info
+                    candidates_by_role.setdefault(role, []).insert(0, model_info)
             else:
                 logger.warning(
                     "Skipping model entry due to invalid or missing 'role': %s",
@@ -158,6 +391,7 @@ def _load_llm_config(config_obj: Optional[Any] = None): # Add config_obj paramet
             "Loaded LLM configuration for roles: %s",
             list(models_by_role.keys()),
         )
+        _candidates_by_role = candidates_by_role
         return models_by_role
     except FileNotFoundError:
         raise
@@ -183,9 +417,8 @@ class RouterAgent:
         self.config = config
         # Metrics collector
         self.metrics = MetricsTracker()
-        # Circuit breaker state
-        self._failure_counts: Dict[str, int] = {}
-        self._last_failure_time: Dict[str, float] = {}
+        # Picks among several models configured for the same role
+        self.routing_policy = RoutingPolicy(self.metrics)
 
     def choose_llm(self, query: str, metadata: Optional[Dict[str, Any]] = None) -> Optional[str]:
         """Choose the appropriate LLM based on the query and metadata."""
@@ -253,7 +486,7 @@ class RouterAgent:
             return None
 
         try:
-            estimated_tokens = len(query.split())  # Simplified token estimation
+            estimated_tokens = estimate_tokens(query)
             logger.info(
                 "Estimated tokens for query: %s (using model context: %s)",
                 estimated_tokens,
@@ -276,7 +509,13 @@ class RouterAgent:
         return model_name
 
     def run(self, prompt: Dict[str, Any], **config: Any) -> Optional[str]:
-        """Convenience wrapper to call an LLM using a structured prompt."""
+        """Convenience wrapper to call an LLM using a structured prompt.
+
+        Keyword arguments form the call's ``config``, except ``stream``,
+        ``on_stream_item`` and ``stream_item_key``, which are passed to
+        :meth:`call_llm_by_role` as request parameters.
+        """
+        call_args = {name: config.pop(name) for name in _RUN_CALL_ARGS if name in config}
         role = prompt.get("role", "pre_planner")
         system_prompt = prompt.get("system", "")
         user_prompt = prompt.get("user", "")
@@ -291,11 +530,7 @@ class RouterAgent:
 
         scratchpad = config.pop("scratchpad", None)
         if scratchpad is None:
-            class _NoOpScratchpad:
-                def log(self, *_a, **_k):
-                    return None
-
-            scratchpad = _NoOpScratchpad()
+            scratchpad = _NullScratchpad()
 
         return self.call_llm_by_role(
             role=role,
@@ -303,6 +538,7 @@ class RouterAgent:
             user_prompt=user_prompt,
             config=config,
             scratchpad=scratchpad,
+            **call_args,
         )
 
     def call_llm_by_role(
@@ -335,11 +571,82 @@ class RouterAgent:
         Returns:
             The LLM response text or None if the call fails
         """
+        call_kwargs = dict(
+            role=role,
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            config=config,
+            scratchpad=scratchpad,
+            fallback_role=fallback_role,
+            tech_stack=tech_stack,
+            code_context=code_context,
+            metadata=metadata,
+            **kwargs,
+        )
+        key = self._coalescing_key(**call_kwargs)
+        if key is None:
+            return self._call_llm_by_role(**call_kwargs)
+
+        result, shared = _inflight_calls.do(key, lambda: self._call_llm_by_role(**call_kwargs))
+        if shared:
+            model_name = _models_by_role[role].get("model", "")
+            self.metrics.record_coalesced(role, model_name)
+            scratchpad.log("RouterAgent", f"Coalesced {role} call with an identical in-flight request")
+        return result
+
+    @staticmethod
+    def _coalescing_key(
+        role: str,
+        system_prompt: str,
+        user_prompt: str,
+        config: Dict[str, Any],
+        scratchpad: Any,
+        **extra: Any,
+    ) -> Optional[str]:
+        """Build the single-flight key for a call, or ``None`` to skip coalescing.
+
+        The key is the ``SemanticCache`` hash of the request; role, context and
+        API parameters are folded into its ``prompt`` field so calls that could
+        produce different responses never share a result. Calls with streaming
+        callbacks are not coalesced because followers would miss the callbacks.
+        """
+        model_info = _models_by_role.get(role)
+        if not model_info or any(callable(value) for value in extra.values()):
+            return None
+        context = {"role": role, **{k: v for k, v in extra.items() if v is not None}}
+        try:
+            context_text = json.dumps(context, sort_keys=True, default=str)
+        except (TypeError, ValueError):
+            return None
+        prompt_data = {
+            "model": model_info.get("model"),
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+            "prompt": context_text,
+        }
+        return request_key(prompt_data)
+
+    def _call_llm_by_role(
+        self,
+        role: str,
+        system_prompt: str,
+        user_prompt: str,
+        config: Dict[str, Any],
+        scratchpad: Any,
+        fallback_role: Optional[str] = None,
+        tech_stack: Optional[Dict[str, Any]] = None,
+        code_context: Optional[Dict[str, str]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> Optional[str]:
+        """Perform :meth:`call_llm_by_role` without request coalescing."""
         # Initialize metadata if not provided
         if metadata is None:
             metadata = {}
 
-        model_info = _models_by_role.get(role)
+        model_info = self._select_model(role, system_prompt, user_prompt, config, scratchpad)
         if not model_info:
             scratchpad.log("RouterAgent", f"Error: No model configured for role: '{role}'", level="error")
             return None
@@ -389,39 +696,25 @@ class RouterAgent:
         max_retries = config.get('max_retries', 3)
         initial_backoff = config.get('initial_backoff', 1.0)
         backoff_multiplier = config.get('backoff_multiplier', 2.0)
-        failure_threshold = config.get('failure_threshold', 5)
-        cooldown = config.get('cooldown_period', 300)
-        
-        # Use separate connection and read timeouts for better reliability
-        connection_timeout = config.get('llm_connection_timeout', 10)
-        read_timeout = config.get('llm_read_timeout', 120)
-        timeout = (connection_timeout, read_timeout)
+        # One retry budget covers the whole call: attempts, wall-clock time and
+        # the endpoint's shared retry allowance. Transport retries are disabled.
+        retry_budget = get_transport_registry(config).get_retry_budget(
+            self._parse_endpoint(model_info.get("api", {}).get("endpoint") or "")[1]
+        )
+        timeout = self._adaptive_timeout(role, model_name, config)
+        deadline_seconds = config.get('llm_retry_deadline')
+        if deadline_seconds is None:
+            # By default every attempt may run to its timeout and still be retried
+            deadline_seconds = retry_deadline(sum(timeout), max_retries, initial_backoff, backoff_multiplier)
+        deadline = time.monotonic() + deadline_seconds
 
         backoff = initial_backoff
         primary_failed = False
         response_content = None
 
-        # Initialize circuit breaker state for the model if not present
-        if model_name not in self._failure_counts:
-            self._failure_counts[model_name] = 0
-            self._last_failure_time[model_name] = 0
-
         for attempt in range(max_retries):
-            # Check circuit breaker
-            if (
-                self._failure_counts[model_name] >= failure_threshold
-                and time.time() < self._last_failure_time[model_name] + cooldown
-            ):
-                scratchpad.log(
-                    "RouterAgent",
-                    f"Circuit breaker tripped for {model_name} (Role: {role}). Attempting fallback if available.",
-                    level="warning",
-                )
-                primary_failed = True
-                break
-
             try:
-                response_content = self._execute_llm_call(
+                response_content = self._execute_hedged_call(
                     model_info,
                     system_prompt,
                     user_prompt,
@@ -434,16 +727,22 @@ class RouterAgent:
                     metadata=metadata,  # Pass command metadata
                     **kwargs
                 )
-                self._failure_counts[model_name] = 0  # Reset failure count on success
                 primary_failed = False
                 scratchpad.log(
                     "RouterAgent",
                     f"Successfully called {model_name} (Role: {role}) on attempt {attempt + 1}",
                 )
                 break  # Success
+            except CircuitOpenError as e:
+                scratchpad.log(
+                    "RouterAgent",
+                    f"{e} (Role: {role}). Attempting fallback if available.",
+                    level="warning",
+                )
+                primary_failed = True
+                break
             except Exception as e:
-                self._failure_counts[model_name] += 1
-                self._last_failure_time[model_name] = time.time()
+                primary_failed = True
                 scratchpad.log(
                     "RouterAgent",
                     (
@@ -453,7 +752,6 @@ class RouterAgent:
                     level="warning",
                 )
                 if attempt + 1 == max_retries:
-                    primary_failed = True
                     scratchpad.log(
                         "RouterAgent",
                         (
@@ -461,9 +759,17 @@ class RouterAgent:
                         ),
                         level="error",
                     )
-                else:
-                    sleep(backoff)
-                    backoff *= backoff_multiplier
+                    break
+                remaining = deadline - time.monotonic()
+                if not self._is_retryable(e) or remaining <= backoff or not retry_budget.try_retry():
+                    scratchpad.log(
+                        "RouterAgent",
+                        f"Not retrying {model_name} (Role: {role}); retry budget exhausted or error is permanent.",
+                        level="warning",
+                    )
+                    break
+                sleep(backoff)
+                backoff *= backoff_multiplier
 
         # Fallback logic
         if primary_failed and fallback_role:
@@ -485,7 +791,7 @@ class RouterAgent:
                     user_prompt,
                     config,
                     scratchpad,
-                    timeout=timeout,
+                    timeout=self._adaptive_timeout(fallback_role, fallback_model_name, config),
                     role=fallback_role,
                     tech_stack=tech_stack,  # Pass tech_stack
                     code_context=code_context,  # Pass code_context
@@ -502,6 +808,230 @@ class RouterAgent:
 
         return response_content
 
+    def _adaptive_timeout(self, role: str, model_name: str, config: Dict[str, Any]) -> Tuple[float, float]:
+        """Return ``(connect, read)`` timeouts for a call to ``model_name``.
+
+        The read timeout starts at ``llm_read_timeout`` and, once the model has
+        enough successful calls, shrinks to ``llm_timeout_p95_multiplier``
+        times its rolling p95 latency (never below ``MIN_READ_TIMEOUT``). A
+        stalled endpoint is then abandoned at a few times its normal latency
+        instead of the static ceiling.
+        """
+        connection_timeout = config.get('llm_connection_timeout', 10)
+        read_timeout = config.get('llm_read_timeout', 120)
+        multiplier = config.get('llm_timeout_p95_multiplier', DEFAULT_TIMEOUT_P95_MULTIPLIER)
+        stats = self.metrics.get_model_stats(role, model_name)
+        successes = stats['samples'] * (1 - stats['error_rate'])
+        if multiplier and successes >= ADAPTIVE_TIMEOUT_MIN_SAMPLES:
+            read_timeout = min(read_timeout, max(MIN_READ_TIMEOUT, stats['p95'] * multiplier))
+        return (connection_timeout, read_timeout)
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        """Return False for errors a retry cannot fix, such as HTTP 4xx responses."""
+        if isinstance(error, CircuitOpenError):
+            return False
+        cause = error.__cause__ or error.__context__
+        if isinstance(cause, requests.exceptions.HTTPError):
+            return is_transient_error(cause)
+        return True
+
+    @staticmethod
+    def _parse_endpoint(endpoint_str: str) -> Tuple[str, str]:
+        """Split an llm.json ``endpoint`` such as ``"POST https://..."`` into method and URL."""
+        if endpoint_str.startswith("POST "):
+            return "POST", endpoint_str.split(" ", 1)[1]
+        if endpoint_str.startswith("GET "):
+            return "GET", endpoint_str.split(" ", 1)[1]
+        return "POST", endpoint_str  # Assume POST if not specified
+
+    def _select_model(
+        self,
+        role: str,
+        system_prompt: str,
+        user_prompt: str,
+        config: Dict[str, Any],
+        scratchpad: Any,
+    ) -> Optional[Dict[str, Any]]:
+        """Return the llm.json entry to use for ``role``.
+
+        Roles with a single entry always use it. Roles listed on several
+        entries are routed by :class:`RoutingPolicy` using ``llm_latency_slo``
+        and ``llm_cost_budget`` from ``config`` (``0`` disables either).
+        """
+        default = _models_by_role.get(role)
+        candidates = _candidates_by_role.get(role) or []
+        if len(candidates) <= 1:
+            return default
+        chosen = self.routing_policy.choose(
+            role,
+            candidates,
+            estimate_tokens(system_prompt) + estimate_tokens(user_prompt),
+            latency_slo=config.get("llm_latency_slo") or None,
+            cost_budget=config.get("llm_cost_budget") or None,
+        )
+        if chosen is not None and chosen is not default:
+            scratchpad.log(
+                "RouterAgent",
+                f"Routing role '{role}' to {chosen.get('model')} instead of default {default.get('model')}",
+            )
+        return chosen or default
+
+    def _hedge_target(self, role: str, model_info: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Return the llm.json entry to hedge with, or ``None`` if ``role`` is not hedged.
+
+        Entries marked ``"latency_sensitive": true`` are hedged against the
+        model of ``hedge.role`` when set, otherwise against another model
+        configured for the same role. A second request to the same model and
+        endpoint would only double spend and load on a slow endpoint, so
+        without a distinct alternative the call is not hedged.
+        """
+        if not model_info.get("latency_sensitive"):
+            return None
+
+        def target(info: Dict[str, Any]) -> Tuple[Any, Any]:
+            return info.get("model"), (info.get("api") or {}).get("endpoint")
+
+        hedge_role = (model_info.get("hedge") or {}).get("role")
+        candidates = [_models_by_role.get(hedge_role)] if hedge_role else _candidates_by_role.get(role) or []
+        for candidate in candidates:
+            if candidate and target(candidate) != target(model_info):
+                return candidate
+        return None
+
+    def _hedge_delay(self, role: str, model_info: Dict[str, Any]) -> float:
+        """Delay before hedging: the primary model's observed latency percentile."""
+        hedge = model_info.get("hedge") or {}
+        stats = self.metrics.get_model_stats(role, model_info.get("model", ""))
+        if stats["samples"] < self.routing_policy.min_samples:
+            return hedge.get("initial_delay", DEFAULT_HEDGE_DELAY)
+        pct = hedge.get("percentile", DEFAULT_HEDGE_PERCENTILE)
+        latencies = sorted(
+            r["duration"] for r in self.metrics.get_recent(role, model_info.get("model", "")) if r["success"]
+        )
+        return max(MIN_HEDGE_DELAY, _percentile(latencies, pct) if latencies else stats["p90"])
+
+    def _execute_hedged_call(
+        self,
+        model_info: Dict[str, Any],
+        system_prompt: str,
+        user_prompt: str,
+        config: Dict[str, Any],
+        scratchpad: Any,
+        timeout: Any,
+        role: str,
+        **kwargs: Any
+    ) -> Optional[str]:
+        """Run :meth:`_execute_llm_call`, hedging latency-sensitive roles.
+
+        If the primary call has not finished after :meth:`_hedge_delay`, a
+        second request goes to the hedge target. The first response that
+        succeeds (and parses as JSON when ``response_format`` is
+        ``json_object``) wins; the other call is cancelled. The caller's
+        ``stream`` setting is kept; a streamed loser closes its connection
+        when cancelled, while a non-streamed one runs to completion and its
+        response is discarded.
+        """
+        hedge_info = self._hedge_target(role, model_info)
+        if hedge_info is None or any(callable(value) for value in kwargs.values()):
+            return self._execute_llm_call(
+                model_info, system_prompt, user_prompt, config, scratchpad,
+                timeout=timeout, role=role, **kwargs
+            )
+
+        response_format = kwargs.get("response_format") or model_info.get("parameters", {}).get("response_format")
+        json_mode = (response_format or {}).get("type") == "json_object"
+
+        def run(info: Dict[str, Any], call_timeout: Any, cancel_event: threading.Event) -> Optional[str]:
+            return self._execute_llm_call(
+                info, system_prompt, user_prompt, config, scratchpad,
+                timeout=call_timeout, role=role, cancel_event=cancel_event, **kwargs
+            )
+
+        executor = _get_hedge_executor()
+        primary_cancel = threading.Event()
+        primary = executor.submit(run, model_info, timeout, primary_cancel)
+        calls = {primary: (primary_cancel, False)}
+        delay = self._hedge_delay(role, model_info)
+        if not wait([primary], timeout=delay).done:
+            hedge_cancel = threading.Event()
+            # The hedge model is cut off at its own latency, not the primary's
+            hedge_timeout = self._adaptive_timeout(role, hedge_info.get("model"), config)
+            calls[executor.submit(run, hedge_info, hedge_timeout, hedge_cancel)] = (hedge_cancel, True)
+            scratchpad.log(
+                "RouterAgent",
+                f"Hedging {role} call to {hedge_info.get('model')} after {delay:.2f}s",
+            )
+
+        hedged = len(calls) > 1
+        errors: List[Exception] = []
+        pending = set(calls)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                is_hedge = calls[future][1]
+                try:
+                    content = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                if json_mode and (not content or extract_json_from_text(content) is None):
+                    errors.append(ValueError(f"Hedged {role} response was not valid JSON"))
+                    continue
+                for other in pending:
+                    calls[other][0].set()
+                    other.cancel()
+                self.metrics.record_hedge(role, hedged, is_hedge)
+                if hedged:
+                    scratchpad.log("RouterAgent", f"{'Hedge' if is_hedge else 'Primary'} won {role} call")
+                return content
+
+        self.metrics.record_hedge(role, hedged, False)
+        raise errors[0]
+
+    def call_llm_by_role_many(
+        self,
+        requests: List[Dict[str, Any]],
+        max_concurrency: int = 4,
+    ) -> List[Dict[str, Any]]:
+        """Run many independent :meth:`call_llm_by_role` calls concurrently.
+
+        Calls run on a bounded thread pool. Per-endpoint concurrency limits and
+        provider rate limits are still enforced inside each call, so
+        ``max_concurrency`` only bounds the number of calls in flight overall.
+
+        Args:
+            requests: One dict of :meth:`call_llm_by_role` keyword arguments per
+                call. ``config`` defaults to ``{}`` and ``scratchpad`` to a
+                no-op logger.
+            max_concurrency: Maximum number of calls in flight at once
+
+        Returns:
+            One result per request, in input order: ``{'success': True,
+            'response': text}`` or ``{'success': False, 'error': message}``
+        """
+        if not requests:
+            return []
+
+        def _run(call_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+            call_kwargs = dict(call_kwargs)
+            call_kwargs.setdefault("config", {})
+            call_kwargs.setdefault("scratchpad", _NullScratchpad())
+            try:
+                response = self.call_llm_by_role(**call_kwargs)
+            except Exception as e:
+                return {"success": False, "error": f"{type(e).__name__}: {e}"}
+            if response is None:
+                return {
+                    "success": False,
+                    "error": f"LLM call failed for role '{call_kwargs.get('role')}'",
+                }
+            return {"success": True, "response": response}
+
+        workers = max(1, min(max_concurrency, len(requests)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-batch") as pool:
+            return list(pool.map(_run, requests))
+
     def _execute_llm_call(
         self,
         model_info: Dict[str, Any],
@@ -523,8 +1053,18 @@ class RouterAgent:
 
         Now supports enhanced context with tech stack, code snippets, command metadata,
         historical context, file metadata, and related features.
+
+        When the payload requests ``stream: true`` the SSE body is consumed as it
+        arrives. JSON-mode responses are fed to an :class:`IncrementalJSONParser`
+        so that ``on_stream_item(item, index)`` can validate each completed
+        element of ``stream_item_key`` (default ``"feature_groups"``) early, and
+        a structural error aborts the stream instead of waiting for the full
+        output.
         """
         start = time.time()
+        on_stream_item = kwargs.pop("on_stream_item", None)
+        stream_item_key = kwargs.pop("stream_item_key", "feature_groups")
+        cancel_event = kwargs.pop("cancel_event", None)
         model_name = model_info["model"]
         api_details = model_info.get("api", {})
         endpoint_str = api_details.get("endpoint")
@@ -630,10 +1170,6 @@ class RouterAgent:
 
         # Include relevant code context if available
         if code_context:
-            # Simple token estimation (can be refined)
-            def estimate_tokens(text):
-                return len(text.split()) * 1.3  # Rough estimation: words * 1.3
-
             # We already retrieved the allocation above, but reuse it to calculate max_context_tokens
             # allocation = self._get_role_specific_context_allocation(role, context_window)
             max_context_tokens = min(allocation["max_abs_tokens"],
@@ -757,10 +1293,10 @@ class RouterAgent:
                             error_context = []
                             for error_line in error_lines[:3]:  # Focus on first 3 errors max
                                 lines = content.split("\n")
-                                start = max(0, error_line - line_context)
+                                snippet_start = max(0, error_line - line_context)
                                 end = min(len(lines), error_line + line_context)
-                                error_snippet = "\n".join(lines[start:end])
-                                error_context.append(f"ERROR CONTEXT (lines {start}-{end}):\n{error_snippet}")
+                                error_snippet = "\n".join(lines[snippet_start:end])
+                                error_context.append(f"ERROR CONTEXT (lines {snippet_start}-{end}):\n{error_snippet}")
 
                             error_content = "\n\n".join(error_context)
                             error_tokens = estimate_tokens(error_content)
@@ -780,23 +1316,16 @@ class RouterAgent:
                     f"Added code context for {role} (estimated {current_tokens:.0f} tokens, "
                     f"{len(code_context)} files, limit {max_context_tokens:.0f})")
 
-        # Add reminder about test-side workarounds to the user prompt
-        reminder = "\n\n⚠️ IMPORTANT: You must NEVER modify tests to make failing code pass. Always fix the implementation code itself, not the tests. Modifying tests to accommodate broken code is strictly prohibited. ⚠️"
-        enhanced_user_prompt += reminder
-        scratchpad.log("RouterAgent", "Added test integrity reminder to user prompt")
+        # The test integrity reminder is static, so it goes with the system prompt
+        # ahead of all per-call context where it can share the cached prefix
+        system_prompt += TEST_INTEGRITY_REMINDER
+        scratchpad.log("RouterAgent", "Added test integrity reminder to system prompt")
 
         if not endpoint_str or not auth_header_template:
             raise ValueError(f"API endpoint or auth_header missing for model {model_name}")
 
         # Determine HTTP method and endpoint URL
-        method = "POST"
-        if endpoint_str.startswith("POST "):
-            endpoint = endpoint_str.split(" ", 1)[1]
-        elif endpoint_str.startswith("GET "):
-            method = "GET"
-            endpoint = endpoint_str.split(" ", 1)[1]
-        else:
-            endpoint = endpoint_str  # Assume POST if not specified
+        method, endpoint = self._parse_endpoint(endpoint_str)
 
         # Resolve API key from config
         api_key_name = None
@@ -828,10 +1357,7 @@ class RouterAgent:
             "X-Title": config.get("openrouter_title", "Agent-S3")  # Make configurable
         }
 
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": enhanced_user_prompt}  # Use enhanced prompt
-        ]
+        messages = self._build_messages(system_prompt, enhanced_user_prompt, config, endpoint)
 
         # Combine default parameters from llm.json with call-specific kwargs
         payload = {
@@ -842,9 +1368,6 @@ class RouterAgent:
         }
 
         # Estimate total tokens for logging and potential warnings
-        def estimate_tokens(text):
-            return len(text.split()) * 1.3  # Rough estimation: words * 1.3
-
         total_tokens = estimate_tokens(system_prompt) + estimate_tokens(enhanced_user_prompt)
         if total_tokens > context_window * 0.9:  # Within 90% of limit
             scratchpad.log("RouterAgent",
@@ -854,35 +1377,70 @@ class RouterAgent:
         scratchpad.log("RouterAgent", f"Calling {method} {endpoint} for model {model_name} "
                       f"(Role: {role}, est. tokens: {total_tokens:.0f}, timeout: {timeout})")
 
+        # Fail fast while the endpoint's circuit is open
+        registry = get_transport_registry(config)
+        breaker = registry.get_breaker(endpoint, model_name)
+        if not breaker.allow():
+            raise CircuitOpenError(model_name, breaker.retry_after())
+        # None until the endpoint answers or fails; cancelled calls say nothing about its health.
+        # From here on every exit, including cancellation while throttled, goes
+        # through the finally block so a half-open probe is never left reserved.
+        endpoint_healthy: Optional[bool] = None
+        limiter = registry.get_limiter(endpoint)
+        acquired = False
         try:
-            # Create a session with connection pooling for better reliability
-            session = requests.Session()
-            
-            # Configure session with retry adapter
-            from requests.adapters import HTTPAdapter
-            from urllib3.util.retry import Retry
-            
-            retry_strategy = Retry(
-                total=3,
-                status_forcelist=[429, 500, 502, 503, 504],
-                allowed_methods=["HEAD", "GET", "PUT", "DELETE", "OPTIONS", "TRACE", "POST"],
-                backoff_factor=1
-            )
-            adapter = HTTPAdapter(max_retries=retry_strategy)
-            session.mount("http://", adapter)
-            session.mount("https://", adapter)
-            
-            response = session.request(
+            registry.get_retry_budget(endpoint).record_request()
+            if cancel_event is not None and cancel_event.is_set():
+                raise _CallCancelled(model_name)
+            # Wait for a per-endpoint concurrency slot and rate-limit token
+            waited = limiter.acquire()
+            acquired = True
+            if waited > 0.05:
+                scratchpad.log("RouterAgent", f"Throttled {waited:.2f}s waiting for {endpoint}")
+            if cancel_event is not None and cancel_event.is_set():
+                raise _CallCancelled(model_name)
+            # Reuse the pooled, keep-alive session for this endpoint
+            streaming = bool(payload.get("stream"))
+            if streaming:
+                # Ask for the final usage chunk so token estimates can be reconciled
+                payload.setdefault("stream_options", {"include_usage": True})
+            response = registry.request(
                 method,
                 endpoint,
                 headers=headers,
                 json=payload,
-                timeout=timeout
+                timeout=timeout,
+                stream=streaming,
             )
-            response.raise_for_status()  # Raises HTTPError for bad responses (4xx or 5xx)
+            limiter.observe(response.status_code, response.headers)
+            try:
+                response.raise_for_status()  # Raises HTTPError for bad responses (4xx or 5xx)
+            except requests.exceptions.HTTPError:
+                # An unread streamed body holds its pooled connection until closed
+                response.close()
+                raise
+            endpoint_healthy = True
+
+            if streaming:
+                json_mode = (payload.get("response_format") or {}).get("type") == "json_object"
+                parser = None
+                if json_mode or on_stream_item is not None:
+                    parser = IncrementalJSONParser(stream_item_key, on_stream_item)
+                usage: Dict[str, Any] = {}
+                content = self._read_streamed_content(response, parser, cancel_event, usage)
+                scratchpad.log(
+                    "RouterAgent",
+                    f"Streamed {len(content)} chars from {model_name}"
+                    + (f" ({len(parser.items)} '{stream_item_key}' items validated)" if parser else ""),
+                )
+                if content:
+                    self._record_success(role, model_info, time.time() - start, total_tokens, content, usage)
+                    return content.strip()
+                raise ValueError(f"Streamed response from {model_name} contained no content")
 
             response_data = response.json()
-            scratchpad.log("RouterAgent", f"Raw response from {model_name}: {json.dumps(response_data, indent=2)}")
+            # Raw bodies are sampled and serialized on a background writer
+            capture = get_response_capture(config)
 
             # Extract content - common pattern for OpenAI/OpenRouter compatible APIs
             if response_data.get("choices") and isinstance(response_data["choices"], list) and len(response_data["choices"]) > 0:
@@ -891,37 +1449,51 @@ class RouterAgent:
                     content = message.get("content")
                     if content:
                         # Record success metrics
-                        duration = time.time() - start
-                        tokens = len(system_prompt.split()) + len(enhanced_user_prompt.split()) + len(str(content).split())
-                        self.metrics.record(role, model_name, duration, True, tokens)
+                        self._record_success(
+                            role, model_info, time.time() - start, total_tokens, str(content),
+                            response_data.get("usage"),
+                        )
+                        capture.submit(scratchpad, role, model_name, response_data)
                         return str(content).strip()
 
             # Handle potential variations in response structure if needed
             # ... add more parsing logic for different API formats ...
 
-            raise ValueError(f"Could not extract content from {model_name} response structure: {response_data}")
+            capture.submit(scratchpad, role, model_name, response_data, error=True)
+            raise ValueError(
+                f"Could not extract content from {model_name} response structure: "
+                f"{str(response_data)[:MAX_LOG_LEN]}"
+            )
 
+        except _CallCancelled:
+            scratchpad.log("RouterAgent", f"Cancelled hedged call to {model_name}")
+            raise
         except requests.exceptions.ConnectTimeout:
+            endpoint_healthy = False
             duration = time.time() - start
             self.metrics.record(role, model_name, duration, False, 0)
             scratchpad.log("RouterAgent", f"Connection to {model_name} timed out after {timeout[0]} seconds.", level="error")
             raise TimeoutError(f"Connection to {model_name} timed out.")
         except requests.exceptions.ReadTimeout:
+            endpoint_healthy = False
             duration = time.time() - start
             self.metrics.record(role, model_name, duration, False, 0)
             scratchpad.log("RouterAgent", f"Read from {model_name} timed out after {timeout[1]} seconds.", level="error")
             raise TimeoutError(f"Read from {model_name} timed out.")
         except requests.exceptions.Timeout:
+            endpoint_healthy = False
             duration = time.time() - start
             self.metrics.record(role, model_name, duration, False, 0)
             scratchpad.log("RouterAgent", f"API call to {model_name} timed out after {timeout} seconds.", level="error")
             raise TimeoutError(f"API call to {model_name} timed out.")
         except requests.exceptions.ConnectionError as e:
+            endpoint_healthy = False
             duration = time.time() - start
             self.metrics.record(role, model_name, duration, False, 0)
             scratchpad.log("RouterAgent", f"Connection error with {model_name}: {str(e)}", level="error")
             raise ConnectionError(f"Connection error with {model_name}: {str(e)}")
         except requests.exceptions.RequestException as e:
+            endpoint_healthy = not is_transient_error(e)
             duration = time.time() - start
             self.metrics.record(role, model_name, duration, False, 0)
             response_text = e.response.text if e.response else "No response body"
@@ -931,12 +1503,18 @@ class RouterAgent:
             )
             scratchpad.log("RouterAgent", error_msg, level="error")
             raise ConnectionError(error_msg)
+        except JSONStreamError as e:
+            duration = time.time() - start
+            self.metrics.record(role, model_name, duration, False, 0)
+            error_msg = f"Aborted streamed response from {model_name}: {e}"
+            scratchpad.log("RouterAgent", error_msg, level="error")
+            raise ValueError(error_msg)
         except (json.JSONDecodeError, KeyError, IndexError, AttributeError, ValueError) as e:
             duration = time.time() - start
             self.metrics.record(role, model_name, duration, False, 0)
             error_msg = (
                 f"Failed to process response from {model_name}: {e}. Response data: "
-                f"{response.text[:MAX_LOG_LEN]}"
+                f"{self._response_excerpt(response)}"
             )
             scratchpad.log("RouterAgent", error_msg, level="error")
             raise ValueError(error_msg)
@@ -947,13 +1525,155 @@ class RouterAgent:
             error_msg = f"Unexpected error during API call to {model_name}: {e}"
             scratchpad.log("RouterAgent", f"{error_msg}\n{traceback.format_exc()}", level="error")
             raise
+        finally:
+            if acquired:
+                limiter.release()
+            if endpoint_healthy is None:
+                breaker.release()
+            elif endpoint_healthy:
+                breaker.record_success()
+            else:
+                breaker.record_failure()
+
+    @staticmethod
+    def _build_messages(
+        system_prompt: str,
+        user_prompt: str,
+        config: Dict[str, Any],
+        endpoint: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """Assemble chat messages with the static system prompt first.
+
+        When prompt caching is enabled (``llm_prompt_caching``), the system
+        prompt reaches ``llm_prompt_cache_min_tokens`` and ``endpoint`` is on
+        one of ``PROMPT_CACHE_CONTROL_HOSTS``, it is sent as a text part with a
+        ``cache_control`` breakpoint so the provider can serve it from its
+        prompt cache. Other endpoints get a plain string; providers that cache
+        automatically still reuse it, since it is the stable prefix. Dynamic
+        context only ever appears in the user message, after the cached prefix.
+        """
+        system_content: Any = system_prompt
+        if (
+            config.get("llm_prompt_caching", True)
+            and _supports_cache_control(endpoint)
+            and estimate_tokens(system_prompt)
+            >= config.get("llm_prompt_cache_min_tokens", DEFAULT_PROMPT_CACHE_MIN_TOKENS)
+        ):
+            system_content = [
+                {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+            ]
+        return [
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    def _record_success(
+        self,
+        role: str,
+        model_info: Dict[str, Any],
+        duration: float,
+        input_tokens: float,
+        content: str,
+        usage: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Record a successful call with token counts and its cost.
+
+        When the provider returned a ``usage`` block its counts replace the
+        local estimates, and the estimate error is tracked per role/model.
+        """
+        input_tokens = int(input_tokens)
+        output_tokens = estimate_tokens(content)
+        model_name = model_info.get("model", "")
+        cached_tokens = 0
+        if usage and usage.get("prompt_tokens") is not None:
+            actual_input = int(usage["prompt_tokens"])
+            actual_output = int(usage.get("completion_tokens") or 0)
+            self.metrics.record_usage(
+                role, model_name, input_tokens, actual_input, output_tokens, actual_output
+            )
+            input_tokens, output_tokens = actual_input, actual_output
+            cached_tokens = _cached_input_tokens(usage)
+            self.metrics.record_prompt_cache(
+                role, input_tokens, cached_tokens, estimate_cache_savings(model_info, cached_tokens)
+            )
+        self.metrics.record(
+            role,
+            model_name,
+            duration,
+            True,
+            input_tokens + output_tokens,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cost=estimate_cost(model_info, input_tokens, output_tokens, cached_tokens),
+        )
+
+    def _read_streamed_content(
+        self,
+        response: requests.Response,
+        parser: Optional[IncrementalJSONParser] = None,
+        cancel_event: Optional[threading.Event] = None,
+        usage: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        """Accumulate ``delta.content`` from an OpenAI-compatible SSE stream.
+
+        Args:
+            response: A response opened with ``stream=True``
+            parser: Optional incremental parser fed with each content delta
+            cancel_event: Optional event; once set the stream is abandoned
+            usage: Optional dict updated with the provider's ``usage`` block
+
+        Returns:
+            The concatenated completion text
+
+        Raises:
+            JSONStreamError: If ``parser`` detects a structural error. The
+                connection is closed immediately so generation stops.
+            _CallCancelled: If ``cancel_event`` is set while streaming
+            ValueError: If the provider sends an error event
+        """
+        parts: List[str] = []
+        try:
+            for data in iter_sse_data(response.iter_lines(decode_unicode=True)):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise _CallCancelled("stream cancelled")
+                event = json.loads(data)
+                if event.get("error"):
+                    raise ValueError(f"Provider stream error: {event['error']}")
+                if usage is not None and event.get("usage"):
+                    usage.update(event["usage"])
+                choices = event.get("choices") or []
+                if not choices:
+                    continue
+                delta = choices[0].get("delta") or choices[0].get("message") or {}
+                text = delta.get("content")
+                if text:
+                    parts.append(text)
+                    if parser is not None:
+                        parser.feed(text)
+            if parser is not None:
+                parser.close()
+        finally:
+            response.close()
+        return "".join(parts)
+
+    @staticmethod
+    def _response_excerpt(response: Any) -> str:
+        """Return the start of a response body for error messages."""
+        try:
+            return response.text[:MAX_LOG_LEN]
+        except Exception:
+            return "<streamed response>"
+
+    def get_model_for_role(self, role: str) -> Optional[str]:
+        """Return the llm.json model name configured for ``role``, or None."""
+        return (_models_by_role.get(role) or {}).get("model")
 
     def reload_config(self):
         """Reload llm.json config and reset router state."""
         global _models_by_role
         _models_by_role = _load_llm_config()
-        self._failure_counts.clear()
-        self._last_failure_time.clear()
+        # Circuit state belongs to the old models; start the new ones closed
+        get_transport_registry(self.config).reset_breakers()
 
     def get_metrics(self):
         """Return aggregated LLM call metrics."""
@@ -0,0 +1,245 @@
+"""
+Latency- and cost-aware model selection for roles with several eligible models.
+
+``RouterAgent`` uses the single llm.json entry for a role unless the role is
+listed on more than one entry. For those roles :class:`RoutingPolicy` picks a
+model from live ``MetricsTracker`` data: rolling p50/p95 latency, error rate
+and cost per token, combined with ``pricing_per_million`` and
+``context_window`` from llm.json.
+
+:func:`simulate` replays recorded metrics through the policy so routing
+changes can be evaluated offline.
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional
+
+from agent_s3.tools.context_management.token_budget import get_token_estimator
+
+logger = logging.getLogger(__name__)
+
+# Samples needed before a model's latency and error rate are trusted
+DEFAULT_MIN_SAMPLES = 5
+# Models failing more often than this are skipped while alternatives exist
+DEFAULT_MAX_ERROR_RATE = 0.5
+# Output tokens assumed when a model has no history
+DEFAULT_EXPECTED_OUTPUT_TOKENS = 1000
+# Cache-read price as a fraction of input price when llm.json has no cached_input
+DEFAULT_CACHED_INPUT_RATE = 0.25
+
+
+def estimate_tokens(text: str) -> int:
+    """Count tokens with the shared tiktoken estimator.
+
+    Counts for long segments are cached by content hash, so system prompts
+    that repeat on every call are only encoded once.
+    """
+    return get_token_estimator().estimate_tokens_for_text(text)
+
+
+def cached_input_price(model_info: Dict[str, Any]) -> float:
+    """Per-million price of cache-read input tokens for an llm.json entry.
+
+    Uses ``pricing_per_million.cached_input`` when present, otherwise assumes
+    ``DEFAULT_CACHED_INPUT_RATE`` of the regular input price.
+    """
+    pricing = model_info.get("pricing_per_million") or {}
+    if "cached_input" in pricing:
+        return pricing["cached_input"]
+    return pricing.get("input", 0.0) * DEFAULT_CACHED_INPUT_RATE
+
+
+def estimate_cost(
+    model_info: Dict[str, Any],
+    input_tokens: int,
+    output_tokens: int,
+    cached_input_tokens: int = 0,
+) -> float:
+    """Return the USD cost of a call using the entry's ``pricing_per_million``.
+
+    ``cached_input_tokens`` of the input are billed at the cached-input price.
+    """
+    pricing = model_info.get("pricing_per_million") or {}
+    uncached = max(0, input_tokens - cached_input_tokens)
+    return (
+        uncached * pricing.get("input", 0.0)
+        + cached_input_tokens * cached_input_price(model_info)
+        + output_tokens * pricing.get("output", 0.0)
+    ) / 1_000_000
+
+
+def estimate_cache_savings(model_info: Dict[str, Any], cached_input_tokens: int) -> float:
+    """Return USD saved by serving ``cached_input_tokens`` from the provider cache."""
+    pricing = model_info.get("pricing_per_million") or {}
+    return cached_input_tokens * (pricing.get("input", 0.0) - cached_input_price(model_info)) / 1_000_000
+
+
+class RoutingPolicy:
+    """Choose a model for a role under a latency SLO and a per-call cost budget.
+
+    Selection rules, in order:
+
+    1. Drop models whose ``context_window`` cannot hold the request.
+    2. Drop models with an error rate above ``max_error_rate``.
+    3. With neither an SLO nor a budget, keep the first remaining candidate,
+       which is the llm.json default unless it was dropped above.
+    4. Keep models whose p95 latency meets the SLO and whose estimated cost
+       fits the budget. Models with fewer than ``min_samples`` calls are kept
+       so they get explored.
+    5. Pick the cheapest remaining model, breaking ties by p50 latency. If
+       nothing satisfies the SLO and budget, pick the fastest healthy model.
+    """
+
+    def __init__(
+        self,
+        metrics: Any,
+        latency_slo: Optional[float] = None,
+        cost_budget: Optional[float] = None,
+        max_error_rate: float = DEFAULT_MAX_ERROR_RATE,
+        min_samples: int = DEFAULT_MIN_SAMPLES,
+    ):
+        self.metrics = metrics
+        self.latency_slo = latency_slo
+        self.cost_budget = cost_budget
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+
+    def expected_output_tokens(self, role: str, model: str) -> int:
+        stats = self.metrics.get_model_stats(role, model)
+        if stats["samples"] and stats["avg_output_tokens"]:
+            return int(stats["avg_output_tokens"])
+        return DEFAULT_EXPECTED_OUTPUT_TOKENS
+
+    def describe(self, role: str, candidates: List[Dict[str, Any]], input_tokens: int) -> List[Dict[str, Any]]:
+        """Return the stats and estimated cost the policy sees for each candidate."""
+        rows = []
+        for model_info in candidates:
+            model = model_info.get("model", "")
+            stats = self.metrics.get_model_stats(role, model)
+            output_tokens = self.expected_output_tokens(role, model)
+            rows.append({
+                **stats,
+                "model": model,
+                "fits_context": input_tokens + output_tokens <= model_info.get("context_window", float("inf")),
+                "estimated_cost": estimate_cost(model_info, input_tokens, output_tokens),
+            })
+        return rows
+
+    def choose(
+        self,
+        role: str,
+        candidates: List[Dict[str, Any]],
+        input_tokens: int,
+        latency_slo: Optional[float] = None,
+        cost_budget: Optional[float] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Pick one llm.json entry from ``candidates`` for a call.
+
+        Args:
+            role: Role being served
+            candidates: Eligible llm.json entries, primary first
+            input_tokens: Estimated prompt size
+            latency_slo: p95 latency target in seconds; overrides the default
+            cost_budget: Maximum USD per call; overrides the default
+
+        Returns:
+            The chosen entry, or ``None`` when ``candidates`` is empty
+        """
+        if len(candidates) <= 1:
+            return candidates[0] if candidates else None
+        latency_slo = latency_slo if latency_slo is not None else self.latency_slo
+        cost_budget = cost_budget if cost_budget is not None else self.cost_budget
+
+        rows = list(zip(candidates, self.describe(role, candidates, input_tokens)))
+        fitting = [(entry, row) for entry, row in rows if row["fits_context"]] or rows
+        healthy = [
+            (entry, row) for entry, row in fitting
+            if row["samples"] < self.min_samples or row["error_rate"] <= self.max_error_rate
+        ] or fitting
+        if not latency_slo and not cost_budget:
+            # Nothing to trade off against, so honour the configured order
+            entry, row = healthy[0]
+            logger.debug("Routing role %s to %s (no SLO or budget)", role, entry.get("model"))
+            return entry
+
+        def meets_targets(row: Dict[str, Any]) -> bool:
+            if cost_budget and row["estimated_cost"] > cost_budget:
+                return False
+            if latency_slo and row["samples"] >= self.min_samples and row["p95"] > latency_slo:
+                return False
+            return True
+
+        eligible = [(entry, row) for entry, row in healthy if meets_targets(row)]
+        if eligible:
+            # Unexplored models sort first so each one gets enough samples
+            entry, row = min(
+                eligible,
+                key=lambda er: (er[1]["samples"] >= self.min_samples, er[1]["estimated_cost"], er[1]["p50"]),
+            )
+        else:
+            entry, row = min(
+                healthy,
+                key=lambda er: (er[1]["p95"] if er[1]["samples"] else float("inf"), er[1]["estimated_cost"]),
+            )
+        logger.debug("Routing role %s to %s (%s)", role, entry.get("model"), row)
+        return entry
+
+
+def simulate(
+    records: Iterable[Dict[str, Any]],
+    candidates_by_role: Dict[str, List[Dict[str, Any]]],
+    latency_slo: Optional[float] = None,
+    cost_budget: Optional[float] = None,
+    metrics: Any = None,
+) -> Dict[str, Any]:
+    """Replay recorded call metrics through a fresh :class:`RoutingPolicy`.
+
+    Records are processed in order. Before each record is fed to the tracker,
+    the policy chooses a model for the record's role and input size, so every
+    decision only sees history that existed at that point. The result is
+    deterministic for a given record sequence.
+
+    Args:
+        records: ``MetricsTracker.get_metrics()`` style dicts with ``role``,
+            ``model``, ``duration``, ``success``, ``tokens`` and optionally
+            ``input_tokens``, ``output_tokens`` and ``cost``
+        candidates_by_role: Eligible llm.json entries per role
+        latency_slo: p95 latency target in seconds
+        cost_budget: Maximum USD per call
+        metrics: Tracker to replay into; defaults to a new ``MetricsTracker``
+
+    Returns:
+        ``{'decisions': [...], 'choices': {role: {model: count}}, 'final_stats': {...}}``
+    """
+    if metrics is None:
+        from agent_s3.router_agent import MetricsTracker
+
+        metrics = MetricsTracker()
+    policy = RoutingPolicy(metrics, latency_slo=latency_slo, cost_budget=cost_budget)
+    decisions = []
+    choices: Dict[str, Dict[str, int]] = {}
+
+    for record in records:
+        role = record["role"]
+        input_tokens = record.get("input_tokens", record.get("tokens", 0))
+        chosen = policy.choose(role, candidates_by_role.get(role, []), input_tokens)
+        if chosen is not None:
+            model = chosen.get("model", "")
+            decisions.append({"role": role, "recorded_model": record["model"], "chosen_model": model})
+            per_role = choices.setdefault(role, {})
+            per_role[model] = per_role.get(model, 0) + 1
+        metrics.record(
+            role,
+            record["model"],
+            record["duration"],
+            record["success"],
+            record.get("tokens", 0),
+            input_tokens=record.get("input_tokens"),
+            output_tokens=record.get("output_tokens"),
+            cost=record.get("cost"),
+        )
+
+    final_stats = {
+        role: {entry.get("model", ""): metrics.get_model_stats(role, entry.get("model", "")) for entry in entries}
+        for role, entries in candidates_by_role.items()
+    }
+    return {"decisions": decisions, "choices": choices, "final_stats": final_stats}
@@ -546,7 +546,7 @@ class JsonValidator:
                     llm_config[key] = value
 
                 # Call LLM with retry prompt
-                result = cached_call_llm(correction_prompt, llm_client, **llm_config)
+                result = cached_call_llm(correction_prompt, llm_client, cache_role="planner", **llm_config)
 
                 if not result.get('success'):
                     if self.scratchpad:
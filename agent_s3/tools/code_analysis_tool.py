@@ -213,6 +213,8 @@ class CodeAnalysisTool:
         # Get file contents and generate embeddings
         file_contents = {}
         file_embeddings = {}
+        # Files without a cached embedding: path -> (file hash, content)
+        uncached = {}
 
         for file_path in code_files:
             try:
@@ -226,30 +228,39 @@ class CodeAnalysisTool:
                 else:
                     # Read the file content
                     content = self.file_tool.read_file(file_path)
-                    if not content:
-                        continue
-
-                    # Generate embedding
-                    embedding = self.embedding_client.get_embedding(content)
-                    if not embedding:
-                        continue
-
-                    # Store in cache
-                    file_embeddings[file_path] = embedding
-                    file_contents[file_path] = content
-
-                    # Update embedding cache
-                    self._embedding_cache[file_hash] = {
-                        "embedding": embedding,
-                        "content": content,
-                        "timestamp": current_time
-                    }
-
-                    # Prune cache if it's too large
-                    self._prune_cache_if_needed()
+                    if content:
+                        uncached[file_path] = (file_hash, content)
             except Exception as e:
                 logging.error(f"Error processing file {file_path}: {e}")
 
+        # Generate the missing embeddings in batches
+        if uncached:
+            try:
+                embeddings = self.embedding_client.get_embeddings(
+                    [content for _, content in uncached.values()]
+                )
+            except Exception as e:
+                logging.error(f"Error generating embeddings for {len(uncached)} files: {e}")
+                embeddings = []
+
+            for (file_path, (file_hash, content)), embedding in zip(uncached.items(), embeddings):
+                if not embedding:
+                    continue
+
+                # Store in cache
+                file_embeddings[file_path] = embedding
+                file_contents[file_path] = content
+
+                # Update embedding cache
+                self._embedding_cache[file_hash] = {
+                    "embedding": embedding,
+                    "content": content,
+                    "timestamp": current_time
+                }
+
+                # Prune cache if it's too large
+                self._prune_cache_if_needed()
+
         # Calculate dense similarity scores (embedding-based)
         dense_scores = {}
 
@@ -507,9 +507,9 @@ def integrate_with_llm_utils():
                 else:
                     prompt_data = {"prompt": str(prompt)}
 
-                # Apply additional kwargs
+                # Apply additional kwargs; cache_role only selects the cache validator
                 for key, value in kwargs.items():
-                    if key not in prompt_data:  # Only add if not already present
+                    if key not in prompt_data and key != "cache_role":  # Only add if not already present
                         prompt_data[key] = value
 
                 # Optimize the prompt using provided context if available
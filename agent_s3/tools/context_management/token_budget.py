@@ -12,11 +12,19 @@ import logging
 import tiktoken
 import os
 import ast
+import hashlib
+import threading
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, List, Any, Optional, Callable
 
 logger = logging.getLogger(__name__)
 
+# Segments shorter than this are cheaper to encode than to hash and look up
+SEGMENT_CACHE_MIN_CHARS = 256
+SEGMENT_CACHE_SIZE = 4096
+
 # Approximate token count for different programming languages (per line)
 TOKEN_ESTIMATES = {
     "python": 8,    # Python tends to be more concise
@@ -60,6 +68,94 @@ EXTENSION_TO_LANGUAGE = {
 }
 
 
+class _WhitespaceEncoding:
+    """Minimal tokenizer when tiktoken is unavailable."""
+
+    name = "whitespace"
+
+    @staticmethod
+    def encode(text: str) -> list[str]:
+        return text.split()
+
+
+@lru_cache(maxsize=None)
+def _load_encoding(model_name: str) -> Any:
+    """Load the tiktoken encoding for ``model_name`` once per process.
+
+    Loading can download BPE files, so every ``TokenEstimator`` shares the
+    same encoder instance instead of loading its own.
+    """
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except Exception as e:  # pragma: no cover - network or lookup failure
+        # Fallback to cl100k_base encoding or simple whitespace encoding
+        logger.warning(
+            f"Failed to load encoding for {model_name}: {e}. Using cl100k_base."
+        )
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception as inner:
+            logger.error(
+                f"Failed to load cl100k_base encoding: {inner}. Using whitespace tokenizer."
+            )
+            return _WhitespaceEncoding()
+
+
+class _SegmentTokenCache:
+    """Thread-safe LRU of token counts keyed by encoding and segment hash."""
+
+    def __init__(self, maxsize: int = SEGMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._counts: "OrderedDict[tuple, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def count(self, encoding: Any, text: str) -> int:
+        key = (
+            getattr(encoding, "name", type(encoding).__name__),
+            hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest(),
+        )
+        with self._lock:
+            cached = self._counts.get(key)
+            if cached is not None:
+                self._counts.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        count = len(encoding.encode(text))
+        with self._lock:
+            self._counts[key] = count
+            if len(self._counts) > self.maxsize:
+                self._counts.popitem(last=False)
+        return count
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._counts), "hits": self.hits, "misses": self.misses}
+
+
+_segment_cache = _SegmentTokenCache()
+_shared_estimators: Dict[str, "TokenEstimator"] = {}
+_shared_estimators_lock = threading.Lock()
+
+
+def get_token_estimator(model_name: str = "gpt-4") -> "TokenEstimator":
+    """Return a process-wide ``TokenEstimator`` for ``model_name``."""
+    estimator = _shared_estimators.get(model_name)
+    if estimator is None:
+        with _shared_estimators_lock:
+            estimator = _shared_estimators.get(model_name)
+            if estimator is None:
+                estimator = _shared_estimators[model_name] = TokenEstimator(model_name)
+    return estimator
+
+
+def get_segment_cache_stats() -> Dict[str, int]:
+    """Return hit/miss counts of the shared token-count cache."""
+    return _segment_cache.get_stats()
+
+
 class TokenEstimator:
     """
     Estimates token count for various content types using tiktoken.
@@ -72,28 +168,7 @@ class TokenEstimator:
         Args:
             model_name: Name of the model to use for token counting
         """
-        try:
-            self.encoding = tiktoken.encoding_for_model(model_name)
-        except Exception as e:  # pragma: no cover - network or lookup failure
-            # Fallback to cl100k_base encoding or simple whitespace encoding
-            logger.warning(
-                f"Failed to load encoding for {model_name}: {e}. Using cl100k_base."
-            )
-            try:
-                self.encoding = tiktoken.get_encoding("cl100k_base")
-            except Exception as inner:
-                logger.error(
-                    f"Failed to load cl100k_base encoding: {inner}. Using whitespace tokenizer."
-                )
-
-                class _WhitespaceEncoding:
-                    """Minimal tokenizer when tiktoken is unavailable."""
-
-                    @staticmethod
-                    def encode(text: str) -> list[str]:
-                        return text.split()
-
-                self.encoding = _WhitespaceEncoding()
+        self.encoding = _load_encoding(model_name)
 
         # Default language-specific modifiers (to account for code density)
         self.language_modifiers = {
@@ -124,9 +199,12 @@ class TokenEstimator:
         if not text:
             return 0
 
-        # Get accurate token count using tiktoken
-        tokens = self.encoding.encode(text)
-        token_count = len(tokens)
+        # Get accurate token count using tiktoken; long segments such as
+        # system prompts repeat across calls, so their counts are cached
+        if len(text) >= SEGMENT_CACHE_MIN_CHARS:
+            token_count = _segment_cache.count(self.encoding, text)
+        else:
+            token_count = len(self.encoding.encode(text))
 
         # Apply language-specific modifier if provided
         if language:
@@ -0,0 +1,270 @@
+"""
+Persistent, content-addressed cache of embedding vectors.
+
+Embeddings are keyed by the embedding model id and the SHA-256 of the exact
+text embedded. The same file contents or prompt therefore embed once per
+model, across sessions, processes and producers. Rows live in a WAL-mode
+SQLite database as little-endian float32 blobs, together with their last
+access time. Once the blobs exceed ``max_bytes``, the least recently used
+rows are deleted until the cache is back under :data:`EVICTION_TARGET` of the
+budget.
+
+Each row records the session that wrote it. A hit on a row written by an
+earlier session is counted as a cross-session hit. That count shows how much
+embedding work the cache saves between runs, rather than within one run.
+
+:func:`get_embedding_cache` returns one shared instance per database path.
+:class:`~agent_s3.tools.embedding_client.EmbeddingClient` and
+:func:`agent_s3.llm_utils.get_embeddings` consult it before embedding
+anything.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from agent_s3.config import EMBEDDING_CACHE_MAX_BYTES, EMBEDDING_CACHE_PATH
+from agent_s3.tools.semantic_cache_metrics import CacheMetrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE = "embedding_cache.v1.sqlite3"
+# Eviction frees space down to this fraction of max_bytes, so it runs rarely
+EVICTION_TARGET = 0.9
+_VECTOR_DTYPE = np.dtype("<f4")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    text_hash BLOB NOT NULL,
+    dim INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    session TEXT NOT NULL,
+    PRIMARY KEY (model, text_hash)
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access);
+"""
+
+
+def text_hash(text: str) -> bytes:
+    """Return the content address of ``text``."""
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache with a byte budget and LRU eviction."""
+
+    def __init__(self, path: Union[str, Path], max_bytes: int = EMBEDDING_CACHE_MAX_BYTES) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.session = uuid.uuid4().hex
+        self.metrics = CacheMetrics()
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._bytes = self._stored_bytes()
+
+        self.hits = 0
+        self.cross_session_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _stored_bytes(self) -> int:
+        row = self._conn.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        return int(row[0])
+
+    def get_many(self, model: str, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Return the cached embedding of each text under ``model``, or None."""
+        start = time.perf_counter()
+        hashes = [text_hash(text) for text in texts]
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        if not hashes:
+            return results
+
+        rows: Dict[bytes, tuple] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            # Stay well below SQLite's bound parameter limit
+            for offset in range(0, len(unique), 500):
+                chunk = unique[offset:offset + 500]
+                placeholders = ",".join("?" * len(chunk))
+                for found in self._conn.execute(
+                    f"SELECT text_hash, dim, vector, session FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *chunk],
+                ):
+                    rows[found[0]] = found[1:]
+            if rows:
+                now = time.time()
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in rows],
+                )
+                self._conn.execute("COMMIT")
+
+            for i, h in enumerate(hashes):
+                row = rows.get(h)
+                if row is None:
+                    self.misses += 1
+                    continue
+                dim, blob, session = row
+                results[i] = np.frombuffer(blob, dtype=_VECTOR_DTYPE, count=dim).astype(np.float32)
+                self.hits += 1
+                if session != self.session:
+                    self.cross_session_hits += 1
+        self.metrics.record("lookup", time.perf_counter() - start)
+        return results
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        return self.get_many(model, [text])[0]
+
+    def put_many(self, model: str, texts: Sequence[str], embeddings: Sequence[Optional[Any]]) -> None:
+        """Store the embedding of each text under ``model``; None entries are skipped."""
+        now = time.time()
+        rows = []
+        for text, embedding in zip(texts, embeddings):
+            if embedding is None:
+                continue
+            vector = np.ascontiguousarray(embedding, dtype=_VECTOR_DTYPE).ravel()
+            rows.append((model, text_hash(text), vector.shape[0], vector.tobytes(), now, now, self.session))
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row in rows:
+                    replaced = self._conn.execute(
+                        "SELECT LENGTH(vector) FROM embeddings WHERE model = ? AND text_hash = ?", row[:2]
+                    ).fetchone()
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO embeddings "
+                        "(model, text_hash, dim, vector, created, last_access, session) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        row,
+                    )
+                    self._bytes += len(row[3]) - (replaced[0] if replaced else 0)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def put(self, model: str, text: str, embedding: Optional[Any]) -> None:
+        self.put_many(model, [text], [embedding])
+
+    def _evict(self) -> None:
+        """Delete least recently used rows until under ``EVICTION_TARGET`` of the budget."""
+        # Other processes share the file, so recount before deleting anything
+        self._bytes = self._stored_bytes()
+        excess = self._bytes - int(self.max_bytes * EVICTION_TARGET)
+        if self._bytes <= self.max_bytes or excess <= 0:
+            return
+        victims = []
+        freed = 0
+        cursor = self._conn.execute("SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_access")
+        for rowid, size in cursor:
+            victims.append((rowid,))
+            freed += size
+            if freed >= excess:
+                break
+        cursor.close()
+        self._conn.execute("BEGIN")
+        self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", victims)
+        self._conn.execute("COMMIT")
+        self._bytes -= freed
+        self.evictions += len(victims)
+        logger.info("Evicted %d cached embeddings (%d bytes) from %s", len(victims), freed, self.path)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit rates for this session, size and lookup latency."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "path": str(self.path),
+                "entries": entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "cross_session_hits": self.cross_session_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "cross_session_hit_rate": self.cross_session_hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "latency": self.metrics.snapshot(),
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.cross_session_hits = self.misses = self.evictions = 0
+            self.metrics.reset()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_caches: Dict[Path, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _setting(config: Any, name: str, default: Any) -> Any:
+    if isinstance(config, dict):
+        return config.get(name, default)
+    return getattr(config, name, default)
+
+
+def get_embedding_cache(config: Any = None) -> Optional[EmbeddingCache]:
+    """Return the shared cache for ``config``, or None when it is disabled.
+
+    The database is ``embedding_cache_path`` if set, otherwise
+    ``.cache/embedding_cache.v1.sqlite3`` under ``workspace_path``. Pointing
+    several workspaces at one path shares embeddings between them. An
+    ``embedding_cache_max_bytes`` of 0 disables the cache.
+    """
+    max_bytes = int(_setting(config, "embedding_cache_max_bytes", EMBEDDING_CACHE_MAX_BYTES) or 0)
+    if max_bytes <= 0:
+        return None
+    path = _setting(config, "embedding_cache_path", EMBEDDING_CACHE_PATH)
+    if not path:
+        path = Path(_setting(config, "workspace_path", ".") or ".") / ".cache" / CACHE_FILE
+    path = Path(path).expanduser().resolve()
+
+    with _caches_lock:
+        cache = _caches.get(path)
+        if cache is None:
+            try:
+                cache = EmbeddingCache(path, max_bytes)
+            except (OSError, sqlite3.Error) as e:
+                logger.warning("Could not open embedding cache at %s: %s", path, e)
+                return None
+            _caches[path] = cache
+        cache.max_bytes = max_bytes
+        return cache
+
+
+def get_embedding_cache_stats() -> List[Dict[str, Any]]:
+    """Return :meth:`EmbeddingCache.get_stats` for every cache opened by this process."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [cache.get_stats() for cache in caches]
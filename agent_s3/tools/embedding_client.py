@@ -1,5 +1,4 @@
 import hashlib
-import faiss
 import json
 import numpy as np
 import logging
@@ -10,24 +9,62 @@ import textwrap  # Adding import for text formatting
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
+from agent_s3.config import (
+    EMBEDDING_BATCH_MAX_TOKENS,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_PQ_M,
+    EMBEDDING_PRECISION,
+    EMBEDDING_RERANK_FACTOR,
+)
+from agent_s3.tools.embedding_cache import EmbeddingCache, get_embedding_cache
+from agent_s3.tools.embedding_metadata import EmbeddingMetadata
+from agent_s3.tools.local_embeddings import EmbeddingBackend, create_embedding_backend, iter_batches
+from agent_s3.tools.quantized_index import QuantizedIndex
+
 logger = logging.getLogger(__name__)
 
 CACHE_DIR_NAME = ".cache"
 FAISS_INDEX_FILE = "vector_store.v1.faiss"
+# Legacy JSON metadata, migrated into METADATA_DB_FILE on first load
 METADATA_FILE = "vector_metadata.v1.json"
+METADATA_DB_FILE = "vector_metadata.v2.sqlite3"
+# Longer texts are truncated before embedding to stay within model limits
+MAX_TEXT_LENGTH = 8000
+# Embeddings endpoint model for the "llm" backend when no router agent is given
+DEFAULT_LLM_EMBEDDING_MODEL = "text-embedding-ada-002"
 
 class EmbeddingClient:
-    """Client for managing embeddings using FAISS with enhanced embedding management."""
-
-    def __init__(self, config: Optional[Dict[str, Any]] = None, router_agent=None):
+    """Client for managing embeddings using FAISS with enhanced embedding management.
+
+    Embeddings come from the offline backend named by ``embedding_backend``
+    (see :mod:`agent_s3.tools.local_embeddings`), the hashing embedder by
+    default. ``embedding_backend: "llm"`` embeds with the ``embedder`` role
+    when a router agent is given, and otherwise with the ``embedding_model``
+    of the embeddings endpoint (``llm_utils.get_embeddings``). One client
+    never mixes the two, since their vectors are not comparable. Every
+    backend consults the persistent :mod:`~agent_s3.tools.embedding_cache`
+    first, keyed by the model that produced the vectors.
+
+    Vectors are stored at ``embedding_precision`` (see
+    :mod:`agent_s3.tools.quantized_index`); below float32, :meth:`search`
+    re-ranks its candidates against exact vectors kept on disk.
+    """
+
+    def __init__(self, config: Optional[Any] = None, router_agent=None):
         """Initialize the FAISS index and metadata mapping."""
-        # Allow no config to use defaults
+        # Allow no config to use defaults; accept a ConfigModel as well as a dict
         config = config or {}
+        if not isinstance(config, dict):
+            config = config.model_dump()
         self.dim = config.get('embedding_dim', 768)
         self.store_path_base = Path(config.get("workspace_path", ".")).resolve() / CACHE_DIR_NAME
         self.index_path = self.store_path_base / FAISS_INDEX_FILE
         self.metadata_path = self.store_path_base / METADATA_FILE
+        self.metadata_db_path = self.store_path_base / METADATA_DB_FILE
         self.top_k = config.get('top_k_retrieval', 5)
+        self.precision = config.get('embedding_precision', EMBEDDING_PRECISION)
+        self.pq_m = config.get('embedding_pq_m', EMBEDDING_PQ_M)
+        self.rerank_factor = config.get('embedding_rerank_factor', EMBEDDING_RERANK_FACTOR)
 
         # Cache configuration
         self.cache_enabled = config.get('embedding_cache_enabled', True)
@@ -43,111 +80,140 @@ class EmbeddingClient:
         # Router agent for specialized LLM roles
         self.router_agent = router_agent
 
+        # Offline embedding model; None is the "llm" backend
+        self.backend: Optional[EmbeddingBackend] = create_embedding_backend(config, self.dim)
+        self.embedder_role_name = config.get('embedder_role_name', 'embedder')
+        self.llm_embedding_model = config.get('embedding_model') or DEFAULT_LLM_EMBEDDING_MODEL
+        self.batch_size = config.get('embedding_batch_size', EMBEDDING_BATCH_SIZE)
+        self.batch_max_tokens = config.get('embedding_batch_max_tokens', EMBEDDING_BATCH_MAX_TOKENS)
+        # Embeddings computed by any session, keyed by model and text hash
+        self.embedding_cache: Optional[EmbeddingCache] = get_embedding_cache(config)
+
         self.store_path_base.mkdir(exist_ok=True)
 
-        self.index: Optional[faiss.Index] = None
-        self.id_map: Dict[int, Dict[str, Any]] = {}
+        self.index: Optional[QuantizedIndex] = None
+        # Per-vector metadata in numpy columns, persisted row by row
+        self.id_map = EmbeddingMetadata(self.metadata_db_path)
         self.next_id = 0
 
         self._load_state()
 
         if self.index is None:
             logger.info("Initializing new FAISS index.")
-            self.index = faiss.IndexIDMap(faiss.IndexFlatIP(self.dim))
-            self.id_map = {}
+            self.index = QuantizedIndex(self.dim, self.precision, self.pq_m, self.rerank_factor)
+            self.id_map.clear()
             self.next_id = 0
 
     def _load_state(self):
-        """Load the FAISS index and metadata map from disk."""
+        """Load the FAISS index and metadata from disk."""
         if self.index_path.exists():
             try:
-                # Load FAISS index with memory-mapped file for large datasets
-                self.index = faiss.read_index(str(self.index_path), faiss.IO_FLAG_MMAP)
+                # Re-quantizes the stored vectors if embedding_precision changed
+                self.index = QuantizedIndex.load(
+                    self.index_path.with_suffix(""),
+                    self.dim,
+                    self.precision,
+                    self.pq_m,
+                    self.rerank_factor,
+                )
                 logger.info(
-                    "Loaded FAISS index with %d vectors from %s",
+                    "Loaded %s FAISS index with %d vectors from %s",
+                    self.index.precision,
                     self.index.ntotal,
                     self.index_path,
                 )
             except Exception as e:
                 logger.error(
-                    "Error memory-mapping FAISS index from %s: %s. Falling back to load.",
+                    "Error loading FAISS index from %s: %s. Will create a new index.",
                     self.index_path,
                     e,
                 )
-                try:
-                    self.index = faiss.read_index(str(self.index_path))
-                except Exception as e2:
-                    logger.error(
-                        "Error loading FAISS index from %s: %s. Will create a new index.",
-                        self.index_path,
-                        e2,
-                    )
 
         if self.metadata_path.exists():
+            self._migrate_json_metadata()
+        self.next_id = self.id_map.next_id
+
+        if self.index is not None:
+            # Metadata is written as it changes and the index on save, so a
+            # crash in between can leave rows for vectors the index lacks
             try:
-                # Auto-detect gzip for metadata
-                with open(self.metadata_path, 'rb') as mf:
-                    sig = mf.read(2)
-                if sig == b"\x1f\x8b":
-                    meta_open = gzip.open
-                    mode = "rt"
-                else:
-                    meta_open = open
-                    mode = "r"
-                with meta_open(self.metadata_path, mode, encoding='utf-8') as f:
-                    metadata_state = json.load(f)
-                # Integrity check if checksum provided
-                checksum = metadata_state.get("checksum")
-                if checksum:
-                    id_map_json = json.dumps(metadata_state.get('id_map', {}), sort_keys=True).encode('utf-8')
-                    if hashlib.sha256(id_map_json).hexdigest() != checksum:
-                        raise ValueError("Metadata checksum mismatch, resetting metadata.")
-                self.id_map = metadata_state.get('id_map', {})
-                self.next_id = metadata_state.get('next_id', 0)
-                if self.id_map:
-                    logger.info(
-                        "Loaded metadata for %d vectors from %s",
-                        len(self.id_map),
-                        self.metadata_path,
-                    )
-                    # Update access timestamps for eviction strategy
-                    current_time = time.time()
-                    for key, meta in self.id_map.items():
-                        if "last_access" not in meta:
-                            meta["last_access"] = current_time
-                        if "access_count" not in meta:
-                            meta["access_count"] = 1
+                dropped = self.id_map.retain(self.index.ids())
             except Exception as e:
-                logger.error(
-                    "Error loading metadata from %s: %s. Will create new metadata.",
-                    self.metadata_path,
-                    e,
-                )
-                self.id_map = {}
+                logger.warning("Could not reconcile embedding metadata with the FAISS index: %s", e)
+            else:
+                if dropped:
+                    logger.warning("Dropped metadata for %d vectors missing from the FAISS index", dropped)
+        if len(self.id_map):
+            logger.info(
+                "Loaded metadata for %d vectors from %s",
+                len(self.id_map),
+                self.metadata_db_path,
+            )
+
+    def _migrate_json_metadata(self):
+        """Import the legacy (optionally gzipped) JSON metadata file into the metadata database."""
+        try:
+            # Auto-detect gzip for metadata
+            with open(self.metadata_path, 'rb') as mf:
+                sig = mf.read(2)
+            if sig == b"\x1f\x8b":
+                meta_open = gzip.open
+                mode = "rt"
+            else:
+                meta_open = open
+                mode = "r"
+            with meta_open(self.metadata_path, mode, encoding='utf-8') as f:
+                metadata_state = json.load(f)
+            # Integrity check if checksum provided
+            checksum = metadata_state.get("checksum")
+            if checksum:
+                id_map_json = json.dumps(metadata_state.get('id_map', {}), sort_keys=True).encode('utf-8')
+                if hashlib.sha256(id_map_json).hexdigest() != checksum:
+                    raise ValueError("Metadata checksum mismatch, resetting metadata.")
+            self.id_map.import_entries(
+                metadata_state.get('id_map', {}),
+                metadata_state.get('next_id', 0),
+                time.time(),
+            )
+            logger.info(
+                "Migrated metadata for %d vectors from %s",
+                len(self.id_map),
+                self.metadata_path,
+            )
+        except Exception as e:
+            logger.error(
+                "Error loading metadata from %s: %s. Will create new metadata.",
+                self.metadata_path,
+                e,
+            )
+            self.id_map.clear()
+        try:
+            self.metadata_path.rename(self.metadata_path.with_name(self.metadata_path.name + ".migrated"))
+        except OSError as e:
+            logger.warning("Could not rename migrated metadata file %s: %s", self.metadata_path, e)
 
     def _save_state(self):
-        """Save the FAISS index and metadata map to disk atomically."""
+        """Save the FAISS index to disk atomically.
+
+        Metadata needs no save: every change is already written to the
+        metadata database.
+        """
         if self.index is None:
             logger.error("Cannot save state: FAISS index is not initialized.")
             return
 
         self.store_path_base.mkdir(exist_ok=True)
 
-        # Snapshot existing index and metadata before saving
+        # Snapshot the existing index before saving
         archive_dir = self.store_path_base / "snapshots"
         archive_dir.mkdir(exist_ok=True)
         timestamp = int(time.time())
-        # Archive current files
         if self.index_path.exists():
             shutil.copy(self.index_path, archive_dir / f"{FAISS_INDEX_FILE}.{timestamp}")
-        if self.metadata_path.exists():
-            shutil.copy(self.metadata_path, archive_dir / f"{METADATA_FILE}.{timestamp}")
 
         try:
-            # Save FAISS index atomically
-            temp_index_path = self.index_path.with_suffix(self.index_path.suffix + ".tmp")
-            faiss.write_index(self.index, str(temp_index_path))
-            shutil.move(str(temp_index_path), str(self.index_path))
+            # Saves the FAISS index atomically, plus exact vectors below float32
+            self.index.save(self.index_path.with_suffix(""))
             logger.info(
                 "Saved FAISS index with %d vectors to %s",
                 self.index.ntotal,
@@ -160,37 +226,20 @@ class EmbeddingClient:
                 e,
             )
 
-        try:
-            # Save metadata atomically with gzip compression
-            metadata_state = {
-                'next_id': self.next_id,
-                'id_map': {str(k): v for k, v in self.id_map.items()},
-                'checksum': hashlib.sha256(json.dumps({str(k): v for k, v in self.id_map.items()}, sort_keys=True).encode('utf-8')).hexdigest()
-            }
-            temp_metadata_path = self.metadata_path.with_suffix(self.metadata_path.suffix + ".tmp")
-            with gzip.open(temp_metadata_path, 'wt', encoding='utf-8') as f:
-                json.dump(metadata_state, f, indent=2)
-            shutil.move(str(temp_metadata_path), str(self.metadata_path))
-            logger.info(
-                "Saved metadata map with %d entries to %s",
-                len(self.id_map),
-                self.metadata_path,
-            )
-        except (OSError, TypeError) as e:
-            logger.error(
-                "Error saving metadata map to %s: %s",
-                self.metadata_path,
-                e,
-            )
-
     def save_state(self) -> None:
         """Public wrapper to persist embedding state to disk."""
         self._save_state()
 
+    def get_embedding_count(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
     def evict_embeddings(self, eviction_count=None):
         """
         Evict embeddings using the progressive embedding eviction strategy.
 
+        Every vector is scored in one vectorized pass over the metadata
+        columns (see :meth:`EmbeddingMetadata.eviction_candidates`).
+
         Args:
             eviction_count: Number of embeddings to evict. If None, uses configured batch size.
 
@@ -222,63 +271,20 @@ class EmbeddingClient:
             eviction_count,
         )
 
-        # Scoring factors for eviction
-        current_time = time.time()
-        candidates = []
-
-        # Calculate eviction scores for each embedding
-        for id_str, metadata in self.id_map.items():
-            id_int = int(id_str)  # Convert string key back to int
-
-            # Skip protected embeddings with high access counts
-            if metadata.get("access_count", 0) > self.min_access_keep:
-                continue
-
-            # Calculate idle time factor (0-1), higher means more idle
-            last_access = metadata.get("last_access", 0)
-            idle_time = current_time - last_access
-            idle_factor = min(1.0, idle_time / self.max_idle_time) if self.max_idle_time > 0 else 0.5
-
-            # Access count factor (0-1), lower means less accessed
-            access_count = metadata.get("access_count", 0)
-            access_factor = 1.0 / (access_count + 1)  # +1 to avoid division by zero
-
-            # Age factor (newer embeddings get some protection)
-            age = current_time - metadata.get("timestamp", 0)
-            age_factor = min(1.0, age / (self.max_idle_time / 2)) if self.max_idle_time > 0 else 0.5
-
-            # Combine factors (higher score means more likely to be evicted)
-            # We weight idle time the most, then access count, then age
-            eviction_score = (0.6 * idle_factor) + (0.3 * access_factor) + (0.1 * age_factor)
-
-            candidates.append((id_int, eviction_score))
-
-        if not candidates:
+        evict_ids = self.id_map.eviction_candidates(
+            eviction_count,
+            time.time(),
+            self.max_idle_time,
+            self.min_access_keep,
+        )
+        if not evict_ids.size:
             logger.info("No candidates for eviction found.")
             return 0
 
-        # Sort by eviction score (descending)
-        candidates.sort(key=lambda x: x[1], reverse=True)
-
-        # Take only as many as we need to evict
-        to_evict = candidates[:min(eviction_count, len(candidates))]
-
-        if not to_evict:
-            return 0
-
-        # Collect IDs to evict
-        evict_ids = np.array([id_int for id_int, _ in to_evict])
-
         try:
-            # Remove from FAISS index
+            # Remove from FAISS index and metadata, then save the index
             self.index.remove_ids(evict_ids)
-
-            # Remove from metadata
-            for id_int, _ in to_evict:
-                if str(id_int) in self.id_map:
-                    del self.id_map[str(id_int)]
-
-            # Save state after eviction
+            self.id_map.remove(evict_ids.tolist())
             self._save_state()
 
             logger.info(
@@ -291,6 +297,32 @@ class EmbeddingClient:
             logger.error("Error during embedding eviction: %s", e)
             return 0
 
+    def remove_embeddings_by_metadata(self, criteria: Dict[str, Any]) -> int:
+        """
+        Remove embeddings whose metadata matches every key in ``criteria``.
+
+        A ``file_path`` criterion is answered from the path table; other keys
+        are compared against each candidate's stored metadata.
+
+        Returns:
+            Number of embeddings removed
+        """
+        if "file_path" in criteria:
+            candidates = self.id_map.ids_for_path(criteria["file_path"])
+        else:
+            candidates = [int(key) for key in self.id_map]
+        others = {k: v for k, v in criteria.items() if k != "file_path"}
+        ids = [
+            vec_id for vec_id in candidates
+            if not others or all(self.id_map[vec_id].get(k) == v for k, v in others.items())
+        ]
+        if not ids:
+            return 0
+        self.index.remove_ids(np.array(ids, dtype=np.int64))
+        self.id_map.remove(ids)
+        self._save_state()
+        return len(ids)
+
     def update_access_patterns(self, file_paths: List[str]):
         """
         Update access patterns for the provided file paths to inform progressive eviction strategy.
@@ -301,25 +333,13 @@ class EmbeddingClient:
         if not self.cache_enabled or not self.id_map:
             return
 
-        current_time = time.time()
-        updated_ids = set()
-
-        # Update metadata for all embeddings matching these file paths
-        for id_str, metadata in self.id_map.items():
-            path = metadata.get("file_path")
-            if path and path in file_paths:
-                # Update access count and timestamp
-                metadata["access_count"] = metadata.get("access_count", 0) + 1
-                metadata["last_access"] = current_time
-                updated_ids.add(id_str)
-
-        # If we updated any metadata entries, save the state
-        if updated_ids:
+        # Only the touched metadata rows are written; the index is unchanged
+        updated = self.id_map.touch_paths(file_paths, time.time())
+        if updated:
             logger.debug(
                 "Updated access patterns for %d embedding entries",
-                len(updated_ids),
+                updated,
             )
-            self._save_state()
 
     def add_embedding(self, embedding: np.ndarray, metadata: Dict[str, Any]) -> None:
         """
@@ -331,19 +351,10 @@ class EmbeddingClient:
         ids = np.arange(self.next_id, self.next_id + num, dtype='int64')
         # Add to FAISS index
         self.index.add_with_ids(vectors, ids)
-        now = time.time()
-        # Store metadata entries
-        for idx, vec_id in enumerate(ids):
-            entry = (metadata.copy() if num == 1 else metadata[idx].copy())
-            # Preserve provided metadata fields if present
-            if 'timestamp' not in entry:
-                entry['timestamp'] = now
-            if 'last_access' not in entry:
-                entry['last_access'] = now
-            if 'access_count' not in entry:
-                entry['access_count'] = 0
-            self.id_map[str(int(vec_id))] = entry
+        # Store metadata rows; missing timestamps and counts get defaults
+        entries = [metadata] if num == 1 and isinstance(metadata, dict) else list(metadata)
         self.next_id += num
+        self.id_map.add(ids, entries, time.time(), self.next_id)
         # Persist state
         self._save_state()
 
@@ -381,9 +392,151 @@ class EmbeddingClient:
         loop = asyncio.get_event_loop()
         await loop.run_in_executor(None, self.add_embedding, embedding, metadata)
 
+    def search(self, query_embedding: np.ndarray, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Return the metadata of the stored embeddings most similar to a query.
+
+        Args:
+            query_embedding: Query vector of length ``dim``
+            top_k: Number of results; defaults to ``top_k_retrieval``
+
+        Returns:
+            Metadata dictionaries, best first, each with its ``id`` and
+            inner-product ``score``
+        """
+        if self.index is None:
+            return []
+        results = []
+        for vec_id, score in self.index.search(query_embedding, top_k or self.top_k):
+            if vec_id in self.id_map:
+                results.append({**self.id_map[vec_id], "id": vec_id, "score": score})
+        return results
+
+    @property
+    def _uses_embedder_role(self) -> bool:
+        return self.backend is None and hasattr(self.router_agent, 'call_llm_by_role')
+
+    def _embedder_role_model(self) -> Optional[str]:
+        """Return the llm.json model behind the embedder role, or None if unknown."""
+        get_model = getattr(self.router_agent, 'get_model_for_role', None)
+        model = get_model(self.embedder_role_name) if callable(get_model) else None
+        return model if isinstance(model, str) and model else None
+
+    @property
+    def model_id(self) -> str:
+        """Identifies the vector space of the embeddings this client produces."""
+        if self.backend is not None:
+            return self.backend.model_id
+        if self._uses_embedder_role:
+            return self._embedder_role_model() or self.embedder_role_name
+        return self.llm_embedding_model
+
+    @property
+    def _cache_model_id(self) -> Optional[str]:
+        """Persistent cache key of the embedding model; None when it cannot be resolved."""
+        if self.backend is not None:
+            return self.backend.model_id
+        if self._uses_embedder_role:
+            model = self._embedder_role_model()
+            # LLM vectors are resized to dim, so key on it too
+            return f"{model}-{self.dim}" if model else None
+        return f"{self.llm_embedding_model}-{self.dim}"
+
+    def get_embedding(self, text: str) -> Optional[List[float]]:
+        """Return :meth:`generate_embedding` as a list of floats, or None."""
+        embedding = self.generate_embedding(text)
+        return embedding.tolist() if embedding is not None else None
+
+    def get_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> List[Optional[List[float]]]:
+        """Return :meth:`generate_embeddings` as lists of floats, with None for failures."""
+        return [
+            embedding.tolist() if embedding is not None else None
+            for embedding in self.generate_embeddings(texts, batch_size)
+        ]
+
+    def generate_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> List[Optional[np.ndarray]]:
+        """
+        Generate embeddings for many texts in batches.
+
+        Batches hold at most ``batch_size`` texts and ``embedding_batch_max_tokens``
+        estimated tokens. The local backend embeds each batch in one call. With
+        the "llm" backend and no router agent, each batch is one multi-input
+        request to the embeddings endpoint. The embedder role takes one text per
+        call, as :meth:`generate_embedding` does.
+
+        Args:
+            texts: The texts to generate embeddings for
+            batch_size: Maximum texts per batch; defaults to ``embedding_batch_size``
+
+        Returns:
+            One normalized embedding per text, in order, with None where generation failed
+        """
+        texts = [text[:MAX_TEXT_LENGTH] for text in texts]
+        cache_model = self._cache_model_id
+        if self.embedding_cache is None or cache_model is None:
+            return self._generate_embeddings(texts, batch_size)
+
+        results = self.embedding_cache.get_many(cache_model, texts)
+        missing = [i for i, embedding in enumerate(results) if embedding is None]
+        if missing:
+            generated = self._generate_embeddings([texts[i] for i in missing], batch_size)
+            for i, embedding in zip(missing, generated):
+                results[i] = embedding
+            self.embedding_cache.put_many(cache_model, [texts[i] for i in missing], generated)
+        return results
+
+    def _generate_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> List[Optional[np.ndarray]]:
+        batch_size = batch_size or self.batch_size
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+
+        if self.backend is not None:
+            for batch in iter_batches(texts, batch_size, self.batch_max_tokens):
+                try:
+                    rows = list(self.backend.embed([texts[i] for i in batch]))
+                except Exception as e:
+                    logger.error(
+                        "Local embedding backend %s failed on a batch of %d texts: %s. Embedding them one at a time.",
+                        self.backend.model_id,
+                        len(batch),
+                        e,
+                    )
+                    rows = [self._generate_embedding(texts[i]) for i in batch]
+                for i, row in zip(batch, rows):
+                    # Texts with no tokens have no direction to compare
+                    results[i] = row if row is not None and row.any() else None
+            return results
+
+        if self._uses_embedder_role:
+            return [self._generate_embedding(text) if text.strip() else None for text in texts]
+        return self._endpoint_embeddings(texts, batch_size)
+
+    def _endpoint_embeddings(self, texts: List[str], batch_size: Optional[int] = None) -> List[Optional[np.ndarray]]:
+        """Embed ``texts`` with ``llm_embedding_model`` through the embeddings endpoint."""
+        try:
+            from agent_s3.llm_utils import get_embeddings
+
+            # Rejected inputs are isolated by bisection inside get_embeddings
+            embeddings = get_embeddings(
+                texts,
+                model=self.llm_embedding_model,
+                dimensions=self.dim,
+                batch_size=batch_size or self.batch_size,
+                max_batch_tokens=self.batch_max_tokens,
+            )
+        except Exception as e:
+            logger.error("Embedding generation with %s failed: %s", self.llm_embedding_model, e)
+            return [None] * len(texts)
+        results: List[Optional[np.ndarray]] = []
+        for embedding in embeddings:
+            vector = np.asarray(embedding, dtype=np.float32) if embedding is not None else None
+            norm = np.linalg.norm(vector) if vector is not None else 0.0
+            results.append(vector / norm if norm > 0 else None)
+        return results
+
     def generate_embedding(self, text: str) -> Optional[np.ndarray]:
         """
-        Generate an embedding for the given text using the specialized 'embedder' role if available.
+        Generate an embedding for the given text with the local backend, or
+        with the model of the "llm" backend (see :class:`EmbeddingClient`).
 
         Args:
             text: The text to generate an embedding for
@@ -391,20 +544,60 @@ class EmbeddingClient:
         Returns:
             A numpy array containing the embedding vector, or None if generation failed
         """
-        start_time = time.time()
-
         # Truncate long texts to prevent context window issues
-        max_text_length = 8000  # Set a reasonable limit that most models can handle
-        if len(text) > max_text_length:
+        if len(text) > MAX_TEXT_LENGTH:
             logger.warning(
                 "Text too long (%d chars), truncating to %d chars",
                 len(text),
-                max_text_length,
+                MAX_TEXT_LENGTH,
             )
-            text = text[:max_text_length]
+            text = text[:MAX_TEXT_LENGTH]
+
+        cache_model = self._cache_model_id
+        if self.embedding_cache is None or cache_model is None:
+            return self._generate_embedding(text)
+        embedding = self.embedding_cache.get(cache_model, text)
+        if embedding is None:
+            embedding = self._generate_embedding(text)
+            self.embedding_cache.put(cache_model, text, embedding)
+        return embedding
+
+    def _generate_embedding(self, text: str) -> Optional[np.ndarray]:
+        start_time = time.time()
 
-        # Use specialized embedder role if router agent is available
-        if self.router_agent and hasattr(self.router_agent, 'call_llm_by_role'):
+        if self.backend is not None:
+            try:
+                embedding = self.backend.embed([text])[0]
+            except Exception as e:
+                logger.error("Local embedding backend %s failed: %s", self.backend.model_id, e)
+                return None
+            # Texts with no tokens have no direction to compare
+            return embedding if embedding.any() else None
+
+        if not self._uses_embedder_role:
+            embedding = self._endpoint_embeddings([text])[0]
+            if embedding is not None:
+                duration = time.time() - start_time
+                logger.info(
+                    "Generated embedding with %s in %.2fs",
+                    self.llm_embedding_model,
+                    duration,
+                )
+
+                # Record metrics if available
+                if hasattr(self, '_metrics') and hasattr(self._metrics, 'record_embedding'):
+                    self._metrics.record_embedding(
+                        success=True,
+                        duration=duration,
+                        text_length=len(text),
+                        specialized_role=False
+                    )
+
+                return embedding
+
+        else:
+            # Use the specialized embedder role. A failure is not retried with
+            # another model, whose vectors would not be comparable.
             try:
                 # System prompt for embedding generation
                 system_prompt = "You are an embedding generator. Return ONLY a JSON object with a single key 'embedding' containing an array of floating-point numbers representing the semantic embedding of the provided text."
@@ -438,12 +631,11 @@ class EmbeddingClient:
                 for attempt in range(max_retries):
                     try:
                         embedding_json = self.router_agent.call_llm_by_role(
-                            role="embedder",  # Use the specialized embedder role
+                            role=self.embedder_role_name,  # Use the specialized embedder role
                             system_prompt=system_prompt,
                             user_prompt=user_prompt,
                             config=config,
                             scratchpad=scratchpad,
-                            fallback_role="default",  # Fall back to default role if embedder not available
                             temperature=0.1,  # Low temperature for deterministic outputs
                             response_format={"type": "json_object"}  # Request JSON format
                         )
@@ -515,46 +707,11 @@ class EmbeddingClient:
                             e,
                         )
 
-                logger.warning("'embedder' role did not return a valid embedding, falling back to default method")
+                logger.warning("'embedder' role did not return a valid embedding")
             except Exception as e:
-                logger.warning(
-                    "Failed to use specialized embedder role: %s. Falling back to default embedding method.",
-                    e,
-                )
-
-        # Fall back to default embedding method
-        try:
-            # If an alternative embedding method is available, use it here
-            # For example, using OpenAI embeddings API directly
-            from agent_s3.llm_utils import get_embedding
-
-            # Get embedding using the default method
-            embedding = get_embedding(text)
-
-            if embedding is not None:
-                duration = time.time() - start_time
-                logger.info(
-                    "Generated embedding using fallback method in %.2fs",
-                    duration,
-                )
-
-                # Record metrics if available
-                if hasattr(self, '_metrics') and hasattr(self._metrics, 'record_embedding'):
-                    self._metrics.record_embedding(
-                        success=True,
-                        duration=duration,
-                        text_length=len(text),
-                        specialized_role=False
-                    )
-
-                return embedding
-        except ImportError:
-            logger.error("Fallback embedding method (get_embedding) not available")
-        except Exception as e:
-            logger.error("Fallback embedding generation failed: %s", e)
+                logger.warning("Failed to use specialized embedder role: %s", e)
 
-        # If all methods failed
-        logger.error("All embedding generation methods failed")
+        logger.error("Embedding generation with %s failed", self.model_id)
 
         # Record metrics if available
         if hasattr(self, '_metrics') and hasattr(self._metrics, 'record_embedding'):
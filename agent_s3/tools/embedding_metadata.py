@@ -0,0 +1,307 @@
+"""
+Columnar metadata for the vectors in :class:`~agent_s3.tools.embedding_client.EmbeddingClient`.
+
+The fields that eviction and access tracking read are held in numpy arrays,
+one row per vector: ``ids``, ``timestamp``, ``last_access`` and
+``access_count``. A side table keeps each row's ``file_path`` and maps paths
+to ids. Scoring every vector for eviction is then a handful of array
+operations plus one ``argpartition``, instead of a Python loop over dicts.
+Removing rows moves rows from the end of the arrays into the gaps, so it
+costs O(rows removed).
+
+Rows are persisted incrementally to a WAL-mode SQLite database. Adding,
+touching and removing vectors writes only the affected rows. Every other
+metadata field is stored there as JSON and read back only when an entry is
+looked up.
+
+:class:`EmbeddingMetadata` is a read-only mapping from string ids to metadata
+dicts, so code that iterated the old ``id_map`` dict keeps working. The dicts
+it returns are copies.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Metadata fields held in numpy columns; the rest are stored as JSON
+COLUMNS = ("timestamp", "last_access", "access_count")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    last_access REAL NOT NULL,
+    access_count INTEGER NOT NULL,
+    file_path TEXT,
+    metadata TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class EmbeddingMetadata(Mapping[str, Dict[str, Any]]):
+    """Per-vector metadata in numpy columns, backed by a SQLite file."""
+
+    def __init__(self, db_path: Union[str, Path]) -> None:
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._load()
+
+    # ------------------------------------------------------------------
+    # In-memory columns
+    # ------------------------------------------------------------------
+
+    def _reset_columns(self, capacity: int = 0) -> None:
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.timestamp = np.empty(capacity, dtype=np.float64)
+        self.last_access = np.empty(capacity, dtype=np.float64)
+        self.access_count = np.empty(capacity, dtype=np.int64)
+        self.file_paths: List[Optional[str]] = []
+        self._size = 0
+        self._rows: Dict[int, int] = {}
+        self._ids_by_path: Dict[str, Set[int]] = {}
+
+    def _ensure_capacity(self, extra: int) -> None:
+        needed = self._size + extra
+        if needed <= self.ids.shape[0]:
+            return
+        capacity = max(needed, 2 * self.ids.shape[0], 1024)
+        for name in ("ids", "timestamp", "last_access", "access_count"):
+            column = getattr(self, name)
+            grown = np.empty(capacity, dtype=column.dtype)
+            grown[:self._size] = column[:self._size]
+            setattr(self, name, grown)
+
+    def _append(self, ids: np.ndarray, timestamp, last_access, access_count, file_paths: List[Optional[str]]) -> None:
+        start, count = self._size, len(ids)
+        self._ensure_capacity(count)
+        end = start + count
+        self.ids[start:end] = ids
+        self.timestamp[start:end] = timestamp
+        self.last_access[start:end] = last_access
+        self.access_count[start:end] = access_count
+        self.file_paths.extend(file_paths)
+        for row, (vec_id, path) in enumerate(zip(ids.tolist(), file_paths), start):
+            self._rows[vec_id] = row
+            if path is not None:
+                self._ids_by_path.setdefault(path, set()).add(vec_id)
+        self._size = end
+
+    def _load(self) -> None:
+        rows = self._conn.execute(
+            "SELECT id, timestamp, last_access, access_count, file_path FROM embeddings ORDER BY id"
+        ).fetchall()
+        self._reset_columns(len(rows))
+        self.next_id = int(self._get_meta("next_id", "0"))
+        if not rows:
+            return
+        ids, timestamp, last_access, access_count, file_paths = zip(*rows)
+        self._append(
+            np.array(ids, dtype=np.int64),
+            np.array(timestamp, dtype=np.float64),
+            np.array(last_access, dtype=np.float64),
+            np.array(access_count, dtype=np.int64),
+            list(file_paths),
+        )
+        self.next_id = max(self.next_id, int(self.ids[self._size - 1]) + 1)
+
+    def _get_meta(self, name: str, default: str) -> str:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, name: str, value: str) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, value),
+        )
+
+    # ------------------------------------------------------------------
+    # Mapping interface (string ids, as in the legacy JSON id_map)
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([str(vec_id) for vec_id in self.ids[:self._size].tolist()])
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            return int(key) in self._rows  # type: ignore[arg-type]
+        except (TypeError, ValueError):
+            return False
+
+    def __getitem__(self, key: Union[str, int]) -> Dict[str, Any]:
+        vec_id = int(key)
+        with self._lock:
+            row = self._rows.get(vec_id)
+            if row is None:
+                raise KeyError(key)
+            stored = self._conn.execute("SELECT metadata FROM embeddings WHERE id = ?", (vec_id,)).fetchone()
+            entry = json.loads(stored[0]) if stored else {}
+            entry.update(
+                timestamp=float(self.timestamp[row]),
+                last_access=float(self.last_access[row]),
+                access_count=int(self.access_count[row]),
+            )
+            if self.file_paths[row] is not None:
+                entry["file_path"] = self.file_paths[row]
+            return entry
+
+    # ------------------------------------------------------------------
+    # Mutations, each persisted before returning
+    # ------------------------------------------------------------------
+
+    def add(self, ids: Iterable[int], entries: List[Dict[str, Any]], now: float, next_id: Optional[int] = None) -> None:
+        """Add one metadata dict per id; missing column fields default to ``now`` and 0."""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        timestamp = [float(entry.get("timestamp", now)) for entry in entries]
+        last_access = [float(entry.get("last_access", now)) for entry in entries]
+        access_count = [int(entry.get("access_count", 0)) for entry in entries]
+        file_paths = [entry.get("file_path") for entry in entries]
+        extras = [
+            json.dumps({k: v for k, v in entry.items() if k not in COLUMNS and k != "file_path"}, default=str)
+            for entry in entries
+        ]
+        with self._lock:
+            # Re-adding an id replaces its row
+            self._remove_rows([int(i) for i in ids.tolist() if int(i) in self._rows])
+            self._append(ids, timestamp, last_access, access_count, file_paths)
+            if next_id is not None:
+                self.next_id = max(self.next_id, next_id)
+            elif len(ids):
+                self.next_id = max(self.next_id, int(ids.max()) + 1)
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (id, timestamp, last_access, access_count, file_path, metadata) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                zip(ids.tolist(), timestamp, last_access, access_count, file_paths, extras),
+            )
+            self._set_meta("next_id", str(self.next_id))
+            self._conn.execute("COMMIT")
+
+    def touch_paths(self, file_paths: Iterable[str], now: float) -> int:
+        """Record an access to every vector of ``file_paths``; returns how many were touched."""
+        with self._lock:
+            ids = set()
+            for path in set(file_paths):
+                ids.update(self._ids_by_path.get(path, ()))
+            if not ids:
+                return 0
+            rows = np.fromiter((self._rows[vec_id] for vec_id in ids), dtype=np.int64, count=len(ids))
+            self.access_count[rows] += 1
+            self.last_access[rows] = now
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE embeddings SET access_count = ?, last_access = ? WHERE id = ?",
+                zip(self.access_count[rows].tolist(), [now] * len(rows), self.ids[rows].tolist()),
+            )
+            self._conn.execute("COMMIT")
+            return len(rows)
+
+    def ids_for_path(self, file_path: str) -> List[int]:
+        return sorted(self._ids_by_path.get(file_path, ()))
+
+    def eviction_candidates(self, count: int, now: float, max_idle_time: float, min_access_keep: int) -> np.ndarray:
+        """Return up to ``count`` ids with the highest eviction scores, highest first.
+
+        Vectors accessed more than ``min_access_keep`` times are never
+        candidates. The score weights idle time 0.6, rarity of access 0.3 and
+        age 0.1.
+        """
+        with self._lock:
+            n = self._size
+            eligible = np.flatnonzero(self.access_count[:n] <= min_access_keep)
+            if count <= 0 or not eligible.size:
+                return np.empty(0, dtype=np.int64)
+            if max_idle_time > 0:
+                idle_factor = np.minimum(1.0, (now - self.last_access[eligible]) / max_idle_time)
+                age_factor = np.minimum(1.0, (now - self.timestamp[eligible]) / (max_idle_time / 2))
+            else:
+                idle_factor = age_factor = 0.5
+            access_factor = 1.0 / (self.access_count[eligible] + 1)
+            scores = 0.6 * idle_factor + 0.3 * access_factor + 0.1 * age_factor
+
+            count = min(count, eligible.size)
+            top = np.argpartition(-scores, count - 1)[:count] if count < eligible.size else np.arange(eligible.size)
+            top = top[np.argsort(-scores[top], kind="stable")]
+            return self.ids[eligible[top]].copy()
+
+    def remove(self, ids: Iterable[int]) -> int:
+        """Remove rows for ``ids``; returns how many existed."""
+        with self._lock:
+            present = [int(vec_id) for vec_id in ids if int(vec_id) in self._rows]
+            if not present:
+                return 0
+            self._remove_rows(present)
+            self._conn.execute("BEGIN")
+            self._conn.executemany("DELETE FROM embeddings WHERE id = ?", [(vec_id,) for vec_id in present])
+            self._conn.execute("COMMIT")
+            return len(present)
+
+    def _remove_rows(self, ids: List[int]) -> None:
+        if not ids:
+            return
+        removed = set()
+        for vec_id in set(ids):
+            row = self._rows.pop(vec_id)
+            removed.add(row)
+            path = self.file_paths[row]
+            if path is not None:
+                path_ids = self._ids_by_path.get(path)
+                if path_ids is not None:
+                    path_ids.discard(vec_id)
+                    if not path_ids:
+                        del self._ids_by_path[path]
+
+        # Fill gaps below the new size with surviving rows from the tail
+        new_size = self._size - len(removed)
+        holes = np.array(sorted(row for row in removed if row < new_size), dtype=np.int64)
+        tail = np.array([row for row in range(new_size, self._size) if row not in removed], dtype=np.int64)
+        if holes.size:
+            for name in ("ids", "timestamp", "last_access", "access_count"):
+                column = getattr(self, name)
+                column[holes] = column[tail]
+            for hole, source in zip(holes.tolist(), tail.tolist()):
+                self.file_paths[hole] = self.file_paths[source]
+                self._rows[int(self.ids[hole])] = hole
+        del self.file_paths[new_size:]
+        self._size = new_size
+
+    def retain(self, ids: np.ndarray) -> int:
+        """Drop rows whose id is not in ``ids``; returns how many were dropped."""
+        with self._lock:
+            stale = self.ids[:self._size][~np.isin(self.ids[:self._size], ids)]
+            return self.remove(stale.tolist())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._reset_columns()
+            self._conn.execute("DELETE FROM embeddings")
+
+    def import_entries(self, id_map: Mapping[str, Dict[str, Any]], next_id: int, now: float) -> None:
+        """Replace the contents with a legacy ``{id: metadata}`` map."""
+        with self._lock:
+            self.clear()
+            ids = [int(key) for key in id_map]
+            self.add(ids, [dict(entry) for entry in id_map.values()], now, next_id)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
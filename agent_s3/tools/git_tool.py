@@ -11,6 +11,8 @@ from typing import Optional, Tuple, Dict, Any, List, Union
 
 import requests
 
+from agent_s3.http_transport import get_transport_registry
+
 
 class GitTool:
     """Tool for Git operations and GitHub API interactions."""
@@ -199,19 +201,15 @@ class GitTool:
 
         while retries <= max_retries:
             try:
-                if method.upper() == "GET":
-                    response = requests.get(url, headers=headers, params=params, timeout=30)
-                elif method.upper() == "POST":
-                    response = requests.post(url, headers=headers, json=data, params=params, timeout=30)
-                elif method.upper() == "PATCH":
-                    response = requests.patch(url, headers=headers, json=data, params=params, timeout=30)
-                elif method.upper() == "PUT":
-                    response = requests.put(url, headers=headers, json=data, params=params, timeout=30)
-                elif method.upper() == "DELETE":
-                    response = requests.delete(url, headers=headers, params=params, timeout=30)
-                else:
+                if method.upper() not in ("GET", "POST", "PATCH", "PUT", "DELETE"):
                     return False, f"Unsupported HTTP method: {method}"
 
+                # Send bodies only for methods that carry one
+                body = data if method.upper() in ("POST", "PATCH", "PUT") else None
+                response = get_transport_registry().request(
+                    method.upper(), url, headers=headers, json=body, params=params, timeout=30
+                )
+
                 # Update rate limit tracking
                 self._update_rate_limit(response)
 
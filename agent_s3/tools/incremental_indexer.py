@@ -9,8 +9,14 @@ import os
 import time
 import logging
 import threading
-from typing import Dict, List, Optional, Any, Callable
-
+from typing import Dict, List, Optional, Any, Callable, Tuple
+
+from agent_s3.config import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_PQ_M,
+    EMBEDDING_PRECISION,
+    EMBEDDING_RERANK_FACTOR,
+)
 from agent_s3.tools.file_change_tracker import FileChangeTracker
 from agent_s3.tools.index_partition_manager import IndexPartitionManager
 from agent_s3.tools.dependency_impact_analyzer import DependencyImpactAnalyzer
@@ -39,7 +45,8 @@ class IncrementalIndexer:
 
         Args:
             storage_path: Path to store index data
-            embedding_client: Client for generating embeddings
+            embedding_client: Client for generating embeddings; defaults to
+                an ``EmbeddingClient`` with the configured local backend
             file_tool: Tool for file operations
             static_analyzer: Analyzer for dependency information
             config: Configuration dictionary
@@ -50,22 +57,26 @@ class IncrementalIndexer:
             home = os.path.expanduser("~")
             self.storage_path = os.path.join(home, ".agent_s3", "index")
 
+        self.config = config or {}
+
         # Create components
         self.file_change_tracker = FileChangeTracker(
             os.path.join(self.storage_path, "change_tracking")
         )
         self.partition_manager = IndexPartitionManager(
-            os.path.join(self.storage_path, "partitions")
+            os.path.join(self.storage_path, "partitions"),
+            precision=self.config.get('embedding_precision', EMBEDDING_PRECISION),
+            pq_m=self.config.get('embedding_pq_m', EMBEDDING_PQ_M),
+            rerank_factor=self.config.get('embedding_rerank_factor', EMBEDDING_RERANK_FACTOR)
         )
         self.dependency_analyzer = DependencyImpactAnalyzer()
 
-        # Store dependencies
-        self.embedding_client = embedding_client
+        # Store dependencies; embeddings default to the offline local backend
+        self.embedding_client = embedding_client if embedding_client is not None else EmbeddingClient(self.config)
         self.file_tool = file_tool
         self.static_analyzer = static_analyzer
 
         # Configuration
-        self.config = config or {}
         self.max_workers = self.config.get('max_indexing_workers', 4)
         self.extensions = self.config.get('extensions', [".py", ".js", ".ts", ".jsx", ".tsx", ".html", ".css", ".java"])
         self.auto_optimize = self.config.get('auto_optimize_partitions', True)
@@ -170,28 +181,10 @@ class IncrementalIndexer:
 
             # Count total files for progress reporting
             total_files = len(files_to_index)
-            files_indexed = 0
-
-            # Update each file
-            for i, file_path in enumerate(files_to_index):
-                try:
-                    self._report_progress(
-                        f"Indexing file {i+1}/{total_files}: {os.path.basename(file_path)}",
-                        i, total_files
-                    )
-
-                    success = self._index_file(file_path)
 
-                    if success:
-                        files_indexed += 1
-
-                        # Record that we've tracked this file
-                        self.file_change_tracker.track_file(file_path)
-                    else:
-                        files_skipped += 1
-                except Exception as e:
-                    logger.error("Error indexing file %s: %s", file_path, e)
-                    files_skipped += 1
+            # Update files, embedding them in batches
+            files_indexed, batch_skipped = self._index_files(files_to_index)
+            files_skipped += batch_skipped
 
             # Save all changes
             self._report_progress("Saving index...", total_files, total_files)
@@ -275,29 +268,9 @@ class IncrementalIndexer:
 
             # Count total files for progress reporting
             total_files = len(file_paths)
-            files_indexed = 0
-            files_skipped = 0
 
-            # Update each file
-            for i, file_path in enumerate(file_paths):
-                try:
-                    self._report_progress(
-                        f"Indexing file {i+1}/{total_files}: {os.path.basename(file_path)}",
-                        i, total_files
-                    )
-
-                    success = self._index_file(file_path)
-
-                    if success:
-                        files_indexed += 1
-
-                        # Record that we've tracked this file
-                        self.file_change_tracker.track_file(file_path)
-                    else:
-                        files_skipped += 1
-                except Exception as e:
-                    logger.error("Error indexing file %s: %s", file_path, e)
-                    files_skipped += 1
+            # Update files, embedding them in batches
+            files_indexed, files_skipped = self._index_files(file_paths)
 
             # Save all changes
             self._report_progress("Saving index...", total_files, total_files)
@@ -388,53 +361,98 @@ class IncrementalIndexer:
             with self.indexing_lock:
                 self.is_indexing = False
 
-    def _index_file(self, file_path: str) -> bool:
+    def _index_files(self, file_paths: List[str]) -> Tuple[int, int]:
         """
-        Index a single file.
+        Index files, generating their embeddings in batches.
+
+        Deleted files are removed from the index and count as indexed. Every
+        indexed file is recorded with the change tracker.
 
         Args:
-            file_path: Path to the file
+            file_paths: Paths to the files
 
         Returns:
-            True if file was indexed successfully, False otherwise
+            Tuple of (files indexed, files skipped)
         """
-        try:
-            # Check if file exists
-            if not os.path.exists(file_path) or not os.path.isfile(file_path):
-                # Remove from index if it exists
-                self.partition_manager.remove_file(file_path)
-                return True
-
-            # Read file content
-            if self.file_tool and hasattr(self.file_tool, 'read_file'):
-                content = self.file_tool.read_file(file_path)
-            else:
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    content = f.read()
+        total_files = len(file_paths)
+        files_indexed = 0
+        files_skipped = 0
+        batch_size = getattr(self.embedding_client, "batch_size", None) or EMBEDDING_BATCH_SIZE
+
+        for start in range(0, total_files, batch_size):
+            batch = file_paths[start:start + batch_size]
+            self._report_progress(
+                f"Indexing files {start + 1}-{start + len(batch)}/{total_files}",
+                start, total_files
+            )
+
+            # Read the batch, dropping deleted files from the index
+            contents: Dict[str, str] = {}
+            for file_path in batch:
+                try:
+                    if not os.path.exists(file_path) or not os.path.isfile(file_path):
+                        self.partition_manager.remove_file(file_path)
+                        files_indexed += 1
+                        self.file_change_tracker.track_file(file_path)
+                        continue
+                    content = self._read_file(file_path)
+                except Exception as e:
+                    logger.error("Error reading file %s: %s", file_path, e)
+                    content = None
+                if content:
+                    contents[file_path] = content
+                else:
+                    files_skipped += 1
+            if not contents:
+                continue
+
+            # One embedding call for the whole batch
+            try:
+                embeddings = self.embedding_client.get_embeddings(list(contents.values()))
+            except Exception as e:
+                logger.error("Error generating embeddings for %d files: %s", len(contents), e)
+                files_skipped += len(contents)
+                continue
+
+            for (file_path, content), embedding in zip(contents.items(), embeddings):
+                if embedding and self._add_file(file_path, content, embedding):
+                    files_indexed += 1
+                    # Record that we've tracked this file
+                    self.file_change_tracker.track_file(file_path)
+                else:
+                    files_skipped += 1
 
-            if not content:
-                return False
+        return files_indexed, files_skipped
 
-            # Generate embedding
-            if not self.embedding_client:
-                return False
+    def _read_file(self, file_path: str) -> Optional[str]:
+        """Read a file's content through the file tool, if any."""
+        if self.file_tool and hasattr(self.file_tool, 'read_file'):
+            return self.file_tool.read_file(file_path)
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read()
 
-            embedding = self.embedding_client.get_embedding(content)
+    def _add_file(self, file_path: str, content: str, embedding: List[float]) -> bool:
+        """
+        Add or update a file's embedding and metadata in the index.
 
-            if not embedding:
-                return False
+        Args:
+            file_path: Path to the file
+            content: The file's content
+            embedding: Embedding vector for the content
 
+        Returns:
+            True if file was indexed successfully, False otherwise
+        """
+        try:
             # Extract metadata
             metadata = self._extract_file_metadata(file_path, content)
 
             # Add/update in index
-            success = self.partition_manager.add_or_update_file(
+            return self.partition_manager.add_or_update_file(
                 file_path=file_path,
                 embedding=embedding,
                 metadata=metadata
             )
-
-            return success
         except Exception as e:
             logger.error("Error indexing file %s: %s", file_path, e)
             return False
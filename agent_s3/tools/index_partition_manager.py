@@ -3,6 +3,11 @@ Index Partition Manager for Agent-S3.
 
 This module implements partitioning strategies for the code search index,
 enabling more efficient and scalable incremental updates.
+
+Each partition keeps its file embeddings in a
+:class:`~agent_s3.tools.quantized_index.QuantizedIndex` at the configured
+``embedding_precision``. Vectors are normalized on insert, so inner-product
+search ranks by cosine similarity.
 """
 
 import os
@@ -13,15 +18,22 @@ import shutil
 from typing import Dict, List, Set, Optional, Any
 import hashlib
 
+import numpy as np
+
+from agent_s3.config import EMBEDDING_PQ_M, EMBEDDING_PRECISION, EMBEDDING_RERANK_FACTOR
+from agent_s3.tools.quantized_index import QuantizedIndex
+
 logger = logging.getLogger(__name__)
 
-# Import numpy if available for vector operations
-try:
-    import numpy as np
-    NUMPY_AVAILABLE = True
-except ImportError:
-    NUMPY_AVAILABLE = False
-    logger.warning("NumPy not available. Using fallback for vector operations.")
+# Legacy per-partition embeddings, migrated into the vector index on load
+EMBEDDINGS_FILE = "embeddings.json"
+VECTORS_PREFIX = "embeddings"
+
+
+def _vector_id(file_path: str) -> int:
+    """Return a stable non-negative 63-bit vector id for a file path."""
+    digest = hashlib.sha256(file_path.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little") >> 1
 
 class IndexPartition:
     """
@@ -35,7 +47,10 @@ class IndexPartition:
         self,
         partition_id: str,
         storage_path: str,
-        criteria: Dict[str, Any]
+        criteria: Dict[str, Any],
+        precision: str = EMBEDDING_PRECISION,
+        pq_m: int = EMBEDDING_PQ_M,
+        rerank_factor: int = EMBEDDING_RERANK_FACTOR
     ):
         """
         Initialize an index partition.
@@ -44,17 +59,25 @@ class IndexPartition:
             partition_id: Unique identifier for this partition
             storage_path: Path to store partition data
             criteria: Criteria that defines what goes in this partition
+            precision: Storage precision of the embedding vectors
+            pq_m: Sub-quantizers per vector at ``pq`` precision
+            rerank_factor: Candidates re-ranked exactly per result below float32
         """
         self.partition_id = partition_id
         self.storage_path = os.path.join(storage_path, f"partition_{partition_id}")
         self.criteria = criteria
+        self.precision = precision
+        self.pq_m = pq_m
+        self.rerank_factor = rerank_factor
 
         # Ensure storage directory exists
         os.makedirs(self.storage_path, exist_ok=True)
 
-        # File data
-        self.file_embeddings: Dict[str, List[float]] = {}
+        # File data; the vector index is created with the first embedding's dimension
+        self.vectors: Optional[QuantizedIndex] = None
         self.file_metadata: Dict[str, Dict[str, Any]] = {}
+        self._paths_by_id: Dict[int, str] = {}
+        self._legacy_embeddings = False
 
         # Partition metadata
         self.metadata = {
@@ -89,25 +112,74 @@ class IndexPartition:
             except Exception as e:
                 logger.error("Error loading file metadata: %s", e)
 
+        self._paths_by_id = {_vector_id(fp): fp for fp in self.file_metadata}
+
         # Load embeddings
-        embeddings_path = os.path.join(self.storage_path, "embeddings.json")
+        self.vectors = None
+        prefix = os.path.join(self.storage_path, VECTORS_PREFIX)
+        dim = self.metadata.get("dim")
+        if dim and os.path.exists(prefix + ".faiss"):
+            try:
+                self.vectors = QuantizedIndex.load(prefix, dim, self.precision, self.pq_m, self.rerank_factor)
+            except Exception as e:
+                logger.error("Error loading file embeddings: %s", e)
+
+        embeddings_path = os.path.join(self.storage_path, EMBEDDINGS_FILE)
         if os.path.exists(embeddings_path):
             try:
                 with open(embeddings_path, 'r') as f:
-                    self.file_embeddings = json.load(f)
-                # Convert string keys to actual file paths if they were stored with an encoding
-                if self.file_embeddings:
-                    # Check if keys are encoded (e.g., have a special prefix)
-                    key_sample = next(iter(self.file_embeddings.keys()))
-                    if key_sample.startswith("path:"):
-                        decoded_embeddings = {}
-                        for k, v in self.file_embeddings.items():
-                            real_path = k.replace("path:", "", 1)
-                            decoded_embeddings[real_path] = v
-                        self.file_embeddings = decoded_embeddings
+                    legacy = json.load(f)
+                # Keys were stored as "path:<file path>"
+                for key, embedding in legacy.items():
+                    file_path = key[len("path:"):] if key.startswith("path:") else key
+                    self._set_embedding(file_path, embedding)
+                self._legacy_embeddings = True
             except Exception as e:
                 logger.error("Error loading file embeddings: %s", e)
 
+    def _set_embedding(self, file_path: str, embedding: List[float]) -> None:
+        """Store the normalized embedding of a file, replacing any previous one."""
+        if embedding is None:
+            return
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        if self.vectors is None:
+            self.vectors = QuantizedIndex(vector.shape[0], self.precision, self.pq_m, self.rerank_factor)
+            self.metadata["dim"] = vector.shape[0]
+        elif vector.shape[0] != self.vectors.dim:
+            raise ValueError(
+                f"Embedding for {file_path} has dimension {vector.shape[0]}, expected {self.vectors.dim}"
+            )
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector = vector / norm
+        vec_id = _vector_id(file_path)
+        self.vectors.add_with_ids(vector.reshape(1, -1), np.array([vec_id], dtype=np.int64))
+        self._paths_by_id[vec_id] = file_path
+
+    def get_embedding(self, file_path: str) -> Optional[List[float]]:
+        """
+        Get the stored (normalized) embedding of a file.
+
+        Args:
+            file_path: Path to the file
+
+        Returns:
+            The embedding, or None if the file has none
+        """
+        if self.vectors is None:
+            return None
+        vector = self.vectors.get_vector(_vector_id(file_path))
+        return None if vector is None else vector.tolist()
+
+    def get_vector_bytes(self) -> int:
+        """
+        Get the RAM held by this partition's embedding vectors.
+
+        Returns:
+            Number of bytes
+        """
+        return self.vectors.memory_bytes() if self.vectors is not None else 0
+
     def _save_data(self) -> None:
         """Save partition data to disk."""
         try:
@@ -131,16 +203,11 @@ class IndexPartition:
             os.replace(temp_path, file_metadata_path)
 
             # Save embeddings (atomic)
-            embeddings_path = os.path.join(self.storage_path, "embeddings.json")
-            temp_path = embeddings_path + ".tmp"
-            # Encode file paths as keys to avoid issues with special characters
-            encoded_embeddings = {}
-            for k, v in self.file_embeddings.items():
-                encoded_key = f"path:{k}"
-                encoded_embeddings[encoded_key] = v
-            with open(temp_path, 'w') as f:
-                json.dump(encoded_embeddings, f)
-            os.replace(temp_path, embeddings_path)
+            if self.vectors is not None:
+                self.vectors.save(os.path.join(self.storage_path, VECTORS_PREFIX))
+            if self._legacy_embeddings:
+                os.remove(os.path.join(self.storage_path, EMBEDDINGS_FILE))
+                self._legacy_embeddings = False
 
             logger.debug("Saved partition %s with %d files", self.partition_id, len(self.file_metadata))
         except Exception as e:
@@ -169,7 +236,7 @@ class IndexPartition:
 
         try:
             # Add file data
-            self.file_embeddings[file_path] = embedding
+            self._set_embedding(file_path, embedding)
             self.file_metadata[file_path] = metadata
 
             return True
@@ -193,8 +260,10 @@ class IndexPartition:
                 return False
 
             # Remove file data
-            if file_path in self.file_embeddings:
-                del self.file_embeddings[file_path]
+            if self.vectors is not None:
+                vec_id = _vector_id(file_path)
+                self.vectors.remove_ids(np.array([vec_id], dtype=np.int64))
+                self._paths_by_id.pop(vec_id, None)
             del self.file_metadata[file_path]
 
             return True
@@ -227,7 +296,7 @@ class IndexPartition:
 
         # Otherwise update it
         try:
-            self.file_embeddings[file_path] = embedding
+            self._set_embedding(file_path, embedding)
             self.file_metadata[file_path] = metadata
             return True
         except Exception as e:
@@ -275,53 +344,21 @@ class IndexPartition:
         Returns:
             List of result dictionaries with file path, score, and metadata
         """
-        if not self.file_embeddings:
+        if self.vectors is None or not self.vectors.ntotal:
             return []
 
         try:
-            # Calculate similarities
-            similarities = []
-
-            if NUMPY_AVAILABLE:
-                # Vectorized calculation with numpy
-                query_vec = np.array(query_embedding)
-
-                for file_path, embedding in self.file_embeddings.items():
-                    file_vec = np.array(embedding)
-
-                    # Calculate cosine similarity
-                    similarity = np.dot(query_vec, file_vec) / (
-                        np.linalg.norm(query_vec) * np.linalg.norm(file_vec)
-                    )
-
-                    similarities.append((file_path, float(similarity)))
-            else:
-                # Fallback for when numpy is not available
-                for file_path, embedding in self.file_embeddings.items():
-                    # Calculate dot product
-                    dot_product = sum(q * f for q, f in zip(query_embedding, embedding))
-
-                    # Calculate magnitudes
-                    query_mag = sum(q * q for q in query_embedding) ** 0.5
-                    file_mag = sum(f * f for f in embedding) ** 0.5
+            query_vec = np.asarray(query_embedding, dtype=np.float32).ravel()
+            norm = np.linalg.norm(query_vec)
+            if norm > 0:
+                query_vec = query_vec / norm
 
-                    # Calculate cosine similarity
-                    if query_mag > 0 and file_mag > 0:
-                        similarity = dot_product / (query_mag * file_mag)
-                    else:
-                        similarity = 0.0
-
-                    similarities.append((file_path, similarity))
-
-            # Sort by similarity (highest first)
-            similarities.sort(key=lambda x: x[1], reverse=True)
-
-            # Get top-k results
-            top_results = similarities[:top_k]
-
-            # Format results
+            # Inner products of normalized vectors are cosine similarities
             results = []
-            for file_path, score in top_results:
+            for vec_id, score in self.vectors.search(query_vec, top_k):
+                file_path = self._paths_by_id.get(vec_id)
+                if file_path is None:
+                    continue
                 results.append({
                     'file_path': file_path,
                     'score': score,
@@ -393,13 +430,25 @@ class IndexPartitionManager:
     index partitions to enable efficient incremental updates.
     """
 
-    def __init__(self, storage_path: Optional[str] = None):
+    def __init__(
+        self,
+        storage_path: Optional[str] = None,
+        precision: str = EMBEDDING_PRECISION,
+        pq_m: int = EMBEDDING_PQ_M,
+        rerank_factor: int = EMBEDDING_RERANK_FACTOR
+    ):
         """
         Initialize the index partition manager.
 
         Args:
             storage_path: Path to store partition data (defaults to ~/.agent_s3/index)
+            precision: Storage precision of partition embedding vectors
+            pq_m: Sub-quantizers per vector at ``pq`` precision
+            rerank_factor: Candidates re-ranked exactly per result below float32
         """
+        self.precision = precision
+        self.pq_m = pq_m
+        self.rerank_factor = rerank_factor
         self.storage_path = storage_path
         if not self.storage_path:
             # Default to a hidden directory in the user's home
@@ -457,11 +506,7 @@ class IndexPartitionManager:
 
                                 # Create partition object
                                 criteria = partition_metadata.get("criteria", {})
-                                partition = IndexPartition(
-                                    partition_id=partition_id,
-                                    storage_path=self.storage_path,
-                                    criteria=criteria
-                                )
+                                partition = self._new_partition(partition_id, criteria)
 
                                 # Add to partitions dictionary
                                 self.partitions[partition_id] = partition
@@ -477,6 +522,17 @@ class IndexPartitionManager:
         except Exception as e:
             logger.error("Error loading partitions: %s", e)
 
+    def _new_partition(self, partition_id: str, criteria: Dict[str, Any]) -> IndexPartition:
+        """Open the partition stored under ``partition_id`` with this manager's vector settings."""
+        return IndexPartition(
+            partition_id=partition_id,
+            storage_path=self.storage_path,
+            criteria=criteria,
+            precision=self.precision,
+            pq_m=self.pq_m,
+            rerank_factor=self.rerank_factor
+        )
+
     def _save_metadata(self) -> None:
         """Save manager metadata to disk."""
         try:
@@ -523,11 +579,7 @@ class IndexPartitionManager:
                 return partition_id  # Return existing partition
 
             # Create new partition
-            partition = IndexPartition(
-                partition_id=partition_id,
-                storage_path=self.storage_path,
-                criteria=criteria
-            )
+            partition = self._new_partition(partition_id, criteria)
 
             # Add to partitions dictionary
             self.partitions[partition_id] = partition
@@ -764,7 +816,9 @@ class IndexPartitionManager:
             stats["partitions"][partition_id] = {
                 "file_count": partition.get_file_count(),
                 "criteria": partition.criteria,
-                "last_updated": partition.metadata.get("last_updated")
+                "last_updated": partition.metadata.get("last_updated"),
+                "precision": partition.precision,
+                "vector_bytes": partition.get_vector_bytes()
             }
 
         return stats
@@ -844,8 +898,9 @@ class IndexPartitionManager:
                     new_pid = self.create_partition(partition.criteria)
                     new_part = self.partitions[new_pid]
                     for fp in files[half:]:
-                        emb = partition.file_embeddings.pop(fp)
-                        meta = partition.file_metadata.pop(fp)
+                        emb = partition.get_embedding(fp)
+                        meta = partition.file_metadata[fp]
+                        partition.remove_file(fp)
                         new_part.add_file(fp, emb, meta)
                         self.file_to_partition[fp] = new_pid
                     partition.commit()
@@ -866,7 +921,7 @@ class IndexPartitionManager:
                     p2 = self.partitions[pid2]
                     if p2.criteria == p.criteria and p2.get_file_count() + p.get_file_count() <= max_files_per_partition:
                         for fp in p.get_all_files():
-                            emb = p.file_embeddings[fp]
+                            emb = p.get_embedding(fp)
                             meta = p.file_metadata[fp]
                             p2.add_file(fp, emb, meta)
                             self.file_to_partition[fp] = pid2
@@ -911,14 +966,13 @@ class IndexPartitionManager:
                     # copy entire partition directory
                     target_dir = os.path.join(self.storage_path, f"partition_{pid}")
                     shutil.copytree(part.storage_path, target_dir, dirs_exist_ok=True)
-                    self.partitions[pid] = IndexPartition(pid, self.storage_path, part.criteria)
-                    self.partitions[pid]._load_data()
+                    self.partitions[pid] = self._new_partition(pid, part.criteria)
                     for fp in part.get_all_files():
                         self.file_to_partition[fp] = pid
                 else:
                     target = self.partitions[pid]
                     for fp in part.get_all_files():
-                        emb = part.file_embeddings[fp]
+                        emb = part.get_embedding(fp)
                         meta = part.file_metadata[fp]
                         target.add_file(fp, emb, meta)
                         self.file_to_partition[fp] = pid
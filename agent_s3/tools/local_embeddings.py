@@ -0,0 +1,262 @@
+"""
+Offline CPU embedding backends for :class:`~agent_s3.tools.embedding_client.EmbeddingClient`.
+
+Two backends are provided, and both return L2-normalized float32 rows of
+exactly ``dim`` values for a batch of texts:
+
+- :class:`HashingEmbedder` (``"local"``, the default) hashes code-aware
+  tokens into ``dim`` signed buckets. Identifiers are split on camelCase and
+  snake_case, and features are subword unigrams, bigrams and character
+  trigrams. It needs only numpy and is deterministic across processes and
+  machines.
+- :class:`OnnxEmbedder` (``"onnx"``) runs a small sentence-embedding model,
+  optionally quantized, with ``onnxruntime`` and a Hugging Face
+  ``tokenizers`` file. Both packages are optional (``pip install
+  agent-s3[onnx]``). Token states are mean-pooled, and when the model's width
+  differs from ``dim`` they are mapped to ``dim`` with a fixed random
+  projection.
+
+:func:`create_embedding_backend` picks one from the configuration and returns
+``None`` for ``"llm"``, which keeps the legacy ``embedder`` role path.
+:func:`iter_batches` splits texts into batches bounded by count and tokens,
+for local inference and for multi-input requests to embedding endpoints.
+"""
+
+import hashlib
+import logging
+import math
+import re
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from agent_s3.config import EMBEDDING_BATCH_MAX_TOKENS, EMBEDDING_BATCH_SIZE
+from agent_s3.routing_policy import estimate_tokens
+
+try:
+    import onnxruntime
+except Exception:  # pragma: no cover - onnxruntime optional
+    onnxruntime = None
+
+try:
+    from tokenizers import Tokenizer
+except Exception:  # pragma: no cover - tokenizers optional
+    Tokenizer = None
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKENDS = ("local", "onnx", "llm")
+DEFAULT_EMBEDDING_BACKEND = "local"
+
+# Identifiers, numbers, and single punctuation characters
+_TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+|[^\sA-Za-z0-9_]")
+# Subwords of an identifier: "parseHTTPResponse_v2" -> parse, HTTP, Response, v2
+_SUBWORD_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+|[A-Za-z]+")
+
+# Feature weights; unigrams dominate, the rest add order and spelling tolerance
+_UNIGRAM_WEIGHT = 1.0
+_BIGRAM_WEIGHT = 0.5
+_TRIGRAM_WEIGHT = 0.25
+
+
+def iter_batches(
+    texts: Sequence[str],
+    batch_size: int = EMBEDDING_BATCH_SIZE,
+    max_tokens: Optional[int] = EMBEDDING_BATCH_MAX_TOKENS,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> Iterator[List[int]]:
+    """Yield lists of indices into ``texts``, in order, forming each batch.
+
+    A batch holds at most ``batch_size`` texts and, unless ``max_tokens`` is
+    ``None``, at most ``max_tokens`` tokens. A text over the token limit on
+    its own is sent alone.
+    """
+    batch: List[int] = []
+    batch_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = count_tokens(text) if max_tokens is not None else 0
+        if batch and (len(batch) >= batch_size or (max_tokens is not None and batch_tokens + tokens > max_tokens)):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+class EmbeddingBackend(ABC):
+    """Turns a batch of texts into normalized ``(len(texts), dim)`` float32 rows."""
+
+    dim: int
+    model_id: str
+    # Whether cosine similarity reflects meaning rather than shared tokens
+    semantic: bool = True
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return one normalized embedding row per text."""
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+@lru_cache(maxsize=1 << 17)
+def _feature_slot(feature: str, dim: int) -> int:
+    """Return a stable signed bucket for a feature: ``index + 1`` or ``-(index + 1)``."""
+    h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+    index = h % dim + 1
+    return index if h >> 63 else -index
+
+
+class HashingEmbedder(EmbeddingBackend):
+    """Feature-hashing embedder over code-aware tokens.
+
+    Texts sharing identifiers, words and phrasing land close together, which
+    suits code search. It does not model synonyms or meaning: prompts that
+    differ in one decisive word still score high, so
+    :class:`~agent_s3.tools.semantic_cache.SemanticCache` does not match on
+    its vectors. Use :class:`OnnxEmbedder` for that.
+    """
+
+    VERSION = 1
+    semantic = False
+
+    def __init__(self, dim: int = 768) -> None:
+        self.dim = dim
+        self.model_id = f"hashing-v{self.VERSION}-{dim}"
+
+    @staticmethod
+    def _subwords(text: str) -> list:
+        subwords = []
+        for token in _TOKEN_RE.findall(text):
+            if token[0].isalpha() or token[0] == "_":
+                parts = _SUBWORD_RE.findall(token)
+                subwords.extend(part.lower() for part in parts)
+                if len(parts) > 1:
+                    subwords.append(token.lower())
+            elif token.isdigit():
+                subwords.append(token)
+        return subwords
+
+    def _features(self, text: str) -> Dict[str, float]:
+        words = self._subwords(text)
+        counts: Counter = Counter()
+        for word in words:
+            counts["w:" + word] += 1
+            if len(word) > 3:
+                padded = f"<{word}>"
+                for i in range(len(padded) - 2):
+                    counts["c:" + padded[i:i + 3]] += 1
+        for first, second in zip(words, words[1:]):
+            counts[f"b:{first} {second}"] += 1
+
+        weights = {"w": _UNIGRAM_WEIGHT, "b": _BIGRAM_WEIGHT, "c": _TRIGRAM_WEIGHT}
+        # Sublinear term frequency keeps repeated boilerplate from dominating
+        return {feature: weights[feature[0]] * (1 + math.log(count)) for feature, count in counts.items()}
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text or "")
+            if not features:
+                continue
+            slots = np.fromiter((_feature_slot(f, self.dim) for f in features), dtype=np.int64, count=len(features))
+            values = np.fromiter(features.values(), dtype=np.float32, count=len(features))
+            np.add.at(matrix[row], np.abs(slots) - 1, np.where(slots > 0, values, -values))
+        return _normalize_rows(matrix)
+
+
+class OnnxEmbedder(EmbeddingBackend):
+    """Mean-pooled sentence embeddings from a local ONNX model on CPU.
+
+    Raises:
+        ImportError: If ``onnxruntime`` or ``tokenizers`` is not installed
+    """
+
+    def __init__(
+        self,
+        model_path: Union[str, Path],
+        tokenizer_path: Union[str, Path],
+        dim: int = 768,
+        max_length: int = 256,
+        threads: Optional[int] = None,
+    ) -> None:
+        if onnxruntime is None or Tokenizer is None:
+            raise ImportError("The onnx embedding backend needs the onnxruntime and tokenizers packages")
+        self.dim = dim
+        self.model_id = f"onnx-{Path(model_path).stem}-{dim}"
+
+        options = onnxruntime.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self._projection: Optional[np.ndarray] = None
+
+    def _project(self, pooled: np.ndarray) -> np.ndarray:
+        width = pooled.shape[1]
+        if width == self.dim:
+            return pooled
+        if self._projection is None or self._projection.shape[0] != width:
+            # Seeded by the model id, so every process maps to the same space
+            rng = np.random.default_rng(zlib.crc32(self.model_id.encode()))
+            self._projection = (rng.standard_normal((width, self.dim)) / math.sqrt(self.dim)).astype(np.float32)
+        return pooled @ self._projection
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        encodings = self.tokenizer.encode_batch(list(texts))
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        output = self.session.run(None, {k: v for k, v in feeds.items() if k in self._input_names})[0]
+        if output.ndim == 3:
+            weights = mask[..., None].astype(np.float32)
+            output = (output * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1.0)
+        return _normalize_rows(self._project(output.astype(np.float32)))
+
+
+def create_embedding_backend(config: Dict[str, Any], dim: int) -> Optional[EmbeddingBackend]:
+    """Return the backend named by ``embedding_backend``; ``None`` means the LLM path.
+
+    An ``"onnx"`` backend that cannot be loaded falls back to ``"local"``.
+    """
+    backend = config.get("embedding_backend") or DEFAULT_EMBEDDING_BACKEND
+    if backend not in EMBEDDING_BACKENDS:
+        logger.warning("Unknown embedding backend %r; using %r", backend, DEFAULT_EMBEDDING_BACKEND)
+        backend = DEFAULT_EMBEDDING_BACKEND
+    if backend == "llm":
+        return None
+    if backend == "onnx":
+        model_path = config.get("embedding_onnx_model")
+        tokenizer_path = config.get("embedding_onnx_tokenizer")
+        try:
+            if not model_path or not tokenizer_path:
+                raise ValueError("embedding_onnx_model and embedding_onnx_tokenizer must be set")
+            return OnnxEmbedder(
+                model_path,
+                tokenizer_path,
+                dim,
+                max_length=config.get("embedding_onnx_max_length", 256),
+                threads=config.get("embedding_onnx_threads"),
+            )
+        except Exception as e:
+            logger.warning("Could not load ONNX embedding model: %s. Using the hashing embedder.", e)
+    return HashingEmbedder(dim)
@@ -418,24 +418,42 @@ class MemoryManager:
 
     def update_embedding(self, file_path: str):
         """Update embedding for a file immediately and add to embedding client."""
-        # Read file content
-        content = self.file_tool.read_file(file_path)
-        if content is None:
-            return
-        # Generate embedding
-        embedding = self.embedding_client.generate_embedding(content)
-        if embedding is None:
-            return
-        # Prepare array for embedding client: always wrap embedding in a numpy array
-        arr = np.array([embedding])
-        # Prepare metadata
-        stat = Path(file_path).stat()
-        metadata = [{
-            'file_path': str(Path(file_path).resolve()),
-            'last_modified': stat.st_mtime
-        }]
-        # Add embeddings synchronously
-        self.embedding_client.add_embeddings(arr, metadata)
+        self.update_embeddings([file_path])
+
+    def update_embeddings(self, file_paths: List[str]) -> int:
+        """Embed files in batches and add them to the embedding client.
+
+        Files that cannot be read or embedded are skipped.
+
+        Returns:
+            Number of files whose embeddings were added
+        """
+        # Read file contents
+        contents = {}
+        for file_path in file_paths:
+            content = self.file_tool.read_file(file_path)
+            if content is not None:
+                contents[file_path] = content
+        if not contents:
+            return 0
+        # Generate embeddings for all files at once
+        embeddings = self.embedding_client.generate_embeddings(list(contents.values()))
+        rows = []
+        metadata = []
+        for file_path, embedding in zip(contents, embeddings):
+            if embedding is None:
+                continue
+            rows.append(embedding)
+            stat = Path(file_path).stat()
+            metadata.append({
+                'file_path': str(Path(file_path).resolve()),
+                'last_modified': stat.st_mtime
+            })
+        if not rows:
+            return 0
+        # Add embeddings synchronously in one batch
+        self.embedding_client.add_embeddings(np.array(rows), metadata)
+        return len(rows)
 
     def remove_embedding(self, file_path: str, record_removal: bool = False):
         """
@@ -0,0 +1,319 @@
+"""
+Reduced-precision vector storage with exact re-ranking.
+
+:class:`QuantizedIndex` searches vectors held at one of ``PRECISIONS``:
+
+- ``float32``: ``IndexFlatIP``, exact, 4 bytes per dimension (3 KB per
+  768-d vector)
+- ``float16``: ``IndexScalarQuantizer`` with ``QT_fp16``, 2 bytes per
+  dimension, no training
+- ``int8``: ``IndexScalarQuantizer`` with ``QT_8bit``, 1 byte per dimension.
+  Per-dimension ranges are trained on the stored vectors.
+- ``pq``: ``IndexPQ`` with ``pq_m`` 8-bit sub-quantizers, ``pq_m`` bytes per
+  vector
+
+At reduced precision, the float32 vectors are also kept, in a ``.npy`` file
+that is memory-mapped once saved, so only rows that are read enter RAM. A
+search takes ``rerank_factor * k`` candidates from the compressed index and
+re-scores them exactly against those rows. ``int8`` and ``pq`` need
+training data. Below ``MIN_TRAINING_VECTORS`` the float32 rows are searched
+exactly instead, which is cheap at that size.
+
+An index is saved as ``<prefix>.faiss`` plus, at reduced precision,
+``<prefix>.vectors.npy`` and ``<prefix>.ids.npy``. Loading with another
+precision re-quantizes from the float32 rows, or from the stored index when
+those rows do not exist.
+"""
+
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import faiss
+import numpy as np
+
+from agent_s3.tools.semantic_cache_index import DEFAULT_PQ_M, MIN_POINTS_PER_LIST
+
+logger = logging.getLogger(__name__)
+
+PRECISIONS = ("float32", "float16", "int8", "pq")
+DEFAULT_PRECISION = "float32"
+# Candidates fetched from the compressed index per result returned
+DEFAULT_RERANK_FACTOR = 4
+# Vectors needed to train each precision; PQ trains 256 centroids per sub-quantizer
+MIN_TRAINING_VECTORS = {"int8": 1000, "pq": 256 * MIN_POINTS_PER_LIST}
+# Training sample cap, and rows copied per chunk when adding or saving
+MAX_TRAINING_VECTORS = 100000
+_CHUNK_ROWS = 65536
+# int8 ranges are widened by this fraction, so vectors added after training clip less
+_INT8_RANGE_MARGIN = 0.2
+
+
+def _pq_subquantizers(dim: int, pq_m: int) -> int:
+    """Return the largest divisor of ``dim`` that is at most ``pq_m``."""
+    for m in range(min(pq_m, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def new_index(dim: int, precision: str = DEFAULT_PRECISION, pq_m: int = DEFAULT_PQ_M) -> faiss.IndexIDMap2:
+    """Return an empty inner-product index at ``precision``, keyed by ids."""
+    metric = faiss.METRIC_INNER_PRODUCT
+    if precision == "float16":
+        base = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, metric)
+    elif precision == "int8":
+        base = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, metric)
+        base.sq.rangestat = faiss.ScalarQuantizer.RS_minmax
+        base.sq.rangestat_arg = _INT8_RANGE_MARGIN
+    elif precision == "pq":
+        base = faiss.IndexPQ(dim, _pq_subquantizers(dim, pq_m), 8, metric)
+    else:
+        base = faiss.IndexFlatIP(dim)
+    return faiss.IndexIDMap2(base)
+
+
+def index_precision(index: faiss.Index) -> str:
+    """Return which of ``PRECISIONS`` a stored index uses."""
+    base = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+    if isinstance(base, faiss.IndexPQ):
+        return "pq"
+    if isinstance(base, faiss.IndexScalarQuantizer):
+        return "float16" if base.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "int8"
+    return "float32"
+
+
+class QuantizedIndex:
+    """Inner-product index over ids at a configurable storage precision."""
+
+    def __init__(
+        self,
+        dim: int,
+        precision: str = DEFAULT_PRECISION,
+        pq_m: int = DEFAULT_PQ_M,
+        rerank_factor: int = DEFAULT_RERANK_FACTOR,
+    ) -> None:
+        if precision not in PRECISIONS:
+            logger.warning("Unknown embedding precision %r; using %r", precision, DEFAULT_PRECISION)
+            precision = DEFAULT_PRECISION
+        self.dim = dim
+        self.precision = precision
+        self.pq_m = pq_m
+        self.rerank_factor = max(1, rerank_factor)
+        self.index = new_index(dim, precision, pq_m)
+
+        # float32 rows for re-ranking: saved rows (memory-mapped), then rows added since
+        self.keeps_exact = precision != "float32"
+        self._saved = np.zeros((0, dim), dtype=np.float32)
+        self._added: List[np.ndarray] = []
+        self._added_rows = 0
+        self._rows: Dict[int, int] = {}
+        self._dirty = False
+
+    # ------------------------------------------------------------------
+    # Float32 rows
+    # ------------------------------------------------------------------
+
+    def _row_count(self) -> int:
+        return self._saved.shape[0] + self._added_rows
+
+    def _read_rows(self, rows: np.ndarray) -> np.ndarray:
+        saved = self._saved.shape[0]
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        in_saved = rows < saved
+        if in_saved.any():
+            out[in_saved] = self._saved[rows[in_saved]]
+        if not in_saved.all():
+            if len(self._added) > 1:
+                self._added = [np.concatenate(self._added)]
+            out[~in_saved] = self._added[0][rows[~in_saved] - saved]
+        return out
+
+    def _live_rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return live ids and their rows, ordered by row."""
+        ids = np.fromiter(self._rows.keys(), dtype=np.int64, count=len(self._rows))
+        rows = np.fromiter(self._rows.values(), dtype=np.int64, count=len(self._rows))
+        order = np.argsort(rows)
+        return ids[order], rows[order]
+
+    # ------------------------------------------------------------------
+    # Index operations
+    # ------------------------------------------------------------------
+
+    @property
+    def ntotal(self) -> int:
+        return len(self._rows) if self.keeps_exact else self.index.ntotal
+
+    def ids(self) -> np.ndarray:
+        """Return the ids of all stored vectors."""
+        if self.keeps_exact:
+            return np.fromiter(self._rows.keys(), dtype=np.int64, count=len(self._rows))
+        return faiss.vector_to_array(self.index.id_map).astype(np.int64)
+
+    def add_with_ids(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        """Add vectors under ``ids``, replacing vectors already stored under them."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        if not len(ids):
+            return
+        self.remove_ids(ids)
+        if self.keeps_exact:
+            first = self._row_count()
+            self._added.append(vectors.copy())
+            self._added_rows += len(ids)
+            self._rows.update(zip(ids.tolist(), range(first, first + len(ids))))
+            self._dirty = True
+        if self.index.is_trained:
+            self.index.add_with_ids(vectors, ids)
+        else:
+            self._maybe_train()
+
+    def remove_ids(self, ids: np.ndarray) -> int:
+        """Remove vectors stored under ``ids``; returns how many were removed."""
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        if not len(ids):
+            return 0
+        removed = self.index.remove_ids(ids) if self.index.ntotal else 0
+        if self.keeps_exact:
+            removed = sum(self._rows.pop(int(vec_id), None) is not None for vec_id in ids)
+            self._dirty = self._dirty or bool(removed)
+        return int(removed)
+
+    def _maybe_train(self) -> None:
+        """Train once enough vectors are stored, then index all of them."""
+        if len(self._rows) < MIN_TRAINING_VECTORS.get(self.precision, 0):
+            return
+        ids, rows = self._live_rows()
+        sample = rows
+        if len(rows) > MAX_TRAINING_VECTORS:
+            sample = np.sort(np.random.default_rng(0).choice(rows, MAX_TRAINING_VECTORS, replace=False))
+        logger.info("Training %s embedding index on %d vectors", self.precision, len(sample))
+        self.index.train(self._read_rows(sample))
+        for start in range(0, len(rows), _CHUNK_ROWS):
+            chunk = slice(start, start + _CHUNK_ROWS)
+            self.index.add_with_ids(self._read_rows(rows[chunk]), ids[chunk])
+
+    def get_vector(self, vec_id: int) -> Optional[np.ndarray]:
+        """Return the float32 vector stored under ``vec_id``, or None."""
+        if self.keeps_exact:
+            row = self._rows.get(int(vec_id))
+            return None if row is None else self._read_rows(np.array([row]))[0]
+        try:
+            return self.index.reconstruct(int(vec_id))
+        except RuntimeError:
+            return None
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Return up to ``k`` ``(id, inner product)`` pairs, best first.
+
+        At reduced precision the scores are exact, computed from the float32
+        rows of the candidates.
+        """
+        query = np.ascontiguousarray(query, dtype=np.float32).reshape(1, self.dim)
+        if k <= 0 or not self.ntotal:
+            return []
+        if not self.keeps_exact:
+            scores, found = self.index.search(query, min(k, self.ntotal))
+            return [(int(i), float(s)) for s, i in zip(scores[0], found[0]) if i >= 0]
+
+        if self.index.is_trained and self.index.ntotal:
+            _, found = self.index.search(query, min(k * self.rerank_factor, self.index.ntotal))
+            ids = np.array([i for i in found[0].tolist() if i in self._rows], dtype=np.int64)
+            rows = np.array([self._rows[i] for i in ids.tolist()], dtype=np.int64)
+        else:
+            ids, rows = self._live_rows()
+        if not len(ids):
+            return []
+        scores = self._read_rows(rows) @ query[0]
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def memory_bytes(self) -> int:
+        """Return the RAM held by compressed codes, ids and unsaved float32 rows."""
+        base = faiss.downcast_index(self.index.index)
+        code_size = getattr(base, "code_size", 4 * self.dim)
+        return self.index.ntotal * (code_size + 8) + self._added_rows * 4 * self.dim
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _paths(prefix: Union[str, Path]) -> Tuple[Path, Path, Path]:
+        prefix = str(prefix)
+        return Path(prefix + ".faiss"), Path(prefix + ".vectors.npy"), Path(prefix + ".ids.npy")
+
+    def save(self, prefix: Union[str, Path]) -> None:
+        """Write the index and, at reduced precision, its live float32 rows."""
+        index_path, vectors_path, ids_path = self._paths(prefix)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_index = index_path.with_name(index_path.name + ".tmp")
+        faiss.write_index(self.index, str(temp_index))
+        os.replace(temp_index, index_path)
+        if not self.keeps_exact or not (self._dirty or not vectors_path.exists()):
+            return
+
+        # Copy live rows into a new file in chunks, dropping removed rows
+        ids, rows = self._live_rows()
+        temp_vectors = vectors_path.with_name(vectors_path.name + ".tmp.npy")
+        out = np.lib.format.open_memmap(temp_vectors, mode="w+", dtype=np.float32, shape=(len(rows), self.dim))
+        for start in range(0, len(rows), _CHUNK_ROWS):
+            out[start:start + _CHUNK_ROWS] = self._read_rows(rows[start:start + _CHUNK_ROWS])
+        out.flush()
+        del out
+        temp_ids = ids_path.with_name(ids_path.name + ".tmp.npy")
+        np.save(temp_ids, ids)
+        os.replace(temp_vectors, vectors_path)
+        os.replace(temp_ids, ids_path)
+        self._attach_rows(np.load(vectors_path, mmap_mode="r"), ids)
+
+    def _attach_rows(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        self._saved = vectors
+        self._added = []
+        self._added_rows = 0
+        self._rows = dict(zip(ids.tolist(), range(len(ids))))
+        self._dirty = False
+
+    @classmethod
+    def load(
+        cls,
+        prefix: Union[str, Path],
+        dim: int,
+        precision: str = DEFAULT_PRECISION,
+        pq_m: int = DEFAULT_PQ_M,
+        rerank_factor: int = DEFAULT_RERANK_FACTOR,
+    ) -> "QuantizedIndex":
+        """Load an index saved by :meth:`save`, re-quantizing it if ``precision`` changed."""
+        index_path, vectors_path, ids_path = cls._paths(prefix)
+        result = cls(dim, precision, pq_m, rerank_factor)
+        stored = faiss.read_index(str(index_path)) if index_path.exists() else None
+        if stored is not None and stored.d != dim:
+            raise ValueError(f"Stored index has dimension {stored.d}, expected {dim}")
+        vectors = ids = None
+        if vectors_path.exists() and ids_path.exists():
+            vectors = np.load(vectors_path, mmap_mode="r")
+            ids = np.load(ids_path)
+
+        same_layout = (
+            stored is not None
+            and isinstance(stored, faiss.IndexIDMap2)
+            and index_precision(stored) == result.precision
+        )
+        if same_layout and (not result.keeps_exact or vectors is not None):
+            result.index = stored
+            if result.keeps_exact:
+                result._attach_rows(vectors, ids)
+            return result
+
+        if vectors is None and stored is not None and stored.ntotal:
+            # Legacy or float32 index: recover vectors from the stored codes
+            ids = faiss.vector_to_array(stored.id_map).astype(np.int64)
+            vectors = faiss.downcast_index(stored.index).reconstruct_n(0, stored.ntotal)
+        if vectors is not None and len(ids):
+            logger.info("Re-quantizing %d vectors at %s precision", len(ids), result.precision)
+            for start in range(0, len(ids), _CHUNK_ROWS):
+                chunk = slice(start, start + _CHUNK_ROWS)
+                result.add_with_ids(np.asarray(vectors[chunk]), ids[chunk])
+        return result
@@ -5,24 +5,44 @@ This module provides a drop-in replacement for any LLM provider with intelligent
 based on semantic similarity rather than exact key matching.
 """
 
+import fnmatch
 import os
 import time
 import json
-import hashlib
 import logging
 import inspect
-from typing import Dict, Any, Optional, Union, Callable, TypeVar
+from typing import Dict, Any, Iterable, Optional, Union, Callable, TypeVar
 from functools import wraps
 import numpy as np
 from pathlib import Path
 import threading
-import faiss
-import shutil
-import stat
 
 # Import our embedding client for vector similarity
 from agent_s3.tools.embedding_client import EmbeddingClient
+from agent_s3.tools.semantic_cache_bundle import DEFAULT_DEDUPE_THRESHOLD, export_bundle, import_bundle
+from agent_s3.tools.semantic_cache_index import (
+    DEFAULT_ANN_THRESHOLD,
+    DEFAULT_EF_SEARCH,
+    DEFAULT_HNSW_M,
+    DEFAULT_NPROBE,
+    DEFAULT_PQ_M,
+    INDEX_KINDS,
+)
+from agent_s3.tools.semantic_cache_key import cache_key
+from agent_s3.tools.semantic_cache_metrics import CacheMetrics, PricingTable, hit_rates
+from agent_s3.tools.semantic_cache_namespace import (
+    DEFAULT_EVICTION_POLICY,
+    EVICTION_POLICIES,
+    CacheNamespace,
+)
+from agent_s3.tools.semantic_cache_store import DEFAULT_NAMESPACE, SemanticCacheStore
+from agent_s3.tools.semantic_cache_validation import (
+    ResponseValidator,
+    check_response,
+    register_cache_validator,
+)
 from agent_s3.config import get_config, ConfigModel
+from agent_s3.routing_policy import estimate_tokens
 
 # Type variables for generic function signatures
 T = TypeVar('T')
@@ -34,7 +54,9 @@ logger = logging.getLogger(__name__)
 DEFAULT_CACHE_TTL = 3600 * 24 * 7  # 7 days in seconds
 DEFAULT_SIMILARITY_THRESHOLD = 0.85  # Minimum cosine similarity to consider a cache hit
 DEFAULT_CACHE_DIR = ".cache/semantic_cache"
-CACHE_VERSION = "v1.0"
+CACHE_VERSION = "v2.0"
+# Placeholder for a namespace component the prompt does not specify
+ANY_COMPONENT = "*"
 
 class SemanticCache:
     """
@@ -43,6 +65,26 @@ class SemanticCache:
     This cache stores both exact matches (using hash keys) and semantic matches
     (using vector embeddings for similarity search). It supports both synchronous
     and asynchronous interfaces, TTL-based expiration, and flexible similarity thresholds.
+
+    Entries are partitioned into :class:`CacheNamespace` objects keyed by
+    ``role/model/response_format``, each with its own FAISS index, TTL,
+    threshold, capacity and statistics. A lookup only searches its own
+    namespace. Per-namespace settings come from ``semantic_cache_namespaces``,
+    a mapping of glob patterns such as ``"test_critic/*/*"`` to ``ttl``,
+    ``similarity_threshold`` and ``max_entries`` overrides.
+
+    Responses are only stored if they pass the validator registered for the
+    namespace's role (see :meth:`register_validator`), and responses requested
+    as ``json_object`` must parse as JSON.
+
+    :meth:`get_metrics` reports per-namespace hit rates, latency histograms
+    for the hash and vector lookup paths and for embedding calls, and the
+    tokens and dollars hits saved, priced from ``llm.json``.
+
+    The class-level ``_lock`` only guards singleton creation, and
+    ``_namespaces_lock`` only guards namespace creation. Embeddings are
+    generated with no lock held; see :mod:`semantic_cache_namespace` for the
+    locking inside a namespace.
     """
 
     _instance = None
@@ -85,34 +127,62 @@ class SemanticCache:
 
         # Cache directory configuration
         workspace_path = Path(getattr(self.config, "workspace_path", ".")).resolve()
-        cache_dir_name = getattr(self.config, "semantic_cache_dir", DEFAULT_CACHE_DIR)
+        self.workspace_path = workspace_path
+        cache_dir_name = os.getenv("SEMANTIC_CACHE_DIR") or getattr(
+            self.config, "semantic_cache_dir", DEFAULT_CACHE_DIR
+        )
         self.cache_dir = workspace_path / cache_dir_name
         self.cache_dir.mkdir(parents=True, exist_ok=True)
 
-        # Cache parameters
+        # Cache parameters; namespaces without overrides use these
         self.ttl = getattr(self.config, "semantic_cache_ttl", DEFAULT_CACHE_TTL)
         self.similarity_threshold = getattr(self.config, "semantic_similarity_threshold", DEFAULT_SIMILARITY_THRESHOLD)
         self.max_cache_entries = getattr(self.config, "semantic_cache_max_entries", 10000)
+        self.eviction_policy = getattr(self.config, "semantic_cache_eviction_policy", DEFAULT_EVICTION_POLICY)
+        if self.eviction_policy not in EVICTION_POLICIES:
+            logger.warning(
+                "Unknown semantic cache eviction policy %r; using %r",
+                self.eviction_policy,
+                DEFAULT_EVICTION_POLICY,
+            )
+            self.eviction_policy = DEFAULT_EVICTION_POLICY
+        self.namespace_overrides: Dict[str, Dict[str, Any]] = dict(
+            getattr(self.config, "semantic_cache_namespaces", None) or {}
+        )
+
+        # Optional approximate index built once a namespace's flat index grows large
+        self.ann_index = getattr(self.config, "semantic_cache_ann_index", "flat")
+        if self.ann_index not in INDEX_KINDS:
+            logger.warning("Unknown semantic cache index %r; using exact search", self.ann_index)
+            self.ann_index = "flat"
+        self.ann_threshold = getattr(self.config, "semantic_cache_ann_threshold", DEFAULT_ANN_THRESHOLD)
+        self.ann_params = self._ann_params()
 
         # Embedding dimension from config or default
         self.embedding_dim = getattr(self.config, "embedding_dim", 768)
-
-        # Cache statistics
-        self.hits = 0
-        self.misses = 0
-        self.semantic_hits = 0
+        # Identifies the vector space of stored embeddings in exported bundles
+        self.embedding_model = getattr(self.config, "semantic_cache_embedding_model", None)
 
         # Initialize embedding client for semantic similarity
         self._init_embedding_client()
 
-        # Initialize FAISS index for vector search
-        self._init_vector_store()
+        # Namespace name -> per-namespace entries, index and statistics
+        self.namespaces: Dict[str, CacheNamespace] = {}
+        self._namespaces_lock = threading.Lock()
+        self._writes = 0
 
-        # Memory cache for fast lookups (prompt_hash -> cached_response)
-        self.mem_cache: Dict[str, Dict[str, Any]] = {}
+        # Lookup and embedding latencies; llm.json prices are read on the first hit
+        self.metrics = CacheMetrics()
+        self._pricing: Optional[PricingTable] = None
+
+        # Append-only on-disk store for entries and embeddings
+        self.store = SemanticCacheStore(self.cache_dir, self.embedding_dim, self.embedding_model_id)
 
         # Load cache from disk if available
         self._load_cache()
+        for namespace in list(self.namespaces.values()):
+            namespace.drop_stale_versions()
+            namespace.maybe_build_ann_index()
 
         logger.info(
             "Initialized semantic cache in %s with threshold %s",
@@ -135,6 +205,20 @@ class SemanticCache:
         self.ttl = getattr(self.config, "semantic_cache_ttl", self.ttl)
         self.similarity_threshold = getattr(self.config, "semantic_similarity_threshold", self.similarity_threshold)
         self.max_cache_entries = getattr(self.config, "semantic_cache_max_entries", self.max_cache_entries)
+        policy = getattr(self.config, "semantic_cache_eviction_policy", self.eviction_policy)
+        if policy in EVICTION_POLICIES:
+            self.eviction_policy = policy
+        ann_index = getattr(self.config, "semantic_cache_ann_index", self.ann_index)
+        if ann_index in INDEX_KINDS:
+            self.ann_index = ann_index
+        self.ann_threshold = getattr(self.config, "semantic_cache_ann_threshold", self.ann_threshold)
+        self.ann_params = self._ann_params()
+        self.namespace_overrides = dict(
+            getattr(self.config, "semantic_cache_namespaces", None) or self.namespace_overrides
+        )
+        for namespace in list(self.namespaces.values()):
+            namespace.configure(**self._overrides_for(namespace.name))
+            namespace.apply_search_params()
 
         logger.info(
             "Updated semantic cache config: ttl=%ss, threshold=%s",
@@ -153,144 +237,255 @@ class SemanticCache:
                 e,
             )
             self.embedding_client = None
+            return
 
-    def _init_vector_store(self) -> None:
-        """Initialize FAISS index for vector similarity search."""
-        try:
-            # Initialize an in-memory FAISS index with cosine similarity
-            self.index = faiss.IndexFlatIP(self.embedding_dim)  # Inner product (normalized vectors = cosine similarity)
-            self.index_lookup: Dict[int, str] = {}  # Maps FAISS index position to cache key
-            self.next_id = 0
+        # Lexical vectors score near-miss prompts ("add" vs "remove" the same
+        # endpoint) above any usable threshold, so until a semantic local
+        # backend is configured the cache keeps embedding with the LLM path
+        backend = getattr(self.embedding_client, "backend", None)
+        if backend is not None and not backend.semantic:
             logger.info(
-                "Initialized FAISS index with dimension %s",
-                self.embedding_dim,
+                "Embedding backend %s is lexical; semantic cache embeds with the llm backend",
+                backend.model_id,
             )
-        except Exception as e:
-            logger.error(
-                "Failed to initialize FAISS index: %s. Semantic matching will be disabled.",
-                e,
-            )
-            self.index = None
+            config = self.config if isinstance(self.config, dict) else self.config.model_dump()
+            try:
+                self.embedding_client = EmbeddingClient({**config, "embedding_backend": "llm"})
+            except Exception as e:
+                logger.error(
+                    "Failed to initialize llm embedding client: %s. Semantic matching will be disabled.",
+                    e,
+                )
+                self.embedding_client = None
+
+    @property
+    def embedding_model_id(self) -> str:
+        """Name of the model whose vectors this cache stores."""
+        return (
+            self.embedding_model
+            or getattr(self.embedding_client, "model_id", None)
+            or getattr(self.config, "embedder_role_name", "embedder")
+        )
+
+    def _ann_params(self) -> Dict[str, Any]:
+        """Return approximate index settings from the configuration."""
+        return {
+            "hnsw_m": getattr(self.config, "semantic_cache_hnsw_m", DEFAULT_HNSW_M),
+            "ef_search": getattr(self.config, "semantic_cache_ef_search", DEFAULT_EF_SEARCH),
+            "nlist": getattr(self.config, "semantic_cache_ivf_nlist", None),
+            "nprobe": getattr(self.config, "semantic_cache_nprobe", DEFAULT_NPROBE),
+            "pq_m": getattr(self.config, "semantic_cache_pq_m", DEFAULT_PQ_M),
+        }
+
+    # ------------------------------------------------------------------
+    # Namespaces
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def namespace_for(prompt_data: Dict[str, Any]) -> str:
+        """
+        Return the namespace a request belongs to.
+
+        The name is ``role/model/response_format``, with ``*`` for components
+        the prompt does not specify. ``response_format`` may be a string or
+        an OpenAI-style dict, whose ``type`` is used. A prompt with none of
+        the three uses the default namespace.
+
+        Args:
+            prompt_data: Dictionary containing prompt data
+
+        Returns:
+            The namespace name
+        """
+        response_format = prompt_data.get("response_format")
+        if isinstance(response_format, dict):
+            response_format = response_format.get("type") or json.dumps(response_format, sort_keys=True)
+        components = [prompt_data.get("role"), prompt_data.get("model"), response_format]
+        if not any(components):
+            return DEFAULT_NAMESPACE
+        return "/".join(str(component) if component else ANY_COMPONENT for component in components)
+
+    def _overrides_for(self, name: str) -> Dict[str, Any]:
+        """Return the configured overrides whose pattern matches namespace ``name``."""
+        for pattern, overrides in self.namespace_overrides.items():
+            if pattern == name or fnmatch.fnmatchcase(name, pattern):
+                return {
+                    setting: overrides.get(setting)
+                    for setting in ("ttl", "similarity_threshold", "max_entries")
+                }
+        return {}
+
+    def namespace(self, name: str) -> CacheNamespace:
+        """Return namespace ``name``, creating it with its configured overrides."""
+        namespace = self.namespaces.get(name)
+        if namespace is not None:
+            return namespace
+        with self._namespaces_lock:
+            namespace = self.namespaces.get(name)
+            if namespace is None:
+                namespace = CacheNamespace(name, self, **self._overrides_for(name))
+                namespace.apply_search_params()
+                self.namespaces[name] = namespace
+            return namespace
+
+    def configure_namespace(
+        self,
+        name: str,
+        ttl: Optional[float] = None,
+        similarity_threshold: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ) -> CacheNamespace:
+        """
+        Set the TTL, similarity threshold or capacity of one namespace.
+
+        Args:
+            name: Namespace name, as returned by :meth:`namespace_for`
+            ttl: Time-to-live in seconds for the namespace's entries
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+            max_entries: Entries kept before the namespace evicts
+
+        Returns:
+            The configured namespace
+        """
+        namespace = self.namespace(name)
+        namespace.configure(ttl=ttl, similarity_threshold=similarity_threshold, max_entries=max_entries)
+        return namespace
+
+    def register_validator(self, role: str, validate: ResponseValidator, version: str) -> int:
+        """
+        Only cache responses for ``role`` that pass ``validate``.
+
+        Entries stored under a different validator version, including those
+        stored before any validator was registered, are dropped.
+
+        Args:
+            role: Role name, the first component of namespace names
+            validate: Callable returning ``(is_valid, error_message)``
+            version: Schema version recorded on entries that pass
+
+        Returns:
+            Number of stale entries dropped
+        """
+        register_cache_validator(role, validate, version)
+        return sum(
+            namespace.drop_stale_versions()
+            for namespace in list(self.namespaces.values())
+            if namespace.role == role
+        )
+
+    def __len__(self) -> int:
+        return sum(len(namespace) for namespace in list(self.namespaces.values()))
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
 
     def _load_cache(self) -> None:
-        """Load cache entries from disk."""
-        cache_file = self.cache_dir / f"semantic_cache_{CACHE_VERSION}.json"
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r') as f:
-                    cache_data = json.load(f)
-
-                # Load metadata
-                self.hits = cache_data.get("stats", {}).get("hits", 0)
-                self.misses = cache_data.get("stats", {}).get("misses", 0)
-                self.semantic_hits = cache_data.get("stats", {}).get("semantic_hits", 0)
-
-                # Load cache entries
-                entries = cache_data.get("entries", {})
-                current_time = time.time()
-
-                # Process all entries, skipping expired ones
-                valid_entries = {}
-                for key, entry in entries.items():
-                    # Skip expired entries
-                    if current_time - entry.get("timestamp", 0) > self.ttl:
-                        continue
-
-                    # Add to memory cache
-                    valid_entries[key] = entry
-                    self.mem_cache[key] = entry
-
-                    # Add to vector index if embedding is available
-                    embedding_data = entry.get("embedding")
-                    if embedding_data and self.index is not None:
-                        try:
-                            embedding = np.array(embedding_data, dtype=np.float32).reshape(1, -1)
-                            # Skip if embedding dimension doesn't match
-                            if embedding.shape[1] != self.embedding_dim:
-                                continue
-
-                            # Add to FAISS index
-                            self.index.add(embedding)
-                            self.index_lookup[self.next_id] = key
-                            self.next_id += 1
-                        except Exception as e:
-                            logger.warning(
-                                "Failed to add embedding for cache key %s: %s",
-                                key,
-                                e,
-                            )
-
-                logger.info(
-                    "Loaded %d valid cache entries from disk",
-                    len(valid_entries),
+        """Load entry metadata and embeddings from the on-disk store.
+
+        Responses stay on disk until an entry is hit. A v1.0 JSON cache file
+        is migrated into the store first; its entries land in the default
+        namespace.
+        """
+        try:
+            self.store.migrate_legacy_json(self.ttl)
+
+            current_time = time.time()
+            expired = []
+            rows_by_namespace: Dict[str, list] = {}
+            namespace_by_id = {}
+            for entry_id, name, key, timestamp, last_access, size, version in self.store.iter_entries():
+                # Skip expired entries
+                if current_time - timestamp > self.namespace(name).ttl:
+                    expired.append(entry_id)
+                    continue
+                rows_by_namespace.setdefault(name, []).append(
+                    (entry_id, key, timestamp, last_access, size, version)
                 )
+                namespace_by_id[entry_id] = name
+            self.store.delete(expired)
+
+            # Read every stored embedding once and hand each namespace its rows
+            ids, vectors = self.store.get_vectors(list(namespace_by_id)) if namespace_by_id else ([], None)
+            owners = np.array([namespace_by_id[entry_id] for entry_id in ids], dtype=object)
+            for name, rows in rows_by_namespace.items():
+                mask = owners == name
+                namespace_ids = [entry_id for entry_id, keep in zip(ids, mask) if keep]
+                self.namespace(name).load(rows, namespace_ids, vectors[mask] if namespace_ids else None)
+
+            stats = self.store.get_stats()
+            by_namespace = stats.get("namespaces")
+            if by_namespace is None:
+                # Statistics saved before namespaces existed
+                by_namespace = {DEFAULT_NAMESPACE: stats}
+            for name, namespace_stats in by_namespace.items():
+                self.namespace(name).restore_stats(namespace_stats)
 
-            except Exception as e:
-                logger.error("Failed to load cache from disk: %s", e)
-                # Initialize empty cache
-                self.mem_cache = {}
+            logger.info(
+                "Loaded %d valid cache entries in %d namespaces from disk",
+                len(self),
+                len(rows_by_namespace),
+            )
+
+        except Exception as e:
+            logger.error("Failed to load cache from disk: %s", e)
+            # Initialize empty cache
+            self.namespaces = {}
 
     def _save_cache(self) -> None:
-        """Save cache entries to disk."""
-        cache_file = self.cache_dir / f"semantic_cache_{CACHE_VERSION}.json"
-        temp_file = cache_file.with_suffix(".tmp")
+        """Persist statistics and pending access times.
 
+        Entries are written to the store as they are set, so this never
+        rewrites the cache itself.
+        """
         try:
-            # Prepare cache data with statistics
-            cache_data = {
-                "version": CACHE_VERSION,
-                "stats": {
-                    "hits": self.hits,
-                    "misses": self.misses,
-                    "semantic_hits": self.semantic_hits,
-                    "timestamp": time.time()
-                },
-                "entries": self.mem_cache
-            }
-
-            # Write to temporary file first
-            with open(temp_file, 'w') as f:
-                json.dump(cache_data, f)
-            # Move temp file to actual file atomically
-            shutil.move(str(temp_file), str(cache_file))
-            # Restrict permissions to owner read/write
-            os.chmod(cache_file, stat.S_IRUSR | stat.S_IWUSR)
-
+            pending = {}
+            by_namespace = {}
+            for name, namespace in list(self.namespaces.items()):
+                pending.update(namespace.drain_pending_access())
+                stats = namespace.get_stats()
+                by_namespace[name] = {
+                    counter: stats[counter]
+                    for counter in (
+                        "hits",
+                        "misses",
+                        "semantic_hits",
+                        "rejected",
+                        "saved_input_tokens",
+                        "saved_output_tokens",
+                        "saved_usd",
+                    )
+                }
+            self.store.touch(pending)
+            self.store.save_stats({**self.get_cache_stats(), "namespaces": by_namespace})
             logger.debug(
-                "Saved %d cache entries to disk",
-                len(self.mem_cache),
+                "Saved cache statistics and %d access times",
+                len(pending),
             )
 
         except Exception as e:
             logger.error("Failed to save cache to disk: %s", e)
-            # Clean up temp file if it exists
-            if temp_file.exists():
-                try:
-                    temp_file.unlink()
-                except Exception:
-                    pass
+
+    def _response(self, entry: Dict[str, Any]) -> Any:
+        """Return an entry's response, reading it from the store on first use."""
+        if "response" not in entry:
+            entry["response"] = self.store.get_response(entry["id"])
+        return entry["response"]
 
     def clear(self) -> None:
         """Clear all cache entries."""
-        with self._lock:
-            self.mem_cache.clear()
-            if self.index is not None:
-                # Reset FAISS index
-                self.index = faiss.IndexFlatIP(self.embedding_dim)
-                self.index_lookup.clear()
-                self.next_id = 0
-
-            # Reset statistics
-            self.hits = 0
-            self.misses = 0
-            self.semantic_hits = 0
-
-            # Save empty cache
-            self._save_cache()
+        for namespace in list(self.namespaces.values()):
+            namespace.reset()
+        self.store.clear()
+        self.metrics.reset()
 
-            logger.info("Cleared semantic cache")
+        # Save empty cache
+        self._save_cache()
+
+        logger.info("Cleared semantic cache")
 
-    def get_cache_key(self, prompt_data: Dict[str, Any]) -> str:
+    @staticmethod
+    def get_cache_key(prompt_data: Dict[str, Any]) -> str:
         """
         Generate a deterministic cache key for the given prompt data.
 
@@ -300,37 +495,7 @@ class SemanticCache:
         Returns:
             A string hash key
         """
-        # Create a normalized, sorted copy of the input dictionary
-        # This ensures consistent hashing regardless of key order
-        prompt_copy = json.loads(json.dumps(prompt_data, sort_keys=True))
-
-        # Extract only the essential parts that affect the output
-        essential_data = {}
-
-        # Extract messages if present (OpenAI-style APIs)
-        if "messages" in prompt_copy:
-            essential_data["messages"] = prompt_copy["messages"]
-
-        # Extract prompt if present (older APIs)
-        if "prompt" in prompt_copy:
-            essential_data["prompt"] = prompt_copy["prompt"]
-
-        # Add model information if present
-        if "model" in prompt_copy:
-            essential_data["model"] = prompt_copy["model"]
-
-        # Include temperature as it affects output
-        if "temperature" in prompt_copy:
-            essential_data["temperature"] = prompt_copy["temperature"]
-
-        # Include any other parameters that affect output
-        for param in ["max_tokens", "top_p", "frequency_penalty", "presence_penalty"]:
-            if param in prompt_copy:
-                essential_data[param] = prompt_copy[param]
-
-        # Create a hash of the essential data
-        key_str = json.dumps(essential_data, sort_keys=True)
-        return hashlib.sha256(key_str.encode()).hexdigest()
+        return cache_key(prompt_data)
 
     def get_prompt_text(self, prompt_data: Dict[str, Any]) -> str:
         """
@@ -358,271 +523,261 @@ class SemanticCache:
         # Fall back to string representation
         return str(prompt_data)
 
-    def get(self, prompt_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    def _embed(self, prompt_text: str) -> Optional[np.ndarray]:
+        """Return the normalized embedding of ``prompt_text``; no cache lock is held."""
+        start = time.perf_counter()
+        embedding = self.embedding_client.generate_embedding(prompt_text)
+        self.metrics.record("embedding", time.perf_counter() - start)
+        if embedding is None:
+            return None
+        # Normalize embedding for cosine similarity
+        embedding = np.asarray(embedding, dtype=np.float32)
+        return embedding / np.linalg.norm(embedding)
+
+    def get(self, prompt_data: Dict[str, Any], namespace: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Get a cached response for the given prompt data.
 
         Args:
             prompt_data: Dictionary containing prompt data
+            namespace: Namespace to search; defaults to :meth:`namespace_for`
 
         Returns:
             Cached response if found, None otherwise
         """
-        with self._lock:
-            # Generate cache key
-            key = self.get_cache_key(prompt_data)
-
-            # Check for exact match in memory cache
-            if key in self.mem_cache:
-                entry = self.mem_cache[key]
-
-                # Check if entry is expired
-                if time.time() - entry.get("timestamp", 0) > self.ttl:
-                    # Remove expired entry
-                    del self.mem_cache[key]
-                    logger.debug("Removed expired cache entry: %s", key[:8])
-                    return None
-
-                # Update access timestamp
-                entry["last_access"] = time.time()
-
-                # Increment hit counter
-                self.hits += 1
-
-                logger.debug("Cache hit for key: %s", key[:8])
-                return {'response': entry.get("response"), 'cached': True}
-
-            # No exact match, try semantic search
-            if self.embedding_client is not None and self.index is not None and self.index.ntotal > 0:
-                # Get prompt text for embedding
-                prompt_text = self.get_prompt_text(prompt_data)
-
-                try:
-                    # Generate embedding
-                    query_embedding = self.embedding_client.generate_embedding(prompt_text)
-
-                    if query_embedding is not None:
-                        # Normalize embedding for cosine similarity
-                        query_embedding = query_embedding / np.linalg.norm(query_embedding)
-
-                        # Search for similar prompts
-                        distances, indices = self.index.search(
-                            query_embedding.reshape(1, -1).astype('float32'),
-                            k=5  # Get top 5 matches
-                        )
-
-                        # Check if we have a semantic match above threshold
-                        if distances.size > 0 and distances[0][0] > self.similarity_threshold:
-                            best_idx = indices[0][0]
-                            match_key = self.index_lookup.get(best_idx)
-
-                            if match_key and match_key in self.mem_cache:
-                                entry = self.mem_cache[match_key]
-
-                                # Check if entry is expired
-                                if time.time() - entry.get("timestamp", 0) > self.ttl:
-                                    return None
-
-                                # Update access timestamp
-                                entry["last_access"] = time.time()
-
-                                # Increment semantic hit counter
-                                self.semantic_hits += 1
-
-                                logger.info(
-                                    "Semantic cache hit with similarity %.3f > threshold %s",
-                                    distances[0][0],
-                                    self.similarity_threshold,
-                                )
-                                return {'response': entry.get("response"), 'cached': True}
-
-                except Exception as e:
-                    logger.warning("Error during semantic search: %s", e)
-
-            # No match found
-            self.misses += 1
-            return None
+        start = time.perf_counter()
+        cache_namespace = self.namespace(namespace if namespace is not None else self.namespace_for(prompt_data))
+
+        # Generate cache key
+        key = self.get_cache_key(prompt_data)
+
+        # Check for exact match in memory cache
+        entry = cache_namespace.lookup(key)
+        if entry is not None:
+            cache_namespace.record_hit(entry)
+            response = self._response(entry)
+            self.metrics.record("exact_lookup", time.perf_counter() - start)
+            self._record_savings(cache_namespace, prompt_data, entry, response)
+            logger.debug("Cache hit for key: %s", key[:8])
+            return {'response': response, 'cached': True}
+
+        # No exact match, try semantic search within the namespace only
+        if self.embedding_client is not None and cache_namespace.has_vectors():
+            # Get prompt text for embedding
+            prompt_text = self.get_prompt_text(prompt_data)
+
+            try:
+                query_embedding = self._embed(prompt_text)
+                match = cache_namespace.search(query_embedding) if query_embedding is not None else None
+                if match is not None:
+                    entry, similarity = match
+                    cache_namespace.record_hit(entry, semantic=True)
+                    response = self._response(entry)
+                    self.metrics.record("vector_lookup", time.perf_counter() - start)
+                    self._record_savings(cache_namespace, prompt_data, entry, response, semantic=True)
+                    logger.info(
+                        "Semantic cache hit with similarity %.3f > threshold %s",
+                        similarity,
+                        cache_namespace.similarity_threshold,
+                    )
+                    return {'response': response, 'cached': True}
+
+            except Exception as e:
+                logger.warning("Error during semantic search: %s", e)
+            self.metrics.record("vector_lookup", time.perf_counter() - start)
+        else:
+            self.metrics.record("exact_lookup", time.perf_counter() - start)
+
+        # No match found
+        cache_namespace.record_miss()
+        return None
+
+    @property
+    def pricing(self) -> PricingTable:
+        """Model prices from the workspace's ``llm.json``, loaded on first use."""
+        if self._pricing is None:
+            self._pricing = PricingTable.load(self.workspace_path)
+        return self._pricing
+
+    @staticmethod
+    def _prompt_tokens(prompt_data: Dict[str, Any]) -> int:
+        """Estimate the input tokens of a request, counting every message."""
+        messages = prompt_data.get("messages")
+        if isinstance(messages, list):
+            return sum(
+                estimate_tokens(msg["content"])
+                for msg in messages
+                if isinstance(msg, dict) and isinstance(msg.get("content"), str)
+            )
+        prompt = prompt_data.get("prompt")
+        return estimate_tokens(prompt if isinstance(prompt, str) else str(prompt_data))
+
+    def _record_savings(
+        self,
+        cache_namespace: CacheNamespace,
+        prompt_data: Dict[str, Any],
+        entry: Dict[str, Any],
+        response: Any,
+        semantic: bool = False,
+    ) -> None:
+        """Credit the namespace with the estimated cost of the call a hit avoided.
+
+        Token counts are kept on the entry, except the input of semantic hits,
+        which differs per query.
+        """
+        if "output_tokens" not in entry:
+            entry["output_tokens"] = estimate_tokens(
+                response if isinstance(response, str) else json.dumps(response, default=str)
+            )
+        if semantic:
+            input_tokens = self._prompt_tokens(prompt_data)
+        else:
+            if "input_tokens" not in entry:
+                entry["input_tokens"] = self._prompt_tokens(prompt_data)
+            input_tokens = entry["input_tokens"]
+        usd = self.pricing.cost(
+            cache_namespace.role or prompt_data.get("role"),
+            prompt_data.get("model"),
+            input_tokens,
+            entry["output_tokens"],
+        )
+        cache_namespace.record_savings(input_tokens, entry["output_tokens"], usd)
 
-    def set(self, prompt_data: Dict[str, Any], response: Any) -> None:
+    def set(self, prompt_data: Dict[str, Any], response: Any, namespace: Optional[str] = None) -> None:
         """
         Store a response in the cache.
 
         Args:
             prompt_data: Dictionary containing prompt data
             response: Response to cache
+            namespace: Namespace to store into; defaults to :meth:`namespace_for`
         """
-        with self._lock:
-            # Generate cache key
-            key = self.get_cache_key(prompt_data)
-
-            # Extract prompt text for embedding
-            prompt_text = self.get_prompt_text(prompt_data)
-
-            # Prepare cache entry
-            entry = {
-                "timestamp": time.time(),
-                "last_access": time.time(),
-                "response": response,
-                "prompt_text": prompt_text[:1000],  # Store truncated prompt text for debugging
-                "embedding": None  # Will be filled if embedding generation succeeds
-            }
-
-            # Generate embedding if embedding client is available
-            if self.embedding_client is not None and self.index is not None:
-                try:
-                    embedding = self.embedding_client.generate_embedding(prompt_text)
-
-                    if embedding is not None:
-                        # Normalize embedding for cosine similarity
-                        embedding = embedding / np.linalg.norm(embedding)
-
-                        # Add to FAISS index
-                        self.index.add(embedding.reshape(1, -1).astype('float32'))
-
-                        # Map index position to cache key
-                        self.index_lookup[self.next_id] = key
-                        self.next_id += 1
-
-                        # Store embedding in cache entry
-                        entry["embedding"] = embedding.tolist()
-
-                        # Log successful embedding generation
-                        logger.debug("Successfully generated embedding for cache entry: %s", key[:8])
-                except Exception as e:
-                    # Log the error but continue storing the entry without an embedding
-                    logger.warning("Failed to generate embedding for cache entry: %s", e)
-
-                    # Check if embedding client initialization failed
-                    if self.embedding_client is None:
-                        logger.error("Embedding client is not initialized - semantic search will be disabled")
-                    elif self.index is None:
-                        logger.error("FAISS index is not initialized - semantic search will be disabled")
+        cache_namespace = self.namespace(namespace if namespace is not None else self.namespace_for(prompt_data))
 
-                    # We still store the entry in memory cache, just without embedding
-                    # This allows exact match cache hits to work even when embeddings fail
-
-            # Add to memory cache
-            self.mem_cache[key] = entry
-
-            # Check if we need to evict entries
-            if len(self.mem_cache) > self.max_cache_entries:
-                self._evict_entries()
-
-            # Periodically save cache to disk (every 10 entries)
-            if len(self.mem_cache) % 10 == 0:
-                self._save_cache()
-
-            logger.debug("Added new cache entry: %s", key[:8])
-
-    def _evict_entries(self) -> None:
-        """
-        Evict least recently used cache entries efficiently.
-        Performs partial index updates instead of rebuilding the entire index.
-        """
-        # Identify entries to evict using LRU strategy
-        sorted_entries = sorted(
-            self.mem_cache.items(),
-            key=lambda x: x[1].get("last_access", 0)
+        # Keep responses that fail the role's validator out of the cache
+        cacheable, validator_version, error = check_response(
+            cache_namespace.role or prompt_data.get("role"), response, prompt_data.get("response_format")
         )
-        num_to_evict = max(1, len(sorted_entries) - int(self.max_cache_entries * 0.9))
-        logger.info("Evicting %d cache entries from semantic cache", num_to_evict)
-
-        # Track IDs to remove from the FAISS index
-        entries_to_evict = sorted_entries[:num_to_evict]
-        keys_to_evict = [item[0] for item in entries_to_evict]
-
-        # Find indices to remove from FAISS
-        index_positions_to_remove = []
-        for idx, key in list(self.index_lookup.items()):
-            if key in keys_to_evict:
-                index_positions_to_remove.append(idx)
-                # Remove from lookup map
-                self.index_lookup.pop(idx)
-
-        # Remove entries from memory cache
-        for key in keys_to_evict:
-            self.mem_cache.pop(key, None)
-
-        # If FAISS index needs updating and we have entries to remove
-        if self.index is not None and index_positions_to_remove and hasattr(self.index, 'remove_ids'):
-            try:
-                # Convert to numpy array of the correct type
-                remove_ids = np.array(index_positions_to_remove, dtype=np.int64)
-                # Remove directly from index instead of rebuilding
-                self.index.remove_ids(remove_ids)
-                logger.debug(
-                    "Removed %d entries from FAISS index",
-                    len(remove_ids),
-                )
-            except Exception as e:
-                logger.warning("Error removing entries from FAISS index: %s", e)
-
-                # If partial removal fails, rebuild index as fallback
-                if len(self.mem_cache) > 0:
-                    try:
-                        self._rebuild_index()
-                    except Exception as rebuild_error:
-                        logger.error(
-                            "Failed to rebuild index after eviction: %s",
-                            rebuild_error,
-                        )
-
-        # Save cache state after eviction
-        self._save_cache()
-
-    def _rebuild_index(self) -> None:
-        """Rebuild the FAISS index from scratch using current cache entries."""
-        import faiss
-        import numpy as np
-
-        logger.info("Rebuilding FAISS index from scratch")
-
-        # Count entries with embeddings
-        entries_with_embeddings = sum(1 for entry in self.mem_cache.values() if entry.get("embedding") is not None)
-
-        if entries_with_embeddings == 0:
-            logger.warning("No cache entries with embeddings found, skipping index rebuild")
+        if not cacheable:
+            cache_namespace.record_rejected()
+            logger.info("Not caching response in namespace %r: %s", cache_namespace.name, error)
             return
 
-        # Initialize a new empty index with the right dimensions
-        sample_embedding = next((np.array(entry["embedding"], dtype=np.float32)
-                               for entry in self.mem_cache.values()
-                               if entry.get("embedding") is not None), None)
+        # Generate cache key
+        key = self.get_cache_key(prompt_data)
 
-        if sample_embedding is None:
-            logger.warning("Could not find any valid embeddings to determine dimensions")
-            return
+        # Extract prompt text for embedding
+        prompt_text = self.get_prompt_text(prompt_data)
 
-        dimension = len(sample_embedding)
-        self.index = faiss.IndexFlatL2(dimension)
+        timestamp = time.time()
+        embedding = None
 
-        # Reset lookup dictionary
-        self.index_lookup = {}
-        self.next_id = 0
+        # Generate embedding without holding any cache lock
+        if self.embedding_client is not None and cache_namespace.index is not None:
+            try:
+                embedding = self._embed(prompt_text)
+                if embedding is not None:
+                    logger.debug("Successfully generated embedding for cache entry: %s", key[:8])
+            except Exception as e:
+                # Log the error but continue storing the entry without an embedding.
+                # This allows exact match cache hits to work even when embeddings fail
+                logger.warning("Failed to generate embedding for cache entry: %s", e)
+
+        self._store_entry(cache_namespace, key, response, prompt_text, timestamp, embedding, validator_version)
+        logger.debug("Added new cache entry: %s", key[:8])
+
+    def _store_entry(
+        self,
+        cache_namespace: CacheNamespace,
+        key: str,
+        response: Any,
+        prompt_text: str,
+        timestamp: float,
+        embedding: Optional[np.ndarray],
+        validator_version: Optional[str],
+    ) -> Dict[str, Any]:
+        """Write an entry to the store and its namespace, evicting if needed; return it."""
+        # Append to the on-disk store (prompt text is kept for debugging)
+        entry_id = self.store.put(
+            key,
+            response,
+            prompt_text[:1000],
+            timestamp,
+            embedding,
+            namespace=cache_namespace.name,
+            validator_version=validator_version,
+        )
+        entry = cache_namespace.new_entry(
+            entry_id, timestamp, len(json.dumps(response, default=str)), validator_version
+        )
+        entry["response"] = response
+        evicted = cache_namespace.insert(key, entry, embedding)
+
+        # Persist statistics and access times after evictions and every 10 writes
+        with self._namespaces_lock:
+            self._writes += 1
+            periodic = self._writes % 10 == 0
+        if evicted or periodic:
+            self._save_cache()
+        return entry
 
-        # Add all existing embeddings to the new index
-        for key, entry in self.mem_cache.items():
-            if entry.get("embedding") is not None:
-                try:
-                    # Convert to numpy array and reshape
-                    embedding = np.array(entry["embedding"], dtype=np.float32).reshape(1, -1)
+    def get_cache_stats(self) -> Dict[str, int]:
+        """
+        Return cache statistics: hits, misses, and semantic_hits, summed over namespaces.
+        """
+        totals = {"hits": 0, "misses": 0, "semantic_hits": 0}
+        for namespace in list(self.namespaces.values()):
+            totals["hits"] += namespace.hits
+            totals["misses"] += namespace.misses
+            totals["semantic_hits"] += namespace.semantic_hits
+        return totals
+
+    def get_namespace_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return per-namespace hit counters, sizes, settings and index state."""
+        return {name: namespace.get_stats() for name, namespace in list(self.namespaces.items())}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Return hit rates and savings, in total and per namespace, and latency histograms.
+
+        Latencies are in milliseconds. ``exact_lookup`` covers lookups answered
+        by the hash path alone, ``vector_lookup`` covers lookups that went on
+        to a vector search (embedding included), and ``embedding`` covers
+        every embedding call, including those made by :meth:`set`.
+        """
+        namespaces = self.get_namespace_stats()
+        totals: Dict[str, Any] = {
+            counter: sum(stats[counter] for stats in namespaces.values())
+            for counter in (
+                "hits",
+                "misses",
+                "semantic_hits",
+                "evictions",
+                "rejected",
+                "entries",
+                "saved_input_tokens",
+                "saved_output_tokens",
+                "saved_usd",
+            )
+        }
+        totals.update(hit_rates(totals["hits"], totals["semantic_hits"], totals["misses"]))
+        return {"totals": totals, "namespaces": namespaces, "latency": self.metrics.snapshot()}
 
-                    # Add to index
-                    self.index.add(embedding)
+    def export_bundle(self, path: Union[str, Path], namespaces: Optional[Iterable[str]] = None) -> int:
+        """Write live entries and their vectors to a portable bundle; return the entry count.
 
-                    # Map to cache key
-                    self.index_lookup[self.next_id] = key
-                    self.next_id += 1
-                except Exception as e:
-                    logger.warning("Error adding entry to rebuilt index: %s", e)
+        See :mod:`agent_s3.tools.semantic_cache_bundle` for the format.
+        """
+        return export_bundle(self, path, namespaces)
 
-        logger.info("FAISS index rebuilt with %s entries", self.index.ntotal)
+    def import_bundle(
+        self, path: Union[str, Path], dedupe_threshold: float = DEFAULT_DEDUPE_THRESHOLD
+    ) -> Dict[str, int]:
+        """Merge a bundle into this cache by key, skipping near-duplicate entries.
 
-    def get_cache_stats(self) -> Dict[str, int]:
-        """
-        Return cache statistics: hits, misses, and semantic_hits.
+        Returns:
+            Counts of imported, replaced, kept, duplicate, expired and stale entries
         """
-        return {"hits": self.hits, "misses": self.misses, "semantic_hits": self.semantic_hits}
+        return import_bundle(self, path, dedupe_threshold)
 
 
 def cache_decorator(ttl: Optional[int] = None, similarity_threshold: Optional[float] = None):
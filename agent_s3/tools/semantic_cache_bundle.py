@@ -0,0 +1,203 @@
+"""
+Portable export and import of :class:`~agent_s3.tools.semantic_cache.SemanticCache` contents.
+
+A bundle is a zip archive (deflate-compressed) holding:
+
+- ``manifest.json``: bundle format and version, the embedding model id and
+  dimension of the vectors, and the entry count
+- ``entries.jsonl``: one JSON object per entry with its namespace, key,
+  timestamps, serialized response, prompt text, validator version and the
+  row of its vector, if any
+- ``vectors.f32``: little-endian float32 rows of the entries' embeddings
+
+Bundles let developers and CI runners start from a pre-warmed cache instead
+of a cold one. On import, entries are merged by key, and a newer timestamp
+wins. An entry whose embedding is nearly identical to one the namespace
+already holds (``dedupe_threshold``) is skipped. Vectors from a different
+embedding model or dimension cannot be searched against local ones, so
+their entries are imported for exact-key hits only.
+"""
+
+import json
+import logging
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Union
+
+import numpy as np
+
+from agent_s3.tools.semantic_cache_validation import is_current_version
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = "agent-s3-semantic-cache"
+BUNDLE_VERSION = 1
+# Imported entries at least this similar to an existing one are duplicates
+DEFAULT_DEDUPE_THRESHOLD = 0.98
+
+_MANIFEST = "manifest.json"
+_ENTRIES = "entries.jsonl"
+_VECTORS = "vectors.f32"
+_VECTOR_DTYPE = np.dtype("<f4")
+
+
+def export_bundle(cache: Any, path: Union[str, Path], namespaces: Optional[Iterable[str]] = None) -> int:
+    """
+    Write the cache's live entries to a bundle at ``path``.
+
+    Args:
+        cache: The ``SemanticCache`` to export
+        path: Bundle file to create
+        namespaces: Only export these namespaces; all by default
+
+    Returns:
+        Number of entries exported
+    """
+    # Flush pending access times so the bundle carries them
+    cache._save_cache()
+    wanted = set(namespaces) if namespaces is not None else None
+    now = time.time()
+
+    rows = [
+        row for row in cache.store.export_rows()
+        if (wanted is None or row[1] in wanted) and now - row[3] <= cache.namespace(row[1]).ttl
+    ]
+    ids, vectors = cache.store.get_vectors([row[0] for row in rows])
+    vector_rows = {entry_id: i for i, entry_id in enumerate(ids)}
+
+    lines = []
+    for entry_id, namespace, key, timestamp, last_access, response, prompt_text, version in rows:
+        lines.append(json.dumps({
+            "namespace": namespace,
+            "key": key,
+            "timestamp": timestamp,
+            "last_access": last_access,
+            "response": response,
+            "prompt_text": prompt_text,
+            "validator_version": version,
+            "vector": vector_rows.get(entry_id),
+        }))
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "embedding_model": cache.embedding_model_id,
+        "dim": cache.embedding_dim,
+        "entries": len(rows),
+        "vectors": len(ids),
+        "created": now,
+    }
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        bundle.writestr(_MANIFEST, json.dumps(manifest, indent=2))
+        bundle.writestr(_ENTRIES, "\n".join(lines))
+        bundle.writestr(_VECTORS, np.ascontiguousarray(vectors, dtype=_VECTOR_DTYPE).tobytes())
+    logger.info("Exported %d semantic cache entries to %s", len(rows), path)
+    return len(rows)
+
+
+def read_manifest(path: Union[str, Path]) -> Dict[str, Any]:
+    """Return a bundle's manifest.
+
+    Raises:
+        ValueError: If ``path`` is not a bundle this version can read
+    """
+    try:
+        with zipfile.ZipFile(path) as bundle:
+            manifest = json.loads(bundle.read(_MANIFEST))
+    except (KeyError, zipfile.BadZipFile, ValueError) as e:
+        raise ValueError(f"{path} is not a semantic cache bundle: {e}") from e
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"{path} is not a semantic cache bundle")
+    if manifest.get("version", 0) > BUNDLE_VERSION:
+        raise ValueError(
+            f"Semantic cache bundle version {manifest['version']} is newer than supported version {BUNDLE_VERSION}"
+        )
+    return manifest
+
+
+def import_bundle(
+    cache: Any,
+    path: Union[str, Path],
+    dedupe_threshold: float = DEFAULT_DEDUPE_THRESHOLD,
+) -> Dict[str, int]:
+    """
+    Merge a bundle's entries into ``cache``.
+
+    Args:
+        cache: The ``SemanticCache`` to import into
+        path: Bundle written by :func:`export_bundle`
+        dedupe_threshold: Cosine similarity above which an entry is a
+            near-duplicate of one already cached
+
+    Returns:
+        Counts of ``imported``, ``replaced``, ``kept_existing``,
+        ``duplicates``, ``expired`` and ``stale`` entries
+
+    Raises:
+        ValueError: If ``path`` is not a bundle this version can read
+    """
+    manifest = read_manifest(path)
+    with zipfile.ZipFile(path) as bundle:
+        lines = bundle.read(_ENTRIES).decode("utf-8").splitlines()
+        raw_vectors = bundle.read(_VECTORS)
+
+    dim = manifest.get("dim")
+    vectors = None
+    if manifest.get("embedding_model") == cache.embedding_model_id and dim == cache.embedding_dim:
+        vectors = np.frombuffer(raw_vectors, dtype=_VECTOR_DTYPE).reshape(-1, dim).astype(np.float32)
+    elif manifest.get("vectors"):
+        logger.warning(
+            "Bundle vectors come from %s (dim %s), not %s (dim %s); importing entries for exact matches only",
+            manifest.get("embedding_model"),
+            dim,
+            cache.embedding_model_id,
+            cache.embedding_dim,
+        )
+
+    counts = {"imported": 0, "replaced": 0, "kept_existing": 0, "duplicates": 0, "expired": 0, "stale": 0}
+    access_times = {}
+    now = time.time()
+    for line in lines:
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        namespace = cache.namespace(item["namespace"])
+        if now - item["timestamp"] > namespace.ttl:
+            counts["expired"] += 1
+            continue
+        if not is_current_version(namespace.role, item.get("validator_version")):
+            counts["stale"] += 1
+            continue
+
+        embedding = vectors[item["vector"]] if vectors is not None and item.get("vector") is not None else None
+        existing = namespace.lookup(item["key"])
+        if existing is not None:
+            if existing["timestamp"] >= item["timestamp"]:
+                counts["kept_existing"] += 1
+                continue
+            counts["replaced"] += 1
+        elif embedding is not None and namespace.search(embedding, threshold=dedupe_threshold) is not None:
+            counts["duplicates"] += 1
+            continue
+        else:
+            counts["imported"] += 1
+
+        entry = cache._store_entry(
+            namespace,
+            item["key"],
+            json.loads(item["response"]),
+            item.get("prompt_text") or "",
+            item["timestamp"],
+            embedding,
+            item.get("validator_version"),
+        )
+        entry["last_access"] = item.get("last_access", item["timestamp"])
+        access_times[entry["id"]] = entry["last_access"]
+
+    cache.store.touch(access_times)
+    cache._save_cache()
+    logger.info("Imported semantic cache bundle %s: %s", path, counts)
+    return counts
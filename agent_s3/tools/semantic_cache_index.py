@@ -0,0 +1,143 @@
+"""
+FAISS index construction for the semantic cache.
+
+``SemanticCache`` starts with an exact ``IndexIDMap2(IndexFlatIP)``. Once it
+holds more than ``semantic_cache_ann_threshold`` vectors, it can switch to an
+approximate index built here:
+
+- ``hnsw``: ``IndexHNSWFlat``. No training and good recall, but FAISS cannot
+  remove vectors from it, so evicted ids stay in the graph as tombstones until
+  the next rebuild.
+- ``ivf_flat``: ``IndexIVFFlat``. Trained with k-means and supports
+  ``remove_ids``.
+- ``ivf_pq``: ``IndexIVFPQ``. Like ``ivf_flat`` with product-quantized
+  vectors, for caches where memory matters more than recall.
+
+All indexes use inner product, so similarities stay cosine for the normalized
+vectors the cache stores. ``ef_search`` and ``nprobe`` trade recall for
+latency at query time.
+"""
+
+import logging
+import math
+from typing import Any, Dict, Optional
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_KINDS = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+# Vectors needed before an approximate index is built
+DEFAULT_ANN_THRESHOLD = 50000
+DEFAULT_HNSW_M = 32
+DEFAULT_EF_CONSTRUCTION = 80
+DEFAULT_EF_SEARCH = 64
+DEFAULT_NPROBE = 16
+DEFAULT_PQ_M = 16
+# FAISS warns when k-means gets fewer training points than this per list
+MIN_POINTS_PER_LIST = 39
+# Rebuild once this fraction of an index's vectors are tombstones
+TOMBSTONE_REBUILD_RATIO = 0.25
+
+
+def new_flat_index(dim: int) -> faiss.IndexIDMap2:
+    """Return an empty exact inner-product index keyed by entry ids."""
+    return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+
+
+def index_kind(index: Any) -> str:
+    """Return which of ``INDEX_KINDS`` ``index`` is."""
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    if isinstance(index, faiss.IndexIDMap) and isinstance(faiss.downcast_index(index.index), faiss.IndexHNSW):
+        return "hnsw"
+    return "flat"
+
+
+def supports_remove(index: Any) -> bool:
+    """Return True if evicted vectors can be removed from ``index`` in place."""
+    return index_kind(index) != "hnsw"
+
+
+def ivf_nlist(count: int, nlist: Optional[int] = None) -> int:
+    """Number of inverted lists for ``count`` vectors.
+
+    Defaults to ``4 * sqrt(count)`` and is capped so every list gets enough
+    k-means training points.
+    """
+    wanted = nlist or int(4 * math.sqrt(count))
+    return max(1, min(wanted, count // MIN_POINTS_PER_LIST))
+
+
+def set_search_params(index: Any, ef_search: int = DEFAULT_EF_SEARCH, nprobe: int = DEFAULT_NPROBE) -> None:
+    """Apply query-time recall/latency settings to an approximate index."""
+    kind = index_kind(index)
+    if kind == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efSearch = ef_search
+    elif kind in ("ivf_flat", "ivf_pq"):
+        index.nprobe = min(nprobe, index.nlist)
+
+
+def build_index(
+    kind: str,
+    vectors: np.ndarray,
+    ids: np.ndarray,
+    params: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """Build and fill an index of ``kind`` from normalized float32 vectors.
+
+    Args:
+        kind: One of ``INDEX_KINDS``
+        vectors: ``(n, dim)`` float32 matrix
+        ids: ``(n,)`` int64 entry ids
+        params: Optional ``hnsw_m``, ``ef_construction``, ``ef_search``,
+            ``nlist``, ``nprobe`` and ``pq_m`` overrides
+
+    Returns:
+        The populated index, with search parameters applied
+
+    Raises:
+        ValueError: If ``kind`` is unknown or ``pq_m`` does not divide the
+            vector dimension
+    """
+    params = params or {}
+    dim = vectors.shape[1]
+    if kind == "flat":
+        index = new_flat_index(dim)
+    elif kind == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, params.get("hnsw_m", DEFAULT_HNSW_M), faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = params.get("ef_construction", DEFAULT_EF_CONSTRUCTION)
+        index = faiss.IndexIDMap2(hnsw)
+    elif kind in ("ivf_flat", "ivf_pq"):
+        nlist = ivf_nlist(len(vectors), params.get("nlist"))
+        quantizer = faiss.IndexFlatIP(dim)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            pq_m = params.get("pq_m", DEFAULT_PQ_M)
+            if dim % pq_m:
+                raise ValueError(f"pq_m={pq_m} does not divide embedding dimension {dim}")
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, 8, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+    else:
+        raise ValueError(f"Unknown semantic cache index kind: {kind!r}")
+
+    if len(vectors):
+        index.add_with_ids(vectors, ids)
+    set_search_params(
+        index,
+        ef_search=params.get("ef_search", DEFAULT_EF_SEARCH),
+        nprobe=params.get("nprobe", DEFAULT_NPROBE),
+    )
+    logger.info("Built %s semantic cache index with %d vectors", kind, index.ntotal)
+    return index
+
+
+def needs_rebuild(index: Any, live: int) -> bool:
+    """Return True when tombstones make up too much of an approximate index."""
+    if index_kind(index) == "flat" or not index.ntotal:
+        return False
+    return index.ntotal - live > TOMBSTONE_REBUILD_RATIO * index.ntotal
@@ -0,0 +1,36 @@
+"""
+Request keys for :class:`~agent_s3.tools.semantic_cache.SemanticCache`.
+
+:func:`cache_key` hashes only the parts of a request that affect the
+response. It lives apart from the cache so that callers needing just the key,
+such as :mod:`agent_s3.cache.single_flight`, do not import FAISS, numpy or the
+embedding stack.
+"""
+
+import hashlib
+import json
+from typing import Any, Dict
+
+# Request fields that change the response, and so belong in the key
+KEY_FIELDS = (
+    "messages",
+    "prompt",
+    "model",
+    "temperature",
+    "max_tokens",
+    "top_p",
+    "frequency_penalty",
+    "presence_penalty",
+)
+
+
+def cache_key(prompt_data: Dict[str, Any]) -> str:
+    """Return a deterministic SHA-256 key for ``prompt_data``.
+
+    Raises:
+        TypeError: If ``prompt_data`` is not JSON serializable
+    """
+    # Round-trip through sorted JSON so key order never changes the hash
+    normalized = json.loads(json.dumps(prompt_data, sort_keys=True))
+    essential = {field: normalized[field] for field in KEY_FIELDS if field in normalized}
+    return hashlib.sha256(json.dumps(essential, sort_keys=True).encode()).hexdigest()
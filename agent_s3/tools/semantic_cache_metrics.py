@@ -0,0 +1,251 @@
+"""
+Latency histograms and savings estimates for cache observability.
+
+:class:`CacheMetrics` keeps one :class:`LatencyHistogram` per timed
+operation. The semantic cache times its exact-key (hash) lookups,
+vector-path lookups and embedding calls. The gptcache prompt cache in
+:mod:`agent_s3.cache.helpers` times its lookups. Histograms use fixed
+millisecond buckets, so recording is a bisect and a counter increment, and
+percentiles are reported as the upper bound of the bucket they fall in.
+
+:class:`PricingTable` turns the tokens a cache hit avoided into dollars using
+the ``pricing_per_million`` of the matching ``llm.json`` entry.
+:func:`collect_cache_stats` gathers everything that the ``/cache-stats`` CLI
+command and the HTTP ``/cache-stats`` endpoint report, including the
+persistent embedding cache's cross-session hit rate.
+"""
+
+import bisect
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from agent_s3.routing_policy import estimate_cost
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in milliseconds, of the histogram buckets; one more bucket
+# collects everything slower
+LATENCY_BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Shipped with the repository; used when the workspace has no llm.json
+_DEFAULT_LLM_JSON = Path(__file__).resolve().parents[2] / "llm.json"
+
+
+class LatencyHistogram:
+    """Thread-safe fixed-bucket histogram of durations."""
+
+    def __init__(self, bounds_ms: Sequence[float] = LATENCY_BUCKETS_MS) -> None:
+        self.bounds_ms = tuple(bounds_ms)
+        self._counts = [0] * (len(self.bounds_ms) + 1)
+        self._count = 0
+        self._sum_ms = 0.0
+        self._max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def record(self, seconds: float) -> None:
+        ms = seconds * 1000
+        bucket = bisect.bisect_left(self.bounds_ms, ms)
+        with self._lock:
+            self._counts[bucket] += 1
+            self._count += 1
+            self._sum_ms += ms
+            self._max_ms = max(self._max_ms, ms)
+
+    def percentile(self, q: float) -> float:
+        """Return the upper bound in ms of the bucket holding the ``q``-th percentile."""
+        with self._lock:
+            return self._percentile(q)
+
+    def _percentile(self, q: float) -> float:
+        if not self._count:
+            return 0.0
+        rank = q / 100 * self._count
+        seen = 0
+        for bucket, count in enumerate(self._counts):
+            seen += count
+            if count and seen >= rank:
+                return self.bounds_ms[bucket] if bucket < len(self.bounds_ms) else self._max_ms
+        return self._max_ms
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counts = [0] * (len(self.bounds_ms) + 1)
+            self._count = 0
+            self._sum_ms = 0.0
+            self._max_ms = 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return count, mean, max and percentiles in ms, with non-empty buckets."""
+        with self._lock:
+            buckets = {
+                (f"<={bound:g}ms" if i < len(self.bounds_ms) else f">{self.bounds_ms[-1]:g}ms"): count
+                for i, (bound, count) in enumerate(zip(self.bounds_ms + (None,), self._counts))
+                if count
+            }
+            return {
+                "count": self._count,
+                "mean_ms": self._sum_ms / self._count if self._count else 0.0,
+                "max_ms": self._max_ms,
+                "p50_ms": self._percentile(50),
+                "p95_ms": self._percentile(95),
+                "p99_ms": self._percentile(99),
+                "buckets": buckets,
+            }
+
+
+class CacheMetrics:
+    """Named latency histograms, created on first use."""
+
+    def __init__(self) -> None:
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str) -> LatencyHistogram:
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def record(self, name: str, seconds: float) -> None:
+        self.histogram(name).record(seconds)
+
+    def reset(self) -> None:
+        for histogram in list(self._histograms.values()):
+            histogram.reset()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: histogram.snapshot() for name, histogram in list(self._histograms.items())}
+
+
+def hit_rates(hits: int, semantic_hits: int, misses: int) -> Dict[str, float]:
+    """Return exact-hit, semantic-hit and miss rates over all lookups."""
+    lookups = hits + semantic_hits + misses
+    if not lookups:
+        return {"hit_rate": 0.0, "semantic_hit_rate": 0.0, "miss_rate": 0.0}
+    return {
+        "hit_rate": hits / lookups,
+        "semantic_hit_rate": semantic_hits / lookups,
+        "miss_rate": misses / lookups,
+    }
+
+
+class PricingTable:
+    """Finds the ``llm.json`` entry, and so the price, of a cached call."""
+
+    def __init__(self, entries: List[Dict[str, Any]]) -> None:
+        self.by_role: Dict[str, List[Dict[str, Any]]] = {}
+        self.by_model: Dict[str, Dict[str, Any]] = {}
+        for entry in entries:
+            if not isinstance(entry, dict) or "pricing_per_million" not in entry:
+                continue
+            if entry.get("role"):
+                self.by_role.setdefault(entry["role"], []).append(entry)
+            if entry.get("model"):
+                self.by_model.setdefault(entry["model"], entry)
+
+    @classmethod
+    def load(cls, workspace_path: Union[str, Path] = ".") -> "PricingTable":
+        """Read ``llm.json`` from the workspace, or the repository's copy.
+
+        A missing or unreadable file gives an empty table, so savings are
+        reported in tokens only.
+        """
+        for path in (Path(workspace_path) / "llm.json", _DEFAULT_LLM_JSON):
+            if not path.exists():
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Could not read pricing from %s: %s", path, e)
+                continue
+            if isinstance(entries, list):
+                return cls(entries)
+        return cls([])
+
+    def lookup(self, role: Optional[str], model: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return the entry for ``role`` and ``model``, the role's default, or the model's."""
+        candidates = self.by_role.get(role or "", [])
+        for entry in candidates:
+            if entry.get("model") == model:
+                return entry
+        if candidates:
+            return candidates[0]
+        return self.by_model.get(model or "")
+
+    def cost(self, role: Optional[str], model: Optional[str], input_tokens: int, output_tokens: int) -> float:
+        """Return the USD price of a call, or 0.0 when no entry matches."""
+        entry = self.lookup(role, model)
+        return estimate_cost(entry, input_tokens, output_tokens) if entry else 0.0
+
+
+def collect_cache_stats() -> Dict[str, Any]:
+    """Return semantic cache, prompt cache and embedding cache statistics in one report."""
+    from agent_s3.cache import helpers
+    from agent_s3.tools.embedding_cache import get_embedding_cache_stats
+    from agent_s3.tools.semantic_cache import SemanticCache
+
+    return {
+        "semantic_cache": SemanticCache.get_instance().get_metrics(),
+        "prompt_cache": helpers.get_cache_stats(),
+        "embedding_cache": get_embedding_cache_stats(),
+    }
+
+
+def _latency_line(name: str, stats: Dict[str, Any]) -> str:
+    return (
+        f"  {name:<14} n={stats['count']:<7} mean={stats['mean_ms']:.2f}ms "
+        f"p50<={stats['p50_ms']:g}ms p95<={stats['p95_ms']:g}ms p99<={stats['p99_ms']:g}ms"
+    )
+
+
+def format_cache_stats(report: Dict[str, Any]) -> str:
+    """Render :func:`collect_cache_stats` output as plain text."""
+    semantic = report["semantic_cache"]
+    totals = semantic["totals"]
+    lines = [
+        "Semantic cache:",
+        f"  lookups={totals['hits'] + totals['semantic_hits'] + totals['misses']} "
+        f"hit={totals['hit_rate']:.1%} semantic={totals['semantic_hit_rate']:.1%} miss={totals['miss_rate']:.1%}",
+        f"  saved: {totals['saved_input_tokens']} input + {totals['saved_output_tokens']} output tokens, "
+        f"${totals['saved_usd']:.4f}",
+    ]
+    for name, stats in sorted(semantic["namespaces"].items()):
+        lines.append(
+            f"  [{name or '(default)'}] entries={stats['entries']} threshold={stats['similarity_threshold']} "
+            f"hit={stats['hit_rate']:.1%} semantic={stats['semantic_hit_rate']:.1%} "
+            f"miss={stats['miss_rate']:.1%} saved=${stats['saved_usd']:.4f}"
+        )
+    if semantic["latency"]:
+        lines.append("Semantic cache latency:")
+        lines.extend(_latency_line(name, stats) for name, stats in sorted(semantic["latency"].items()))
+
+    prompt = report["prompt_cache"]
+    lines.extend([
+        "Prompt cache (gptcache + KV reuse):",
+        f"  lookups={prompt['hits'] + prompt['misses']} hit={prompt['hit_rate']:.1%} "
+        f"kv_reuse={prompt['kv_reuses']} reused_tokens={prompt['kv_reused_tokens']}",
+    ])
+    kv = prompt["kv_store"]
+    lines.append(
+        f"  kv_store entries={kv['entries']} ram={kv['ram_bytes']}/{kv['max_bytes']}B "
+        f"spilled={kv['spilled_bytes']}B evictions={kv['evictions']}"
+    )
+    lines.extend(_latency_line(name, stats) for name, stats in sorted(prompt["latency"].items()))
+
+    for stats in report.get("embedding_cache", []):
+        lines.extend([
+            f"Embedding cache ({stats['path']}):",
+            f"  lookups={stats['hits'] + stats['misses']} hit={stats['hit_rate']:.1%} "
+            f"cross_session={stats['cross_session_hit_rate']:.1%} entries={stats['entries']} "
+            f"size={stats['bytes']}/{stats['max_bytes']}B evictions={stats['evictions']}",
+        ])
+        lines.extend(_latency_line(name, latency) for name, latency in sorted(stats["latency"].items()))
+    return "\n".join(lines)
@@ -0,0 +1,612 @@
+"""
+Per-namespace state for :class:`~agent_s3.tools.semantic_cache.SemanticCache`.
+
+A namespace holds the entries cached for one ``(role, model, response format)``
+combination. Each one has its own FAISS index, TTL, similarity threshold,
+capacity and statistics, so a lookup only searches vectors that could be a
+valid answer for the caller. Namespaces share the cache's on-disk store and
+embedding client.
+
+Locking inside a namespace: exact-key lookups read ``mem_cache`` without a
+lock, ``_state_lock`` briefly guards entry and statistic updates, and
+``_index_lock`` lets FAISS searches run concurrently while index mutations
+take a short write lock. When both are needed, ``_state_lock`` is taken before
+``_index_lock``.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agent_s3.tools.semantic_cache_index import (
+    build_index,
+    index_kind,
+    needs_rebuild,
+    new_flat_index,
+    set_search_params,
+    supports_remove,
+)
+from agent_s3.tools.semantic_cache_metrics import hit_rates
+from agent_s3.tools.semantic_cache_validation import is_current_version
+
+logger = logging.getLogger(__name__)
+
+# "lru" evicts least recently used entries; "gdsf" (Greedy-Dual-Size-Frequency)
+# prefers evicting large, rarely hit entries
+EVICTION_POLICIES = ("lru", "gdsf")
+DEFAULT_EVICTION_POLICY = "lru"
+# Fraction of a namespace's capacity kept after an eviction pass
+EVICTION_TARGET_RATIO = 0.9
+# Nearest neighbours fetched per semantic lookup
+SEARCH_K = 5
+
+
+class ReadWriteLock:
+    """Lock allowing many concurrent readers or a single writer.
+
+    Writers take priority: once a writer is waiting, new readers block until
+    it has finished, so a steady stream of searches cannot starve index
+    updates.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    def acquire_read(self) -> None:
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class CacheNamespace:
+    """Entries, vector index and statistics for one cache namespace.
+
+    ``ttl``, ``similarity_threshold`` and ``max_entries`` are per-namespace
+    overrides. When one is ``None``, the owning cache's current value is used,
+    so cache-wide changes still apply to namespaces without an override.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        owner: Any,
+        ttl: Optional[float] = None,
+        similarity_threshold: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        self.name = name
+        self._owner = owner
+        self._ttl = ttl
+        self._similarity_threshold = similarity_threshold
+        self._max_entries = max_entries
+
+        # Exact-key entries (prompt hash -> entry metadata)
+        self.mem_cache: Dict[str, Dict[str, Any]] = {}
+        # Access times not yet persisted (entry id -> last_access)
+        self._pending_access: Dict[int, float] = {}
+        self._state_lock = threading.Lock()
+        self._index_lock = ReadWriteLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.semantic_hits = 0
+        self.evictions = 0
+        # Responses the role's validator kept out of the cache
+        self.rejected = 0
+        # Estimated tokens and USD that hits saved
+        self.saved_input_tokens = 0
+        self.saved_output_tokens = 0
+        self.saved_usd = 0.0
+        # GDSF inflation value: the priority of the last evicted entry
+        self._gdsf_clock = 0.0
+
+        try:
+            self.index = new_flat_index(owner.embedding_dim)
+        except Exception as e:
+            logger.error("Failed to initialize FAISS index for namespace %r: %s", name, e)
+            self.index = None
+        # Maps stable entry id to cache key
+        self.index_lookup: Dict[int, str] = {}
+        self._ann_builder: Optional[threading.Thread] = None
+        # Ids added, replaced or removed while a background build runs
+        self._index_changes: Optional[set] = None
+        # Bumped whenever the index is replaced wholesale; stale builds are dropped
+        self._index_epoch = 0
+
+    @property
+    def role(self) -> Optional[str]:
+        """Role component of the namespace name, or None if unspecified."""
+        role = self.name.split("/", 1)[0]
+        return role if role and role != "*" else None
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl if self._ttl is not None else self._owner.ttl
+
+    @property
+    def similarity_threshold(self) -> float:
+        if self._similarity_threshold is not None:
+            return self._similarity_threshold
+        return self._owner.similarity_threshold
+
+    @property
+    def max_entries(self) -> int:
+        return self._max_entries if self._max_entries is not None else self._owner.max_cache_entries
+
+    def configure(
+        self,
+        ttl: Optional[float] = None,
+        similarity_threshold: Optional[float] = None,
+        max_entries: Optional[int] = None,
+    ) -> None:
+        """Set per-namespace overrides; ``None`` leaves a setting unchanged."""
+        if ttl is not None:
+            self._ttl = ttl
+        if similarity_threshold is not None:
+            self._similarity_threshold = similarity_threshold
+        if max_entries is not None:
+            self._max_entries = max_entries
+
+    def __len__(self) -> int:
+        return len(self.mem_cache)
+
+    # ------------------------------------------------------------------
+    # Loading and persistence
+    # ------------------------------------------------------------------
+
+    def new_entry(
+        self, entry_id: int, timestamp: float, size: int, validator_version: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Return in-memory metadata for a stored entry."""
+        return {
+            "id": entry_id,
+            "timestamp": timestamp,
+            "last_access": timestamp,
+            "hits": 0,
+            "size": max(1, size),
+            "clock": self._gdsf_clock,
+            "validator_version": validator_version,
+        }
+
+    def load(
+        self,
+        entries: List[Tuple[int, str, float, float, int, Optional[str]]],
+        ids: List[int],
+        vectors: np.ndarray,
+    ) -> None:
+        """Populate the namespace from stored rows and their vectors."""
+        for entry_id, key, timestamp, last_access, size, validator_version in entries:
+            entry = self.new_entry(entry_id, timestamp, size, validator_version)
+            entry["last_access"] = last_access
+            self.mem_cache[key] = entry
+        if self.index is not None and ids:
+            keys_by_id = {entry_id: key for entry_id, key, *_ in entries}
+            # Add every stored embedding to the vector index in one batch
+            self.index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+            self.index_lookup = {entry_id: keys_by_id[entry_id] for entry_id in ids}
+
+    def restore_stats(self, stats: Dict[str, int]) -> None:
+        self.hits = stats.get("hits", 0)
+        self.misses = stats.get("misses", 0)
+        self.semantic_hits = stats.get("semantic_hits", 0)
+        self.rejected = stats.get("rejected", 0)
+        self.saved_input_tokens = stats.get("saved_input_tokens", 0)
+        self.saved_output_tokens = stats.get("saved_output_tokens", 0)
+        self.saved_usd = stats.get("saved_usd", 0.0)
+
+    def drain_pending_access(self) -> Dict[int, float]:
+        """Return and forget access times not yet written to the store."""
+        with self._state_lock:
+            pending, self._pending_access = self._pending_access, {}
+        return pending
+
+    def reset(self) -> None:
+        """Drop every entry, vector and statistic; overrides are kept."""
+        with self._state_lock:
+            self.mem_cache.clear()
+            self._pending_access.clear()
+            with self._index_lock.write_locked():
+                if self.index is not None:
+                    self.index = new_flat_index(self._owner.embedding_dim)
+                self.index_lookup.clear()
+                self._index_epoch += 1
+            self.hits = 0
+            self.misses = 0
+            self.semantic_hits = 0
+            self.evictions = 0
+            self.rejected = 0
+            self.saved_input_tokens = 0
+            self.saved_output_tokens = 0
+            self.saved_usd = 0.0
+            self._gdsf_clock = 0.0
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the live entry for ``key``, expiring it if its TTL has passed."""
+        # A single dict read, no lock
+        entry = self.mem_cache.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry.get("timestamp", 0) > self.ttl or not self._is_current(entry):
+            self._expire(key, entry)
+            return None
+        return entry
+
+    def search(
+        self, query: np.ndarray, threshold: Optional[float] = None
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Return the most similar live entry above the threshold, with its similarity.
+
+        ``query`` must be a normalized float32 vector. ``threshold`` defaults
+        to the namespace's similarity threshold.
+        """
+        if self.index is None or self.index.ntotal == 0:
+            return None
+        threshold = self.similarity_threshold if threshold is None else threshold
+        # Concurrent searches share the read lock
+        with self._index_lock.read_locked():
+            distances, indices = self.index.search(query.reshape(1, -1), k=SEARCH_K)
+            # Take the best live match; approximate indexes may still return evicted ids
+            match_key = None
+            similarity = 0.0
+            for similarity, entry_id in zip(distances[0], indices[0]):
+                if similarity <= threshold:
+                    break
+                match_key = self.index_lookup.get(entry_id)
+                if match_key:
+                    break
+        entry = self.mem_cache.get(match_key) if match_key else None
+        if entry is None or time.time() - entry.get("timestamp", 0) > self.ttl:
+            return None
+        if not self._is_current(entry):
+            self._expire(match_key, entry)
+            return None
+        return entry, float(similarity)
+
+    def has_vectors(self) -> bool:
+        return self.index is not None and self.index.ntotal > 0
+
+    def record_hit(self, entry: Dict[str, Any], semantic: bool = False) -> None:
+        with self._state_lock:
+            entry["last_access"] = time.time()
+            entry["hits"] += 1
+            entry["clock"] = self._gdsf_clock
+            self._pending_access[entry["id"]] = entry["last_access"]
+            if semantic:
+                self.semantic_hits += 1
+            else:
+                self.hits += 1
+
+    def record_miss(self) -> None:
+        with self._state_lock:
+            self.misses += 1
+
+    def record_rejected(self) -> None:
+        with self._state_lock:
+            self.rejected += 1
+
+    def record_savings(self, input_tokens: int, output_tokens: int, usd: float) -> None:
+        """Add the estimated cost of an LLM call a hit avoided."""
+        with self._state_lock:
+            self.saved_input_tokens += input_tokens
+            self.saved_output_tokens += output_tokens
+            self.saved_usd += usd
+
+    def _is_current(self, entry: Dict[str, Any]) -> bool:
+        """Return False if the role's validator changed since ``entry`` was stored."""
+        return is_current_version(self.role, entry.get("validator_version"))
+
+    def _expire(self, key: str, entry: Dict[str, Any]) -> None:
+        """Remove an expired entry unless another thread already replaced it."""
+        with self._state_lock:
+            if self.mem_cache.get(key) is not entry:
+                return
+            del self.mem_cache[key]
+            self._pending_access.pop(entry["id"], None)
+        self._owner.store.delete([entry["id"]])
+        logger.debug("Removed expired cache entry: %s", key[:8])
+
+    # ------------------------------------------------------------------
+    # Writes and eviction
+    # ------------------------------------------------------------------
+
+    def insert(self, key: str, entry: Dict[str, Any], embedding: Optional[np.ndarray]) -> int:
+        """Add a stored entry and its vector; return the number of entries evicted."""
+        entry_id = entry["id"]
+        if self.index is not None:
+            # Short writer lock: index the vector under the entry's stable id,
+            # replacing any vector a previous value for this key left behind
+            ids = np.array([entry_id], dtype=np.int64)
+            with self._index_lock.write_locked():
+                if entry_id in self.index_lookup:
+                    # HNSW cannot remove; the old vector still maps to this key
+                    if supports_remove(self.index):
+                        self.index.remove_ids(ids)
+                    del self.index_lookup[entry_id]
+                if embedding is not None:
+                    self.index.add_with_ids(embedding.reshape(1, -1), ids)
+                    self.index_lookup[entry_id] = key
+                self._record_index_change(entry_id)
+
+        with self._state_lock:
+            self.mem_cache[key] = entry
+            size = len(self.mem_cache)
+
+        evicted = self.evict() if size > self.max_entries else 0
+        self.maybe_build_ann_index()
+        return evicted
+
+    def _eviction_priorities(self, entries: List[Dict[str, Any]]) -> np.ndarray:
+        """Return one priority per entry; the lowest priorities are evicted first.
+
+        ``lru`` ranks by last access time. ``gdsf`` ranks by
+        ``clock + (hits + 1) / size``, where ``clock`` is the inflation value
+        recorded when the entry was last touched, so entries that have not
+        been used since earlier evictions age out.
+        """
+        count = len(entries)
+        if self._owner.eviction_policy == "gdsf":
+            clock = np.fromiter((e["clock"] for e in entries), dtype=np.float64, count=count)
+            hits = np.fromiter((e["hits"] for e in entries), dtype=np.float64, count=count)
+            size = np.fromiter((e["size"] for e in entries), dtype=np.float64, count=count)
+            return clock + (hits + 1.0) / size
+        return np.fromiter((e["last_access"] for e in entries), dtype=np.float64, count=count)
+
+    def evict(self) -> int:
+        """
+        Evict entries chosen by the eviction policy and return how many went.
+
+        Victims are selected with one ``argpartition`` over the access
+        statistics and removed from the FAISS index with a single batched
+        ``remove_ids`` call, so the index is never rebuilt. Approximate
+        indexes that cannot remove vectors keep them as tombstones until the
+        next background build.
+        """
+        with self._state_lock:
+            if len(self.mem_cache) <= self.max_entries:
+                # Another thread evicted while we waited for the lock
+                return 0
+            keys = list(self.mem_cache)
+            entries = [self.mem_cache[key] for key in keys]
+            num_to_evict = max(1, len(keys) - int(self.max_entries * EVICTION_TARGET_RATIO))
+            logger.info("Evicting %d cache entries from semantic cache namespace %r", num_to_evict, self.name)
+
+            priorities = self._eviction_priorities(entries)
+            victims = np.argpartition(priorities, num_to_evict - 1)[:num_to_evict]
+            if self._owner.eviction_policy == "gdsf":
+                self._gdsf_clock = float(priorities[victims].max())
+
+            evicted_ids = self._remove_entries([keys[position] for position in victims])
+            self.evictions += len(evicted_ids)
+
+        # Drop evicted rows from the on-disk store
+        self._owner.store.delete(evicted_ids)
+        return len(evicted_ids)
+
+    def drop_stale_versions(self) -> int:
+        """Remove entries stored under an outdated validator version; return how many went."""
+        with self._state_lock:
+            stale = [key for key, entry in self.mem_cache.items() if not self._is_current(entry)]
+            removed_ids = self._remove_entries(stale)
+        self._owner.store.delete(removed_ids)
+        if removed_ids:
+            logger.info(
+                "Dropped %d semantic cache entries with an outdated validator version from namespace %r",
+                len(removed_ids),
+                self.name,
+            )
+        return len(removed_ids)
+
+    def _remove_entries(self, keys: List[str]) -> List[int]:
+        """Remove ``keys`` from memory and the vector index and return their ids.
+
+        The caller holds ``_state_lock`` and deletes the ids from the store.
+        """
+        removed_ids = []
+        for key in keys:
+            entry = self.mem_cache.pop(key)
+            removed_ids.append(entry["id"])
+            self._pending_access.pop(entry["id"], None)
+
+        if self.index is not None and removed_ids:
+            with self._index_lock.write_locked():
+                indexed = [entry_id for entry_id in removed_ids if self.index_lookup.pop(entry_id, None)]
+                for entry_id in indexed:
+                    self._record_index_change(entry_id)
+                if indexed and supports_remove(self.index):
+                    try:
+                        self.index.remove_ids(np.array(indexed, dtype=np.int64))
+                        logger.debug("Removed %d entries from FAISS index", len(indexed))
+                    except Exception as e:
+                        logger.warning("Error removing entries from FAISS index: %s", e)
+                        self._rebuild_index()
+        return removed_ids
+
+    def _rebuild_index(self) -> None:
+        """Rebuild the FAISS index from the vectors of the current entries.
+
+        The caller holds ``_state_lock`` and the ``_index_lock`` write lock.
+        """
+        logger.info("Rebuilding FAISS index for namespace %r from scratch", self.name)
+
+        keys_by_id = {entry["id"]: key for key, entry in self.mem_cache.items()}
+        ids, vectors = self._owner.store.get_vectors(list(keys_by_id))
+
+        self.index = new_flat_index(self._owner.embedding_dim)
+        self.index_lookup = {}
+        self._index_epoch += 1
+        if ids:
+            # Add all existing embeddings in one batch
+            self.index.add_with_ids(vectors, np.asarray(ids, dtype=np.int64))
+            self.index_lookup = {entry_id: keys_by_id[entry_id] for entry_id in ids}
+
+        logger.info("FAISS index rebuilt with %s entries", self.index.ntotal)
+
+    # ------------------------------------------------------------------
+    # Approximate index tier
+    # ------------------------------------------------------------------
+
+    def apply_search_params(self) -> None:
+        if self.index is not None:
+            params = self._owner.ann_params
+            with self._index_lock.write_locked():
+                set_search_params(self.index, params["ef_search"], params["nprobe"])
+
+    def maybe_build_ann_index(self) -> None:
+        """Start a background index build if the index is due for one.
+
+        A build is due when the exact index has reached the cache's
+        ``ann_threshold`` vectors, or when evictions have left too many
+        tombstones in an approximate index that cannot remove vectors.
+        """
+        if self._owner.ann_index == "flat" or self.index is None:
+            return
+        if self._ann_builder is not None and self._ann_builder.is_alive():
+            return
+        live = len(self.index_lookup)
+        if index_kind(self.index) == "flat":
+            if live < self._owner.ann_threshold:
+                return
+        elif not needs_rebuild(self.index, live):
+            return
+        with self._state_lock:
+            if self._ann_builder is not None and self._ann_builder.is_alive():
+                return
+            self._ann_builder = threading.Thread(
+                target=self._build_ann_index, name="semantic-cache-ann-build", daemon=True
+            )
+            self._ann_builder.start()
+
+    def _build_ann_index(self) -> None:
+        """Train an approximate index off-lock and swap it in atomically.
+
+        Vectors are read from the store without holding the index lock, so
+        lookups and writes continue during training. Changes made meanwhile
+        are recorded in ``_index_changes`` and replayed under the write lock
+        just before the swap.
+        """
+        kind = self._owner.ann_index
+        with self._index_lock.write_locked():
+            epoch = self._index_epoch
+            snapshot = set(self.index_lookup)
+            self._index_changes = set()
+        try:
+            ids, vectors = self._owner.store.get_vectors(sorted(snapshot))
+            index = build_index(kind, vectors, np.asarray(ids, dtype=np.int64), self._owner.ann_params)
+        except Exception as e:
+            logger.warning("Failed to build %s semantic cache index for namespace %r: %s", kind, self.name, e)
+            with self._index_lock.write_locked():
+                self._index_changes = None
+            return
+
+        with self._index_lock.write_locked():
+            changes, self._index_changes = self._index_changes, None
+            if epoch != self._index_epoch:
+                logger.info("Discarding semantic cache index built before a reset")
+                return
+            stale = [entry_id for entry_id in changes if entry_id in snapshot]
+            if stale and supports_remove(index):
+                index.remove_ids(np.array(stale, dtype=np.int64))
+            replay = [entry_id for entry_id in changes if entry_id in self.index_lookup]
+            if replay:
+                replay_ids, replay_vectors = self._owner.store.get_vectors(replay)
+                if replay_ids:
+                    index.add_with_ids(replay_vectors, np.asarray(replay_ids, dtype=np.int64))
+            self.index = index
+        logger.info(
+            "Switched semantic cache namespace %r to %s index (%d vectors, %d replayed)",
+            self.name,
+            kind,
+            index.ntotal,
+            len(replay),
+        )
+
+    def _record_index_change(self, entry_id: int) -> None:
+        """Note an index mutation for a running build; the caller holds the write lock."""
+        if self._index_changes is not None:
+            self._index_changes.add(entry_id)
+
+    # ------------------------------------------------------------------
+    # Statistics
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit counters, size and effective settings for this namespace."""
+        with self._state_lock:
+            stats = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "semantic_hits": self.semantic_hits,
+                "evictions": self.evictions,
+                "rejected": self.rejected,
+                "saved_input_tokens": self.saved_input_tokens,
+                "saved_output_tokens": self.saved_output_tokens,
+                "saved_usd": self.saved_usd,
+                "entries": len(self.mem_cache),
+            }
+        stats.update(hit_rates(stats["hits"], stats["semantic_hits"], stats["misses"]))
+        stats.update({
+            "ttl": self.ttl,
+            "similarity_threshold": self.similarity_threshold,
+            "max_entries": self.max_entries,
+            "index": self.get_index_stats(),
+        })
+        return stats
+
+    def get_index_stats(self) -> Dict[str, Any]:
+        """Return the active index kind, its size and whether a build is running."""
+        with self._index_lock.read_locked():
+            if self.index is None:
+                return {"kind": None, "vectors": 0, "live": 0, "building": False}
+            return {
+                "kind": index_kind(self.index),
+                "vectors": self.index.ntotal,
+                "live": len(self.index_lookup),
+                "building": self._ann_builder is not None and self._ann_builder.is_alive(),
+            }
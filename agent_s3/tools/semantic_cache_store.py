@@ -0,0 +1,429 @@
+"""
+Append-only on-disk storage for :class:`~agent_s3.tools.semantic_cache.SemanticCache`.
+
+Entries live in a SQLite database (WAL mode) and embeddings in a separate
+raw float32 vector file read through ``numpy.memmap``. A ``set`` is one row
+insert plus one vector append, so writes cost O(1) instead of rewriting the
+whole cache. Startup reads entry metadata and maps the vector file; responses
+are fetched from SQLite only when an entry is hit.
+
+Deleting an entry leaves its vector row behind as garbage.
+:meth:`SemanticCacheStore.compact` copies the live vectors into a new
+*generation* of the vector file. It then switches the database to that
+generation in a single transaction, so a crash at any point leaves either
+the old or the new generation fully consistent.
+
+Keys are unique per namespace, so the same prompt can be cached separately
+for different roles, models and response formats. Each entry records the
+version of the response validator it passed, if any.
+
+The embedding dimension and model id are recorded in the ``meta`` table.
+Stored vectors are discarded, and their entries kept for exact matches, when
+either changes.
+
+The v1.0 JSON file written by earlier versions is imported on first open and
+renamed with a ``.migrated`` suffix.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import stat
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STORE_FILE = "semantic_cache_v2.sqlite3"
+LEGACY_CACHE_FILE = "semantic_cache_v1.0.json"
+VECTOR_FILE_TEMPLATE = "vectors.{generation}.f32"
+# Compact once dead vector rows outnumber live ones and exceed this count
+COMPACTION_MIN_DEAD_ROWS = 1000
+# Namespace of entries written before namespaces existed
+DEFAULT_NAMESPACE = ""
+SCHEMA_VERSION = 3
+
+_ENTRIES_TABLE = """
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    namespace TEXT NOT NULL DEFAULT '',
+    key TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    last_access REAL NOT NULL,
+    response TEXT NOT NULL,
+    prompt_text TEXT,
+    vector_row INTEGER,
+    validator_version TEXT,
+    UNIQUE (namespace, key)
+)
+"""
+_SCHEMA = _ENTRIES_TABLE + """;
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class SemanticCacheStore:
+    """SQLite entry store plus a float32 vector file for one cache directory."""
+
+    def __init__(self, cache_dir: Path, dim: int, model_id: Optional[str] = None):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.model_id = model_id
+        self.db_path = self.cache_dir / STORE_FILE
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate_schema()
+        os.chmod(self.db_path, stat.S_IRUSR | stat.S_IWUSR)
+
+        self.generation = int(self._get_meta("vector_generation", "0"))
+        stored_dim = int(self._get_meta("dim", str(dim)))
+        if stored_dim != dim:
+            logger.warning(
+                "Semantic cache vectors have dimension %d, expected %d; discarding stored vectors",
+                stored_dim,
+                dim,
+            )
+            self._switch_generation({}, self.generation + 1)
+        elif model_id is not None and self._get_meta("embedding_model", "") != model_id:
+            # Vectors from another model live in another space, even at the same dimension
+            vector_path = self._vector_path(self.generation)
+            if vector_path.exists() and vector_path.stat().st_size:
+                logger.warning(
+                    "Semantic cache vectors were written by %r, not %r; discarding stored vectors",
+                    self._get_meta("embedding_model", "an unrecorded model"),
+                    model_id,
+                )
+                self._switch_generation({}, self.generation + 1)
+        self._set_meta("dim", str(dim))
+        if model_id is not None:
+            self._set_meta("embedding_model", model_id)
+        self._cleanup_vector_files()
+        self._vector_file = open(self._vector_path(self.generation), "ab")
+        self._recover_vector_file()
+        self._memmap: Optional[np.memmap] = None
+        self._memmap_rows = 0
+
+    # ------------------------------------------------------------------
+    # Meta helpers
+    # ------------------------------------------------------------------
+
+    def _get_meta(self, name: str, default: str) -> str:
+        row = self._conn.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else default
+
+    def _set_meta(self, name: str, value: str) -> None:
+        self._conn.execute(
+            "INSERT INTO meta (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+            (name, value),
+        )
+
+    def _migrate_schema(self) -> None:
+        """Bring an older ``entries`` table up to ``SCHEMA_VERSION``.
+
+        Version 1 tables are keyed by ``key`` alone and are copied into a
+        namespaced table. Version 2 tables lack ``validator_version``.
+        """
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+        if "namespace" in columns:
+            if "validator_version" not in columns:
+                self._conn.execute("ALTER TABLE entries ADD COLUMN validator_version TEXT")
+                logger.info("Migrated semantic cache store to schema version %d", SCHEMA_VERSION)
+            self._set_meta("schema_version", str(SCHEMA_VERSION))
+            return
+        self._conn.execute("BEGIN")
+        self._conn.execute("ALTER TABLE entries RENAME TO entries_v1")
+        self._conn.execute(_ENTRIES_TABLE)
+        self._conn.execute(
+            "INSERT INTO entries (id, namespace, key, timestamp, last_access, response, prompt_text, vector_row) "
+            "SELECT id, ?, key, timestamp, last_access, response, prompt_text, vector_row FROM entries_v1",
+            (DEFAULT_NAMESPACE,),
+        )
+        self._conn.execute("DROP TABLE entries_v1")
+        self._set_meta("schema_version", str(SCHEMA_VERSION))
+        self._conn.execute("COMMIT")
+        logger.info("Migrated semantic cache store to schema version %d", SCHEMA_VERSION)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return persisted cache statistics (hits, misses, semantic_hits)."""
+        with self._lock:
+            raw = self._get_meta("stats", "{}")
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return {}
+
+    def save_stats(self, stats: Dict[str, Any]) -> None:
+        with self._lock:
+            self._set_meta("stats", json.dumps(stats))
+
+    # ------------------------------------------------------------------
+    # Vector file
+    # ------------------------------------------------------------------
+
+    def _vector_path(self, generation: int) -> Path:
+        return self.cache_dir / VECTOR_FILE_TEMPLATE.format(generation=generation)
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.dim * 4
+
+    def _cleanup_vector_files(self) -> None:
+        """Delete vector files from abandoned or superseded generations."""
+        current = self._vector_path(self.generation).name
+        for path in self.cache_dir.glob(VECTOR_FILE_TEMPLATE.format(generation="*")):
+            if path.name != current:
+                try:
+                    path.unlink()
+                except OSError as e:
+                    logger.debug("Could not remove stale vector file %s: %s", path, e)
+
+    def _recover_vector_file(self) -> None:
+        """Drop a torn trailing row and forget rows that never reached disk."""
+        path = self._vector_path(self.generation)
+        size = path.stat().st_size
+        if size % self._row_bytes:
+            self._vector_file.truncate(size - size % self._row_bytes)
+        rows = self.vector_rows
+        self._conn.execute("UPDATE entries SET vector_row = NULL WHERE vector_row >= ?", (rows,))
+
+    @property
+    def vector_rows(self) -> int:
+        """Number of rows, live or dead, in the current vector file."""
+        return self._vector_path(self.generation).stat().st_size // self._row_bytes
+
+    def _append_vector(self, vector: np.ndarray) -> int:
+        row = self.vector_rows
+        self._vector_file.write(np.ascontiguousarray(vector, dtype=np.float32).reshape(-1).tobytes())
+        self._vector_file.flush()
+        return row
+
+    def _vectors(self) -> Optional[np.memmap]:
+        rows = self.vector_rows
+        if rows == 0:
+            return None
+        if self._memmap is None or self._memmap_rows != rows:
+            self._memmap = np.memmap(
+                self._vector_path(self.generation), dtype=np.float32, mode="r", shape=(rows, self.dim)
+            )
+            self._memmap_rows = rows
+        return self._memmap
+
+    # ------------------------------------------------------------------
+    # Entries
+    # ------------------------------------------------------------------
+
+    def put(
+        self,
+        key: str,
+        response: Any,
+        prompt_text: str,
+        timestamp: float,
+        embedding: Optional[np.ndarray] = None,
+        namespace: str = DEFAULT_NAMESPACE,
+        validator_version: Optional[str] = None,
+    ) -> int:
+        """Insert or replace the entry for ``key`` in ``namespace`` and return its stable id."""
+        payload = json.dumps(response, default=str)
+        with self._lock:
+            vector_row = self._append_vector(embedding) if embedding is not None else None
+            existing = self._conn.execute(
+                "SELECT id FROM entries WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if existing:
+                self._conn.execute(
+                    "UPDATE entries SET timestamp = ?, last_access = ?, response = ?, prompt_text = ?, "
+                    "vector_row = ?, validator_version = ? WHERE id = ?",
+                    (timestamp, timestamp, payload, prompt_text, vector_row, validator_version, existing[0]),
+                )
+                return existing[0]
+            cursor = self._conn.execute(
+                "INSERT INTO entries (namespace, key, timestamp, last_access, response, prompt_text, vector_row, "
+                "validator_version) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (namespace, key, timestamp, timestamp, payload, prompt_text, vector_row, validator_version),
+            )
+            return cursor.lastrowid
+
+    def get_response(self, entry_id: int) -> Any:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def iter_entries(self) -> Iterable[Tuple[int, str, str, float, float, int, Optional[str]]]:
+        """Return ``(id, namespace, key, timestamp, last_access, size, validator_version)`` for every entry.
+
+        ``size`` is the length of the serialized response.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, namespace, key, timestamp, last_access, length(response), validator_version "
+                "FROM entries ORDER BY id"
+            ).fetchall()
+
+    def export_rows(self) -> List[Tuple[int, str, str, float, float, str, Optional[str], Optional[str]]]:
+        """Return ``(id, namespace, key, timestamp, last_access, response_json, prompt_text,
+        validator_version)`` for every entry, with responses left serialized."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, namespace, key, timestamp, last_access, response, prompt_text, validator_version "
+                "FROM entries ORDER BY id"
+            ).fetchall()
+
+    def get_vectors(self, entry_ids: Optional[List[int]] = None) -> Tuple[List[int], np.ndarray]:
+        """Return ``(ids, vectors)`` for the given entries, or all entries, that have a vector."""
+        with self._lock:
+            if entry_ids is None:
+                rows = self._conn.execute(
+                    "SELECT id, vector_row FROM entries WHERE vector_row IS NOT NULL ORDER BY id"
+                ).fetchall()
+            else:
+                wanted = set(int(entry_id) for entry_id in entry_ids)
+                rows = [
+                    row for row in self._conn.execute(
+                        "SELECT id, vector_row FROM entries WHERE vector_row IS NOT NULL ORDER BY id"
+                    ).fetchall()
+                    if row[0] in wanted
+                ]
+            return [row[0] for row in rows], self._read_rows([row[1] for row in rows])
+
+    def _read_rows(self, vector_rows: List[int]) -> np.ndarray:
+        vectors = self._vectors()
+        if vectors is None or not vector_rows:
+            return np.empty((0, self.dim), dtype=np.float32)
+        return np.array(vectors[np.asarray(vector_rows, dtype=np.int64)], dtype=np.float32)
+
+    def touch(self, access_times: Dict[int, float]) -> None:
+        """Persist ``last_access`` for the given entry ids in one transaction."""
+        if not access_times:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE entries SET last_access = ? WHERE id = ?",
+                [(when, entry_id) for entry_id, when in access_times.items()],
+            )
+            self._conn.execute("COMMIT")
+
+    def delete(self, entry_ids: Iterable[int]) -> None:
+        """Delete entries; compacts the vector file once enough rows are dead."""
+        ids = [(int(entry_id),) for entry_id in entry_ids]
+        if not ids:
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("DELETE FROM entries WHERE id = ?", ids)
+            self._conn.execute("COMMIT")
+            live = self._conn.execute(
+                "SELECT COUNT(*) FROM entries WHERE vector_row IS NOT NULL"
+            ).fetchone()[0]
+            dead = self.vector_rows - live
+            if dead > COMPACTION_MIN_DEAD_ROWS and dead > live:
+                self.compact()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._switch_generation({}, self.generation + 1)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------
+
+    def compact(self) -> None:
+        """Rewrite the vector file with live rows only."""
+        with self._lock:
+            live = self._conn.execute(
+                "SELECT id, vector_row FROM entries WHERE vector_row IS NOT NULL ORDER BY vector_row"
+            ).fetchall()
+            vectors = self._read_rows([row for _, row in live])
+            new_generation = self.generation + 1
+            path = self._vector_path(new_generation)
+            with open(path, "wb") as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._switch_generation({entry_id: i for i, (entry_id, _) in enumerate(live)}, new_generation)
+            logger.info("Compacted semantic cache vectors to %d rows", len(live))
+
+    def _switch_generation(self, row_map: Dict[int, int], generation: int) -> None:
+        """Atomically point entries at ``generation``; unmapped entries lose their vector."""
+        path = self._vector_path(generation)
+        path.touch()
+        self._conn.execute("BEGIN")
+        self._conn.execute("UPDATE entries SET vector_row = NULL")
+        self._conn.executemany(
+            "UPDATE entries SET vector_row = ? WHERE id = ?",
+            [(row, entry_id) for entry_id, row in row_map.items()],
+        )
+        self._set_meta("vector_generation", str(generation))
+        self._conn.execute("COMMIT")
+
+        old_file = getattr(self, "_vector_file", None)
+        self.generation = generation
+        self._memmap = None
+        self._vector_file = open(path, "ab")
+        if old_file is not None:
+            old_file.close()
+        self._cleanup_vector_files()
+
+    # ------------------------------------------------------------------
+    # Migration
+    # ------------------------------------------------------------------
+
+    def migrate_legacy_json(self, ttl: float) -> int:
+        """Import a v1.0 JSON cache file, if present, and return the entries imported."""
+        legacy = self.cache_dir / LEGACY_CACHE_FILE
+        if not legacy.exists():
+            return 0
+        try:
+            with open(legacy, "r") as f:
+                cache_data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("Failed to read legacy semantic cache %s: %s", legacy, e)
+            return 0
+
+        now = time.time()
+        imported = 0
+        access_times = {}
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for key, entry in cache_data.get("entries", {}).items():
+                timestamp = entry.get("timestamp", 0)
+                if now - timestamp > ttl:
+                    continue
+                embedding = None
+                if entry.get("embedding"):
+                    vector = np.asarray(entry["embedding"], dtype=np.float32)
+                    if vector.shape == (self.dim,):
+                        embedding = vector
+                entry_id = self.put(key, entry.get("response"), entry.get("prompt_text", ""), timestamp, embedding)
+                access_times[entry_id] = entry.get("last_access", timestamp)
+                imported += 1
+            self._conn.execute("COMMIT")
+            self.touch(access_times)
+            stats = cache_data.get("stats", {})
+            self.save_stats({name: stats.get(name, 0) for name in ("hits", "misses", "semantic_hits")})
+        legacy.rename(legacy.with_name(legacy.name + ".migrated"))
+        logger.info("Migrated %d entries from %s", imported, legacy.name)
+        return imported
+
+    def close(self) -> None:
+        with self._lock:
+            self._vector_file.close()
+            self._conn.close()
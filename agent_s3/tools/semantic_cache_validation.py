@@ -0,0 +1,155 @@
+"""
+Validation hooks deciding which LLM responses may be cached.
+
+A validator is registered per role with a version string. Responses for that
+role are only cached when the validator accepts them, and each cached entry
+records the validator version it passed. Registering a new version for a
+role makes every entry stored under an older version stale. Stale entries are
+dropped when :meth:`SemanticCache.register_validator` is called and, for
+caches that were not told, when they are next looked up.
+
+Roles without a validator are cached as before, except that responses
+requested with ``response_format={"type": "json_object"}`` must parse as JSON.
+The ``pre_planner`` and ``planner`` roles get built-in validators that apply
+the same schema checks their callers run on fresh responses.
+"""
+
+import json
+import logging
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple, Type
+
+from agent_s3.schema_validator import JsonValidator, extract_json, validate_llm_response
+
+logger = logging.getLogger(__name__)
+
+# Returns (is_valid, error_message), like JsonValidator.validate_plan_json
+ResponseValidator = Callable[[Any], Tuple[bool, Optional[str]]]
+
+
+class CacheValidator(NamedTuple):
+    """A role's validator and the version recorded on entries it accepted."""
+
+    validate: ResponseValidator
+    version: str
+
+
+_validators: Dict[str, CacheValidator] = {}
+_validators_lock = threading.Lock()
+
+
+def register_cache_validator(role: str, validate: ResponseValidator, version: str) -> None:
+    """Only cache responses for ``role`` that ``validate`` accepts.
+
+    Args:
+        role: Role name, as used in ``llm.json`` and cache namespaces
+        validate: Callable returning ``(is_valid, error_message)``
+        version: Schema version; changing it invalidates entries cached
+            under the previous one
+    """
+    with _validators_lock:
+        _validators[role] = CacheValidator(validate, str(version))
+
+
+def unregister_cache_validator(role: str) -> None:
+    with _validators_lock:
+        _validators.pop(role, None)
+
+
+def get_cache_validator(role: Optional[str]) -> Optional[CacheValidator]:
+    """Return the validator registered for ``role``, if any."""
+    return _validators.get(role) if role else None
+
+
+def is_current_version(role: Optional[str], version: Optional[str]) -> bool:
+    """Return False if ``role`` has a validator whose version is not ``version``."""
+    validator = get_cache_validator(role)
+    return validator is None or validator.version == version
+
+
+def _format_type(response_format: Any) -> Optional[str]:
+    if isinstance(response_format, dict):
+        return response_format.get("type")
+    return response_format
+
+
+def json_object_validator(response: Any) -> Tuple[bool, Optional[str]]:
+    """Accept responses that are, or contain, a JSON object or array."""
+    if isinstance(response, (dict, list)):
+        return True, None
+    if isinstance(response, str) and extract_json(response) is not None:
+        return True, None
+    return False, "Response is not valid JSON"
+
+
+def pydantic_validator(model_class: Type[Any]) -> ResponseValidator:
+    """Return a validator accepting responses that parse into ``model_class``."""
+
+    def validate(response: Any) -> Tuple[bool, Optional[str]]:
+        text = response if isinstance(response, str) else json.dumps(response, default=str)
+        is_valid, result = validate_llm_response(text, model_class)
+        return is_valid, None if is_valid else result
+
+    return validate
+
+
+def _as_json(response: Any) -> Any:
+    if isinstance(response, (dict, list)):
+        return response
+    return extract_json(response) if isinstance(response, str) else None
+
+
+def pre_planning_validator(response: Any) -> Tuple[bool, Optional[str]]:
+    """Accept pre-planning responses whose feature groups pass the plan schema."""
+    from agent_s3.planning.json_validation import validate_json_schema
+
+    data = _as_json(response)
+    if data is None:
+        return False, "Response is not valid JSON"
+    is_valid, error, _ = validate_json_schema(data)
+    return is_valid, None if is_valid else error
+
+
+def plan_validator(response: Any) -> Tuple[bool, Optional[str]]:
+    """Accept plans that pass :meth:`JsonValidator.validate_plan_json`."""
+    data = _as_json(response)
+    if data is None:
+        return False, "Response is not valid JSON"
+    return JsonValidator().validate_plan_json(data)
+
+
+def check_response(
+    role: Optional[str],
+    response: Any,
+    response_format: Any = None,
+) -> Tuple[bool, Optional[str], Optional[str]]:
+    """Decide whether ``response`` may be cached for ``role``.
+
+    Args:
+        role: Role the response was generated for, if known
+        response: The LLM response
+        response_format: The request's ``response_format``, a string or an
+            OpenAI-style dict
+
+    Returns:
+        Tuple of (cacheable, validator_version, error_message)
+    """
+    validator = get_cache_validator(role)
+    if validator is not None:
+        try:
+            is_valid, error = validator.validate(response)
+        except Exception as e:
+            is_valid, error = False, f"{type(e).__name__}: {e}"
+        return is_valid, validator.version, error
+    if _format_type(response_format) == "json_object":
+        is_valid, error = json_object_validator(response)
+        return is_valid, None, error
+    return True, None, None
+
+
+# Bump a version when its validator's schema changes
+PRE_PLANNING_VALIDATOR_VERSION = "feature_groups-1"
+PLAN_VALIDATOR_VERSION = "plan-1"
+
+register_cache_validator("pre_planner", pre_planning_validator, PRE_PLANNING_VALIDATOR_VERSION)
+register_cache_validator("planner", plan_validator, PLAN_VALIDATOR_VERSION)
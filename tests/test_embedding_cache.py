@@ -0,0 +1,55 @@
+import itertools
+import time
+import types
+
+import numpy as np
+
+from agent_s3.tools import embedding_cache
+from agent_s3.tools.embedding_cache import EmbeddingCache
+from agent_s3.tools.embedding_client import EmbeddingClient
+
+
+def test_embeddings_persist_across_sessions(tmp_path):
+    path = tmp_path / "embeddings.sqlite3"
+    first = EmbeddingCache(path)
+    first.put_many("model-a", ["alpha", "beta"], [np.ones(4), None])
+    assert first.get("model-a", "alpha") is not None
+    first.close()
+
+    second = EmbeddingCache(path)
+    hits = second.get_many("model-a", ["alpha", "beta", "alpha"])
+    assert np.array_equal(hits[0], np.ones(4, dtype=np.float32))
+    assert hits[1] is None
+    # Keys include the model id
+    assert second.get("model-b", "alpha") is None
+
+    stats = second.get_stats()
+    assert (stats["hits"], stats["misses"], stats["cross_session_hits"]) == (2, 2, 2)
+    assert stats["entries"] == 1
+
+
+def test_least_recently_used_embeddings_are_evicted(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(embedding_cache, "time", types.SimpleNamespace(time=lambda: next(clock), perf_counter=time.perf_counter))
+    row_bytes = 16 * 4
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite3", max_bytes=3 * row_bytes + row_bytes // 2)
+    for text in ("a", "b", "c"):
+        cache.put("model", text, np.ones(16))
+    cache.get("model", "a")
+    cache.put("model", "d", np.ones(16))
+
+    assert [cache.get("model", t) is not None for t in "abcd"] == [True, False, True, True]
+    assert cache.get_stats()["bytes"] == 3 * row_bytes
+    assert cache.evictions == 1
+
+
+def test_embedding_client_reuses_embeddings_from_earlier_clients(tmp_path, monkeypatch):
+    config = {"workspace_path": str(tmp_path), "embedding_dim": 64}
+    texts = ["def parse_config(path): pass", "class HttpClient: pass"]
+    expected = EmbeddingClient(config).generate_embeddings(texts)
+
+    client = EmbeddingClient(config)
+    monkeypatch.setattr(client.backend, "embed", lambda texts: (_ for _ in ()).throw(AssertionError("re-embedded")))
+    for embedding, cached in zip(expected, client.generate_embeddings(texts)):
+        assert np.array_equal(embedding, cached)
+    assert np.array_equal(client.generate_embedding(texts[0]), expected[0])
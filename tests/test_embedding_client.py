@@ -1,3 +1,4 @@
+import json
 from pathlib import Path
 import shutil
 import tempfile
@@ -139,3 +140,179 @@ def test_add_embedding_method(embedding_client):
     assert stored_metadata["file_path"] == "test_file.py"
     assert "access_count" in stored_metadata
     assert "last_access" in stored_metadata
+
+
+def test_generate_embedding_uses_local_backend_by_default(embedding_client):
+    embedding = embedding_client.generate_embedding("class UserRepository: pass")
+    assert embedding.shape == (embedding_client.dim,)
+    assert np.isclose(np.linalg.norm(embedding), 1.0)
+    assert embedding_client.model_id == "hashing-v1-384"
+    assert embedding_client.get_embedding("class UserRepository: pass") == embedding.tolist()
+    assert embedding_client.generate_embedding("   ") is None
+
+
+def test_generate_embeddings_batches_local_inference(embedding_client, monkeypatch):
+    batches = []
+    embed = embedding_client.backend.embed
+    monkeypatch.setattr(embedding_client.backend, "embed", lambda texts: batches.append(len(texts)) or embed(texts))
+
+    texts = [f"def handler_{i}(request): pass" for i in range(5)] + [""]
+    embeddings = embedding_client.generate_embeddings(texts, batch_size=2)
+    assert batches == [2, 2, 2]
+    assert embeddings[-1] is None
+    for text, embedding in zip(texts[:5], embeddings):
+        assert np.allclose(embedding, embedding_client.generate_embedding(text))
+
+
+def test_metadata_persists_incrementally_and_migrates_legacy_json(temp_workspace):
+    import gzip
+    import hashlib
+    import json
+
+    import faiss
+
+    from agent_s3.tools.embedding_client import FAISS_INDEX_FILE, METADATA_FILE
+
+    cache_dir = Path(temp_workspace) / CACHE_DIR_NAME
+    cache_dir.mkdir()
+    id_map = {"0": {"file_path": "a.py", "chunk_id": 0, "timestamp": 1.0, "last_access": 2.0, "access_count": 3}}
+    checksum = hashlib.sha256(json.dumps(id_map, sort_keys=True).encode("utf-8")).hexdigest()
+    with gzip.open(cache_dir / METADATA_FILE, "wt", encoding="utf-8") as f:
+        json.dump({"next_id": 1, "id_map": id_map, "checksum": checksum}, f)
+    index = faiss.IndexIDMap(faiss.IndexFlatIP(8))
+    index.add_with_ids(np.ones((1, 8), dtype=np.float32), np.array([0], dtype=np.int64))
+    faiss.write_index(index, str(cache_dir / FAISS_INDEX_FILE))
+
+    config = {"workspace_path": temp_workspace, "embedding_dim": 8}
+    client = EmbeddingClient(config)
+    assert client.next_id == 1
+    assert client.id_map["0"] == id_map["0"]
+    assert (cache_dir / (METADATA_FILE + ".migrated")).exists()
+
+    vectors = np.eye(8, dtype=np.float32)[:3]
+    client.add_embeddings(vectors, [{"file_path": f"f{i}.py", "chunk_id": i} for i in range(3)])
+    client.update_access_patterns(["f1.py"])
+    assert client.remove_embeddings_by_metadata({"file_path": "f0.py"}) == 1
+
+    reloaded = EmbeddingClient(config)
+    assert reloaded.next_id == 4
+    assert sorted(reloaded.id_map) == ["0", "2", "3"]
+    assert reloaded.id_map["2"]["access_count"] == 1
+    assert reloaded.id_map["3"]["chunk_id"] == 2
+
+
+def test_eviction_scores_columns_and_compacts_rows(temp_workspace):
+    from agent_s3.tools.embedding_metadata import EmbeddingMetadata
+
+    metadata = EmbeddingMetadata(Path(temp_workspace) / "metadata.sqlite3")
+    now = 1_000_000.0
+    # Idle time grows with the id; id 4 has been accessed too often to evict
+    metadata.add(
+        range(6),
+        [{"file_path": f"f{i}.py", "last_access": now - 100 * i, "timestamp": now - 100 * i,
+          "access_count": 5 if i == 4 else 0} for i in range(6)],
+        now,
+    )
+    victims = metadata.eviction_candidates(2, now, max_idle_time=1000, min_access_keep=2)
+    assert victims.tolist() == [5, 3]
+
+    assert metadata.remove(victims.tolist()) == 2
+    assert sorted(int(key) for key in metadata) == [0, 1, 2, 4]
+    assert metadata["4"]["file_path"] == "f4.py"
+    assert metadata.touch_paths(["f4.py", "f5.py"], now) == 1
+    assert metadata["4"]["access_count"] == 6
+
+
+def test_search_reranks_reduced_precision_vectors(temp_workspace):
+    config = {"workspace_path": temp_workspace, "embedding_dim": 16, "embedding_precision": "float16"}
+    client = EmbeddingClient(config)
+    vectors = np.eye(16, dtype=np.float32)[:4]
+    client.add_embeddings(vectors, [{"file_path": f"f{i}.py"} for i in range(4)])
+
+    results = client.search(vectors[2], top_k=2)
+    assert results[0]["file_path"] == "f2.py"
+    assert results[0]["score"] == pytest.approx(1.0)
+    assert len(results) == 2
+
+    # Switching precision re-quantizes the saved vectors
+    reloaded = EmbeddingClient({**config, "embedding_precision": "int8"})
+    assert reloaded.index.precision == "int8"
+    assert reloaded.search(vectors[1], top_k=1)[0]["file_path"] == "f1.py"
+
+
+class _EmbedderRouter:
+    def __init__(self, model, dim):
+        self.model = model
+        self.dim = dim
+        self.calls = 0
+
+    def get_model_for_role(self, role):
+        return self.model if role == "embedder" else None
+
+    def call_llm_by_role(self, role, system_prompt, user_prompt, config, scratchpad, **kwargs):
+        self.calls += 1
+        return json.dumps({"embedding": [1.0] + [0.0] * (self.dim - 1)})
+
+
+def test_llm_backend_uses_one_model_for_single_and_batched_embeddings(temp_workspace, monkeypatch):
+    from agent_s3 import llm_utils
+
+    monkeypatch.setattr(llm_utils, "get_embeddings", lambda *a, **k: pytest.fail("embeddings endpoint used"))
+    config = {"workspace_path": temp_workspace, "embedding_dim": 8, "embedding_backend": "llm",
+              "embedding_cache_path": str(Path(temp_workspace) / "cache.sqlite3")}
+    router = _EmbedderRouter("embed-model-a", 8)
+    client = EmbeddingClient(config, router_agent=router)
+
+    assert client.model_id == "embed-model-a"
+    assert client.generate_embedding("alpha") is not None
+    assert all(e is not None for e in client.generate_embeddings(["beta", "gamma"]))
+    assert router.calls == 3
+
+
+def test_llm_backend_without_router_uses_embeddings_endpoint(temp_workspace, monkeypatch):
+    from agent_s3 import llm_utils
+
+    requested = []
+
+    def fake_get_embeddings(texts, model, dimensions, **kwargs):
+        requested.append((model, dimensions, list(texts)))
+        return [[1.0] * dimensions for _ in texts]
+
+    monkeypatch.setattr(llm_utils, "get_embeddings", fake_get_embeddings)
+    config = {"workspace_path": temp_workspace, "embedding_dim": 4, "embedding_backend": "llm",
+              "embedding_model": "text-embedding-3-small", "embedding_cache_max_bytes": 0}
+    client = EmbeddingClient(config)
+
+    client.generate_embedding("alpha")
+    client.generate_embeddings(["beta", "gamma"])
+    assert requested == [
+        ("text-embedding-3-small", 4, ["alpha"]),
+        ("text-embedding-3-small", 4, ["beta", "gamma"]),
+    ]
+
+
+def test_llm_backend_cache_is_keyed_on_resolved_model(temp_workspace, monkeypatch):
+    config = {"workspace_path": temp_workspace, "embedding_dim": 8, "embedding_backend": "llm",
+              "embedding_cache_path": str(Path(temp_workspace) / "cache.sqlite3")}
+    client = EmbeddingClient(config, router_agent=_EmbedderRouter("embed-model-a", 8))
+    client.generate_embeddings(["alpha"])
+    assert client._cache_model_id == "embed-model-a-8"
+    assert client.embedding_cache.get("embed-model-a-8", "alpha") is not None
+
+    # Pointing the embedder role at another model must not reuse the old vectors
+    other = EmbeddingClient(config, router_agent=_EmbedderRouter("embed-model-b", 8))
+    other.generate_embedding("alpha")
+    assert other.router_agent.calls == 1
+
+    # A model that cannot be resolved bypasses the cache instead of sharing a key
+    unknown = _EmbedderRouter(None, 8)
+    client = EmbeddingClient(config, router_agent=unknown)
+    assert client._cache_model_id is None
+    client.generate_embedding("alpha")
+    client.generate_embedding("alpha")
+    assert unknown.calls == 2
+
+    from agent_s3 import llm_utils
+    monkeypatch.setattr(llm_utils, "get_embeddings", lambda texts, model, dimensions, **k: [[1.0] * dimensions for _ in texts])
+    endpoint = EmbeddingClient({**config, "embedding_model": "text-embedding-3-small"})
+    assert endpoint._cache_model_id == "text-embedding-3-small-8"
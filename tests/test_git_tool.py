@@ -1,5 +1,8 @@
+import json as jsonlib
+
 import pytest
 
+from agent_s3.http_transport import TransportRegistry
 from agent_s3.tools.git_tool import GitTool
 
 class DummyResponse:
@@ -7,6 +10,8 @@ class DummyResponse:
         self.status_code = status_code
         self._json = json_data or {}
         self.text = text
+        self.headers = {}
+        self.content = jsonlib.dumps(self._json).encode() if json_data else b''
     def json(self):
         return self._json
 
@@ -19,29 +24,29 @@ def dummy_repo_info(monkeypatch, tmp_path):
     yield
 
 def test_create_github_issue_success(monkeypatch):
-    def fake_post(url, headers=None, json=None):
+    def fake_post(self, method, url, **kwargs):
         assert 'repos/test_owner/test_repo/issues' in url
         return DummyResponse(201, {'html_url': 'https://github.com/test_owner/test_repo/issues/1'})
-    monkeypatch.setattr('requests.post', fake_post)
+    monkeypatch.setattr(TransportRegistry, 'request', fake_post)
 
     tool = GitTool(github_token='token')
     issue_url = tool.create_github_issue('Title', 'Body')
     assert issue_url == 'https://github.com/test_owner/test_repo/issues/1'
 
 def test_create_pull_request_success(monkeypatch):
-    def fake_post(url, headers=None, json=None):
+    def fake_post(self, method, url, **kwargs):
         assert 'repos/test_owner/test_repo/pulls' in url
         return DummyResponse(201, {'html_url': 'https://github.com/test_owner/test_repo/pull/2'})
-    monkeypatch.setattr('requests.post', fake_post)
+    monkeypatch.setattr(TransportRegistry, 'request', fake_post)
 
     tool = GitTool(github_token='token')
     pr_url = tool.create_pull_request('PR Title', 'PR Body')
     assert pr_url == 'https://github.com/test_owner/test_repo/pull/2'
 
 def test_create_pull_request_failure(monkeypatch):
-    def fake_post(url, headers=None, json=None):
+    def fake_post(self, method, url, **kwargs):
         return DummyResponse(400, text='Error')
-    monkeypatch.setattr('requests.post', fake_post)
+    monkeypatch.setattr(TransportRegistry, 'request', fake_post)
 
     tool = GitTool(github_token='token')
     pr_url = tool.create_pull_request('PR Title', 'PR Body')
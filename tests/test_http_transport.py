@@ -0,0 +1,293 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from agent_s3 import http_transport
+from agent_s3.http_transport import TransportRegistry, get_transport_registry
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"ok": True}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args):
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    _KeepAliveHandler.connections = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1/chat"
+    server.shutdown()
+
+
+def test_same_origin_shares_session():
+    registry = TransportRegistry()
+    a = registry.get_session("https://openrouter.ai/api/v1/chat/completions")
+    b = registry.get_session("https://OPENROUTER.ai:443/api/v1/embeddings")
+    c = registry.get_session("https://api.github.com/repos")
+    assert a is b
+    assert a is not c
+    assert registry.get_stats()["sessions"] == 2
+
+
+def test_retry_policy_gets_separate_pool():
+    registry = TransportRegistry()
+    plain = registry.get_session("https://api.github.com/x")
+    retried = registry.get_session("https://api.github.com/x", max_retries=3)
+    assert plain is not retried
+
+
+def test_sequential_requests_reuse_connection(stub_url):
+    registry = TransportRegistry()
+    for _ in range(5):
+        response = registry.request("POST", stub_url, json={"q": 1}, timeout=5)
+        assert response.json() == {"ok": True}
+
+    assert _KeepAliveHandler.connections == 1
+    assert sum(registry.get_stats()["requests"].values()) == 5
+    registry.close()
+
+
+def test_configure_rebuilds_sessions():
+    registry = TransportRegistry(pool_maxsize=4)
+    first = registry.get_session("https://example.com")
+    registry.configure(pool_maxsize=8)
+    second = registry.get_session("https://example.com")
+    assert first is not second
+    assert registry.get_stats()["pool_maxsize"] == 8
+
+
+def test_registry_created_without_config_applies_later_config(monkeypatch):
+    monkeypatch.setattr(http_transport, "_registry", None)
+    registry = get_transport_registry()
+    session = registry.get_session("https://example.com")
+    limiter = registry.get_limiter("https://example.com")
+    breaker = registry.get_breaker("https://example.com")
+    budget = registry.get_retry_budget("https://example.com")
+    breaker.record_failure()
+
+    config = {
+        "http_pool_maxsize": 3,
+        "llm_max_concurrency_per_endpoint": 2,
+        "llm_requests_per_second": 4.0,
+        "llm_circuit_failure_threshold": 2,
+        "llm_circuit_cooldown": 1.5,
+        "llm_retry_budget_ratio": 0.5,
+    }
+    assert get_transport_registry(config) is registry
+    assert registry.get_stats()["pool_maxsize"] == 3
+    assert registry.get_session("https://example.com") is not session
+    new_limiter = registry.get_limiter("https://example.com")
+    assert new_limiter is not limiter
+    assert (new_limiter.max_concurrency, new_limiter.rate) == (2, 4.0)
+    assert registry.get_breaker("https://example.com") is breaker
+    assert (breaker.failure_threshold, breaker.cooldown) == (2, 1.5)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert budget.ratio == 0.5
+
+    # Repeating the same config leaves pooled sessions alone
+    pooled = registry.get_session("https://example.com")
+    get_transport_registry(config)
+    assert registry.get_session("https://example.com") is pooled
+    registry.close()
+
+
+def test_configure_lets_in_flight_requests_drain(stub_url):
+    registry = TransportRegistry(pool_maxsize=4)
+    streamed = registry.request("POST", stub_url, json={}, timeout=5, stream=True)
+    session, = registry._sessions.values()
+    closed = []
+    original_close = session.close
+    session.close = lambda: (closed.append(True), original_close())
+
+    registry.configure(pool_maxsize=8)
+    # The streamed body is still readable on the replaced session
+    assert not closed and registry.get_stats()["draining_sessions"] == 1
+    assert streamed.json() == {"ok": True}
+    assert session not in registry._sessions.values()
+
+    streamed.close()
+    streamed.close()
+    assert closed == [True]
+    assert registry.get_stats()["draining_sessions"] == 0
+
+    # An idle session is closed as soon as it is replaced, unless a caller holds it
+    registry.request("POST", stub_url, json={}, timeout=5)
+    idle, = registry._sessions.values()
+    held = registry.get_session("https://example.com")
+    closed_now = []
+    idle.close = lambda: closed_now.append("idle")
+    held.close = lambda: closed_now.append("held")
+    registry.configure(pool_maxsize=4)
+    assert closed_now == ["idle"]
+    registry.close()
+
+
+def test_iter_sse_data_handles_comments_multiline_and_done():
+    from agent_s3.http_transport import iter_sse_data
+
+    lines = [
+        ": OPENROUTER PROCESSING",
+        "",
+        "data: {\"a\": 1}",
+        "",
+        b"data: line1",
+        b"data: line2",
+        b"",
+        "data: [DONE]",
+        "",
+        "data: ignored",
+    ]
+    assert list(iter_sse_data(lines)) == ['{"a": 1}', "line1\nline2"]
+
+
+def test_limiter_parses_rate_limit_headers():
+    from agent_s3.http_transport import _parse_reset, _parse_retry_after
+
+    assert _parse_retry_after("2") == 2.0
+    assert _parse_retry_after("soon") is None
+    assert _parse_reset("6m0s") == 360.0
+    assert _parse_reset("20ms") == pytest.approx(0.02)
+    assert _parse_reset("1.5") == 1.5
+
+
+def test_limiter_pauses_on_429_and_exhausted_quota():
+    from agent_s3.http_transport import EndpointLimiter
+
+    limiter = EndpointLimiter(max_concurrency=2)
+    limiter.observe(429, {"Retry-After": "0.2"})
+    assert limiter.get_stats()["paused_for"] > 0.1
+    assert limiter.acquire() >= 0.15
+    limiter.release()
+
+    limiter.observe(200, {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "100ms"})
+    assert limiter.acquire() >= 0.05
+    limiter.release()
+    assert limiter.get_stats()["throttled"] == 2
+
+
+def test_limiter_adapts_rate_when_quota_is_scarce():
+    from agent_s3.http_transport import EndpointLimiter
+
+    limiter = EndpointLimiter(max_concurrency=4)
+    limiter.observe(200, {"x-ratelimit-remaining-requests": "500", "x-ratelimit-reset-requests": "10s"})
+    assert limiter.rate is None
+    limiter.observe(200, {"x-ratelimit-remaining-requests": "4", "x-ratelimit-reset-requests": "2s"})
+    assert limiter.rate == pytest.approx(2.0)
+
+
+def test_limiter_caps_concurrency():
+    from agent_s3.http_transport import EndpointLimiter
+
+    limiter = EndpointLimiter(max_concurrency=2)
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def work():
+        with limiter:
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            threading.Event().wait(0.02)
+            with lock:
+                active.pop()
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) == 2
+
+
+def test_registry_shares_limiter_per_origin():
+    registry = TransportRegistry(max_concurrency_per_endpoint=3)
+    a = registry.get_limiter("https://openrouter.ai/api/v1/chat/completions")
+    b = registry.get_limiter("https://openrouter.ai/api/v1/embeddings")
+    assert a is b
+    assert a.max_concurrency == 3
+
+
+def test_circuit_breaker_opens_probes_and_closes():
+    from agent_s3.http_transport import CircuitBreaker
+
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    threading.Event().wait(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    threading.Event().wait(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.get_stats()["opened"] == 2
+
+
+def test_retry_budget_limits_retries_to_ratio_of_requests():
+    from agent_s3.http_transport import RetryBudget
+
+    budget = RetryBudget(ratio=0.5, min_tokens=1.0, refill_per_second=0.0)
+    assert budget.try_retry()
+    assert not budget.try_retry()
+    budget.record_request()
+    budget.record_request()
+    assert budget.try_retry()
+    assert budget.get_stats() == {"tokens": 0.0, "retries": 2, "denied": 1}
+
+
+def test_transient_errors_are_classified():
+    import requests
+
+    from agent_s3.http_transport import is_transient_error
+
+    def http_error(status):
+        response = requests.Response()
+        response.status_code = status
+        return requests.exceptions.HTTPError(response=response)
+
+    assert is_transient_error(requests.exceptions.ReadTimeout())
+    assert is_transient_error(http_error(503))
+    assert is_transient_error(http_error(429))
+    assert not is_transient_error(http_error(400))
+    assert not is_transient_error(ValueError("bad json"))
+
+
+def test_registry_breakers_are_scoped_per_model():
+    registry = TransportRegistry(failure_threshold=1)
+    url = "https://openrouter.ai/api/v1/chat/completions"
+    assert registry.get_breaker(url, "a") is registry.get_breaker(url, "a")
+    registry.get_breaker(url, "a").record_failure()
+    assert not registry.get_breaker(url, "a").allow()
+    assert registry.get_breaker(url, "b").allow()
+    assert registry.get_stats()["breakers"]["https://openrouter.ai:443#a"]["state"] == "open"
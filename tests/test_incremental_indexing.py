@@ -30,6 +30,9 @@ class MockEmbeddingClient:
         # Return a fixed-size mock embedding
         return [0.1] * 384
 
+    def get_embeddings(self, texts):
+        return [self.get_embedding(text) for text in texts]
+
 class MockFileTool:
     def __init__(self, workspace_root=None):
         self.workspace_root = workspace_root or os.getcwd()
@@ -39,3 +39,22 @@ def test_partition_selection_and_optimization():
         assert stats_pruned["total_files"] == 3
     finally:
         shutil.rmtree(tmpdir)
+
+
+def test_partition_search_uses_quantized_vectors():
+    tmpdir = tempfile.mkdtemp(prefix="idx_mgr_test_")
+    try:
+        mgr = IndexPartitionManager(tmpdir, precision="float16")
+        mgr.add_or_update_file("a.py", [1.0, 0.0, 0.0, 0.0], {"language": "python"})
+        mgr.add_or_update_file("b.py", [0.0, 2.0, 0.0, 0.0], {"language": "python"})
+        mgr.add_or_update_file("c.py", [0.0, 1.0, 1.0, 0.0], {"language": "python"})
+        mgr.remove_file("a.py")
+
+        reloaded = IndexPartitionManager(tmpdir, precision="float16")
+        results = reloaded.search_all_partitions([0.0, 1.0, 0.0, 0.0], top_k=5)
+        assert [r["file_path"] for r in results] == ["b.py", "c.py"]
+        # Scores are cosine similarities
+        assert abs(results[0]["score"] - 1.0) < 1e-6
+        assert abs(results[1]["score"] - 0.5 ** 0.5) < 1e-6
+    finally:
+        shutil.rmtree(tmpdir)
@@ -44,3 +44,36 @@ def test_repair_json_structure_multi_dimensional_array():
 
     valid, errors = validate_json_against_schema(repaired, schema)
     assert valid, f"Unexpected errors: {errors}"
+
+
+def test_incremental_parser_emits_items_across_chunks():
+    import json
+    from agent_s3.json_utils import IncrementalJSONParser
+
+    doc = {
+        "original_request": "x",
+        "feature_groups": [
+            {"group_name": 'a "quoted" }', "features": [{"name": "n", "v": [1, -2.5e1, True, None]}]},
+            {"group_name": "b", "features": []},
+        ],
+    }
+    text = json.dumps(doc, indent=2)
+    seen = []
+    parser = IncrementalJSONParser("feature_groups", lambda item, idx: seen.append((idx, item)))
+    for i in range(0, len(text), 3):
+        parser.feed(text[i:i + 3])
+        if i < len(text) // 2:
+            assert len(seen) <= 1
+
+    assert parser.close() == doc
+    assert [item for _, item in seen] == doc["feature_groups"]
+
+
+def test_incremental_parser_aborts_on_structural_error():
+    import pytest
+    from agent_s3.json_utils import IncrementalJSONParser, JSONStreamError
+
+    parser = IncrementalJSONParser("feature_groups")
+    parser.feed('{"feature_groups": [{"group_name": "a"}')
+    with pytest.raises(JSONStreamError):
+        parser.feed('}')
@@ -0,0 +1,74 @@
+import time
+
+import numpy as np
+
+from agent_s3.cache import helpers
+from agent_s3.cache.helpers import Tensor
+from agent_s3.cache.kv_store import KVStore
+from agent_s3.cache.prefix import prefix_hash
+
+
+def _tensor(value, nbytes=400):
+    return np.full(nbytes // 4, value, dtype=np.float32)
+
+
+def test_budget_spills_lowest_gdsf_entry_and_reloads_it(tmp_path):
+    store = KVStore(max_bytes=1000, spill_dir=str(tmp_path), max_spill_bytes=10_000)
+    store["cold"] = _tensor(1)
+    store["hot"] = _tensor(2)
+    for _ in range(5):
+        store.get("hot")
+    store["new"] = _tensor(3)
+
+    stats = store.get_stats()
+    assert stats["ram_bytes"] <= 1000
+    assert stats["spilled_entries"] == 1
+    assert list(tmp_path.glob("*.npy")) == [tmp_path / "cold.npy"]
+
+    # A hit on a spilled entry reads it back and spills another one
+    np.testing.assert_array_equal(store["cold"], _tensor(1))
+    assert not (tmp_path / "cold.npy").exists()
+    assert store.get_stats()["spills"] == 2
+    assert store.get("missing") is None
+    assert store.get_stats()["misses"] == 1
+
+
+def test_spill_budget_and_fallback_tensors_are_dropped(tmp_path):
+    store = KVStore(max_bytes=500, spill_dir=str(tmp_path), max_spill_bytes=400)
+    store["a"] = _tensor(1)
+    store["b"] = _tensor(2)
+    store["c"] = _tensor(3)
+    assert len(store) == 2
+    assert store.get_stats()["evictions"] == 1
+
+    no_spill = KVStore(max_bytes=100, spill_dir=None)
+    fallback = Tensor()
+    fallback.nbytes = 80
+    no_spill["x"] = fallback
+    no_spill["y"] = _tensor(1, 80)
+    assert "x" not in no_spill and "y" in no_spill
+
+
+def test_read_cache_updates_gdsf_counters(monkeypatch):
+    store = KVStore(max_bytes=10_000, spill_dir=None)
+    monkeypatch.setattr(helpers, "kv_store", store)
+    monkeypatch.setattr(helpers.cache, "get", lambda prompt: None, raising=False)
+
+    class Llm:
+        attached = None
+
+        def attach_kv(self, kv):
+            self.attached = kv
+
+    llm = Llm()
+    pfx = prefix_hash("shared prefix")
+    store[pfx] = _tensor(1)
+    before = store.meta(pfx)
+    time.sleep(0.01)
+
+    assert helpers.read_cache("shared prefix", llm) is None
+    assert llm.attached is not None
+    after = store.meta(pfx)
+    assert after["hits"] == before["hits"] + 1
+    assert after["last"] > before["last"]
+    assert store.get_stats()["hits"] == 1
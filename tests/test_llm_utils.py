@@ -1,3 +1,4 @@
+import json
 import requests
 import sys
 import types
@@ -44,3 +45,134 @@ def test_call_llm_with_retry_fallback_executes():
     assert result["success"] is True
     assert result.get("used_fallback") is True
     assert len(client.calls) == 2
+
+
+def test_call_llm_coalesces_identical_inflight_prompts(monkeypatch):
+    import threading
+
+    from agent_s3 import llm_utils
+
+    monkeypatch.setattr(llm_utils, "read_cache", lambda prompt, llm: None)
+    release = threading.Event()
+
+    class SlowLLM:
+        model = "local-model"
+
+        def __init__(self):
+            self.calls = 0
+
+        def generate(self, prompt_data):
+            self.calls += 1
+            release.wait(2)
+            return {"response": "ok"}
+
+    client = SlowLLM()
+    results = []
+
+    def worker():
+        results.append(llm_utils.call_llm("same prompt", client, temperature=0)[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for t in threads:
+        t.start()
+    threading.Event().wait(0.1)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert client.calls == 1
+    assert all(r["success"] for r in results)
+    assert sum(1 for r in results if r.get("coalesced")) == 2
+
+
+def test_cached_call_llm_skips_caching_invalid_json(monkeypatch):
+    from agent_s3 import llm_utils
+
+    writes = []
+    monkeypatch.setattr(llm_utils, "read_cache", lambda prompt, llm: None)
+    monkeypatch.setattr(llm_utils, "write_cache", lambda *args: writes.append(args))
+
+    class JsonLLM:
+        model = "local-model"
+
+        def __init__(self, response):
+            self.response = response
+
+        def generate(self, prompt_data):
+            return self.response
+
+        def get_kv_tensor(self):
+            return object()
+
+    json_mode = {"type": "json_object"}
+    llm_utils.cached_call_llm("plan", JsonLLM("not json"), response_format=json_mode)
+    assert writes == []
+    llm_utils.cached_call_llm("plan", JsonLLM('{"steps": []}'), response_format=json_mode)
+    assert len(writes) == 1
+
+
+def test_get_embeddings_batches_requests_and_isolates_rejected_inputs(monkeypatch):
+    from agent_s3 import llm_utils
+
+    requests_made = []
+
+    class Response:
+        def __init__(self, inputs):
+            self.inputs = inputs
+            self.status_code = 400 if "bad" in inputs else 200
+
+        def raise_for_status(self):
+            if self.status_code >= 400:
+                raise requests.HTTPError("bad input", response=self)
+
+        def json(self):
+            # Items may come back out of order; "index" maps them to inputs
+            return {"data": [
+                {"index": i, "embedding": [float(len(text)), 1.0]}
+                for i, text in reversed(list(enumerate(self.inputs)))
+            ]}
+
+    class Transport:
+        def request(self, method, url, json=None, **kwargs):
+            requests_made.append(json["input"])
+            return Response(json["input"])
+
+    monkeypatch.setattr(llm_utils, "get_transport_registry", lambda config: Transport())
+    config = types.SimpleNamespace(
+        openai_key="key", embedding_batch_size=4, embedding_batch_max_tokens=1000, embedding_cache_max_bytes=0
+    )
+
+    embeddings = llm_utils.get_embeddings(["a", "bb", "", "bad", "cccc", "dd"], config=config, dimensions=3)
+    assert embeddings == [[1.0, 1.0, 0.0], [2.0, 1.0, 0.0], None, None, [4.0, 1.0, 0.0], [2.0, 1.0, 0.0]]
+    # One request per batch of four, then halving only the rejected batch
+    assert requests_made == [["a", "bb", "bad", "cccc"], ["a", "bb"], ["bad", "cccc"], ["bad"], ["cccc"], ["dd"]]
+
+
+def test_cached_call_llm_applies_role_validator(monkeypatch):
+    from agent_s3 import llm_utils
+
+    writes = []
+    monkeypatch.setattr(llm_utils, "read_cache", lambda prompt, llm: None)
+    monkeypatch.setattr(llm_utils, "write_cache", lambda *args: writes.append(args))
+
+    class PlanLLM:
+        model = "local-model"
+
+        def __init__(self, response):
+            self.response = response
+
+        def generate(self, prompt_data):
+            return self.response
+
+        def get_kv_tensor(self):
+            return object()
+
+    # Valid JSON, but not a plan: rejected by the planner's built-in validator
+    llm_utils.cached_call_llm("fix plan", PlanLLM('{"steps": []}'), cache_role="planner")
+    assert writes == []
+    plan = {
+        "functional_plan": {"overview": "", "steps": [], "file_changes": [], "functions": []},
+        "test_plan": {"test_files": [], "test_scenarios": [], "test_cases": []},
+    }
+    llm_utils.cached_call_llm("fix plan", PlanLLM(json.dumps(plan)), cache_role="planner")
+    assert len(writes) == 1
@@ -0,0 +1,30 @@
+import numpy as np
+
+from agent_s3.tools.local_embeddings import HashingEmbedder, create_embedding_backend
+
+
+def test_hashing_embedder_is_deterministic_and_code_aware():
+    embedder = HashingEmbedder(256)
+    texts = [
+        "def get_user_name(user): return user.name",
+        "def getUserName(user): return user.name",
+        "Add pagination to the orders endpoint",
+    ]
+    vectors = embedder.embed(texts)
+    assert vectors.shape == (3, 256) and vectors.dtype == np.float32
+    assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+    assert np.array_equal(vectors, HashingEmbedder(256).embed(texts))
+
+    similarity = vectors @ vectors.T
+    # snake_case and camelCase spellings share their subwords
+    assert similarity[0, 1] > 0.8
+    assert similarity[0, 2] < 0.2
+    assert not embedder.embed([""]).any()
+
+
+def test_backend_selection_falls_back_to_hashing():
+    assert create_embedding_backend({}, 64).model_id == "hashing-v1-64"
+    assert create_embedding_backend({"embedding_backend": "llm"}, 64) is None
+    # No model configured (or onnxruntime missing): use the offline baseline
+    backend = create_embedding_backend({"embedding_backend": "onnx"}, 64)
+    assert isinstance(backend, HashingEmbedder)
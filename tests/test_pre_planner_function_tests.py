@@ -490,3 +490,27 @@ def test_clarification_callback_invoked_when_disabled(monkeypatch, router_agent)
     assert success
     assert captured["question"] == "Need more details?"
     assert not input_called
+
+
+def test_enforced_json_pre_planning_streams_and_validates_groups(router_agent):
+    """The production pre-planning call streams with per-group validation."""
+    router_agent.run.return_value = '{"feature_groups": []}'
+    pre_planner._attempt_pre_planning_call(router_agent, {"role": "pre_planner"}, {"openrouter_key": "k"})
+
+    _, call_kwargs = router_agent.run.call_args
+    assert call_kwargs["stream"] is True
+    assert call_kwargs["on_stream_item"] is pre_planner._validate_streamed_feature_group
+    assert call_kwargs["stream_item_key"] == "feature_groups"
+
+
+def test_streamed_group_validation_defers_repairable_omissions():
+    """Missing fields are left to repair; only malformed groups abort the stream."""
+    from agent_s3.json_utils import JSONStreamError
+
+    pre_planner._validate_streamed_feature_group({"group_name": "g", "features": [{"name": "f"}]}, 0)
+    pre_planner._validate_streamed_feature_group({"group_name": "g"}, 1)
+
+    with pytest.raises(JSONStreamError):
+        pre_planner._validate_streamed_feature_group(["not", "a", "group"], 2)
+    with pytest.raises(JSONStreamError):
+        pre_planner._validate_streamed_feature_group({"group_name": "g", "features": ["f"]}, 3)
@@ -0,0 +1,95 @@
+import numpy as np
+
+from agent_s3.cache import helpers
+from agent_s3.cache.kv_store import KVStore
+from agent_s3.cache.prefix import PrefixTrie, prefix_hash, tokenize
+
+SYSTEM = " ".join(f"rule{i}" for i in range(300))
+
+
+def test_prefix_hash_is_token_exact():
+    # Differences past the first 50 words and in whitespace both change the hash
+    assert prefix_hash(SYSTEM + " task a") != prefix_hash(SYSTEM + " task b")
+    assert prefix_hash("plan  the feature") != prefix_hash("plan the feature")
+    assert prefix_hash(SYSTEM + " task a", n_tokens=64) == prefix_hash(SYSTEM + " task b", n_tokens=64)
+
+
+def test_longest_prefix_finds_deepest_shared_boundary():
+    trie = PrefixTrie(chunk_tokens=16)
+    short = tokenize(SYSTEM[:200])
+    long_key = trie.insert(tokenize(SYSTEM + " first task"))
+    short_key = trie.insert(short)
+
+    match = trie.longest_prefix(tokenize(SYSTEM + " second task"))
+    assert match.key == long_key
+    # Shared up to the last full chunk before the prompts diverge
+    assert len(tokenize(SYSTEM)) - 16 < match.tokens <= len(tokenize(SYSTEM))
+    # A prompt ending on a boundary of a longer cached prompt is not a leaf
+    inner_key = trie.insert(tokenize(SYSTEM)[:32])
+    assert not trie.is_leaf(inner_key) and trie.is_leaf(long_key)
+    assert trie.longest_prefix(short).key == short_key
+    assert trie.longest_prefix(tokenize("unrelated prompt")) is None
+
+    # Evicted tensors are pruned, falling back to shorter live prefixes
+    match = trie.longest_prefix(tokenize(SYSTEM + " second task"), is_live=lambda key: key == short_key)
+    assert match.key == short_key
+    assert long_key not in trie
+
+
+def test_read_cache_attaches_longest_cached_prefix(monkeypatch):
+    store = KVStore(max_bytes=10_000, spill_dir=None)
+    monkeypatch.setattr(helpers, "kv_store", store)
+    monkeypatch.setattr(helpers, "prefix_trie", PrefixTrie())
+    monkeypatch.setattr(helpers.cache, "get", lambda prompt: None, raising=False)
+    monkeypatch.setattr(helpers.cache, "set", lambda *args: None, raising=False)
+
+    class Llm:
+        attached = None
+
+        def attach_kv(self, kv, prefix_tokens=None):
+            self.attached = (kv, prefix_tokens)
+
+    helpers.reset_cache_stats()
+    helpers.write_cache(SYSTEM + " first task", "answer", np.ones(10, dtype=np.float32))
+    llm = Llm()
+    assert helpers.read_cache(SYSTEM + " second task", llm) is None
+    assert llm.attached[1] >= len(tokenize(SYSTEM)) - 64
+
+    assert helpers.read_cache("unrelated prompt", Llm()) is None
+    assert store.get_stats()["hits"] == 1
+    assert store.get_stats()["misses"] == 1
+
+    stats = helpers.get_cache_stats()
+    assert (stats["hits"], stats["misses"], stats["kv_reuses"]) == (0, 2, 1)
+    assert stats["kv_reused_tokens"] == llm.attached[1]
+    assert stats["latency"]["lookup"]["count"] == 2
+    assert stats["kv_store"]["entries"] == 1
+
+
+def test_read_cache_without_prefix_tokens_attaches_only_whole_prompts(monkeypatch):
+    store = KVStore(max_bytes=10_000, spill_dir=None)
+    monkeypatch.setattr(helpers, "kv_store", store)
+    monkeypatch.setattr(helpers, "prefix_trie", PrefixTrie())
+    monkeypatch.setattr(helpers.cache, "get", lambda prompt: None, raising=False)
+    monkeypatch.setattr(helpers.cache, "set", lambda *args: None, raising=False)
+
+    class LegacyLlm:
+        attached = None
+
+        def attach_kv(self, kv):
+            self.attached = kv
+
+    helpers.reset_cache_stats()
+    helpers.write_cache(SYSTEM + " first task", "answer", np.ones(10, dtype=np.float32))
+
+    # The only cached tensor carries " first task"; it must not be attached
+    llm = LegacyLlm()
+    assert helpers.read_cache(SYSTEM + " second task", llm) is None
+    assert llm.attached is None
+    assert helpers.get_cache_stats()["kv_reuses"] == 0
+
+    # A cached prompt that ends at a shared boundary is still reused
+    prefix_kv = np.full(4, 2.0, dtype=np.float32)
+    store[helpers.prefix_trie.insert(tokenize(SYSTEM)[:128])] = prefix_kv
+    assert helpers.read_cache(SYSTEM + " second task", llm) is None
+    assert llm.attached is prefix_kv
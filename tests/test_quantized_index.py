@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from agent_s3.tools.quantized_index import MIN_TRAINING_VECTORS, QuantizedIndex
+
+
+def _dataset(count, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    queries = vectors[:20] + 0.05 * rng.standard_normal((20, dim)).astype(np.float32)
+    return vectors, queries
+
+
+def _recall(index, vectors, ids, queries, k=5):
+    hits = 0
+    for query in queries:
+        truth = set(ids[np.argsort(-(vectors @ query))[:k]].tolist())
+        hits += len(truth & {vec_id for vec_id, _ in index.search(query, k)})
+    return hits / (k * len(queries))
+
+
+@pytest.mark.parametrize("precision", ["float16", "int8", "pq"])
+def test_reduced_precision_round_trip_reranks_exactly(tmp_path, precision):
+    count = MIN_TRAINING_VECTORS.get(precision, 500)
+    vectors, queries = _dataset(count, 32)
+    ids = np.arange(count, dtype=np.int64) * 3
+    index = QuantizedIndex(32, precision, pq_m=8, rerank_factor=16)
+    index.add_with_ids(vectors, ids)
+    assert index.index.is_trained
+
+    index.save(tmp_path / "vectors")
+    loaded = QuantizedIndex.load(tmp_path / "vectors", 32, precision, pq_m=8, rerank_factor=16)
+    assert loaded.ntotal == count
+    assert loaded.memory_bytes() < count * 32 * 4
+    assert _recall(loaded, vectors, ids, queries) >= 0.95
+
+    # Scores come from the float32 rows, not the compressed codes
+    (best_id, best_score), = loaded.search(vectors[7], 1)
+    assert best_id == ids[7]
+    assert best_score == pytest.approx(float(vectors[7] @ vectors[7]), abs=1e-6)
+
+
+def test_untrained_index_searches_exactly_and_tracks_removals(tmp_path):
+    vectors, _ = _dataset(50, 16)
+    ids = np.arange(50, dtype=np.int64)
+    index = QuantizedIndex(16, "int8")
+    index.add_with_ids(vectors, ids)
+    assert not index.index.is_trained
+    assert index.search(vectors[3], 1)[0][0] == 3
+
+    assert index.remove_ids(np.array([3, 99])) == 1
+    index.add_with_ids(vectors[4:5] * -1, np.array([4]))
+    index.save(tmp_path / "vectors")
+
+    loaded = QuantizedIndex.load(tmp_path / "vectors", 16, "int8")
+    assert loaded.ntotal == 49
+    assert loaded.get_vector(3) is None
+    assert np.allclose(loaded.get_vector(4), -vectors[4])
+    assert 3 not in {vec_id for vec_id, _ in loaded.search(vectors[3], 5)}
+
+
+def test_changing_precision_requantizes_stored_vectors(tmp_path):
+    vectors, queries = _dataset(200, 16)
+    ids = np.arange(200, dtype=np.int64)
+    index = QuantizedIndex(16, "float32")
+    index.add_with_ids(vectors, ids)
+    index.save(tmp_path / "vectors")
+
+    halved = QuantizedIndex.load(tmp_path / "vectors", 16, "float16")
+    assert halved.precision == "float16" and halved.ntotal == 200
+    assert _recall(halved, vectors, ids, queries) == 1.0
+    halved.save(tmp_path / "vectors")
+
+    restored = QuantizedIndex.load(tmp_path / "vectors", 16, "float32")
+    assert restored.ntotal == 200
+    assert np.allclose(restored.get_vector(5), vectors[5])
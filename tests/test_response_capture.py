@@ -0,0 +1,87 @@
+import gzip
+import json
+import threading
+
+from agent_s3.response_capture import ResponseCapture
+
+
+class RecordingPad:
+    def __init__(self):
+        self.messages = []
+        self.threads = []
+
+    def log(self, role, message, level="info"):
+        self.messages.append((message, level))
+        self.threads.append(threading.current_thread().name)
+
+
+def test_modes_control_what_is_captured():
+    pad = RecordingPad()
+    errors_only = ResponseCapture(mode="errors")
+    assert not errors_only.submit(pad, "planner", "m", {"ok": True})
+    assert errors_only.submit(pad, "planner", "m", {"bad": True}, error=True)
+    assert errors_only.flush()
+
+    assert not ResponseCapture(mode="off").submit(pad, "planner", "m", {}, error=True)
+    assert not ResponseCapture(mode="sampled", sample_rate=0.0).submit(pad, "planner", "m", {})
+    assert ResponseCapture(mode="sampled", sample_rate=1.0).should_capture()
+
+    assert pad.messages == [('Raw response from m (Role: planner): {"bad": true}', "warning")]
+    assert pad.threads == ["llm-response-capture"]
+
+
+def test_serialization_happens_on_writer_thread():
+    serialized_on = []
+
+    class Payload:
+        def __str__(self):
+            serialized_on.append(threading.current_thread().name)
+            return "payload"
+
+    capture = ResponseCapture(mode="all")
+    capture.submit(RecordingPad(), "planner", "m", {"body": Payload()})
+    assert capture.flush()
+    assert serialized_on == ["llm-response-capture"]
+
+
+def test_inline_capture_is_size_capped():
+    pad = RecordingPad()
+    capture = ResponseCapture(mode="all", max_chars=10)
+    capture.submit(pad, "planner", "m", "x" * 25)
+    assert capture.flush()
+    assert pad.messages[0][0].endswith("xxxxxxxxxx... [truncated, 15 chars omitted]")
+
+
+def test_compressed_side_files_are_referenced(tmp_path):
+    pad = RecordingPad()
+    capture = ResponseCapture(mode="all", compress=True, capture_dir=str(tmp_path))
+    response = {"choices": [{"message": {"content": "y" * 5000}}]}
+    capture.submit(pad, "planner", "openai/gpt-4o", response)
+    assert capture.flush()
+
+    files = list(tmp_path.glob("*.json.gz"))
+    assert len(files) == 1 and "openai_gpt-4o" in files[0].name
+    assert str(files[0]) in pad.messages[0][0]
+    with gzip.open(files[0], "rt", encoding="utf-8") as f:
+        assert json.load(f) == response
+    assert capture.get_stats()["written"] == 1
+
+
+def test_full_queue_drops_instead_of_blocking():
+    release = threading.Event()
+
+    class BlockingPad:
+        def log(self, *_a, **_k):
+            release.wait(2)
+
+    capture = ResponseCapture(mode="all", queue_size=1)
+    results = [capture.submit(BlockingPad(), "planner", "m", {}) for _ in range(4)]
+    release.set()
+    assert capture.flush()
+    assert results[0] and not results[-1]
+    assert capture.get_stats()["dropped"] >= 1
+
+
+def test_default_mode_captures_every_response():
+    assert ResponseCapture().mode == "all"
+    assert ResponseCapture().should_capture()
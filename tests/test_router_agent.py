@@ -0,0 +1,633 @@
+import json
+
+import pytest
+
+from agent_s3.json_utils import JSONStreamError
+from agent_s3.router_agent import RouterAgent, _NullScratchpad
+
+
+class FakeStreamResponse:
+    def __init__(self, chunks):
+        self.lines = []
+        for chunk in chunks:
+            event = {"choices": [{"delta": {"content": chunk}}]}
+            self.lines += [": keep-alive", f"data: {json.dumps(event)}", ""]
+        self.lines += ["data: [DONE]", ""]
+        self.consumed = 0
+        self.closed = False
+
+    def iter_lines(self, decode_unicode=False):
+        for line in self.lines:
+            self.consumed += 1
+            yield line
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def router():
+    return RouterAgent()
+
+
+def test_read_streamed_content_validates_items(router):
+    from agent_s3.json_utils import IncrementalJSONParser
+
+    seen = []
+    parser = IncrementalJSONParser("feature_groups", lambda item, idx: seen.append(item))
+    response = FakeStreamResponse(['{"feature_groups": [{"a"', ': 1}, {"b": 2}', "]}"])
+
+    content = router._read_streamed_content(response, parser)
+
+    assert json.loads(content) == {"feature_groups": [{"a": 1}, {"b": 2}]}
+    assert seen == [{"a": 1}, {"b": 2}]
+    assert response.closed
+
+
+def test_read_streamed_content_aborts_early(router):
+    from agent_s3.json_utils import IncrementalJSONParser
+
+    response = FakeStreamResponse(['{"feature_groups": [', "}", '{"never": "read"}', "]}"])
+    parser = IncrementalJSONParser("feature_groups")
+
+    with pytest.raises(JSONStreamError):
+        router._read_streamed_content(response, parser)
+    assert response.closed
+    assert response.consumed < len(response.lines)
+
+
+def test_call_llm_by_role_many_keeps_order_and_isolates_errors(router, monkeypatch):
+    import threading
+    import time
+
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    def fake_call(role, system_prompt, user_prompt, config, scratchpad, **kwargs):
+        with lock:
+            in_flight.append(role)
+            peak.append(len(in_flight))
+        time.sleep(0.01 * (5 - int(user_prompt)))
+        with lock:
+            in_flight.remove(role)
+        if user_prompt == "2":
+            raise RuntimeError("boom")
+        if user_prompt == "3":
+            return None
+        return f"answer {user_prompt}"
+
+    monkeypatch.setattr(router, "call_llm_by_role", fake_call)
+    requests = [
+        {"role": f"r{i}", "system_prompt": "s", "user_prompt": str(i)} for i in range(5)
+    ]
+
+    results = router.call_llm_by_role_many(requests, max_concurrency=2)
+
+    assert [r["success"] for r in results] == [True, True, False, False, True]
+    assert results[0]["response"] == "answer 0"
+    assert results[4]["response"] == "answer 4"
+    assert "boom" in results[2]["error"]
+    assert "r3" in results[3]["error"]
+    assert max(peak) <= 2
+
+
+def test_identical_concurrent_calls_are_coalesced(router, monkeypatch):
+    import threading
+    import time
+
+    import agent_s3.router_agent as router_module
+
+    calls = []
+    release = threading.Event()
+
+    def slow_call(**kwargs):
+        calls.append(kwargs["user_prompt"])
+        release.wait(2)
+        return f"answer to {kwargs['user_prompt']}"
+
+    monkeypatch.setattr(router, "_call_llm_by_role", slow_call)
+    monkeypatch.setitem(router_module._models_by_role, "summarizer", {"model": "summary-model"})
+
+    class Pad:
+        def log(self, *_a, **_k):
+            pass
+
+    results = []
+
+    def worker(prompt):
+        results.append(router.call_llm_by_role("summarizer", "sys", prompt, {}, Pad()))
+
+    threads = [threading.Thread(target=worker, args=("same",)) for _ in range(4)]
+    threads.append(threading.Thread(target=worker, args=("other",)))
+    for t in threads:
+        t.start()
+    time.sleep(0.1)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert sorted(calls) == ["other", "same"]
+    assert results.count("answer to same") == 4
+    assert router.metrics.get_coalescing_stats()["coalesced"] == 3
+
+
+def test_single_flight_propagates_leader_error():
+    import threading
+
+    from agent_s3.cache.single_flight import SingleFlight
+
+    group = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def leader():
+        started.set()
+        threading.Event().wait(0.1)
+        raise RuntimeError("upstream down")
+
+    def run(fn):
+        try:
+            group.do("k", fn)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    first = threading.Thread(target=run, args=(leader,))
+    first.start()
+    started.wait()
+    follower = threading.Thread(target=run, args=(lambda: "unused",))
+    follower.start()
+    first.join()
+    follower.join()
+
+    assert errors == ["upstream down", "upstream down"]
+    assert group.get_stats() == {"leaders": 1, "coalesced": 1, "in_flight": 0}
+
+
+def test_request_key_matches_semantic_cache_without_importing_it():
+    import subprocess
+    import sys
+
+    from agent_s3.cache.single_flight import request_key
+    from agent_s3.tools.semantic_cache import SemanticCache
+
+    prompt = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "temperature": 0, "stream": True}
+    assert request_key(prompt) == SemanticCache.get_cache_key(dict(reversed(list(prompt.items()))))
+    assert request_key({"prompt": object()}) is None
+
+    # Loading the router must not pull in FAISS through the semantic cache
+    probe = (
+        "import sys, agent_s3.router_agent, agent_s3.llm_utils; "
+        "print(sorted(m for m in ('faiss', 'agent_s3.tools.semantic_cache') if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+
+def test_select_model_routes_between_candidates(router, monkeypatch):
+    import agent_s3.router_agent as router_module
+
+    slow = {"model": "slow", "context_window": 100000, "pricing_per_million": {"input": 0.1, "output": 0.1}}
+    quick = {"model": "quick", "context_window": 100000, "pricing_per_million": {"input": 1.0, "output": 1.0}}
+    monkeypatch.setitem(router_module._models_by_role, "planner", slow)
+    monkeypatch.setitem(router_module._candidates_by_role, "planner", [slow, quick])
+    for _ in range(10):
+        router.metrics.record("planner", "slow", 40.0, True, 100)
+        router.metrics.record("planner", "quick", 2.0, True, 100)
+
+    class Pad:
+        def log(self, *_a, **_k):
+            pass
+
+    chosen = router._select_model("planner", "sys", "user", {"llm_latency_slo": 10}, Pad())
+    assert chosen is quick
+    assert router._select_model("planner", "sys", "user", {}, Pad()) is slow
+
+
+def _hedging_router(router, monkeypatch, behaviour, timeouts=None):
+    """Patch _execute_llm_call with per-model (delay, content) behaviour."""
+    cancelled = []
+
+    def fake_execute(model_info, system_prompt, user_prompt, config, scratchpad,
+                     timeout, role, cancel_event=None, **kwargs):
+        if timeouts is not None:
+            timeouts[model_info["model"]] = timeout
+        delay, content = behaviour[model_info["model"]]
+        if cancel_event is not None and cancel_event.wait(delay):
+            cancelled.append(model_info["model"])
+            raise RuntimeError("cancelled")
+        return content
+
+    monkeypatch.setattr(router, "_execute_llm_call", fake_execute)
+    return cancelled
+
+
+PRIMARY = {"model": "primary", "latency_sensitive": True, "hedge": {"initial_delay": 0.05}}
+BACKUP = {"model": "backup"}
+
+
+def test_hedged_call_uses_faster_backup_and_cancels_primary(router, monkeypatch):
+    import time
+
+    import agent_s3.router_agent as router_module
+
+    monkeypatch.setitem(router_module._candidates_by_role, "planner", [PRIMARY, BACKUP])
+    cancelled = _hedging_router(router, monkeypatch, {"primary": (1.0, "slow"), "backup": (0.01, "fast")})
+
+    result = router._execute_hedged_call(PRIMARY, "s", "u", {}, router_module._NullScratchpad(), 5, "planner")
+
+    assert result == "fast"
+    time.sleep(0.05)
+    assert cancelled == ["primary"]
+    stats = router.metrics.get_hedging_stats()["planner"]
+    assert stats["hedge_rate"] == 1.0 and stats["win_rate"] == 1.0
+
+
+def test_hedge_and_fallback_use_their_own_timeouts(router, monkeypatch):
+    import agent_s3.router_agent as router_module
+
+    monkeypatch.setitem(router_module._candidates_by_role, "planner", [PRIMARY, BACKUP])
+    for _ in range(20):
+        router.metrics.record("planner", "primary", 10.0, True, 100)
+    monkeypatch.setattr(router, "_hedge_delay", lambda *_a: 0.05)
+    config = {"llm_connection_timeout": 5, "llm_read_timeout": 120}
+    timeouts = {}
+    _hedging_router(router, monkeypatch, {"primary": (1.0, "slow"), "backup": (0.01, "fast")}, timeouts)
+
+    primary_timeout = router._adaptive_timeout("planner", "primary", config)
+    router._execute_hedged_call(PRIMARY, "s", "u", config, router_module._NullScratchpad(), primary_timeout, "planner")
+    assert timeouts == {"primary": (5, 30.0), "backup": (5, 120)}
+
+    monkeypatch.setitem(router_module._models_by_role, "planner", PRIMARY)
+    monkeypatch.setitem(router_module._models_by_role, "reviewer", BACKUP)
+    monkeypatch.setattr(router, "_execute_hedged_call", lambda *_a, **_k: (_ for _ in ()).throw(ValueError("bad")))
+    timeouts.clear()
+    router._call_llm_by_role(
+        "planner", "s", "u", {**config, "max_retries": 1}, router_module._NullScratchpad(), fallback_role="reviewer"
+    )
+    assert timeouts == {"backup": (5, 120)}
+
+
+def test_fast_primary_is_not_hedged(router, monkeypatch):
+    import agent_s3.router_agent as router_module
+
+    monkeypatch.setitem(router_module._candidates_by_role, "planner", [PRIMARY, BACKUP])
+    _hedging_router(router, monkeypatch, {"primary": (0.0, "ok"), "backup": (0.0, "unused")})
+
+    assert router._execute_hedged_call(PRIMARY, "s", "u", {}, router_module._NullScratchpad(), 5, "planner") == "ok"
+    assert router.metrics.get_hedging_stats()["planner"] == {
+        "calls": 1, "hedged": 0, "hedge_wins": 0, "hedge_rate": 0.0, "win_rate": 0.0,
+    }
+
+
+def test_hedge_ignores_invalid_json_winner(router, monkeypatch):
+    import agent_s3.router_agent as router_module
+
+    monkeypatch.setitem(router_module._candidates_by_role, "planner", [PRIMARY, BACKUP])
+    _hedging_router(router, monkeypatch, {"primary": (0.2, '{"ok": true}'), "backup": (0.0, "not json")})
+
+    result = router._execute_hedged_call(
+        PRIMARY, "s", "u", {}, router_module._NullScratchpad(), 5, "planner",
+        response_format={"type": "json_object"},
+    )
+    assert result == '{"ok": true}'
+    assert router.metrics.get_hedging_stats()["planner"]["hedge_wins"] == 0
+
+
+def test_single_candidate_is_not_hedged_against_itself(router, monkeypatch):
+    import agent_s3.router_agent as router_module
+
+    monkeypatch.setitem(router_module._candidates_by_role, "planner", [PRIMARY])
+    calls = []
+
+    def fake_execute(model_info, system_prompt, user_prompt, config, scratchpad, timeout, role, **kwargs):
+        calls.append((model_info["model"], kwargs))
+        return "ok"
+
+    monkeypatch.setattr(router, "_execute_llm_call", fake_execute)
+
+    assert router._hedge_target("planner", PRIMARY) is None
+    assert router._execute_hedged_call(
+        PRIMARY, "s", "u", {}, router_module._NullScratchpad(), 5, "planner", stream=False
+    ) == "ok"
+    assert calls == [("primary", {"stream": False})]
+    assert "planner" not in router.metrics.get_hedging_stats()
+
+
+def test_hedged_call_keeps_caller_stream_setting(router, monkeypatch):
+    import agent_s3.router_agent as router_module
+
+    monkeypatch.setitem(router_module._candidates_by_role, "planner", [PRIMARY, BACKUP])
+    seen = []
+
+    def fake_execute(model_info, system_prompt, user_prompt, config, scratchpad,
+                     timeout, role, cancel_event=None, **kwargs):
+        seen.append(kwargs.get("stream"))
+        return "ok"
+
+    monkeypatch.setattr(router, "_execute_llm_call", fake_execute)
+    router._execute_hedged_call(PRIMARY, "s", "u", {}, router_module._NullScratchpad(), 5, "planner")
+    assert seen == [None]
+
+
+def test_stream_usage_reconciles_token_estimates(router):
+    response = FakeStreamResponse(["hello ", "world"])
+    usage_event = {"choices": [], "usage": {"prompt_tokens": 120, "completion_tokens": 7}}
+    response.lines[-2:-2] = [f"data: {json.dumps(usage_event)}", ""]
+    usage = {}
+
+    content = router._read_streamed_content(response, usage=usage)
+    router._record_success("planner", {"model": "m", "pricing_per_million": {"input": 1.0, "output": 2.0}},
+                           0.5, 100, content, usage)
+
+    record = router.metrics.get_metrics()[-1]
+    assert content == "hello world"
+    assert (record["input_tokens"], record["output_tokens"]) == (120, 7)
+    assert record["cost"] == pytest.approx((120 * 1.0 + 7 * 2.0) / 1_000_000)
+    accuracy = router.metrics.get_token_accuracy()["planner/m"]
+    assert accuracy["input_ratio"] == pytest.approx(1.2)
+
+
+OPENROUTER = "https://openrouter.ai/api/v1/chat/completions"
+
+
+def test_build_messages_marks_long_static_system_prompt_for_caching():
+    long_system = "Follow the planning rules carefully. " * 400
+    messages = RouterAgent._build_messages(long_system, "dynamic task", {}, OPENROUTER)
+    assert messages[0]["content"] == [
+        {"type": "text", "text": long_system, "cache_control": {"type": "ephemeral"}}
+    ]
+    assert messages[1] == {"role": "user", "content": "dynamic task"}
+
+    assert RouterAgent._build_messages("short", "task", {}, OPENROUTER)[0]["content"] == "short"
+    disabled = RouterAgent._build_messages(long_system, "task", {"llm_prompt_caching": False}, OPENROUTER)
+    assert disabled[0]["content"] == long_system
+
+
+@pytest.mark.parametrize("endpoint, marked", [
+    ("https://api.anthropic.com/v1/messages", True),
+    ("https://api.openai.com/v1/chat/completions", False),
+    ("http://localhost:8000/v1/chat/completions", False),
+    ("https://openrouter.ai.example.com/v1/chat", False),
+    (None, False),
+])
+def test_cache_control_is_only_sent_to_supporting_endpoints(endpoint, marked):
+    long_system = "Follow the planning rules carefully. " * 400
+    content = RouterAgent._build_messages(long_system, "task", {}, endpoint)[0]["content"]
+    assert isinstance(content, list) is marked
+    if not marked:
+        assert content == long_system
+
+
+def test_cached_input_tokens_are_reported_per_role(router):
+    model_info = {"model": "m", "pricing_per_million": {"input": 2.0, "output": 8.0, "cached_input": 0.5}}
+    usage = {"prompt_tokens": 4000, "completion_tokens": 100, "prompt_tokens_details": {"cached_tokens": 3000}}
+
+    router._record_success("debugger", model_info, 1.0, 3900, "fixed", usage)
+
+    stats = router.metrics.get_prompt_cache_stats()["debugger"]
+    assert stats["cached_tokens"] == 3000
+    assert stats["cached_ratio"] == 0.75
+    assert stats["savings_usd"] == pytest.approx(3000 * 1.5 / 1_000_000)
+    assert router.metrics.get_metrics()[-1]["cost"] == pytest.approx(
+        (1000 * 2.0 + 3000 * 0.5 + 100 * 8.0) / 1_000_000
+    )
+
+
+def _retrying_router(router, monkeypatch, error):
+    """Make the planner's primary model fail with ``error`` and count attempts."""
+    import agent_s3.router_agent as router_module
+
+    primary = {"model": "primary", "api": {"endpoint": "https://primary.example/v1"}}
+    backup = {"model": "backup"}
+    monkeypatch.setitem(router_module._models_by_role, "planner", primary)
+    monkeypatch.setitem(router_module._models_by_role, "reviewer", backup)
+    monkeypatch.setattr(router_module, "sleep", lambda _s: None)
+    attempts = []
+
+    def failing(model_info, *_a, **_k):
+        attempts.append(model_info["model"])
+        raise error
+
+    monkeypatch.setattr(router, "_execute_hedged_call", failing)
+    monkeypatch.setattr(router, "_execute_llm_call", lambda model_info, *_a, **_k: "from " + model_info["model"])
+    return attempts
+
+
+def test_open_circuit_fails_over_without_retrying(router, monkeypatch):
+    from agent_s3.http_transport import CircuitOpenError
+
+    attempts = _retrying_router(router, monkeypatch, CircuitOpenError("primary", 30.0))
+
+    result = router._call_llm_by_role(
+        "planner", "s", "u", {"max_retries": 3}, _NullScratchpad(), fallback_role="reviewer"
+    )
+
+    assert result == "from backup"
+    assert attempts == ["primary"]
+
+
+def test_client_errors_are_not_retried(router, monkeypatch):
+    import requests
+
+    response = requests.Response()
+    response.status_code = 400
+    try:
+        try:
+            raise requests.exceptions.HTTPError(response=response)
+        except requests.exceptions.HTTPError:
+            raise ConnectionError("API call to primary failed: 400")
+    except ConnectionError as e:
+        error = e
+    attempts = _retrying_router(router, monkeypatch, error)
+
+    assert router._call_llm_by_role("planner", "s", "u", {"max_retries": 3}, _NullScratchpad()) is None
+    assert attempts == ["primary"]
+
+
+def test_transient_errors_retry_within_budget(router, monkeypatch):
+    attempts = _retrying_router(router, monkeypatch, TimeoutError("read timed out"))
+
+    assert router._call_llm_by_role("planner", "s", "u", {"max_retries": 3}, _NullScratchpad()) is None
+    assert attempts == ["primary"] * 3
+    assert router._call_llm_by_role(
+        "planner", "s", "u", {"max_retries": 3, "llm_retry_deadline": 0}, _NullScratchpad()
+    ) is None
+    assert attempts == ["primary"] * 4
+
+
+def test_timed_out_attempt_is_retried_by_default(router, monkeypatch):
+    import agent_s3.router_agent as router_module
+    from agent_s3.http_transport import TransportRegistry
+
+    clock = [0.0]
+    monkeypatch.setattr(router_module.time, "monotonic", lambda: clock[0])
+    registry = TransportRegistry()
+    monkeypatch.setattr(router_module, "get_transport_registry", lambda config=None: registry)
+    attempts = _retrying_router(router, monkeypatch, TimeoutError("read timed out"))
+
+    def timing_out(model_info, *_a, **_k):
+        clock[0] += 125.0  # the whole 5 s connect + 120 s read timeout
+        attempts.append(model_info["model"])
+        raise TimeoutError("read timed out")
+
+    monkeypatch.setattr(router, "_execute_hedged_call", timing_out)
+    config = {"max_retries": 3, "llm_connection_timeout": 5, "llm_read_timeout": 120}
+    assert router._call_llm_by_role("planner", "s", "u", config, _NullScratchpad()) is None
+    assert attempts == ["primary"] * 3
+
+
+def test_read_timeout_adapts_to_p95_latency(router):
+    config = {"llm_connection_timeout": 5, "llm_read_timeout": 120}
+    assert router._adaptive_timeout("planner", "m", config) == (5, 120)
+    for _ in range(20):
+        router.metrics.record("planner", "m", 10.0, True, 100)
+    assert router._adaptive_timeout("planner", "m", config) == (5, 30.0)
+    assert router._adaptive_timeout("planner", "m", {**config, "llm_timeout_p95_multiplier": 0}) == (5, 120)
+
+
+def test_run_passes_stream_arguments_to_the_call(router, monkeypatch):
+    seen = {}
+
+    def fake_call(**kwargs):
+        seen.update(kwargs)
+        return "{}"
+
+    def validate(item, index):
+        return None
+
+    monkeypatch.setattr(router, "call_llm_by_role", fake_call)
+    router.run(
+        {"role": "pre_planner", "system": "s", "user": "u"},
+        openrouter_key="k",
+        stream=True,
+        on_stream_item=validate,
+        stream_item_key="feature_groups",
+    )
+
+    assert seen["config"] == {"openrouter_key": "k"}
+    assert seen["stream"] is True and seen["on_stream_item"] is validate
+    assert seen["stream_item_key"] == "feature_groups"
+
+
+def _half_open_call(router, monkeypatch):
+    """Return a breaker in the half-open state, with the router bound to its registry."""
+    import agent_s3.router_agent as router_module
+    from agent_s3.http_transport import TransportRegistry
+
+    registry = TransportRegistry(failure_threshold=1, cooldown=0.0)
+    monkeypatch.setattr(router_module, "get_transport_registry", lambda config=None: registry)
+    model_info = {
+        "model": "m",
+        "api": {"endpoint": "https://api.example.com/v1/chat", "auth_header": "Authorization: Bearer $OPENROUTER_KEY"},
+    }
+    breaker = registry.get_breaker("https://api.example.com/v1/chat", "m")
+    breaker.record_failure()
+    return registry, breaker, model_info
+
+
+@pytest.mark.parametrize("interruption", ["cancelled", "throttle_error"])
+def test_half_open_probe_is_released_on_every_exit(router, monkeypatch, interruption):
+    import threading
+    import agent_s3.router_agent as router_module
+
+    registry, breaker, model_info = _half_open_call(router, monkeypatch)
+    cancel_event = threading.Event()
+    limiter = registry.get_limiter("https://api.example.com/v1/chat")
+    if interruption == "cancelled":
+        cancel_event.set()
+        expected = router_module._CallCancelled
+    else:
+        monkeypatch.setattr(limiter, "acquire", lambda: (_ for _ in ()).throw(KeyboardInterrupt()))
+        expected = KeyboardInterrupt
+
+    with pytest.raises(expected):
+        router._execute_llm_call(
+            model_info, "s", "u", {"openrouter_key": "k"}, _NullScratchpad(),
+            timeout=(1, 1), role="planner", cancel_event=cancel_event,
+        )
+
+    # The probe slot is free again and no concurrency slot was leaked or over-released
+    assert breaker.allow()
+    assert limiter._semaphore._value == limiter.max_concurrency
+
+
+def test_streamed_error_response_is_closed(router, monkeypatch):
+    import requests
+
+    registry, _breaker, model_info = _half_open_call(router, monkeypatch)
+    response = requests.Response()
+    response.status_code = 503
+    closed = []
+    response.close = lambda: closed.append(True)
+    monkeypatch.setattr(registry, "request", lambda *_a, **_k: response)
+
+    with pytest.raises(ConnectionError):
+        router._execute_llm_call(
+            model_info, "s", "u", {"openrouter_key": "k"}, _NullScratchpad(),
+            timeout=(1, 1), role="planner", stream=True,
+        )
+
+    assert closed == [True]
+
+
+def test_truncated_error_context_keeps_call_start_time(router, monkeypatch):
+    import agent_s3.router_agent as router_module
+    from agent_s3.http_transport import TransportRegistry
+
+    registry = TransportRegistry()
+    monkeypatch.setattr(router_module, "get_transport_registry", lambda config=None: registry)
+
+    class Ok:
+        status_code = 200
+        headers = {}
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"choices": [{"message": {"content": "analysis"}}]}
+
+    monkeypatch.setattr(registry, "request", lambda *_a, **_k: Ok())
+    model_info = {
+        "model": "m",
+        "context_window": 8000,
+        "api": {"endpoint": "https://api.example.com/v1/chat", "auth_header": "Authorization: Bearer $OPENROUTER_KEY"},
+    }
+    log = "\n".join(["ok line"] * 5000 + ["Traceback: ValueError boom"] + ["ok line"] * 50)
+
+    assert router._execute_llm_call(
+        model_info, "s", "u", {"openrouter_key": "k"}, _NullScratchpad(),
+        timeout=(1, 1), role="error_analyzer", code_context={"app.log": log},
+    ) == "analysis"
+    assert router.metrics.get_metrics()[-1]["duration"] < 60
+
+
+def test_choose_llm_counts_tokens_not_words(router, monkeypatch, caplog):
+    import logging
+    import agent_s3.router_agent as router_module
+
+    monkeypatch.setitem(router_module._models_by_role, "planner", {"model": "m", "context_window": 100})
+    counted = []
+    monkeypatch.setattr(router_module, "estimate_tokens", lambda text: counted.append(text) or 150)
+    query = "parse_http_response " * 60  # 60 words, 150 tokens
+    with caplog.at_level(logging.WARNING, logger=router_module.logger.name):
+        assert router.choose_llm(query, {"role": "planner"}) == "m"
+    assert counted == [query]
+    assert "Estimated token count (150) exceeds the context window" in caplog.text
+
+
+def test_reload_config_closes_open_circuits(router, monkeypatch):
+    import agent_s3.router_agent as router_module
+    from agent_s3.http_transport import TransportRegistry
+
+    registry = TransportRegistry(failure_threshold=1, cooldown=60.0)
+    monkeypatch.setattr(router_module, "get_transport_registry", lambda config=None: registry)
+    monkeypatch.setattr(router_module, "_load_llm_config", lambda: {})
+    breaker = registry.get_breaker("https://api.example.com/v1/chat", "m")
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    router.reload_config()
+    assert breaker.state == "closed"
+    assert breaker.allow()
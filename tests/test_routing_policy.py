@@ -0,0 +1,103 @@
+import pytest
+
+from agent_s3.router_agent import MetricsTracker
+from agent_s3.routing_policy import RoutingPolicy, estimate_cost, simulate
+
+CHEAP = {
+    "model": "cheap",
+    "context_window": 8000,
+    "pricing_per_million": {"input": 0.1, "output": 0.4},
+}
+FAST = {
+    "model": "fast",
+    "context_window": 1000000,
+    "pricing_per_million": {"input": 1.0, "output": 4.0},
+}
+
+
+def _feed(metrics, model, duration, count, success=True):
+    for _ in range(count):
+        metrics.record("planner", model, duration, success, 100, input_tokens=60, output_tokens=40)
+
+
+def test_model_stats_rolling_percentiles_and_errors():
+    metrics = MetricsTracker(window=10)
+    for duration in [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]:
+        metrics.record("planner", "m", duration, True, 10, cost=0.001)
+    metrics.record("planner", "m", 99, False, 0)
+
+    stats = metrics.get_model_stats("planner", "m")
+    assert stats["samples"] == 10
+    assert stats["p50"] == 8
+    assert stats["p95"] == 12
+    assert stats["error_rate"] == 0.1
+    assert stats["cost_per_token"] == pytest.approx(0.0001)
+
+
+def test_estimate_cost_uses_pricing_per_million():
+    assert estimate_cost(FAST, 1_000_000, 500_000) == 3.0
+    assert estimate_cost({"model": "free"}, 1000, 1000) == 0.0
+
+
+def test_prefers_cheapest_model_meeting_slo():
+    metrics = MetricsTracker()
+    _feed(metrics, "cheap", 2.0, 10)
+    _feed(metrics, "fast", 1.0, 10)
+    policy = RoutingPolicy(metrics, latency_slo=5.0)
+    assert policy.choose("planner", [FAST, CHEAP], 500)["model"] == "cheap"
+
+
+def test_skips_models_violating_slo_or_error_budget():
+    metrics = MetricsTracker()
+    _feed(metrics, "cheap", 30.0, 10)
+    _feed(metrics, "fast", 1.0, 10)
+    policy = RoutingPolicy(metrics, latency_slo=5.0)
+    assert policy.choose("planner", [FAST, CHEAP], 500)["model"] == "fast"
+
+    metrics = MetricsTracker()
+    _feed(metrics, "cheap", 1.0, 10, success=False)
+    _feed(metrics, "fast", 1.0, 10)
+    assert RoutingPolicy(metrics).choose("planner", [FAST, CHEAP], 500)["model"] == "fast"
+
+
+def test_respects_context_window_and_cost_budget():
+    metrics = MetricsTracker()
+    _feed(metrics, "cheap", 1.0, 10)
+    _feed(metrics, "fast", 1.0, 10)
+    policy = RoutingPolicy(metrics)
+    assert policy.choose("planner", [FAST, CHEAP], 20000)["model"] == "fast"
+    assert policy.choose("planner", [CHEAP, FAST], 500, cost_budget=0.0001)["model"] == "cheap"
+
+
+def test_unexplored_models_are_tried_first():
+    metrics = MetricsTracker()
+    _feed(metrics, "fast", 1.0, 10)
+    assert RoutingPolicy(metrics, latency_slo=5.0).choose("planner", [FAST, CHEAP], 500)["model"] == "cheap"
+
+
+def test_without_slo_or_budget_the_configured_default_is_kept():
+    metrics = MetricsTracker()
+    _feed(metrics, "cheap", 1.0, 10)
+    _feed(metrics, "fast", 3.0, 10)
+    policy = RoutingPolicy(metrics)
+    # FAST is the llm.json default; CHEAP being cheaper is no reason to switch
+    assert policy.choose("planner", [FAST, CHEAP], 500)["model"] == "fast"
+    # The default is still skipped when it cannot serve the request
+    assert policy.choose("planner", [CHEAP, FAST], 20000)["model"] == "fast"
+
+
+def test_simulation_replay_is_deterministic_and_shifts_traffic():
+    records = []
+    for i in range(40):
+        records.append({"role": "planner", "model": "cheap", "duration": 2.0 if i < 20 else 30.0,
+                        "success": True, "tokens": 100})
+        records.append({"role": "planner", "model": "fast", "duration": 1.0, "success": True, "tokens": 100})
+    candidates = {"planner": [FAST, CHEAP]}
+
+    first = simulate(records, candidates, latency_slo=10.0)
+    second = simulate(records, candidates, latency_slo=10.0)
+
+    assert first["decisions"] == second["decisions"]
+    assert first["decisions"][10]["chosen_model"] == "cheap"
+    assert first["decisions"][-1]["chosen_model"] == "fast"
+    assert first["final_stats"]["planner"]["fast"]["samples"] == 40
@@ -71,10 +71,10 @@ def test_eviction_lru():
     for i in range(5):
         cache.set({'prompt': str(i)}, {'val': i})
     # Should have evicted to <= max entries
-    assert len(cache.mem_cache) <= 3
+    assert len(cache.namespace('').mem_cache) <= 3
 
     # Check ordering: oldest entries removed
-    keys = list(cache.mem_cache.keys())
+    keys = list(cache.namespace('').mem_cache.keys())
     # The last few inserted should remain
     assert all(k in [cache.get_cache_key({'prompt': str(i)}) for i in range(2,5)] for k in keys)
 
@@ -112,7 +112,7 @@ def test_eviction_lru_default():
     for i in range(5):
         cache.set({'prompt': f'p{i}', 'model': 'test'}, i)
     # After eviction, only <=3 entries remain
-    entries = cache.mem_cache
+    entries = cache.namespace('').mem_cache
     assert len(entries) <= cache.max_cache_entries
 
 
@@ -121,7 +121,7 @@ def test_semantic_search_no_embedding(monkeypatch, count):
     cache = SemanticCache.get_instance()
     # Monkeypatch embedding client to None to disable semantic
     cache.embedding_client = None
-    cache.index = None
+    cache.namespace('').index = None
     prompt = {'prompt': f'q{count}', 'model': 'test'}
     cache.set(prompt, {'val': count})
     # Only exact get works
@@ -129,3 +129,325 @@ def test_semantic_search_no_embedding(monkeypatch, count):
     assert result is not None
     assert result['response'] == {'val': count}
     assert result['cached']
+
+
+def test_entries_persist_without_full_rewrites(tmp_path):
+    cache = SemanticCache.get_instance({'semantic_cache_ttl': 100})
+    cache.embedding_client = None
+    cache.set({'prompt': 'kept'}, {'answer': 42})
+    cache_dir = cache.cache_dir
+    assert not (cache_dir / "semantic_cache_v1.0.json").exists()
+
+    SemanticCache._instance = None
+    reloaded = SemanticCache.get_instance()
+    reloaded.embedding_client = None
+    entry = reloaded.namespace('').mem_cache[reloaded.get_cache_key({'prompt': 'kept'})]
+    assert "response" not in entry  # loaded lazily on first hit
+    assert reloaded.get({'prompt': 'kept'})['response'] == {'answer': 42}
+
+
+def test_embedding_calls_do_not_hold_the_cache_lock():
+    import threading
+
+    class SlowClient:
+        def generate_embedding(self, text):
+            time.sleep(0.2)
+            return [1.0] * SemanticCache.get_instance().embedding_dim
+
+    cache = SemanticCache.get_instance({'semantic_cache_ttl': 100})
+    cache.embedding_client = SlowClient()
+    cache.set({'prompt': 'seed'}, 'value')
+    threads = [
+        threading.Thread(target=cache.get, args=({'prompt': f'similar {i}'},))
+        for i in range(4)
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    # Exact-key hits are served while the lookups wait on embeddings
+    assert cache.get({'prompt': 'seed'})['response'] == 'value'
+    assert time.perf_counter() - start < 0.1
+    for thread in threads:
+        thread.join()
+
+    assert time.perf_counter() - start < 0.6
+    assert cache.get_cache_stats()['semantic_hits'] == 4
+
+
+class AxisClient:
+    """Embeds ``axis N`` prompts as unit vectors along dimension N."""
+
+    def generate_embedding(self, text):
+        vector = [0.0] * SemanticCache.get_instance().embedding_dim
+        vector[int(text.split()[-1])] = 2.0  # unnormalized on purpose
+        return vector
+
+
+def test_eviction_removes_ids_and_keeps_cosine_similarity():
+    import faiss
+
+    cache = SemanticCache.get_instance({'semantic_cache_max_entries': 4, 'semantic_similarity_threshold': 0.99})
+    cache.embedding_client = AxisClient()
+    for i in range(4):
+        cache.set({'prompt': f'axis {i}'}, i)
+    cache.get({'prompt': 'axis 0'})  # keep entry 0 recently used
+    time.sleep(0.01)
+    cache.set({'prompt': 'axis 4'}, 4)
+
+    assert cache.namespace('').index.ntotal == len(cache.namespace('').mem_cache) == 3
+    assert set(cache.namespace('').index_lookup.values()) == set(cache.namespace('').mem_cache)
+    inner = faiss.downcast_index(cache.namespace('').index.index)
+    assert inner.metric_type == faiss.METRIC_INNER_PRODUCT
+    # Same direction after eviction is still a cosine match of 1.0
+    assert cache.get({'prompt': 'different wording, axis 0'})['response'] == 0
+    assert cache.get_cache_stats()['semantic_hits'] == 1
+
+
+def test_replacing_a_key_replaces_its_vector():
+    cache = SemanticCache.get_instance()
+    cache.embedding_client = AxisClient()
+    cache.set({'prompt': 'axis 1'}, 'old')
+    cache.set({'prompt': 'axis 1'}, 'new')
+    assert cache.namespace('').index.ntotal == 1
+    assert cache.get({'prompt': 'axis 1'})['response'] == 'new'
+
+
+def test_gdsf_evicts_large_unused_entries_first():
+    cache = SemanticCache.get_instance({
+        'semantic_cache_max_entries': 3,
+        'semantic_cache_eviction_policy': 'gdsf',
+    })
+    cache.embedding_client = None
+    cache.set({'prompt': 'big'}, 'x' * 5000)
+    cache.set({'prompt': 'small'}, 'x')
+    cache.set({'prompt': 'hot'}, 'x' * 10)
+    for _ in range(5):
+        cache.get({'prompt': 'hot'})
+    cache.set({'prompt': 'trigger'}, 'x')
+
+    # Two of four entries go: the large one and the least hit per byte
+    assert cache.get_cache_key({'prompt': 'big'}) not in cache.namespace('').mem_cache
+    assert cache.get_cache_key({'prompt': 'hot'}) in cache.namespace('').mem_cache
+    assert cache.namespace('')._gdsf_clock > 0
+
+
+@pytest.mark.parametrize('kind', ['hnsw', 'ivf_flat'])
+def test_approximate_index_swaps_in_after_threshold(kind):
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    vectors = {f'v{i}': rng.standard_normal(32) for i in range(120)}
+
+    class TableClient:
+        def generate_embedding(self, text):
+            return vectors[text]
+
+    cache = SemanticCache.get_instance({
+        'embedding_dim': 32,
+        'semantic_cache_ann_index': kind,
+        'semantic_cache_ann_threshold': 100,
+        'semantic_cache_max_entries': 110,
+        'semantic_cache_nprobe': 64,
+        'semantic_similarity_threshold': 0.99,
+    })
+    cache.embedding_client = TableClient()
+    for i in range(100):
+        cache.set({'prompt': f'v{i}'}, i)
+    cache.namespace('')._ann_builder.join(timeout=10)
+    assert cache.namespace('').get_index_stats()['kind'] == kind
+
+    # Writes and evictions after the swap keep lookups consistent
+    for i in range(100, 120):
+        cache.set({'prompt': f'v{i}'}, i)
+    stats = cache.namespace('').get_index_stats()
+    assert stats['live'] == len(cache.namespace('').mem_cache) <= 110
+    for key, entry in list(cache.namespace('').mem_cache.items())[-5:]:
+        prompt = cache.store.get_response(entry['id'])
+        query = {'prompt': f'v{prompt}', 'temperature': 0.5}  # different key, same vector
+        assert cache.get(query)['response'] == prompt
+
+
+def test_namespaces_isolate_roles_and_apply_overrides():
+    cache = SemanticCache.get_instance({
+        'semantic_similarity_threshold': 0.5,
+        'semantic_cache_namespaces': {'test_critic/*/*': {'similarity_threshold': 0.999, 'max_entries': 10}},
+    })
+    cache.embedding_client = DummyClient()
+    designer = {'prompt': 'plan it', 'role': 'designer', 'model': 'm'}
+    cache.set(designer, 'plan')
+
+    # Same vector, other role: never searched
+    critic = {'prompt': 'critique it', 'role': 'test_critic', 'model': 'm'}
+    assert cache.get(critic) is None
+    assert cache.get({**designer, 'prompt': 'reworded'})['response'] == 'plan'
+
+    critic_ns = cache.namespace(cache.namespace_for(critic))
+    assert critic_ns.name == 'test_critic/m/*'
+    assert critic_ns.similarity_threshold == 0.999
+    assert critic_ns.max_entries == 10
+    for i in range(11):
+        cache.set({**critic, 'prompt': f'critique {i}'}, i)
+    assert len(critic_ns) == 9
+
+    stats = cache.get_namespace_stats()
+    assert stats['designer/m/*']['semantic_hits'] == 1
+    assert stats['test_critic/m/*']['misses'] == 1
+    assert stats['test_critic/m/*']['evictions'] == 2
+    assert stats['designer/m/*']['entries'] == 1
+    assert cache.get_cache_stats()['semantic_hits'] == 1
+
+
+def test_namespaces_survive_reload():
+    cache = SemanticCache.get_instance()
+    cache.embedding_client = None
+    prompt = {'prompt': 'same', 'role': 'designer', 'response_format': {'type': 'json_object'}}
+    cache.set(prompt, '{"ok": true}')
+    cache.set({'prompt': 'same'}, 'text')
+    cache.get(prompt)
+    cache._save_cache()
+    cache.store.close()
+
+    SemanticCache._instance = None
+    reloaded = SemanticCache.get_instance()
+    reloaded.embedding_client = None
+    assert set(reloaded.namespaces) >= {'', 'designer/*/json_object'}
+    assert reloaded.get(prompt)['response'] == '{"ok": true}'
+    assert reloaded.get({'prompt': 'same'})['response'] == 'text'
+    assert reloaded.get_namespace_stats()['designer/*/json_object']['hits'] == 2
+
+
+def test_validators_gate_writes_and_versions_invalidate_entries():
+    from agent_s3.tools.semantic_cache_validation import register_cache_validator, unregister_cache_validator
+
+    cache = SemanticCache.get_instance()
+    cache.embedding_client = None
+    json_prompt = {'prompt': 'plan', 'response_format': {'type': 'json_object'}}
+    cache.set(json_prompt, 'not json')
+    assert cache.get(json_prompt) is None
+
+    prompt = {'prompt': 'plan', 'role': 'designer'}
+    cache.set(prompt, {'steps': []})
+    try:
+        def has_steps(response):
+            return 'steps' in response, None if 'steps' in response else 'missing steps'
+
+        # Entries cached before the validator existed are dropped in bulk
+        assert cache.register_validator('designer', has_steps, '1') == 1
+        assert cache.get(prompt) is None
+
+        cache.set(prompt, {'other': 1})
+        assert cache.get(prompt) is None
+        cache.set(prompt, {'steps': [1]})
+        assert cache.get(prompt)['response'] == {'steps': [1]}
+        assert cache.get_namespace_stats()['designer/*/*']['rejected'] == 1
+
+        # Versions survive a reload; a version the cache was not told about
+        # still invalidates entries when they are looked up
+        cache.store.close()
+        SemanticCache._instance = None
+        reloaded = SemanticCache.get_instance()
+        reloaded.embedding_client = None
+        assert reloaded.get(prompt)['response'] == {'steps': [1]}
+        register_cache_validator('designer', has_steps, '2')
+        assert reloaded.get(prompt) is None
+        assert len(reloaded.store) == 0
+    finally:
+        unregister_cache_validator('designer')
+
+
+def test_pre_planner_and_planner_have_builtin_validators():
+    from agent_s3.tools.semantic_cache_validation import check_response
+
+    group = {"group_name": "g", "features": [{"name": "f", "description": "d"}]}
+    assert not check_response('pre_planner', '{"feature_groups": []}')[0]
+    assert check_response('pre_planner', {"feature_groups": [group]})[:2] == (True, 'feature_groups-1')
+    assert not check_response('planner', '{"steps": []}')[0]
+    assert not check_response('planner', 'not json')[0]
+
+
+def test_metrics_report_rates_latency_and_savings():
+    from agent_s3.routing_policy import estimate_tokens
+    from agent_s3.tools.semantic_cache_metrics import PricingTable
+
+    cache = SemanticCache.get_instance({'semantic_similarity_threshold': 0.5})
+    cache.embedding_client = DummyClient()
+    # $1 per input token and $2 per output token
+    cache._pricing = PricingTable([
+        {'role': 'designer', 'model': 'm', 'pricing_per_million': {'input': 1e6, 'output': 2e6}},
+    ])
+    prompt = {'prompt': 'plan it', 'role': 'designer', 'model': 'm'}
+    assert cache.get(prompt) is None
+    cache.set(prompt, 'plan')
+    assert cache.get(prompt)['response'] == 'plan'
+    assert cache.get({**prompt, 'prompt': 'reworded'})['response'] == 'plan'
+
+    metrics = cache.get_metrics()
+    stats = metrics['namespaces']['designer/m/*']
+    assert stats['hit_rate'] == stats['semantic_hit_rate'] == stats['miss_rate'] == pytest.approx(1 / 3)
+    input_tokens = estimate_tokens('plan it') + estimate_tokens('reworded')
+    output_tokens = 2 * estimate_tokens('plan')
+    assert (stats['saved_input_tokens'], stats['saved_output_tokens']) == (input_tokens, output_tokens)
+    assert stats['saved_usd'] == pytest.approx(input_tokens + 2 * output_tokens)
+    assert metrics['totals']['saved_usd'] == stats['saved_usd']
+
+    latency = metrics['latency']
+    assert latency['exact_lookup']['count'] == 2
+    assert latency['vector_lookup']['count'] == 1
+    assert latency['embedding']['count'] == 2
+    assert latency['vector_lookup']['p95_ms'] >= latency['vector_lookup']['p50_ms'] > 0
+
+
+def test_latency_histogram_percentiles():
+    from agent_s3.tools.semantic_cache_metrics import LatencyHistogram
+
+    histogram = LatencyHistogram()
+    for _ in range(90):
+        histogram.record(0.0008)
+    for _ in range(10):
+        histogram.record(0.2)
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 100
+    assert snapshot['p50_ms'] == 1
+    assert snapshot['p95_ms'] == 250
+    assert snapshot['buckets'] == {'<=1ms': 90, '<=250ms': 10}
+
+
+def test_lexical_embeddings_do_not_match_near_miss_prompts():
+    from agent_s3.tools.local_embeddings import HashingEmbedder
+    from agent_s3.tools.semantic_cache import DEFAULT_SIMILARITY_THRESHOLD
+
+    cache = SemanticCache.get_instance({'semantic_cache_ttl': 10})
+    add = (
+        "Create a plan to add a login endpoint to the authentication service. The endpoint accepts a "
+        "username and password, validates them against the user store, issues a session token and "
+        "records the login attempt for auditing."
+    )
+    remove = add.replace("add a login", "remove the login")
+    # The default backend scores this pair above any usable threshold
+    add_vec, remove_vec = HashingEmbedder(cache.embedding_dim).embed([add, remove])
+    assert float(add_vec @ remove_vec) > DEFAULT_SIMILARITY_THRESHOLD
+
+    # Hashing vectors are never used for matching; without an API key the llm path embeds nothing
+    assert cache.embedding_client.backend is None
+    cache.set({'prompt': add}, {'plan': 'add'})
+    assert cache.get({'prompt': remove}) is None
+    assert cache.get({'prompt': add})['response'] == {'plan': 'add'}
+
+
+def test_default_config_cache_matches_semantically(monkeypatch):
+    from agent_s3 import llm_utils
+
+    dim = SemanticCache.get_instance().embedding_dim
+    SemanticCache._instance = None
+
+    def fake_embeddings(texts, **_kwargs):
+        # Both phrasings of the request share one vector, anything else is orthogonal
+        return [[1.0] + [0.0] * (dim - 1) if 'login' in text else [0.0, 1.0] + [0.0] * (dim - 2) for text in texts]
+
+    monkeypatch.setattr(llm_utils, 'get_embeddings', fake_embeddings)
+    cache = SemanticCache.get_instance()
+    assert cache.embedding_client is not None
+    cache.set({'prompt': 'Plan a login endpoint'}, 'plan')
+    assert cache.get({'prompt': 'Plan the login endpoint, please'})['response'] == 'plan'
+    assert cache.get({'prompt': 'Plan a billing report'}) is None
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import zipfile
+
+import numpy as np
+import pytest
+
+from agent_s3.tools.semantic_cache import SemanticCache
+
+DIM = 16
+
+
+class HashEmbeddingClient:
+    """Embeddings seeded from the text, so equal texts get equal vectors."""
+
+    def generate_embedding(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], "little")
+        return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+
+
+def _cache(tmp_path, name, **config):
+    cache = SemanticCache({"workspace_path": str(tmp_path / name), "embedding_dim": DIM, **config})
+    cache.embedding_client = HashEmbeddingClient()
+    return cache
+
+
+@pytest.fixture(autouse=True)
+def no_cache_dir_override(monkeypatch):
+    monkeypatch.delenv("SEMANTIC_CACHE_DIR", raising=False)
+
+
+def test_export_import_merges_by_key_and_skips_near_duplicates(tmp_path):
+    source = _cache(tmp_path, "source")
+    source.set({"prompt": "shared", "temperature": 0}, "old answer")
+    source.set({"prompt": "fresh"}, "fresh answer")
+    source.set({"prompt": "planned", "role": "designer"}, {"steps": [1]})
+    bundle = tmp_path / "warm.zip"
+    assert source.export_bundle(bundle) == 3
+
+    with zipfile.ZipFile(bundle) as archive:
+        manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["dim"] == DIM and manifest["vectors"] == 3
+
+    target = _cache(tmp_path, "target")
+    target.set({"prompt": "shared", "temperature": 0}, "newer local answer")
+    # Same prompt text under a different key embeds identically
+    target.set({"prompt": "fresh", "temperature": 1}, "local copy")
+
+    counts = target.import_bundle(bundle)
+    assert counts["imported"] == 1
+    assert counts["kept_existing"] == 1
+    assert counts["duplicates"] == 1
+    assert target.get({"prompt": "shared", "temperature": 0})["response"] == "newer local answer"
+    assert target.get({"prompt": "planned", "role": "designer"})["response"] == {"steps": [1]}
+    assert target.get({"prompt": "fresh"})["response"] == "local copy"
+    assert target.namespace("designer/*/*").has_vectors()
+
+
+def test_import_from_another_embedding_model_keeps_exact_matches_only(tmp_path):
+    source = _cache(tmp_path, "source", semantic_cache_embedding_model="model-a")
+    source.set({"prompt": "hello"}, "world")
+    bundle = tmp_path / "warm.zip"
+    source.export_bundle(bundle)
+
+    target = _cache(tmp_path, "target", semantic_cache_embedding_model="model-b")
+    assert target.import_bundle(bundle)["imported"] == 1
+    assert target.get({"prompt": "hello"})["response"] == "world"
+    assert not target.namespace("").has_vectors()
+
+    (tmp_path / "bogus.zip").write_bytes(b"not a bundle")
+    with pytest.raises(ValueError):
+        target.import_bundle(tmp_path / "bogus.zip")
@@ -0,0 +1,135 @@
+import json
+import time
+
+import numpy as np
+
+from agent_s3.tools.semantic_cache_store import SemanticCacheStore
+
+DIM = 4
+
+
+def _vec(i):
+    return np.full(DIM, float(i), dtype=np.float32)
+
+
+def test_entries_and_vectors_survive_reopen(tmp_path):
+    store = SemanticCacheStore(tmp_path, DIM)
+    first = store.put("a", {"text": "one"}, "prompt a", time.time(), _vec(1))
+    store.put("b", "two", "prompt b", time.time())
+    store.save_stats({"hits": 3})
+    store.close()
+
+    store = SemanticCacheStore(tmp_path, DIM)
+    assert [row[2] for row in store.iter_entries()] == ["a", "b"]
+    assert store.get_response(first) == {"text": "one"}
+    ids, vectors = store.get_vectors()
+    assert ids == [first]
+    np.testing.assert_array_equal(vectors[0], _vec(1))
+    assert store.get_stats() == {"hits": 3}
+
+
+def test_compaction_keeps_live_vectors_and_switches_generation(tmp_path):
+    store = SemanticCacheStore(tmp_path, DIM)
+    ids = [store.put(str(i), i, "", time.time(), _vec(i)) for i in range(6)]
+    store.delete(ids[:4])
+    assert store.vector_rows == 6
+
+    store.compact()
+    assert store.vector_rows == 2
+    assert store.generation == 1
+    assert not (tmp_path / "vectors.0.f32").exists()
+    live_ids, vectors = store.get_vectors()
+    assert live_ids == ids[4:]
+    np.testing.assert_array_equal(vectors, np.stack([_vec(4), _vec(5)]))
+
+
+def test_interrupted_compaction_and_torn_append_recover(tmp_path):
+    store = SemanticCacheStore(tmp_path, DIM)
+    entry_id = store.put("a", 1, "", time.time(), _vec(7))
+    store.close()
+    # A compaction that crashed before committing leaves an orphan generation
+    (tmp_path / "vectors.1.f32").write_bytes(b"\0" * 16)
+    # A crash mid-append leaves a partial trailing row
+    with open(tmp_path / "vectors.0.f32", "ab") as f:
+        f.write(b"\1\2\3")
+
+    store = SemanticCacheStore(tmp_path, DIM)
+    assert store.generation == 0
+    assert not (tmp_path / "vectors.1.f32").exists()
+    assert store.vector_rows == 1
+    ids, vectors = store.get_vectors()
+    assert ids == [entry_id]
+    np.testing.assert_array_equal(vectors[0], _vec(7))
+
+
+def test_dimension_change_discards_vectors_only(tmp_path):
+    store = SemanticCacheStore(tmp_path, DIM)
+    store.put("a", 1, "", time.time(), _vec(1))
+    store.close()
+
+    store = SemanticCacheStore(tmp_path, DIM * 2)
+    assert len(store) == 1
+    ids, vectors = store.get_vectors()
+    assert ids == []
+    assert vectors.shape == (0, DIM * 2)
+
+
+def test_embedding_model_change_discards_vectors_only(tmp_path):
+    store = SemanticCacheStore(tmp_path, DIM, "model-a")
+    store.put("a", 1, "", time.time(), _vec(1))
+    store.close()
+
+    store = SemanticCacheStore(tmp_path, DIM, "model-a")
+    assert store.get_vectors()[0] != []
+    store.close()
+
+    store = SemanticCacheStore(tmp_path, DIM, "model-b")
+    assert len(store) == 1
+    assert store.get_vectors()[0] == []
+
+
+def test_migrates_v1_json_cache(tmp_path):
+    now = time.time()
+    legacy = {
+        "version": "v1.0",
+        "stats": {"hits": 2, "misses": 5, "semantic_hits": 1, "timestamp": now},
+        "entries": {
+            "fresh": {"timestamp": now, "last_access": now, "response": {"ok": True},
+                      "prompt_text": "hi", "embedding": [0.5] * DIM},
+            "stale": {"timestamp": now - 1000, "last_access": now, "response": "old", "embedding": None},
+        },
+    }
+    (tmp_path / "semantic_cache_v1.0.json").write_text(json.dumps(legacy))
+
+    store = SemanticCacheStore(tmp_path, DIM)
+    assert store.migrate_legacy_json(ttl=100) == 1
+    assert (tmp_path / "semantic_cache_v1.0.json.migrated").exists()
+    assert store.migrate_legacy_json(ttl=100) == 0
+
+    [(entry_id, namespace, key, _ts, _access, size, _version)] = store.iter_entries()
+    assert namespace == ''
+    assert size == len('{"ok": true}')
+    assert key == "fresh"
+    assert store.get_response(entry_id) == {"ok": True}
+    assert store.get_stats() == {"hits": 2, "misses": 5, "semantic_hits": 1}
+    np.testing.assert_array_equal(store.get_vectors()[1][0], np.full(DIM, 0.5, dtype=np.float32))
+
+
+def test_namespaces_keep_separate_entries_and_old_schema_migrates(tmp_path):
+    import sqlite3
+
+    conn = sqlite3.connect(tmp_path / "semantic_cache_v2.sqlite3")
+    conn.executescript(
+        "CREATE TABLE entries (id INTEGER PRIMARY KEY, key TEXT NOT NULL UNIQUE, timestamp REAL NOT NULL, "
+        "last_access REAL NOT NULL, response TEXT NOT NULL, prompt_text TEXT, vector_row INTEGER);"
+        "INSERT INTO entries VALUES (7, 'k', 1.0, 2.0, '\"old\"', '', NULL);"
+    )
+    conn.commit()
+    conn.close()
+
+    store = SemanticCacheStore(tmp_path, DIM)
+    assert store.iter_entries() == [(7, "", "k", 1.0, 2.0, 5, None)]
+    other = store.put("k", "new", "", time.time(), namespace="planner/*/*")
+    assert other != 7
+    assert store.get_response(7) == "old"
+    assert store.get_response(other) == "new"
@@ -34,3 +34,24 @@ def test_estimate_tokens_for_context(sample_context):
     code_total = estimates["code_context"]["total"]
     expected = code_total + estimates["metadata"] + estimates["framework_structures"]
     assert estimates["total"] == expected
+
+
+def test_shared_estimator_caches_long_segments():
+    from agent_s3.tools.context_management.token_budget import (
+        get_segment_cache_stats,
+        get_token_estimator,
+    )
+
+    estimator = get_token_estimator()
+    assert get_token_estimator() is estimator
+    assert TokenEstimator().encoding is estimator.encoding
+
+    system_prompt = "You are a meticulous planner. " * 50
+    before = get_segment_cache_stats()
+    first = estimator.estimate_tokens_for_text(system_prompt)
+    second = estimator.estimate_tokens_for_text(system_prompt)
+    after = get_segment_cache_stats()
+
+    assert first == second == len(estimator.encoding.encode(system_prompt))
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"] + 1
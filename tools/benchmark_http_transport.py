@@ -0,0 +1,118 @@
+"""
+Benchmark pooled HTTP transport against per-call sessions using a local stub server.
+
+Runs N chat-completion style POSTs against a keep-alive stub server twice:
+once building a new ``requests.Session`` per call (the old router behaviour)
+and once through :class:`agent_s3.http_transport.TransportRegistry`. Reports
+TCP connections opened by the server and mean per-call latency for each mode.
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from agent_s3.http_transport import TransportRegistry
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible completion endpoint with HTTP/1.1 keep-alive."""
+
+    protocol_version = "HTTP/1.1"
+    # Avoid Nagle/delayed-ACK stalls on reused connections
+    disable_nagle_algorithm = True
+    connections = 0
+    _count_lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with StubHandler._count_lock:
+            StubHandler.connections += 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        body = json.dumps({"choices": [{"message": {"content": "ok"}}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args):
+        pass
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def _per_call_session(url, payload):
+    session = requests.Session()
+    adapter = HTTPAdapter()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    try:
+        return session.post(url, json=payload, timeout=10)
+    finally:
+        session.close()
+
+
+def run_mode(url, calls, threads, send):
+    StubHandler.connections = 0
+    payload = {"model": "stub", "messages": [{"role": "user", "content": "hi"}]}
+    latencies = []
+    lock = threading.Lock()
+
+    def one(_):
+        start = time.perf_counter()
+        send(url, payload).raise_for_status()
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(calls)))
+    return {
+        "connections": StubHandler.connections,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p95_ms": sorted(latencies)[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def run_benchmark(calls=500, threads=4):
+    server = start_stub_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    registry = TransportRegistry(pool_maxsize=threads)
+    try:
+        results = {
+            "per_call_session": run_mode(url, calls, threads, _per_call_session),
+            "pooled_registry": run_mode(
+                url, calls, threads,
+                lambda u, p: registry.request("POST", u, json=p, timeout=10),
+            ),
+        }
+    finally:
+        registry.close()
+        server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+    for mode, stats in run_benchmark(args.calls, args.threads).items():
+        print(
+            f"{mode}: connections={stats['connections']}, "
+            f"mean={stats['mean_ms']:.2f}ms, p95={stats['p95_ms']:.2f}ms"
+        )
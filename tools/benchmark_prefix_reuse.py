@@ -0,0 +1,118 @@
+"""
+Benchmark KV prefix reuse on the planner's own prompts.
+
+Prompts are built the way the planner sends them: a real system prompt from
+``agent_s3.pre_planner_json_enforced`` or ``agent_s3.planning.prompt_templates``,
+followed by the user prompt for a task. Each prompt is looked up and then
+cached, in order, against two schemes:
+
+- ``legacy``: the old hash of the first 50 whitespace-split words. A hit
+  attaches the KV of whichever prompt was stored under that hash. It is
+  ``unsafe`` when that prompt's text differs from the new one, because the
+  attached KV then covers tokens the new prompt does not have.
+- ``trie``: :class:`agent_s3.cache.prefix.PrefixTrie`. A hit reuses the
+  longest cached prefix up to the last shared chunk boundary. This is what
+  ``agent_s3.cache.helpers.read_cache`` attaches when ``attach_kv`` accepts
+  ``prefix_tokens``.
+- ``whole``: the trie restricted to cached prompts that end exactly at the
+  matched boundary. This is all a plain ``attach_kv(kv)`` backend reuses.
+
+For each scheme it reports the fraction of prompts with a hit. For both trie
+schemes it also reports the fraction of all prompt tokens served from cached
+KV.
+
+Example::
+
+    python tools/benchmark_prefix_reuse.py --tasks-file tasks.txt --chunk 64
+"""
+import argparse
+import hashlib
+
+from agent_s3.cache.prefix import PREFIX_CHUNK_TOKENS, PrefixTrie, tokenize
+from agent_s3.planning.prompt_templates import get_stage_system_prompt
+from agent_s3.pre_planner_json_enforced import get_json_system_prompt, get_json_user_prompt
+
+STAGES = ("architecture_review", "refined_tests", "test_implementation", "implementation_plan")
+
+DEFAULT_TASKS = (
+    "Add password reset by email to the authentication service",
+    "Add pagination to the /api/orders endpoint",
+    "Migrate the settings page from class components to hooks",
+    "Add rate limiting to the public search API",
+    "Support CSV export of the monthly billing report",
+    "Add a dark mode toggle that persists per user",
+    "Replace the cron-based cleanup job with a task queue",
+    "Add OAuth login with GitHub",
+    "Cache product detail pages in Redis",
+    "Add audit logging for admin actions",
+    "Add  pagination to the /api/orders endpoint",
+    "Add pagination to the /api/orders endpoint ",
+)
+
+
+def legacy_hash(prompt):
+    return hashlib.sha256(" ".join(prompt.split()[:50]).encode()).hexdigest()
+
+
+def planner_prompts(tasks):
+    """Yield ``(prompt_set, prompt)`` pairs for every system prompt and task."""
+    for task in tasks:
+        yield "pre_planning", get_json_system_prompt() + "\n\n" + get_json_user_prompt(task)
+    for stage in STAGES:
+        for task in tasks:
+            yield stage, get_stage_system_prompt(stage) + "\n\nTask: " + task
+
+
+def run_benchmark(tasks=DEFAULT_TASKS, chunk_tokens=PREFIX_CHUNK_TOKENS):
+    legacy = {}
+    trie = PrefixTrie(chunk_tokens)
+    rows = {}
+    for prompt_set, prompt in planner_prompts(tasks):
+        row = rows.setdefault(prompt_set, {
+            "prompts": 0, "legacy_hits": 0, "legacy_unsafe": 0,
+            "trie_hits": 0, "tokens": 0, "reused_tokens": 0,
+            "whole_hits": 0, "whole_reused_tokens": 0,
+        })
+        row["prompts"] += 1
+
+        stored = legacy.get(legacy_hash(prompt))
+        if stored is not None:
+            row["legacy_hits"] += 1
+            row["legacy_unsafe"] += stored != prompt
+        legacy[legacy_hash(prompt)] = prompt
+
+        tokens = tokenize(prompt)
+        row["tokens"] += len(tokens)
+        match = trie.longest_prefix(tokens)
+        if match is not None:
+            row["trie_hits"] += 1
+            row["reused_tokens"] += match.tokens
+        match = trie.longest_prefix(tokens, whole=True)
+        if match is not None:
+            row["whole_hits"] += 1
+            row["whole_reused_tokens"] += match.tokens
+        trie.insert(tokens)
+    return rows
+
+
+def _read_tasks(path):
+    with open(path, encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks-file", help="one task description per line")
+    parser.add_argument("--chunk", type=int, default=PREFIX_CHUNK_TOKENS, help="tokens per trie chunk")
+    args = parser.parse_args()
+    tasks = _read_tasks(args.tasks_file) if args.tasks_file else DEFAULT_TASKS
+    for prompt_set, row in run_benchmark(tasks, args.chunk).items():
+        print(
+            f"{prompt_set:20s} prompts={row['prompts']:3d} "
+            f"legacy hit={row['legacy_hits'] / row['prompts']:.2f} "
+            f"(unsafe={row['legacy_unsafe'] / row['prompts']:.2f}) "
+            f"trie hit={row['trie_hits'] / row['prompts']:.2f} "
+            f"reused tokens={row['reused_tokens'] / row['tokens']:.2f} "
+            f"whole hit={row['whole_hits'] / row['prompts']:.2f} "
+            f"reused tokens={row['whole_reused_tokens'] / row['tokens']:.2f}"
+        )
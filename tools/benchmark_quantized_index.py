@@ -0,0 +1,97 @@
+"""
+Benchmark reduced-precision embedding storage against exact float32 search.
+
+Builds a ``QuantizedIndex`` at each precision from
+``agent_s3.tools.quantized_index`` over synthetic clustered, normalized
+vectors. It saves each index and loads it back, so the float32 re-ranking rows
+are memory-mapped as they are in use. Queries are noisy copies of stored
+vectors. For every re-rank factor it reports recall@k against the float32
+answer, resident bytes per vector, on-disk bytes per vector and mean query
+latency.
+
+Example::
+
+    python tools/benchmark_quantized_index.py --vectors 100000 --dim 768
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from agent_s3.tools.quantized_index import PRECISIONS, QuantizedIndex
+
+
+def make_dataset(count, dim, queries, clusters=256, noise=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = rng.integers(0, count, queries)
+    query_vectors = vectors[picks] + noise * rng.standard_normal((queries, dim)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return vectors, query_vectors
+
+
+def timed_search(index, queries, k):
+    start = time.perf_counter()
+    results = [[vec_id for vec_id, _ in index.search(query, k)] for query in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def disk_bytes(prefix):
+    directory, name = os.path.split(prefix)
+    return sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory) if f.startswith(name + "."))
+
+
+def run_benchmark(count=20000, dim=768, queries=200, k=10, precisions=PRECISIONS, rerank_factors=(1, 4, 16)):
+    vectors, query_vectors = make_dataset(count, dim, queries)
+    ids = np.arange(count, dtype=np.int64)
+    rows = []
+    truth = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for precision in precisions:
+            prefix = os.path.join(tmp, precision)
+            start = time.perf_counter()
+            index = QuantizedIndex(dim, precision)
+            index.add_with_ids(vectors, ids)
+            index.save(prefix)
+            build_s = time.perf_counter() - start
+            for factor in rerank_factors if precision != "float32" else (1,):
+                loaded = QuantizedIndex.load(prefix, dim, precision, rerank_factor=factor)
+                found, query_ms = timed_search(loaded, query_vectors, k)
+                if truth is None:
+                    truth = found
+                recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+                rows.append({
+                    "precision": precision,
+                    "rerank_factor": factor,
+                    f"recall_at_{k}": float(recall),
+                    "ram_bytes_per_vector": loaded.memory_bytes() / count,
+                    "disk_bytes_per_vector": disk_bytes(prefix) / count,
+                    "query_ms": query_ms,
+                    "build_s": build_s,
+                })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--precisions", nargs="+", default=list(PRECISIONS))
+    parser.add_argument("--rerank-factors", nargs="+", type=int, default=[1, 4, 16])
+    args = parser.parse_args()
+    if "float32" not in args.precisions[:1]:
+        # The first precision provides the ground truth
+        args.precisions = ["float32"] + [p for p in args.precisions if p != "float32"]
+    for row in run_benchmark(args.vectors, args.dim, args.queries, args.k, args.precisions, args.rerank_factors):
+        print(
+            f"{row['precision']:8s} rerank={row['rerank_factor']:<3d} "
+            f"recall@{args.k}={row[f'recall_at_{args.k}']:.3f} "
+            f"ram={row['ram_bytes_per_vector']:.0f}B/vec disk={row['disk_bytes_per_vector']:.0f}B/vec "
+            f"query={row['query_ms']:.3f}ms build={row['build_s']:.1f}s"
+        )
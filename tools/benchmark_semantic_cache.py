@@ -0,0 +1,76 @@
+"""
+Benchmark SemanticCache lookup throughput as the number of threads grows.
+
+Each lookup is a miss on the exact key, so it generates an embedding and runs
+a FAISS search. The embedding client is a stub that sleeps for ``--latency``
+milliseconds to stand in for a remote embedding call, which is the part that
+used to run under the cache's global lock. A fraction of lookups (``--exact``)
+repeat a seeded prompt and take the exact-key path instead.
+
+With embeddings computed outside the lock, throughput should scale roughly
+linearly with threads until the stub latency stops dominating.
+"""
+import argparse
+import hashlib
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from agent_s3.tools.semantic_cache import SemanticCache
+
+
+class StubEmbeddingClient:
+    """Deterministic embeddings derived from a hash of the text, after a fixed delay."""
+
+    def __init__(self, dim, latency):
+        self.dim = dim
+        self.latency = latency
+
+    def generate_embedding(self, text):
+        time.sleep(self.latency)
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], "little")
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+
+
+def run_threads(cache, lookups, threads, exact_ratio):
+    seeded = max(1, int(lookups * exact_ratio))
+
+    def one(i):
+        if i % lookups < seeded:
+            return cache.get({"prompt": f"seed {i % 50}"})
+        return cache.get({"prompt": f"query {threads} {i}"})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(lookups)))
+    elapsed = time.perf_counter() - start
+    return {"elapsed_s": elapsed, "ops_per_s": lookups / elapsed}
+
+
+def run_benchmark(lookups=200, thread_counts=(1, 2, 4, 8, 16), latency_ms=20.0, exact_ratio=0.2, dim=384):
+    with tempfile.TemporaryDirectory() as workspace:
+        cache = SemanticCache({"workspace_path": workspace, "embedding_dim": dim, "semantic_cache_ttl": 3600})
+        cache.embedding_client = StubEmbeddingClient(dim, latency_ms / 1000)
+        for i in range(50):
+            cache.set({"prompt": f"seed {i}"}, {"answer": i})
+        results = {threads: run_threads(cache, lookups, threads, exact_ratio) for threads in thread_counts}
+        cache.store.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--latency", type=float, default=20.0, help="stub embedding latency in ms")
+    parser.add_argument("--exact", type=float, default=0.2, help="fraction of exact-key lookups")
+    args = parser.parse_args()
+    results = run_benchmark(args.lookups, args.threads, args.latency, args.exact)
+    baseline = results[args.threads[0]]["ops_per_s"]
+    for threads, stats in results.items():
+        print(
+            f"threads={threads}: {stats['ops_per_s']:.1f} lookups/s "
+            f"({stats['elapsed_s']:.2f}s, {stats['ops_per_s'] / baseline:.1f}x)"
+        )
@@ -0,0 +1,78 @@
+"""
+Benchmark approximate semantic cache indexes against exact search.
+
+Builds each index kind from ``agent_s3.tools.semantic_cache_index`` over
+synthetic clustered, normalized vectors. Queries are noisy copies of stored
+vectors, which is what a reworded prompt looks like to the cache. For every
+``ef_search`` (HNSW) or ``nprobe`` (IVF) value it reports recall@1 against the
+``IndexFlatIP`` answer, mean query latency and build time.
+
+Example::
+
+    python tools/benchmark_semantic_cache_ann.py --vectors 100000 --dim 384
+"""
+import argparse
+import time
+
+import numpy as np
+
+from agent_s3.tools.semantic_cache_index import build_index, set_search_params
+
+
+def make_dataset(count, dim, queries, clusters=256, noise=0.05, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, count)] + 0.5 * rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = rng.integers(0, count, queries)
+    query_vectors = vectors[picks] + noise * rng.standard_normal((queries, dim)).astype(np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    return vectors, query_vectors
+
+
+def timed_search(index, queries):
+    start = time.perf_counter()
+    # One query per call, as SemanticCache.get issues them
+    results = [index.search(query.reshape(1, -1), 1)[1][0, 0] for query in queries]
+    return np.array(results), (time.perf_counter() - start) / len(queries) * 1000
+
+
+def run_benchmark(count=20000, dim=384, queries=500, kinds=("hnsw", "ivf_flat", "ivf_pq"),
+                  ef_search=(16, 32, 64, 128), nprobe=(1, 4, 16, 64)):
+    vectors, query_vectors = make_dataset(count, dim, queries)
+    ids = np.arange(count, dtype=np.int64)
+
+    flat = build_index("flat", vectors, ids)
+    truth, flat_ms = timed_search(flat, query_vectors)
+    rows = [{"kind": "flat", "setting": "-", "recall_at_1": 1.0, "query_ms": flat_ms, "build_s": 0.0}]
+
+    for kind in kinds:
+        start = time.perf_counter()
+        index = build_index(kind, vectors, ids)
+        build_s = time.perf_counter() - start
+        settings = ef_search if kind == "hnsw" else nprobe
+        for value in settings:
+            set_search_params(index, ef_search=value, nprobe=value)
+            found, query_ms = timed_search(index, query_vectors)
+            rows.append({
+                "kind": kind,
+                "setting": f"{'ef_search' if kind == 'hnsw' else 'nprobe'}={value}",
+                "recall_at_1": float(np.mean(found == truth)),
+                "query_ms": query_ms,
+                "build_s": build_s,
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--kinds", nargs="+", default=["hnsw", "ivf_flat", "ivf_pq"])
+    args = parser.parse_args()
+    for row in run_benchmark(args.vectors, args.dim, args.queries, args.kinds):
+        print(
+            f"{row['kind']:9s} {row['setting']:14s} recall@1={row['recall_at_1']:.3f} "
+            f"query={row['query_ms']:.3f}ms build={row['build_s']:.1f}s"
+        )
@@ -0,0 +1,66 @@
+"""
+Replay recorded LLM call metrics through the latency/cost routing policy.
+
+Input is a JSON list or JSON-lines file of ``RouterAgent.get_metrics()``
+records (``role``, ``model``, ``duration``, ``success``, ``tokens`` and
+optionally ``input_tokens``, ``output_tokens``, ``cost``). Candidate models per
+role come from llm.json. The replay is deterministic, so the same records and
+settings always produce the same routing decisions.
+
+Example::
+
+    python tools/simulate_routing.py metrics.jsonl --latency-slo 20 --cost-budget 0.01
+"""
+import argparse
+import json
+from pathlib import Path
+
+from agent_s3.routing_policy import simulate
+
+
+def load_records(path):
+    text = Path(path).read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def load_candidates(llm_config_path):
+    entries = json.loads(Path(llm_config_path).read_text(encoding="utf-8"))
+    candidates = {}
+    for entry in entries:
+        roles = entry.get("role")
+        for role in [roles] if isinstance(roles, str) else roles or []:
+            candidates.setdefault(role, []).insert(0, entry)
+    return candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("records", help="JSON or JSON-lines file of recorded call metrics")
+    parser.add_argument("--llm-config", default="llm.json", help="llm.json with candidate models per role")
+    parser.add_argument("--latency-slo", type=float, default=None, help="p95 latency target in seconds")
+    parser.add_argument("--cost-budget", type=float, default=None, help="maximum USD per call")
+    parser.add_argument("--decisions", action="store_true", help="print every routing decision")
+    args = parser.parse_args()
+
+    result = simulate(
+        load_records(args.records),
+        load_candidates(args.llm_config),
+        latency_slo=args.latency_slo,
+        cost_budget=args.cost_budget,
+    )
+    if args.decisions:
+        for decision in result["decisions"]:
+            print(json.dumps(decision))
+    for role, counts in sorted(result["choices"].items()):
+        print(f"{role}: " + ", ".join(f"{model}={count}" for model, count in sorted(counts.items())))
+        for model, stats in result["final_stats"].get(role, {}).items():
+            print(
+                f"  {model}: samples={stats['samples']} p50={stats['p50']:.2f}s "
+                f"p95={stats['p95']:.2f}s errors={stats['error_rate']:.1%}"
+            )
+
+
+if __name__ == "__main__":
+    main()